@@ -7,15 +7,24 @@ import os
 import random
 import re
 import logging
+from http.cookiejar import DefaultCookiePolicy
 from urllib.parse import quote
 
 import requests
+from requests.adapters import HTTPAdapter
 from dotenv import load_dotenv
 import threading
+import uuid
 
 from backend.planner.common import build_health_notes, parse_allergy_list, parse_health_flags
 from backend.planner.workouts import generate_workout_plan, pick_exercises
 from backend.planner.diets import generate_diet_plan, calc_target_kcal_and_macros, DIET_BASES
+from backend.planner.cache import get_plan_cache
+from backend.planner.refs import PLAN_REF_KEY, is_plan_ref, make_plan_ref
+
+from actions.cache import TTLCache
+from actions.health import BackendHealthMonitor
+from actions.jobs import DurableJobQueue, JobExecutor, PermanentJobError
 
 from rasa_sdk import Action, Tracker
 from rasa_sdk.executor import CollectingDispatcher
@@ -27,8 +36,40 @@ logger = logging.getLogger(__name__)
 # Optional local composer import (used when action server has access to backend package)
 try:
     from backend.food.composer import compose_diet  # type: ignore
+    from backend.food.catalog import get_catalog  # type: ignore
 except Exception:
     compose_diet = None
+    get_catalog = None
+
+
+def _compose_diet_cached(target_kcal: int, *, n_meals: int, catalog_path: str,
+                         exclude_allergens: Optional[List[str]], objetivo: str,
+                         weight_kg: Optional[float]) -> Optional[Dict[str, Any]]:
+    """compose_diet memoizado en el cache de planes (compartido con el backend si se configura).
+
+    La clave incluye la versión del catálogo para no servir menús de un archivo ya modificado.
+    """
+    params = {
+        "target_kcal": int(target_kcal),
+        "n_meals": int(n_meals),
+        "catalog_path": os.path.abspath(catalog_path),
+        "catalog_version": get_catalog(catalog_path).version if get_catalog else None,
+        "exclude": sorted({str(a).strip().lower() for a in exclude_allergens or []}),
+        "objetivo": (objetivo or "").strip().lower(),
+        "weight_kg": weight_kg,
+    }
+    return get_plan_cache().get_or_compute(
+        "compose",
+        params,
+        lambda: compose_diet(
+            int(target_kcal),
+            n_meals=n_meals,
+            catalog_path=catalog_path,
+            exclude_allergens=exclude_allergens,
+            objetivo=objetivo,
+            weight_kg=weight_kg,
+        ),
+    )
 
 # =========================================================
 # Helpers
@@ -56,6 +97,22 @@ else:
 CHAT_DIET_CATALOG = os.getenv("CHAT_DIET_CATALOG", "0").strip() in {"1", "true", "yes"}
 BACKEND_HEALTH_PATH = (os.getenv("BACKEND_HEALTH_PATH", "/health") or "/health").strip()
 BACKEND_HEALTH_TIMEOUT = float(os.getenv("BACKEND_HEALTH_TIMEOUT", "0.8"))
+# Cache + circuit breaker del estado del backend (ver actions/health.py)
+BACKEND_HEALTH_TTL_S = float(os.getenv("BACKEND_HEALTH_TTL_S", "5"))
+BACKEND_HEALTH_INTERVAL_S = float(os.getenv("BACKEND_HEALTH_INTERVAL_S", "2"))
+BACKEND_BREAKER_FAILURES = int(os.getenv("BACKEND_BREAKER_FAILURES", "3"))
+BACKEND_BREAKER_RESET_S = float(os.getenv("BACKEND_BREAKER_RESET_S", "10"))
+BACKEND_HTTP_POOL_SIZE = int(os.getenv("BACKEND_HTTP_POOL_SIZE", "16"))
+BACKEND_BOOTSTRAP_ENABLED = os.getenv("BACKEND_BOOTSTRAP", "1").strip().lower() not in {"0", "false", "no"}
+# Cache de lecturas al backend (ver actions/cache.py)
+ACTION_CACHE_CLASSES_TTL_S = float(os.getenv("ACTION_CACHE_CLASSES_TTL_S", "60"))
+ACTION_CACHE_STATE_TTL_S = float(os.getenv("ACTION_CACHE_STATE_TTL_S", "10"))
+ACTION_CACHE_MAX_ENTRIES = int(os.getenv("ACTION_CACHE_MAX_ENTRIES", "512"))
+# Cola durable de efectos secundarios (ver actions/jobs.py)
+ACTION_JOBS_DB = os.getenv("ACTION_JOBS_DB", "").strip() or os.path.join(_BASE_DIR, "actions", "data", "jobs.sqlite3")
+ACTION_JOBS_WORKERS = int(os.getenv("ACTION_JOBS_WORKERS", "2"))
+ACTION_JOBS_BATCH = int(os.getenv("ACTION_JOBS_BATCH", "20"))
+ACTION_JOBS_MAX_ATTEMPTS = int(os.getenv("ACTION_JOBS_MAX_ATTEMPTS", "6"))
 
 # Training prescription schemes: objetivo → nivel → {series, reps, rpe, rires}
 # series/reps are (min, max) tuples; rpe/rires are display strings.
@@ -97,6 +154,78 @@ SCHEMES: dict = {
 }
 
 
+_BACKEND_SESSION: Optional[requests.Session] = None
+_BACKEND_SESSION_LOCK = threading.Lock()
+
+
+def backend_http() -> requests.Session:
+    """Sesion HTTP compartida (keep-alive + pool) para todas las llamadas al backend.
+
+    No guarda cookies: la misma sesion atiende a todos los usuarios y una cookie de
+    Flask reenviada entre ellos mezclaria identidades. Los reintentos los decide cada
+    helper; el adapter no reintenta por su cuenta.
+    """
+    global _BACKEND_SESSION
+    if _BACKEND_SESSION is None:
+        with _BACKEND_SESSION_LOCK:
+            if _BACKEND_SESSION is None:
+                session = requests.Session()
+                session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=BACKEND_HTTP_POOL_SIZE, max_retries=0)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                _BACKEND_SESSION = session
+    return _BACKEND_SESSION
+
+
+# Clases/sesiones publicas (iguales para todos) y contexto/perfil por sender.
+# Solo se cachean respuestas validas; las escrituras invalidan con `invalidate_backend_state`.
+CLASSES_CACHE = TTLCache("classes", maxsize=ACTION_CACHE_MAX_ENTRIES, ttl_s=ACTION_CACHE_CLASSES_TTL_S)
+BACKEND_STATE_CACHE = TTLCache(
+    "backend_state", maxsize=ACTION_CACHE_MAX_ENTRIES, ttl_s=ACTION_CACHE_STATE_TTL_S, copy_values=True
+)
+# Planes resueltos desde su `plan_ref`: un digest nunca cambia de contenido.
+PLAN_REF_CACHE = TTLCache("plan_refs", maxsize=128, ttl_s=3600.0, copy_values=True)
+
+
+def invalidate_backend_state(sender_id: Optional[str] = None, user_id: Any = None) -> None:
+    """Descarta contexto/perfil cacheados tras una escritura del sender o del usuario."""
+    if sender_id:
+        BACKEND_STATE_CACHE.invalidate(("boot", sender_id))
+        BACKEND_STATE_CACHE.invalidate(("ctx", sender_id))
+    if user_id is not None:
+        BACKEND_STATE_CACHE.invalidate(("profile", str(user_id)))
+
+
+def _has_user(ctx: Any) -> bool:
+    return isinstance(ctx, dict) and bool(ctx.get("user_id"))
+
+
+def _probe_backend_health() -> bool:
+    path = BACKEND_HEALTH_PATH if BACKEND_HEALTH_PATH.startswith("/") else f"/{BACKEND_HEALTH_PATH}"
+    resp = backend_http().get(f"{BACKEND_BASE_URL.rstrip('/')}{path}", timeout=BACKEND_HEALTH_TIMEOUT)
+    return resp.status_code == 200
+
+
+_BACKEND_MONITOR: Optional[BackendHealthMonitor] = None
+
+
+def backend_monitor() -> BackendHealthMonitor:
+    """Monitor de salud compartido: cachea `/health` y abre el circuito si el backend cae."""
+    global _BACKEND_MONITOR
+    if _BACKEND_MONITOR is None:
+        with _BACKEND_SESSION_LOCK:
+            if _BACKEND_MONITOR is None:
+                _BACKEND_MONITOR = BackendHealthMonitor(
+                    _probe_backend_health,
+                    ttl_s=BACKEND_HEALTH_TTL_S,
+                    interval_s=BACKEND_HEALTH_INTERVAL_S,
+                    failure_threshold=BACKEND_BREAKER_FAILURES,
+                    reset_timeout_s=BACKEND_BREAKER_RESET_S,
+                )
+    return _BACKEND_MONITOR
+
+
 def backend_health_status(
     *,
     sender_id: Optional[str] = None,
@@ -104,31 +233,14 @@ def backend_health_status(
 ) -> Tuple[bool, float]:
     if not BACKEND_BASE_URL:
         return False, 0.0
-    path = BACKEND_HEALTH_PATH if BACKEND_HEALTH_PATH.startswith("/") else f"/{BACKEND_HEALTH_PATH}"
-    url = f"{BACKEND_BASE_URL.rstrip('/')}{path}"
-    start = time.perf_counter()
-    try:
-        resp = requests.get(url, timeout=BACKEND_HEALTH_TIMEOUT)
-    except Exception:
-        elapsed_ms = (time.perf_counter() - start) * 1000
-        logger.info(
-            "healthcheck",
-            extra={
-                "sender": sender_id,
-                "intent": intent,
-                "ok": False,
-                "elapsed_ms": round(elapsed_ms, 1),
-            },
-        )
-        return False, elapsed_ms
-    elapsed_ms = (time.perf_counter() - start) * 1000
-    ok = resp.status_code == 200
+    ok, elapsed_ms, source = backend_monitor().status()
     logger.info(
         "healthcheck",
         extra={
             "sender": sender_id,
             "intent": intent,
             "ok": ok,
+            "source": source,
             "elapsed_ms": round(elapsed_ms, 1),
         },
     )
@@ -160,29 +272,66 @@ def mark_offline(dispatcher: CollectingDispatcher, tracker: Tracker) -> List[Dic
 
 
 def send_context_update(sender_id: str, payload: Dict[str, Any]) -> None:
-    """Propaga información del usuario al backend para persistir contexto."""
-    if not sender_id or not payload:
-        return
-    base = BACKEND_BASE_URL
-    if not base:
+    """Encola la propagacion de datos del usuario al contexto del backend.
+
+    Las actualizaciones seguidas de un mismo sender se fusionan en un solo POST.
+    """
+    if not sender_id or not payload or not BACKEND_BASE_URL:
         return
-    url = f"{base.rstrip('/')}/chat/context/{sender_id}"
+    invalidate_backend_state(sender_id)
     try:
-        requests.post(url, json=payload, timeout=CONTEXT_TIMEOUT)
+        action_jobs().submit(
+            "context_update", {"sender_id": sender_id, "payload": payload}, coalesce_key=sender_id
+        )
     except Exception as exc:
-        logger.warning("No se pudo actualizar contexto para %s: %s", sender_id, exc)
+        logger.warning("No se pudo encolar contexto para %s: %s", sender_id, exc)
+
+
+def _raise_for_job(resp: requests.Response, what: str) -> None:
+    """5xx/429 se reintentan; el resto de 4xx no tiene arreglo reintentando."""
+    if resp.status_code >= 500 or resp.status_code == 429:
+        raise RuntimeError(f"{what}: status {resp.status_code}")
+    if resp.status_code >= 400:
+        raise PermanentJobError(f"{what}: status {resp.status_code}")
+
+
+def _require_backend() -> None:
+    if not backend_monitor().available():
+        raise RuntimeError("backend offline (circuito abierto)")
+
+
+def _deliver_context_update(job: Dict[str, Any]) -> None:
+    _require_backend()
+    sender_id = str(job.get("sender_id") or "")
+    headers: Dict[str, str] = {}
+    if CONTEXT_API_KEY:
+        headers["X-Context-Key"] = CONTEXT_API_KEY
+    resp = backend_http().post(
+        f"{BACKEND_BASE_URL.rstrip('/')}/chat/context/{quote(sender_id[:80])}",
+        json=job.get("payload") or {},
+        headers=headers,
+        timeout=CONTEXT_TIMEOUT,
+    )
+    _raise_for_job(resp, f"contexto {sender_id}")
+    invalidate_backend_state(sender_id)
 
 
 def fetch_chat_context(sender_id: str) -> Optional[Dict[str, Any]]:
     if not sender_id or not BACKEND_BASE_URL:
         return None
+    return BACKEND_STATE_CACHE.get_or_load(
+        ("ctx", sender_id), lambda: _load_chat_context(sender_id), cache_if=_has_user
+    )
+
+
+def _load_chat_context(sender_id: str) -> Optional[Dict[str, Any]]:
     safe_sender = quote(sender_id[:80])
     url = f"{BACKEND_BASE_URL.rstrip('/')}/chat/context/{safe_sender}"
     headers: Dict[str, str] = {}
     if CONTEXT_API_KEY:
         headers["X-Context-Key"] = CONTEXT_API_KEY
     try:
-        resp = requests.get(url, headers=headers, timeout=CONTEXT_TIMEOUT)
+        resp = backend_http().get(url, headers=headers, timeout=CONTEXT_TIMEOUT)
     except requests.RequestException as exc:
         logger.warning("No se pudo obtener contexto para %s: %s", sender_id, exc)
         return None
@@ -196,6 +345,57 @@ def fetch_chat_context(sender_id: str) -> Optional[Dict[str, Any]]:
     return payload.get("context")
 
 
+def resolve_plan_ref(value: Any) -> Optional[Dict[str, Any]]:
+    """Resuelve bajo demanda un slot `ultima_rutina`/`ultima_dieta` al plan completo.
+
+    Los slots guardan solo la referencia por contenido (`plan_ref`); el plan se pide
+    a `/chat/plans/<digest>` y se cachea en `PLAN_REF_CACHE`.
+    """
+    if not is_plan_ref(value):
+        return value if isinstance(value, dict) else None
+    if not BACKEND_BASE_URL:
+        return None
+    digest = value[PLAN_REF_KEY]
+    return PLAN_REF_CACHE.get_or_load(("plan", digest), lambda: _load_plan(digest))
+
+
+def _load_plan(digest: str) -> Optional[Dict[str, Any]]:
+    headers: Dict[str, str] = {}
+    if CONTEXT_API_KEY:
+        headers["X-Context-Key"] = CONTEXT_API_KEY
+    try:
+        resp = backend_http().get(
+            f"{BACKEND_BASE_URL.rstrip('/')}/chat/plans/{quote(digest)}", headers=headers, timeout=CONTEXT_TIMEOUT
+        )
+    except requests.RequestException as exc:
+        logger.warning("No se pudo resolver el plan %s: %s", digest[:12], exc)
+        return None
+    if resp.status_code != 200:
+        return None
+    try:
+        plan = resp.json().get("plan")
+    except Exception:
+        return None
+    return plan if isinstance(plan, dict) else None
+
+
+def _exercise_in_last_routine(tracker: Tracker, fragment: str) -> Optional[str]:
+    """Nombre exacto del ejercicio de la ultima rutina que contiene `fragment`.
+
+    `pick_exercises` excluye por nombre completo; el usuario suele decir solo una
+    parte ("quita el press"), asi que se busca en el plan referenciado por el slot.
+    """
+    plan = resolve_plan_ref(tracker.get_slot("ultima_rutina"))
+    needle = fragment.strip().lower()
+    if not plan or not needle:
+        return None
+    for exercise in plan.get("exercises") or []:
+        name = str((exercise or {}).get("nombre") or "")
+        if needle in name.lower():
+            return name
+    return None
+
+
 def ensure_authenticated_context(tracker: Tracker) -> Optional[Dict[str, Any]]:
     sender = (tracker.sender_id or "").strip()
     if not sender:
@@ -210,45 +410,45 @@ def _fetch_authenticated_context_or_offline(
     tracker: Tracker,
     dispatcher: CollectingDispatcher,
     events: List[Dict[Text, Any]],
-) -> Any:
-    """Fetch context without a prior health-check round-trip.
+) -> Tuple[Any, Optional[Dict[str, Any]]]:
+    """Fetch context and profile in one round-trip (/chat/bootstrap), no prior health-check.
 
-    Returns:
+    Returns (ctx, profile) where ctx is:
         dict  — authenticated context (backend up, user logged in)
         False — backend up but user not logged in (show login message)
         None  — backend unreachable (caller should mark offline)
     """
     sender = (tracker.sender_id or "").strip()
-    if not sender or not BACKEND_BASE_URL:
-        events.extend(mark_offline(dispatcher, tracker))
-        return None
+    intent = tracker.latest_message.get("intent", {}).get("name")
     try:
-        ctx = fetch_chat_context(sender)
+        boot = fetch_backend_bootstrap(sender, intent=intent)
     except Exception:
+        boot = None
+    if boot is None:
         events.extend(mark_offline(dispatcher, tracker))
-        return None
-    if ctx is None:
-        # fetch_chat_context returns None on connection error OR non-200.
-        # We treat it as offline to stay safe.
-        events.extend(mark_offline(dispatcher, tracker))
-        return None
-    if not ctx.get("user_id"):
+        return None, None
+    ctx = boot.get("context")
+    if not isinstance(ctx, dict) or not ctx.get("user_id"):
         dispatcher.utter_message(
             text="No pude validar tu sesion. Inicia sesion en la web y vuelve a intentarlo."
         )
-        return False
-    return ctx
+        return False, None
+    return ctx, boot.get("profile")
 
 
 def fetch_user_profile(ctx: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
     if not ctx or not ctx.get("user_id") or not BACKEND_BASE_URL:
         return None
     user_id = ctx.get("user_id")
+    return BACKEND_STATE_CACHE.get_or_load(("profile", str(user_id)), lambda: _load_user_profile(user_id))
+
+
+def _load_user_profile(user_id: Any) -> Optional[Dict[str, Any]]:
     headers: Dict[str, str] = {"Accept": "application/json"}
     if CONTEXT_API_KEY:
         headers["X-Context-Key"] = CONTEXT_API_KEY
     try:
-        resp = requests.get(
+        resp = backend_http().get(
             f"{BACKEND_BASE_URL.rstrip('/')}" + "/profile/me",
             params={"user_id": user_id},
             headers=headers,
@@ -266,19 +466,122 @@ def fetch_user_profile(ctx: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]
         logger.warning("Respuesta invalida del backend al obtener perfil (user_id=%s)", user_id)
         return None
     profile = payload.get("profile") if isinstance(payload, dict) else None
-    if profile and profile.get("weight_kg") is not None:
-        try:
-            profile["weight_kg"] = float(profile["weight_kg"])
-        except (TypeError, ValueError):
-            pass
-    if profile and profile.get("height_cm") is not None:
-        try:
-            profile["height_cm"] = float(profile["height_cm"])
-        except (TypeError, ValueError):
-            pass
+    return _normalize_profile(profile)
+
+
+def _normalize_profile(profile: Any) -> Optional[Dict[str, Any]]:
+    if not isinstance(profile, dict):
+        return None
+    for key in ("weight_kg", "height_cm"):
+        if profile.get(key) is not None:
+            try:
+                profile[key] = float(profile[key])
+            except (TypeError, ValueError):
+                pass
     return profile
 
 
+def fetch_backend_bootstrap(
+    sender_id: str,
+    *,
+    include_profile: bool = True,
+    intent: Optional[str] = None,
+) -> Optional[Dict[str, Any]]:
+    """Salud + contexto + perfil del backend en un solo GET a `/chat/bootstrap/<sender>`.
+
+    Devuelve `{"ok", "context", "profile"}` o None si el backend no responde. Si el
+    backend todavia no expone el endpoint se arma la misma respuesta con las llamadas
+    sueltas (health, contexto, perfil). Con usuario autenticado la respuesta se reutiliza
+    `ACTION_CACHE_STATE_TTL_S` entre acciones (ver `invalidate_backend_state`).
+    """
+    if not sender_id or not BACKEND_BASE_URL:
+        return None
+    monitor = backend_monitor()
+    if not monitor.available():
+        # Circuito abierto: offline al instante, sin esperar el timeout.
+        logger.info("backend_bootstrap", extra={"sender": sender_id, "intent": intent, "ok": False, "source": "circuit"})
+        return None
+    return BACKEND_STATE_CACHE.get_or_load(
+        ("boot", sender_id, include_profile),
+        lambda: _load_backend_bootstrap(sender_id, include_profile=include_profile, intent=intent),
+        cache_if=lambda boot: boot is not None and _has_user(boot.get("context")),
+    )
+
+
+def _load_backend_bootstrap(
+    sender_id: str,
+    *,
+    include_profile: bool,
+    intent: Optional[str],
+) -> Optional[Dict[str, Any]]:
+    monitor = backend_monitor()
+    if BACKEND_BOOTSTRAP_ENABLED:
+        headers: Dict[str, str] = {"Accept": "application/json"}
+        if CONTEXT_API_KEY:
+            headers["X-Context-Key"] = CONTEXT_API_KEY
+        start = time.perf_counter()
+        payload: Any = None
+        try:
+            resp = backend_http().get(
+                f"{BACKEND_BASE_URL.rstrip('/')}/chat/bootstrap/{quote(sender_id[:80])}",
+                params={"profile": "1" if include_profile else "0"},
+                headers=headers,
+                timeout=CONTEXT_TIMEOUT,
+            )
+            if resp.status_code == 200:
+                payload = resp.json()
+            elif resp.status_code != 404:
+                payload = {"ok": resp.status_code < 500, "context": None, "profile": None}
+            if resp.status_code >= 500:
+                monitor.record_failure()
+            else:
+                monitor.record_success()
+        except (requests.RequestException, ValueError) as exc:
+            logger.warning("No se pudo obtener bootstrap para %s: %s", sender_id, exc)
+            monitor.record_failure()
+            payload = {"ok": False}
+        logger.info(
+            "backend_bootstrap",
+            extra={
+                "sender": sender_id,
+                "intent": intent,
+                "ok": bool(isinstance(payload, dict) and payload.get("ok")),
+                "elapsed_ms": round((time.perf_counter() - start) * 1000, 1),
+            },
+        )
+        if isinstance(payload, dict) and "ok" in payload:
+            if not payload.get("ok"):
+                return None
+            return {
+                "ok": True,
+                "context": payload.get("context"),
+                "profile": _normalize_profile(payload.get("profile")),
+            }
+    # Backend sin /chat/bootstrap (404 de ruta): secuencia anterior.
+    if not backend_health_ok(sender_id=sender_id, intent=intent):
+        return None
+    ctx = fetch_chat_context(sender_id)
+    profile = fetch_user_profile(ctx) if include_profile else None
+    return {"ok": True, "context": ctx, "profile": profile}
+
+
+def load_backend_state(
+    tracker: Tracker,
+    *,
+    include_profile: bool = True,
+) -> Tuple[bool, Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
+    """(backend_online, contexto autenticado, perfil) para una accion, en un round-trip."""
+    sender = (tracker.sender_id or "").strip()
+    intent = tracker.latest_message.get("intent", {}).get("name")
+    boot = fetch_backend_bootstrap(sender, include_profile=include_profile, intent=intent)
+    if boot is None:
+        return False, None, None
+    ctx = boot.get("context")
+    if not isinstance(ctx, dict) or not ctx.get("user_id"):
+        return True, None, None
+    return True, ctx, boot.get("profile")
+
+
 def save_hero_plan(ctx: Optional[Dict[str, Any]], payload: Dict[str, Any]) -> bool:
     if not ctx or not ctx.get("user_id") or not BACKEND_BASE_URL:
         return False
@@ -293,7 +596,7 @@ def save_hero_plan(ctx: Optional[Dict[str, Any]], payload: Dict[str, Any]) -> bo
         "source": "chat",
     }
     try:
-        resp = requests.post(
+        resp = backend_http().post(
             f"{BACKEND_BASE_URL.rstrip('/')}/profile/hero-plans",
             json=body,
             headers=headers,
@@ -318,7 +621,7 @@ def persist_plan(
         headers["X-Context-Key"] = CONTEXT_API_KEY
     body = {"user_id": ctx.get("user_id"), **payload}
     try:
-        resp = requests.post(
+        resp = backend_http().post(
             f"{BACKEND_BASE_URL.rstrip('/')}{path}",
             json=body,
             headers=headers,
@@ -338,6 +641,108 @@ def persist_plan(
     return str(plan_id) if plan_id else None
 
 
+_PLAN_PATHS = {"routine": "/api/routine-plans", "diet": "/api/diet-plans"}
+
+
+def queue_plan_persistence(ctx: Optional[Dict[str, Any]], kind: str, payload: Dict[str, Any]) -> Optional[str]:
+    """Encola el guardado de un plan; devuelve el id (uuid) que tendra en el backend.
+
+    El id se genera aqui para que los reintentos sean idempotentes en `/api/plans/bulk`.
+    """
+    if not ctx or not ctx.get("user_id") or not BACKEND_BASE_URL or kind not in _PLAN_PATHS:
+        return None
+    plan_id = str(uuid.uuid4())
+    try:
+        action_jobs().submit(
+            "persist_plan", {"kind": kind, "id": plan_id, "user_id": ctx.get("user_id"), **payload}
+        )
+    except Exception as exc:
+        logger.warning("No se pudo encolar el plan %s: %s", kind, exc)
+        return None
+    return plan_id
+
+
+def _deliver_plans(items: List[Dict[str, Any]]) -> List[Optional[Exception]]:
+    """Guarda un lote de planes con un POST a `/api/plans/bulk` (un commit en el backend)."""
+    _require_backend()
+    headers: Dict[str, str] = {"Content-Type": "application/json"}
+    if CONTEXT_API_KEY:
+        headers["X-Context-Key"] = CONTEXT_API_KEY
+    resp = backend_http().post(
+        f"{BACKEND_BASE_URL.rstrip('/')}/api/plans/bulk",
+        json={"items": items},
+        headers=headers,
+        timeout=CONTEXT_TIMEOUT,
+    )
+    if resp.status_code in {404, 405}:
+        # Backend sin endpoint bulk: un POST por plan como antes. Esas rutas no reciben el
+        # uuid del cliente, asi que un reintento podria duplicar un plan que si se guardo
+        # (p.ej. respuesta perdida): cada item se resuelve por separado y los fallidos se
+        # descartan (`PermanentJobError`) en vez de reintentarse.
+        errors: List[Optional[Exception]] = []
+        for item in items:
+            body = {k: v for k, v in item.items() if k not in {"kind", "id", "user_id"}}
+            try:
+                saved = persist_plan(
+                    {"user_id": item.get("user_id")}, path=_PLAN_PATHS[item["kind"]], payload=body
+                )
+            except Exception as exc:
+                saved = None
+                logger.warning("persist_plan lanzo una excepcion: %s", exc)
+            errors.append(None if saved else PermanentJobError("persist_plan fallo (ruta sin idempotencia)"))
+        return errors
+    _raise_for_job(resp, "plans/bulk")
+    results = resp.json().get("results") or []
+    errors = []
+    for idx in range(len(items)):
+        result = results[idx] if idx < len(results) and isinstance(results[idx], dict) else {}
+        status = int(result.get("status") or 500)
+        if status < 300:
+            errors.append(None)
+        elif status < 500:
+            errors.append(PermanentJobError(f"plan rechazado ({status}): {result.get('error')}"))
+        else:
+            errors.append(RuntimeError(f"plan fallo ({status})"))
+    return errors
+
+
+def _deliver_routine_email(job: Dict[str, Any]) -> None:
+    _require_backend()
+    result = maybe_send_routine_email(
+        {"user_id": job.get("user_id")}, routine_data=job.get("routine_data"), attach=bool(job.get("attach"))
+    )
+    status = (result or {}).get("status")
+    if status == "unauthorized":
+        raise PermanentJobError("correo de rutina rechazado por auth")
+    if status in {"network", "error"}:
+        raise RuntimeError(f"correo de rutina: {status}")
+
+
+_ACTION_JOBS: Optional[JobExecutor] = None
+_ACTION_JOBS_LOCK = threading.Lock()
+
+
+def action_jobs() -> JobExecutor:
+    """Executor compartido (lazy) de efectos secundarios; reemplaza un hilo por accion."""
+    global _ACTION_JOBS
+    if _ACTION_JOBS is None:
+        with _ACTION_JOBS_LOCK:
+            if _ACTION_JOBS is None:
+                executor = JobExecutor(
+                    DurableJobQueue(ACTION_JOBS_DB),
+                    workers=ACTION_JOBS_WORKERS,
+                    batch_size=ACTION_JOBS_BATCH,
+                    max_attempts=ACTION_JOBS_MAX_ATTEMPTS,
+                )
+                executor.register("persist_plan", _deliver_plans, batch=True)
+                executor.register("context_update", _deliver_context_update)
+                executor.register("routine_email", _deliver_routine_email)
+                # Retoma lo que quedo pendiente de una ejecucion anterior.
+                executor.start()
+                _ACTION_JOBS = executor
+    return _ACTION_JOBS
+
+
 def infer_training_level(profile: Optional[Dict[str, Any]]) -> Optional[str]:
     """Determina el nivel de entrenamiento usando experiencia declarada o actividad."""
     if not profile:
@@ -635,7 +1040,7 @@ class ActionFetchProfile(Action):
         # Skip the separate health check: we infer backend health from the
         # context/profile calls themselves. This removes one sequential HTTP
         # round-trip and saves ~1-2s of latency.
-        ctx = _fetch_authenticated_context_or_offline(
+        ctx, profile = _fetch_authenticated_context_or_offline(
             tracker, dispatcher, events
         )
         if ctx is None:
@@ -648,11 +1053,6 @@ class ActionFetchProfile(Action):
             events.append(SlotSet("perfil_completo", False))
             return events
 
-        try:
-            profile = fetch_user_profile(ctx)
-        except Exception as exc:
-            logger.warning("No se pudo obtener el perfil: %s", exc)
-            profile = None
         complete = profile_is_complete(profile)
 
         if profile:
@@ -714,15 +1114,14 @@ class ActionSubmitProfileForm(Action):
         tracker: Tracker,
         domain: Dict[Text, Any],
     ) -> List[Dict[Text, Any]]:
-        intent_name = tracker.latest_message.get("intent", {}).get("name")
-        if not backend_health_ok(sender_id=tracker.sender_id, intent=intent_name):
+        backend_online, ctx, _ = load_backend_state(tracker, include_profile=False)
+        if not backend_online:
             events = mark_offline(dispatcher, tracker)
             dispatcher.utter_message(
                 text="No pude guardar tu perfil porque el backend no está disponible. Puedo seguir con datos locales si quieres."
             )
             events.append(SlotSet("perfil_completo", False))
             return events
-        ctx = ensure_authenticated_context(tracker)
         if not ctx:
             dispatcher.utter_message(
                 text="Tu sesion web no esta activa. Inicia sesion y vuelve a actualizar el perfil."
@@ -758,7 +1157,7 @@ class ActionSubmitProfileForm(Action):
             return []
 
         try:
-            resp = requests.put(
+            resp = backend_http().put(
                 f"{BACKEND_BASE_URL.rstrip('/')}{PROFILE_UPDATE_PATH}",
                 json=payload,
                 headers=headers,
@@ -771,6 +1170,7 @@ class ActionSubmitProfileForm(Action):
             )
             return []
 
+        invalidate_backend_state(tracker.sender_id, ctx.get("user_id"))
         if resp.status_code in {401, 403}:
             dispatcher.utter_message(text="Parece que tu sesion expiro. Inicia sesion otra vez para continuar.")
             return [SlotSet("perfil_completo", False)]
@@ -908,7 +1308,7 @@ def maybe_send_routine_email(
     if CONTEXT_API_KEY:
         headers["X-Context-Key"] = CONTEXT_API_KEY
     try:
-        resp = requests.post(
+        resp = backend_http().post(
             f"{BACKEND_BASE_URL.rstrip('/')}/notifications/daily-routine",
             json=payload,
             headers=headers,
@@ -1507,31 +1907,43 @@ def _parse_iso_datetime(value: Optional[str]) -> Optional[datetime]:
 def _fetch_public_classes(search: Optional[str] = None) -> List[Dict[str, Any]]:
     if not BACKEND_BASE_URL:
         return []
+    key = ("classes", str(search or "").strip())
+    return CLASSES_CACHE.get_or_load(key, lambda: _load_public_classes(search)) or []
+
+
+def _load_public_classes(search: Optional[str]) -> Optional[List[Dict[str, Any]]]:
     params: Dict[str, str] = {}
     if search:
         params["search"] = str(search).strip()
     try:
-        resp = requests.get(
+        resp = backend_http().get(
             f"{BACKEND_BASE_URL.rstrip('/')}/classes/public",
             params=params if params else None,
             timeout=CONTEXT_TIMEOUT,
         )
     except requests.RequestException as exc:
         logger.warning("No se pudo obtener clases publicas: %s", exc)
-        return []
+        return None
     if resp.status_code != 200:
         logger.warning("Clases publicas no disponibles (status=%s)", resp.status_code)
-        return []
+        return None
     try:
         payload = resp.json()
     except Exception:
-        return []
+        return None
     classes = payload.get("classes") if isinstance(payload, dict) else None
-    return classes if isinstance(classes, list) else []
+    return classes if isinstance(classes, list) else None
 
 def _fetch_public_sessions(class_id: Optional[int], start_iso: Optional[str], end_iso: Optional[str]) -> List[Dict[str, Any]]:
     if not BACKEND_BASE_URL:
         return []
+    key = ("sessions", class_id, start_iso, end_iso)
+    return CLASSES_CACHE.get_or_load(key, lambda: _load_public_sessions(class_id, start_iso, end_iso)) or []
+
+
+def _load_public_sessions(
+    class_id: Optional[int], start_iso: Optional[str], end_iso: Optional[str]
+) -> Optional[List[Dict[str, Any]]]:
     params: Dict[str, str] = {}
     if class_id is not None:
         params["class_id"] = str(class_id)
@@ -1540,23 +1952,23 @@ def _fetch_public_sessions(class_id: Optional[int], start_iso: Optional[str], en
     if end_iso:
         params["end"] = end_iso
     try:
-        resp = requests.get(
+        resp = backend_http().get(
             f"{BACKEND_BASE_URL.rstrip('/')}/classes/public/sessions",
             params=params if params else None,
             timeout=CONTEXT_TIMEOUT,
         )
     except requests.RequestException as exc:
         logger.warning("No se pudo obtener sesiones publicas: %s", exc)
-        return []
+        return None
     if resp.status_code != 200:
         logger.warning("Sesiones publicas no disponibles (status=%s)", resp.status_code)
-        return []
+        return None
     try:
         payload = resp.json()
     except Exception:
-        return []
+        return None
     sessions = payload.get("sessions") if isinstance(payload, dict) else None
-    return sessions if isinstance(sessions, list) else []
+    return sessions if isinstance(sessions, list) else None
 
 def _norm_class_name(value: Any) -> str:
     return str(value or "").strip().lower()
@@ -1820,8 +2232,7 @@ class ValidateRutinaForm(FormValidationAction):
             return {"nivel": None}
 
         # Si no hay valor, intenta usar el perfil del usuario
-        ctx = ensure_authenticated_context(tracker)
-        profile = fetch_user_profile(ctx)
+        _, _, profile = load_backend_state(tracker)
         inferred = infer_training_level(profile)
         if inferred:
             dispatcher.utter_message(text=f"Asumiré nivel {inferred} según tu actividad registrada.")
@@ -1965,21 +2376,15 @@ class ActionGenerarRutina(Action):
     def run(self, dispatcher: CollectingDispatcher, tracker: Tracker,
             domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
 
-        intent_name = tracker.latest_message.get("intent", {}).get("name")
-        offline_backend = not backend_health_ok(sender_id=tracker.sender_id, intent=intent_name)
+        # Salud, contexto y perfil en un solo round-trip (/chat/bootstrap).
+        backend_online, ctx, profile_data = load_backend_state(tracker)
+        offline_backend = not backend_online
         offline_events: List[Dict[Text, Any]] = []
         if offline_backend:
             offline_events.extend(mark_offline(dispatcher, tracker))
-        ctx: Optional[Dict[str, Any]] = None
-        if REQUIRE_AUTH_FOR_ROUTINE:
-            ctx = ensure_authenticated_context(tracker)
-            if ctx is None and not offline_backend:
-                dispatcher.utter_message(text="Necesitas iniciar sesión en Fitter antes de generar tu rutina. Inicia sesión y vuelve a intentarlo.")
-                return []
-        if ctx is None:
-            ctx = ensure_authenticated_context(tracker)
-
-        profile_data = None if offline_backend else fetch_user_profile(ctx)
+        if REQUIRE_AUTH_FOR_ROUTINE and ctx is None and not offline_backend:
+            dispatcher.utter_message(text="Necesitas iniciar sesión en Fitter antes de generar tu rutina. Inicia sesión y vuelve a intentarlo.")
+            return []
 
         profile_goal = None
         if profile_data and profile_data.get("primary_goal"):
@@ -2232,29 +2637,31 @@ class ActionGenerarRutina(Action):
         if dislikes and str(dislikes).strip():
             context_payload["dislikes"] = dislikes
 
-        # persist_plan, email y send_context_update son fire-and-forget
+        # persist_plan, email y send_context_update van a la cola durable (actions/jobs.py)
         if not offline_backend:
-            def _bg_persist_rutina():
-                plan_id = persist_plan(
-                    ctx,
-                    path="/api/routine-plans",
-                    payload={
-                        "title": routine_summary.get("header") or "Rutina generada",
-                        "objective": objetivo,
-                        "content": routine_summary,
-                    },
-                )
-                if EMAIL_ROUTINE_ENABLED and ctx:
-                    try:
-                        maybe_send_routine_email(ctx, routine_data=routine_summary, attach=True)
-                    except Exception as exc:
-                        logger.warning("No se pudo enviar rutina por correo: %s", exc)
-                if context_payload:
-                    send_context_update(tracker.sender_id, context_payload)
-            threading.Thread(target=_bg_persist_rutina, daemon=True).start()
+            queue_plan_persistence(
+                ctx,
+                "routine",
+                {
+                    "title": routine_summary.get("header") or "Rutina generada",
+                    "objective": objetivo,
+                    "content": routine_summary,
+                },
+            )
+            if EMAIL_ROUTINE_ENABLED and ctx and ctx.get("user_id"):
+                try:
+                    action_jobs().submit(
+                        "routine_email",
+                        {"user_id": ctx.get("user_id"), "routine_data": routine_summary, "attach": True},
+                    )
+                except Exception as exc:
+                    logger.warning("No se pudo encolar la rutina por correo: %s", exc)
+            if context_payload:
+                send_context_update(tracker.sender_id, context_payload)
 
         return offline_events + [
-            SlotSet("ultima_rutina", routine_summary),
+            # Solo la referencia: el tracker store persiste los slots en cada evento.
+            SlotSet("ultima_rutina", make_plan_ref(routine_summary)),
             SlotSet("servicio_pendiente", None),
         ]
 
@@ -2270,14 +2677,11 @@ class ActionGenerarDieta(Action):
 
         logger.info(f"=== DIETA CONFIG === CHAT_DIETA_CALC_MODE={CHAT_DIETA_CALC_MODE}, CHAT_DIET_CATALOG={CHAT_DIET_CATALOG}")
         
-        intent_name = tracker.latest_message.get("intent", {}).get("name")
-        offline_backend = not backend_health_ok(sender_id=tracker.sender_id, intent=intent_name)
+        backend_online, ctx, profile_data = load_backend_state(tracker)
+        offline_backend = not backend_online
         offline_events: List[Dict[Text, Any]] = []
         if offline_backend:
             offline_events.extend(mark_offline(dispatcher, tracker))
-
-        ctx = ensure_authenticated_context(tracker)
-        profile_data = None if offline_backend else fetch_user_profile(ctx)
         ctx_dislikes = ctx.get("dislikes") if ctx else None
 
         profile_goal = None
@@ -2524,7 +2928,7 @@ class ActionGenerarDieta(Action):
 
                     # Excluir alérgenos + alimentos no deseados del catálogo
                     exclude_combined = list({*(allergy_list or []), *(dislike_list or [])})
-                    composed = compose_diet(
+                    composed = _compose_diet_cached(
                         int(target_kcal),
                         n_meals=n_meals,
                         catalog_path=catalog_path,
@@ -2564,7 +2968,7 @@ class ActionGenerarDieta(Action):
                     catalog_url = f"{BACKEND_BASE_URL.rstrip('/')}/notifications/catalog?limit=200"
                     if exclude_allergens_param:
                         catalog_url += f"&exclude_allergens={quote(exclude_allergens_param)}"
-                    resp = requests.get(catalog_url, timeout=CONTEXT_TIMEOUT)
+                    resp = backend_http().get(catalog_url, timeout=CONTEXT_TIMEOUT)
                     if resp.ok:
                         catalog_items = resp.json().get('items', [])
                     else:
@@ -2621,8 +3025,8 @@ class ActionGenerarDieta(Action):
 
         dispatcher.utter_message(json_message=diet_payload)
 
-        # persist_plan y send_context_update son fire-and-forget: se ejecutan en
-        # background para no bloquear la respuesta al usuario.
+        # persist_plan y send_context_update van a la cola durable de trabajos para no
+        # bloquear la respuesta al usuario.
         context_payload: Dict[str, Any] = {}
         if condiciones and condiciones.lower() not in {"", "ninguna", "ninguno", "no"}:
             context_payload["medical_conditions"] = condiciones
@@ -2632,23 +3036,16 @@ class ActionGenerarDieta(Action):
             context_payload["dislikes"] = dislikes
 
         if not offline_backend:
-            def _bg_persist():
-                diet_id = persist_plan(
-                    ctx,
-                    path="/api/diet-plans",
-                    payload={
-                        "title": f"Dieta {plan_label}".strip(),
-                        "goal": plan_label,
-                        "content": diet_payload,
-                    },
-                )
-                if context_payload:
-                    send_context_update(tracker.sender_id, context_payload)
-                return diet_id
-            threading.Thread(target=_bg_persist, daemon=True).start()
+            queue_plan_persistence(
+                ctx,
+                "diet",
+                {"title": f"Dieta {plan_label}".strip(), "goal": plan_label, "content": diet_payload},
+            )
+            if context_payload:
+                send_context_update(tracker.sender_id, context_payload)
 
         return offline_events + [
-            SlotSet("ultima_dieta", diet_payload),
+            SlotSet("ultima_dieta", make_plan_ref(diet_payload)),
             SlotSet("servicio_pendiente", None),
         ]
 
@@ -2816,8 +3213,7 @@ class ActionSugerirRutina(Action):
     def run(self, dispatcher: CollectingDispatcher, tracker: Tracker,
             domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
 
-        ctx = ensure_authenticated_context(tracker)
-        profile_data = fetch_user_profile(ctx) if ctx else None
+        _, ctx, profile_data = load_backend_state(tracker)
         inferred_level = infer_training_level(profile_data)
 
         objetivo = (_slot(tracker, "objetivo") or "hipertrofia").lower()
@@ -2848,8 +3244,7 @@ class ActionResumenRutina(Action):
     def run(self, dispatcher: CollectingDispatcher, tracker: Tracker,
             domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
 
-        ctx = ensure_authenticated_context(tracker)
-        profile_data = fetch_user_profile(ctx) if ctx else None
+        _, ctx, profile_data = load_backend_state(tracker)
         inferred_level = infer_training_level(profile_data)
 
         objetivo = _slot(tracker, "objetivo") or "general"
@@ -2998,6 +3393,8 @@ class ActionCrearReserva(Action):
             "created_at": datetime.now().isoformat(timespec="seconds")
         }
         RESERVAS.append(reserva)
+        # Una reserva cambia los cupos: las sesiones cacheadas dejan de valer.
+        CLASSES_CACHE.invalidate(("sessions",))
         dispatcher.utter_message(text=f"Reserva creada ✅: {clase} el {fecha} a las {hora} (demo).")
         return []
 
@@ -3027,6 +3424,7 @@ class ActionCancelarReserva(Action):
 
         after = len(RESERVAS)
         if after < before:
+            CLASSES_CACHE.invalidate(("sessions",))
             dispatcher.utter_message(text="Reserva cancelada ✅ (demo).")
         else:
             dispatcher.utter_message(text="No encontré una reserva que coincida para cancelar (demo).")
@@ -3222,7 +3620,10 @@ class ActionExcluirEjercicio(Action):
             )
             return []
 
-        # 3. Accumulate (comma-separated, deduplicated)
+        # 3. Map a partial name to the exercise in the last routine, if any
+        ejercicio = _exercise_in_last_routine(tracker, ejercicio) or ejercicio
+
+        # 4. Accumulate (comma-separated, deduplicated)
         current = tracker.get_slot("ejercicios_excluidos") or ""
         existing = [e.strip().lower() for e in current.split(",") if e.strip()]
         if ejercicio.lower() not in existing:
@@ -0,0 +1,162 @@
+"""Cache de lectura (LRU + TTL) para las consultas de las acciones al backend.
+
+`ValidateReservaForm` y las acciones de reserva bajaban la lista completa de
+clases en cada validacion de slot, y contexto/perfil se pedian de nuevo en
+acciones consecutivas de la misma conversacion. `TTLCache`:
+
+- LRU acotado a `maxsize` entradas; cada entrada vence a los `ttl_s`.
+- Single-flight por clave: si varios hilos piden la misma clave a la vez, solo
+  uno llama al backend y el resto espera y comparte el resultado.
+- `invalidate(prefijo)` descarta las claves (tuplas) que empiezan con el prefijo
+  tras una escritura; una carga en vuelo iniciada antes no se guarda.
+- Solo se cachea lo que acepta `cache_if` (p.ej. no cachear un fallo de red).
+- Aciertos/fallos en `backend.metrics` y, cada `log_every` consultas, la tasa de
+  aciertos en el log (`action_cache`).
+"""
+from __future__ import annotations
+
+import copy
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+try:  # pragma: no cover - optional dependency
+    from backend.metrics import metrics
+except Exception:  # pragma: no cover - optional dependency
+    metrics = None
+
+logger = logging.getLogger(__name__)
+
+
+class _Flight:
+    __slots__ = ("event", "value", "error", "generation")
+
+    def __init__(self, generation: int) -> None:
+        self.event = threading.Event()
+        self.value: Any = None
+        self.error: Optional[BaseException] = None
+        self.generation = generation
+
+
+class TTLCache:
+    def __init__(
+        self,
+        name: str,
+        *,
+        maxsize: int = 256,
+        ttl_s: float = 30.0,
+        copy_values: bool = False,
+        log_every: int = 200,
+    ) -> None:
+        self.name = name
+        self.maxsize = max(1, int(maxsize))
+        self.ttl_s = max(0.0, float(ttl_s))
+        # Copia profunda al devolver: los llamadores pueden mutar ctx/perfil.
+        self.copy_values = copy_values
+        self.log_every = max(0, int(log_every))
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._inflight: Dict[Hashable, _Flight] = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._counts = {"hit": 0, "miss": 0, "shared": 0, "evicted": 0}
+
+    def get_or_load(
+        self,
+        key: Hashable,
+        loader: Callable[[], Any],
+        *,
+        ttl_s: Optional[float] = None,
+        cache_if: Callable[[Any], bool] = lambda value: value is not None,
+    ) -> Any:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[0] > now:
+                self._data.move_to_end(key)
+                self._count("hit")
+                return self._out(entry[1])
+            if entry is not None:
+                del self._data[key]
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = _Flight(self._generation)
+                self._inflight[key] = flight
+                self._count("miss")
+            else:
+                self._count("shared")
+        if not leader:
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            return self._out(flight.value)
+        try:
+            value = loader()
+        except BaseException as exc:
+            flight.error = exc
+            raise
+        else:
+            flight.value = value
+            with self._lock:
+                if flight.generation == self._generation and cache_if(value):
+                    ttl = self.ttl_s if ttl_s is None else max(0.0, float(ttl_s))
+                    self._data[key] = (time.monotonic() + ttl, value)
+                    self._data.move_to_end(key)
+                    while len(self._data) > self.maxsize:
+                        self._data.popitem(last=False)
+                        self._counts["evicted"] += 1
+            return self._out(value)
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            flight.event.set()
+
+    def invalidate(self, prefix: Tuple[Any, ...] = ()) -> int:
+        """Descarta las claves tupla que empiezan con `prefix` (todas con `()`)."""
+        with self._lock:
+            self._generation += 1
+            size = len(prefix)
+            doomed = [
+                key for key in self._data
+                if not size or (isinstance(key, tuple) and key[:size] == prefix)
+            ]
+            for key in doomed:
+                del self._data[key]
+        return len(doomed)
+
+    def clear(self) -> None:
+        self.invalidate()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counts = dict(self._counts)
+            counts["size"] = len(self._data)
+        lookups = counts["hit"] + counts["miss"] + counts["shared"]
+        counts["hit_rate"] = round((counts["hit"] + counts["shared"]) / lookups, 4) if lookups else 0.0
+        return counts
+
+    def _out(self, value: Any) -> Any:
+        return copy.deepcopy(value) if self.copy_values else value
+
+    def _count(self, result: str) -> None:
+        # Se llama con el lock tomado.
+        self._counts[result] += 1
+        if metrics is not None:
+            metrics.inc_counter("action_cache_total", tags={"cache": self.name, "result": result})
+        lookups = self._counts["hit"] + self._counts["miss"] + self._counts["shared"]
+        if self.log_every and lookups % self.log_every == 0:
+            served = self._counts["hit"] + self._counts["shared"]
+            logger.info(
+                "action_cache",
+                extra={
+                    "cache": self.name,
+                    "lookups": lookups,
+                    "hits": self._counts["hit"],
+                    "shared": self._counts["shared"],
+                    "misses": self._counts["miss"],
+                    "hit_rate": round(served / lookups, 4),
+                    "size": len(self._data),
+                },
+            )
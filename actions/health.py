@@ -0,0 +1,158 @@
+"""Estado de salud del backend compartido por todas las acciones.
+
+Antes cada accion hacia un GET sincrono a `/health` (`BACKEND_HEALTH_TIMEOUT`)
+y, con el backend caido, todas pagaban el timeout completo antes de caer en
+`mark_offline`. `BackendHealthMonitor`:
+
+- Cachea el ultimo resultado durante `ttl_s`. Un hilo de fondo lo refresca
+  cada `interval_s` (< `ttl_s`), asi en modo sano las acciones no agregan
+  round-trips; solo la primera consulta (o un cache vencido) probea en linea.
+- Circuit breaker: `CircuitBreaker(name="backend")` de `backend/chat/rasa_client.py`,
+  el mismo que usa el cliente de Rasa (estados, metricas
+  `backend_breaker_transition_total` / `backend_breaker_open` y llamada de
+  prueba). Tras `failure_threshold` fallos seguidos (probes o llamadas reales
+  reportadas con `record_failure`) el circuito se abre y `status()` responde
+  offline al instante. Pasado `reset_timeout_s` el hilo de fondo toma la unica
+  llamada de prueba half-open: si responde se cierra, si no se vuelve a abrir.
+- Las llamadas reales al backend (p.ej. `/chat/bootstrap`) informan exito o
+  fallo con `record_success` / `record_failure`; cuentan como probes pasivos.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from backend.chat.rasa_client import CircuitBreaker
+
+
+class BackendHealthMonitor:
+    CLOSED = CircuitBreaker.CLOSED
+    OPEN = CircuitBreaker.OPEN
+    HALF_OPEN = CircuitBreaker.HALF_OPEN
+
+    def __init__(
+        self,
+        probe: Callable[[], bool],
+        *,
+        ttl_s: float = 5.0,
+        interval_s: float = 2.0,
+        failure_threshold: int = 3,
+        reset_timeout_s: float = 10.0,
+    ) -> None:
+        self._probe = probe
+        self.ttl_s = max(0.0, float(ttl_s))
+        self.interval_s = max(0.0, float(interval_s))
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout_s, name="backend")
+        self._ok: Optional[bool] = None
+        self._checked_at = 0.0
+        self._latency_ms = 0.0
+        self._lock = threading.Lock()
+        self._probe_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def state(self) -> str:
+        return self.breaker.state
+
+    @property
+    def failures(self) -> int:
+        return self.breaker.failures
+
+    def status(self) -> Tuple[bool, float, str]:
+        """`(ok, elapsed_ms, fuente)`; fuente es "circuit", "cache" o "probe"."""
+        self._ensure_thread()
+        if self._offline():
+            return False, 0.0, "circuit"
+        with self._lock:
+            fresh = self._ok is not None and time.monotonic() - self._checked_at < self.ttl_s
+            if fresh and self.state == self.CLOSED:
+                return bool(self._ok), 0.0, "cache"
+        if not self._probe_lock.acquire(blocking=False):
+            # Otro hilo ya esta probeando: no encolarse detras del timeout.
+            with self._lock:
+                return bool(self._ok) and self.state != self.OPEN, 0.0, "cache"
+        try:
+            ok = self._run_probe()
+        finally:
+            self._probe_lock.release()
+        return ok, self._latency_ms, "probe"
+
+    def available(self) -> bool:
+        """False con el circuito abierto o en half-open (sin probear ni esperar)."""
+        return not self._offline()
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._ok = True
+            self._checked_at = time.monotonic()
+        self.breaker.record_success()
+
+    def record_failure(self) -> None:
+        """Cuenta para abrir el circuito; un fallo suelto de una llamada real no marca offline."""
+        self.breaker.record_failure()
+
+    def probe_once(self) -> bool:
+        """Probe sincrono; con el circuito abierto y vencido el reset es el probe half-open."""
+        with self._probe_lock:
+            return self._run_probe()
+
+    def snapshot(self) -> Dict[str, Any]:
+        snap = self.breaker.snapshot()
+        with self._lock:
+            snap.update(
+                ok=self._ok,
+                age_s=round(time.monotonic() - self._checked_at, 3) if self._ok is not None else None,
+                latency_ms=round(self._latency_ms, 1),
+            )
+        return snap
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _run_probe(self) -> bool:
+        # En half-open el probe es la llamada de prueba del breaker; si ya hay una en curso, no sale.
+        if not self.breaker.allow(trial=True):
+            return False
+        started = time.perf_counter()
+        try:
+            ok = bool(self._probe())
+        except Exception:
+            ok = False
+        self._latency_ms = (time.perf_counter() - started) * 1000.0
+        if ok:
+            self.record_success()
+        else:
+            with self._lock:
+                self._ok = False
+                self._checked_at = time.monotonic()
+            self.record_failure()
+        return ok
+
+    def _offline(self) -> bool:
+        # Con hilo de fondo el probe half-open lo hace el hilo; sin hilo, el primer llamador.
+        state = self.state
+        if state == self.HALF_OPEN:
+            return True
+        return state == self.OPEN and (self._thread is not None or not self.breaker.reset_due())
+
+    def _ensure_thread(self) -> None:
+        if self.interval_s <= 0 or self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._loop, name="backend-health", daemon=True)
+        self._thread.start()
+
+    def _loop(self) -> None:
+        while not self._stop.wait(self.interval_s):
+            state = self.state
+            skip = state == self.OPEN and not self.breaker.reset_due()
+            with self._lock:
+                # Una llamada real reciente ya dejo el estado al dia.
+                recent = self._ok is not None and time.monotonic() - self._checked_at < self.interval_s
+            if skip or (recent and state == self.CLOSED):
+                continue
+            self.probe_once()
@@ -0,0 +1,378 @@
+"""Cola durable y pool acotado para los efectos secundarios del action server.
+
+Las acciones no deben bloquear la respuesta por `persist_plan`, el correo de la
+rutina o `send_context_update`, pero tampoco crear un hilo por accion. Aqui:
+
+- `DurableJobQueue`: tabla SQLite (WAL) en `ACTION_JOBS_DB`. Un trabajo
+  sobrevive reinicios: al tomarlo se "arrienda" (`leased_until`) y, si el proceso
+  muere antes de completarlo, vuelve a estar disponible al vencer el arriendo.
+- Coalescencia: un trabajo con `coalesce_key` pendiente (no arrendado) del mismo
+  tipo se fusiona con el nuevo (`merge_payloads`: gana el ultimo valor, pero los
+  dicts anidados como el `payload` de `context_update` se fusionan clave a clave)
+  en vez de encolar otro. Asi N `send_context_update` seguidos de un sender son
+  una llamada y ninguno pierde sus campos.
+- `JobExecutor`: `workers` hilos fijos. Los tipos registrados con `batch=True`
+  reciben hasta `batch_size` trabajos del mismo tipo en una sola llamada.
+  Un fallo reintenta con backoff exponencial con jitter hasta `max_attempts`;
+  `PermanentJobError` (p.ej. un 4xx) lo descarta de inmediato. Los descartados
+  quedan con `status = 'dead'` para inspeccion.
+
+Entrega "al menos una vez": los handlers deben ser idempotentes (los planes se
+envian con un id generado al encolar).
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+try:  # pragma: no cover - optional dependency
+    from backend.metrics import metrics
+except Exception:  # pragma: no cover - optional dependency
+    metrics = None
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS action_jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    coalesce_key TEXT,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    available_at REAL NOT NULL,
+    leased_until REAL,
+    created_at REAL NOT NULL,
+    last_error TEXT
+);
+CREATE INDEX IF NOT EXISTS ix_action_jobs_ready ON action_jobs (status, available_at, id);
+CREATE INDEX IF NOT EXISTS ix_action_jobs_coalesce ON action_jobs (kind, coalesce_key, status);
+"""
+
+# Disponible: pendiente, vencido su `available_at`, sin arriendo vigente y sin otro
+# trabajo anterior de la misma `coalesce_key` en curso (orden por sender).
+_READY = (
+    "a.status = 'pending' AND a.available_at <= :now AND (a.leased_until IS NULL OR a.leased_until < :now) "
+    "AND NOT EXISTS (SELECT 1 FROM action_jobs b WHERE b.kind = a.kind AND b.coalesce_key = a.coalesce_key "
+    "AND b.id < a.id AND b.leased_until >= :now)"
+)
+
+
+def merge_payloads(older: Dict[str, Any], newer: Dict[str, Any]) -> Dict[str, Any]:
+    """Fusiona dos payloads de la misma `coalesce_key`; `newer` gana en conflicto.
+
+    Un nivel de profundidad: si ambos traen un dict en la misma clave se unen sus
+    claves (`{"sender_id", "payload": {...}}` acumula los campos de cada update).
+    """
+    merged = dict(older)
+    for key, value in newer.items():
+        previous = merged.get(key)
+        if isinstance(previous, dict) and isinstance(value, dict):
+            merged[key] = {**previous, **value}
+        else:
+            merged[key] = value
+    return merged
+
+
+class PermanentJobError(Exception):
+    """El trabajo no tiene sentido reintentarlo (datos invalidos, 4xx del backend)."""
+
+
+@dataclass
+class Job:
+    id: int
+    kind: str
+    payload: Dict[str, Any]
+    attempts: int
+    created_at: float
+    coalesce_key: Optional[str] = None
+
+
+class DurableJobQueue:
+    def __init__(self, path: str) -> None:
+        self.path = path
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=10)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+
+    def enqueue(self, kind: str, payload: Dict[str, Any], *, coalesce_key: Optional[str] = None,
+                delay_s: float = 0.0) -> int:
+        """Encola (o fusiona con un pendiente de la misma `coalesce_key`) y devuelve el id."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                if coalesce_key is not None:
+                    row = self._conn.execute(
+                        "SELECT id, payload FROM action_jobs WHERE kind = ? AND coalesce_key = ? "
+                        "AND status = 'pending' AND (leased_until IS NULL OR leased_until < ?) "
+                        "ORDER BY id DESC LIMIT 1",
+                        (kind, coalesce_key, now),
+                    ).fetchone()
+                    if row is not None:
+                        merged = merge_payloads(json.loads(row[1]), payload)
+                        self._conn.execute(
+                            "UPDATE action_jobs SET payload = ? WHERE id = ?", (json.dumps(merged, default=str), row[0])
+                        )
+                        self._conn.execute("COMMIT")
+                        return int(row[0])
+                cur = self._conn.execute(
+                    "INSERT INTO action_jobs (kind, coalesce_key, payload, available_at, created_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (kind, coalesce_key, json.dumps(payload, default=str), now + max(0.0, delay_s), now),
+                )
+                self._conn.execute("COMMIT")
+                return int(cur.lastrowid)
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def lease(self, *, batch_kinds: Sequence[str] = (), batch_size: int = 1, lease_s: float = 60.0) -> List[Job]:
+        """Toma el trabajo disponible mas antiguo; si su tipo es batch, hasta `batch_size` del mismo tipo."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                first = self._conn.execute(
+                    f"SELECT a.kind FROM action_jobs a WHERE {_READY} ORDER BY a.id LIMIT 1", {"now": now}
+                ).fetchone()
+                if first is None:
+                    self._conn.execute("COMMIT")
+                    return []
+                kind = first[0]
+                limit = max(1, int(batch_size)) if kind in batch_kinds else 1
+                rows = self._conn.execute(
+                    "SELECT a.id, a.kind, a.payload, a.attempts, a.created_at, a.coalesce_key FROM action_jobs a "
+                    f"WHERE a.kind = :kind AND {_READY} ORDER BY a.id LIMIT :limit",
+                    {"kind": kind, "now": now, "limit": limit},
+                ).fetchall()
+                self._conn.executemany(
+                    "UPDATE action_jobs SET leased_until = ? WHERE id = ?", [(now + lease_s, r[0]) for r in rows]
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return [Job(r[0], r[1], json.loads(r[2]), r[3], r[4], r[5]) for r in rows]
+
+    def complete(self, job_ids: Sequence[int]) -> None:
+        if not job_ids:
+            return
+        with self._lock:
+            self._conn.executemany("DELETE FROM action_jobs WHERE id = ?", [(i,) for i in job_ids])
+
+    def retry(self, job: Job, error: str, delay_s: float) -> None:
+        """Reprograma el trabajo; si ya hay uno mas nuevo de la misma clave, se fusiona en ese."""
+        with self._lock:
+            if job.coalesce_key is not None:
+                row = self._conn.execute(
+                    "SELECT id, payload FROM action_jobs WHERE kind = ? AND coalesce_key = ? AND status = 'pending' "
+                    "AND id > ? AND (leased_until IS NULL OR leased_until < ?) ORDER BY id LIMIT 1",
+                    (job.kind, job.coalesce_key, job.id, time.time()),
+                ).fetchone()
+                if row is not None:
+                    merged = merge_payloads(job.payload, json.loads(row[1]))
+                    self._conn.execute("BEGIN IMMEDIATE")
+                    self._conn.execute(
+                        "UPDATE action_jobs SET payload = ? WHERE id = ?", (json.dumps(merged, default=str), row[0])
+                    )
+                    self._conn.execute("DELETE FROM action_jobs WHERE id = ?", (job.id,))
+                    self._conn.execute("COMMIT")
+                    return
+            self._conn.execute(
+                "UPDATE action_jobs SET attempts = attempts + 1, available_at = ?, leased_until = NULL, "
+                "last_error = ? WHERE id = ?",
+                (time.time() + delay_s, error[:500], job.id),
+            )
+
+    def bury(self, job: Job, error: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                "UPDATE action_jobs SET status = 'dead', attempts = attempts + 1, leased_until = NULL, "
+                "last_error = ? WHERE id = ?",
+                (error[:500], job.id),
+            )
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.time()
+        with self._lock:
+            pending, oldest = self._conn.execute(
+                "SELECT COUNT(*), MIN(created_at) FROM action_jobs WHERE status = 'pending'"
+            ).fetchone()
+            dead = self._conn.execute("SELECT COUNT(*) FROM action_jobs WHERE status = 'dead'").fetchone()[0]
+        return {
+            "depth": int(pending or 0),
+            "lag_s": round(now - oldest, 3) if oldest else 0.0,
+            "dead": int(dead or 0),
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+@dataclass
+class _Handler:
+    fn: Callable[..., Any]
+    batch: bool
+
+
+class JobExecutor:
+    """Pool fijo de hilos que consume `DurableJobQueue`."""
+
+    def __init__(
+        self,
+        queue: DurableJobQueue,
+        *,
+        workers: int = 2,
+        batch_size: int = 20,
+        max_attempts: int = 6,
+        backoff_s: float = 2.0,
+        max_backoff_s: float = 300.0,
+        poll_s: float = 1.0,
+        lease_s: float = 120.0,
+    ) -> None:
+        self.queue = queue
+        self.workers = max(1, int(workers))
+        self.batch_size = max(1, int(batch_size))
+        self.max_attempts = max(1, int(max_attempts))
+        self.backoff_s = max(0.0, float(backoff_s))
+        self.max_backoff_s = max(self.backoff_s, float(max_backoff_s))
+        self.poll_s = max(0.01, float(poll_s))
+        self.lease_s = max(1.0, float(lease_s))
+        self._handlers: Dict[str, _Handler] = {}
+        self._wake = threading.Condition()
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._started_lock = threading.Lock()
+
+    def register(self, kind: str, fn: Callable[..., Any], *, batch: bool = False) -> None:
+        """`fn(payload)` o, con `batch=True`, `fn(payloads) -> [error | None, ...]` alineado."""
+        self._handlers[kind] = _Handler(fn, batch)
+
+    def submit(self, kind: str, payload: Dict[str, Any], *, coalesce_key: Optional[str] = None) -> int:
+        if kind not in self._handlers:
+            raise KeyError(f"Tipo de trabajo no registrado: {kind}")
+        job_id = self.queue.enqueue(kind, payload, coalesce_key=coalesce_key)
+        self.start()
+        with self._wake:
+            self._wake.notify()
+        self._publish()
+        return job_id
+
+    def start(self) -> None:
+        """Arranca los hilos una sola vez (lazy: el primer `submit` o el arranque del server)."""
+        if self._threads:
+            return
+        with self._started_lock:
+            if self._threads:
+                return
+            for idx in range(self.workers):
+                thread = threading.Thread(target=self._loop, name=f"action-jobs-{idx}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        with self._wake:
+            self._wake.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def run_pending(self) -> int:
+        """Procesa en el hilo actual lo que este disponible (scripts y tests); devuelve cuantos."""
+        done = 0
+        while True:
+            jobs = self._lease()
+            if not jobs:
+                return done
+            self._run(jobs)
+            done += len(jobs)
+
+    def _lease(self) -> List[Job]:
+        batch_kinds = [kind for kind, handler in self._handlers.items() if handler.batch]
+        return self.queue.lease(batch_kinds=batch_kinds, batch_size=self.batch_size, lease_s=self.lease_s)
+
+    def _loop(self) -> None:
+        while not self._stop.is_set():
+            try:
+                jobs = self._lease()
+            except Exception:
+                logger.exception("No se pudo leer la cola de trabajos")
+                jobs = []
+            if not jobs:
+                with self._wake:
+                    self._wake.wait(self.poll_s)
+                continue
+            self._run(jobs)
+
+    def _run(self, jobs: List[Job]) -> None:
+        kind = jobs[0].kind
+        handler = self._handlers.get(kind)
+        if handler is None:
+            for job in jobs:
+                self.queue.bury(job, f"sin handler para {kind}")
+            return
+        started = time.monotonic()
+        try:
+            if handler.batch:
+                errors = list(handler.fn([job.payload for job in jobs]))
+                # Un lote con menos resultados que trabajos no confirma los faltantes: se reintentan.
+                errors += [RuntimeError(f"sin resultado para {kind} en el lote")] * (len(jobs) - len(errors))
+            else:
+                handler.fn(jobs[0].payload)
+                errors = [None]
+        except Exception as exc:
+            errors = [exc] * len(jobs)
+        ok = [job.id for job, err in zip(jobs, errors) if err is None]
+        self.queue.complete(ok)
+        for job, err in zip(jobs, errors):
+            if err is not None:
+                self._fail(job, err)
+        self._record(kind, "ok", len(ok))
+        if metrics is not None:
+            metrics.observe_latency("action_jobs_run_ms", (time.monotonic() - started) * 1000.0, tags={"kind": kind})
+        self._publish()
+
+    def _fail(self, job: Job, err: Any) -> None:
+        message = str(err) or err.__class__.__name__
+        if isinstance(err, PermanentJobError) or job.attempts + 1 >= self.max_attempts:
+            logger.warning("Trabajo %s (%s) descartado tras %s intentos: %s", job.id, job.kind, job.attempts + 1, message)
+            self.queue.bury(job, message)
+            self._record(job.kind, "dead")
+            return
+        delay = min(self.max_backoff_s, self.backoff_s * (2 ** job.attempts))
+        delay *= 0.5 + random.random() / 2
+        self.queue.retry(job, message, delay)
+        self._record(job.kind, "retry")
+
+    def _record(self, kind: str, result: str, count: int = 1) -> None:
+        if metrics is not None and count:
+            metrics.inc_counter("action_jobs_total", value=count, tags={"kind": kind, "result": result})
+
+    def _publish(self) -> None:
+        if metrics is None:
+            return
+        try:
+            stats = self.queue.stats()
+        except Exception:
+            return
+        metrics.set_gauge("action_jobs_queue_depth", stats["depth"], mode="max")
+        metrics.set_gauge("action_jobs_lag_s", stats["lag_s"], mode="max")
+        metrics.set_gauge("action_jobs_dead", stats["dead"], mode="max")
+
+    def snapshot(self) -> Dict[str, Any]:
+        stats = self.queue.stats()
+        stats["workers"] = len(self._threads)
+        return stats
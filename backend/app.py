@@ -2,12 +2,12 @@
 import os
 import json
 import logging
+import threading
 import time
 from collections import deque
 from datetime import datetime
-from math import ceil
-from typing import Any, Dict
-from flask import Flask, request, jsonify, render_template, session as flask_session
+from typing import Any, Dict, Tuple
+from flask import Flask, Response, request, jsonify, render_template, stream_with_context, session as flask_session
 from logging.handlers import RotatingFileHandler
 import requests
 from dotenv import load_dotenv
@@ -21,8 +21,15 @@ from .config import (
 from .bootstrap import init_extensions, load_models
 from .blueprints import register_blueprints
 from .extensions import db, cors, socketio  # unica instancia compartida
+from .chat.admission import AdaptiveConcurrencyLimiter
+from .chat.errors import ChatOverloaded
 from .chat.service import ChatService, ChatServiceError, ServiceResponse
+from .log_pipeline import BatchedRotatingFileHandler, install_pipeline, pipeline_stats
 from .metrics import metrics, setup_metrics_logger
+from .metrics.shared import COUNTER, LAT_BUCKET, LAT_COUNT, LAT_MAX, LAT_TOTAL, SharedMetricsStore
+from .metrics.sketch import DEFAULT_QUANTILES, LatencySketch, WindowedLatency
+from .metrics.queries import QueryProfiler
+from .metrics.tracing import Tracer
 
 # (opcional) rate limit si lo tienes instalado
 Limiter = None
@@ -37,8 +44,49 @@ except Exception:
 
 
 class OperationalMetrics:
-    def __init__(self, window_size: int) -> None:
-        self._events = deque(maxlen=max(1, int(window_size or 500)))
+    """Resumen operativo de /chat/send y /chat/stream para GET /metrics.
+
+    Los campos historicos (`window_size`, tasas, `count_*`, `p95_latency_ms`) siguen
+    cubriendo los ultimos `window_size` eventos, pero se mantienen incrementalmente:
+    contadores que suben y bajan al entrar/salir un evento, un `LatencySketch` con
+    `remove` y una cola monotona para el maximo de la ventana. `snapshot` ya no
+    copia ni ordena el deque.
+
+    Ademas hay ventanas por tiempo (1m/5m/1h, `WindowedLatency`) para todo el
+    trafico, por ruta y por `interaction_result`.
+
+    Todo lo anterior es del worker que atiende. Con `shared` (METRICS_SHARED_DIR)
+    cada evento tambien suma en el archivo mmap del proceso y `snapshot` agrega
+    `cluster`: totales acumulados de todos los workers desde el arranque.
+    """
+
+    MAX_SERIES = 64  # tope de rutas/resultados distintos (cardinalidad)
+
+    def __init__(
+        self, window_size: int, *, clock=time.monotonic, shared: SharedMetricsStore | None = None
+    ) -> None:
+        self._events = deque()
+        self._maxlen = max(1, int(window_size or 500))
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._seq = 0
+        self._status: Dict[int, int] = {2: 0, 4: 0, 5: 0}
+        self._results: Dict[str, int] = {}
+        self._sketch = LatencySketch()
+        self._window_max: deque = deque()
+        self._windows = WindowedLatency(clock=clock)
+        self._series_keys: Dict[Tuple[str, str], Tuple[str, ...]] = {}
+        self._shared = shared
+
+    def _keys(self, route: str, result: str) -> Tuple[str, ...]:
+        keys = self._series_keys.get((route, result))
+        if keys is None:
+            if len(self._series_keys) >= self.MAX_SERIES:
+                route, result = "other", "other" if result else ""
+            keys = ("all", f"route:{route}") + ((f"result:{result}",) if result else ())
+            if len(self._series_keys) < self.MAX_SERIES:
+                self._series_keys[(route, result)] = keys
+        return keys
 
     def record(
         self,
@@ -46,40 +94,136 @@ class OperationalMetrics:
         status_code: int,
         latency_ms: float,
         interaction_result: str | None,
+        route: str = "/chat/send",
     ) -> None:
-        self._events.append(
-            {
-                "status_code": int(status_code),
-                "latency_ms": max(0.0, float(latency_ms)),
-                "interaction_result": interaction_result or "",
-            }
-        )
+        family = int(status_code) // 100
+        latency_ms = max(0.0, float(latency_ms))
+        result = interaction_result or ""
+        idx = self._sketch.index(latency_ms)
+        now = self._clock()
+        with self._lock:
+            self._seq += 1
+            seq = self._seq
+            events = self._events
+            events.append((seq, family, latency_ms, result, idx))
+            if family in self._status:
+                self._status[family] += 1
+            if result:
+                self._results[result] = self._results.get(result, 0) + 1
+            self._sketch.add(latency_ms, idx)
+            window_max = self._window_max
+            while window_max and window_max[-1][1] <= latency_ms:
+                window_max.pop()
+            window_max.append((seq, latency_ms))
+            if len(events) > self._maxlen:
+                old_seq, old_family, old_latency, old_result, old_idx = events.popleft()
+                if old_family in self._status:
+                    self._status[old_family] -= 1
+                if old_result:
+                    self._results[old_result] -= 1
+                self._sketch.remove(old_latency, old_idx)
+                if window_max[0][0] == old_seq:
+                    window_max.popleft()
+            keys = self._keys(route, result)
+            self._windows.add(latency_ms, keys, idx=idx, now=now)
+            shared = self._shared
+            if shared is not None:
+                route_tags = (("route", keys[1][len("route:"):]),)
+                counter_tags = (
+                    ("result", keys[2][len("result:"):] if len(keys) > 2 else "none"),
+                    route_tags[0],
+                    ("status", f"{family}xx"),
+                )
+                shared.add(COUNTER, "operational_requests_total", counter_tags, 1)
+                shared.add(LAT_COUNT, "operational_latency_ms", route_tags, 1)
+                shared.add(LAT_TOTAL, "operational_latency_ms", route_tags, latency_ms)
+                shared.set_max(LAT_MAX, "operational_latency_ms", route_tags, latency_ms)
+                shared.add(LAT_BUCKET, "operational_latency_ms", route_tags, 1, idx)
 
     def snapshot(self) -> Dict[str, Any]:
-        events = list(self._events)
-        total = len(events)
-        count_2xx = sum(1 for event in events if 200 <= event["status_code"] < 300)
-        count_4xx = sum(1 for event in events if 400 <= event["status_code"] < 500)
-        count_5xx = sum(1 for event in events if 500 <= event["status_code"] < 600)
-        fallback_count = sum(1 for event in events if event["interaction_result"] == "fallback")
-        handoff_count = sum(1 for event in events if event["interaction_result"] == "handoff")
-        blocked_count = sum(1 for event in events if event["interaction_result"] == "blocked_no_consent")
-
-        p95_latency_ms = 0.0
-        if events:
-            latencies = sorted(event["latency_ms"] for event in events)
-            index = max(0, ceil(0.95 * len(latencies)) - 1)
-            p95_latency_ms = round(latencies[index], 3)
+        now = self._clock()
+        with self._lock:
+            total = len(self._events)
+            counts = dict(self._status)
+            results = dict(self._results)
+            quantiles = self._sketch.quantiles(
+                DEFAULT_QUANTILES, lo=0.0, hi=self._window_max[0][1] if total else 0.0
+            )
+            windows = self._windows.snapshot(now=now)
+        empty = {name: LatencySketch().summary() for name in self._windows.window_names}
+        routes: Dict[str, Any] = {}
+        by_result: Dict[str, Any] = {}
+        for key, summary in windows.items():
+            kind, _, name = key.partition(":")
+            if kind == "route":
+                routes[name] = summary
+            elif kind == "result":
+                by_result[name] = summary
+
+        def _rate(name: str) -> float:
+            return round(results.get(name, 0) / total, 4) if total else 0.0
+
+        payload = {
+            "window_size": total,
+            "fallback_rate": _rate("fallback"),
+            "handoff_rate": _rate("handoff"),
+            "blocked_rate": _rate("blocked_no_consent"),
+            "p50_latency_ms": round(quantiles[0.5], 3),
+            "p90_latency_ms": round(quantiles[0.9], 3),
+            "p95_latency_ms": round(quantiles[0.95], 3),
+            "p99_latency_ms": round(quantiles[0.99], 3),
+            "count_2xx": counts[2],
+            "count_4xx": counts[4],
+            "count_5xx": counts[5],
+            "latency_ms": windows.get("all", empty),
+            "routes": routes,
+            "interaction_results": by_result,
+        }
+        if self._shared is not None:
+            payload["cluster"] = self._cluster_snapshot()
+        return payload
+
+    def _cluster_snapshot(self) -> Dict[str, Any]:
+        data = self._shared.collect()
+        counts = {2: 0, 4: 0, 5: 0}
+        results: Dict[str, int] = {}
+        for (name, tags), value in data["counters"].items():
+            if name != "operational_requests_total":
+                continue
+            tag_map = dict(tags)
+            family = int(tag_map.get("status", "0")[:1] or 0)
+            if family in counts:
+                counts[family] += int(value)
+            results[tag_map.get("result", "none")] = results.get(tag_map.get("result", "none"), 0) + int(value)
+        merged = LatencySketch()
+        merged.min = 0.0
+        routes: Dict[str, Any] = {}
+        for (name, tags), stats in data["latency"].items():
+            if name != "operational_latency_ms":
+                continue
+            sketch = metrics.latency_sketch(stats)
+            routes[dict(tags).get("route", "")] = sketch.summary()
+            merged.merge(sketch)
+        total = merged.count
+        quantiles = merged.quantiles(DEFAULT_QUANTILES)
+
+        def _rate(name: str) -> float:
+            return round(results.get(name, 0) / total, 4) if total else 0.0
 
         return {
-            "window_size": total,
-            "fallback_rate": round(fallback_count / total, 4) if total else 0.0,
-            "handoff_rate": round(handoff_count / total, 4) if total else 0.0,
-            "blocked_rate": round(blocked_count / total, 4) if total else 0.0,
-            "p95_latency_ms": p95_latency_ms,
-            "count_2xx": count_2xx,
-            "count_4xx": count_4xx,
-            "count_5xx": count_5xx,
+            "workers": data["workers"],
+            "requests": total,
+            "fallback_rate": _rate("fallback"),
+            "handoff_rate": _rate("handoff"),
+            "blocked_rate": _rate("blocked_no_consent"),
+            "p50_latency_ms": round(quantiles[0.5], 3),
+            "p90_latency_ms": round(quantiles[0.9], 3),
+            "p95_latency_ms": round(quantiles[0.95], 3),
+            "p99_latency_ms": round(quantiles[0.99], 3),
+            "count_2xx": counts[2],
+            "count_4xx": counts[4],
+            "count_5xx": counts[5],
+            "routes": routes,
         }
 
 
@@ -129,19 +273,34 @@ def create_app() -> Flask:
             app.logger.warning("RATELIMIT_STORAGE_URI no esta definido. Se usa memoria en proceso.")
         app.limiter = limiter  # por si luego quieres usar decorators
 
-    # Logging rotativo (tolerante a FS)
+    # Logging rotativo (tolerante a FS). Con LOG_ASYNC_ENABLED escribe un hilo aparte por lotes.
+    log_async = app.config.get("LOG_ASYNC_ENABLED", True)
     try:
         logs_path = os.path.join(os.path.dirname(__file__), "logs")
         os.makedirs(logs_path, exist_ok=True)
-        handler = RotatingFileHandler(
-            os.path.join(logs_path, "backend.log"),
-            maxBytes=5 * 1024 * 1024,
-            backupCount=5,
-            encoding="utf-8"
-        )
-        handler.setFormatter(logging.Formatter("[%(asctime)s] %(levelname)s in %(module)s: %(message)s"))
+
+        def _backend_log_handler():
+            handler_cls = BatchedRotatingFileHandler if log_async else RotatingFileHandler
+            handler = handler_cls(
+                os.path.join(logs_path, "backend.log"),
+                maxBytes=5 * 1024 * 1024,
+                backupCount=5,
+                encoding="utf-8"
+            )
+            handler.setFormatter(logging.Formatter("[%(asctime)s] %(levelname)s in %(module)s: %(message)s"))
+            return handler
+
         app.logger.setLevel(logging.INFO)
-        app.logger.addHandler(handler)
+        if log_async:
+            install_pipeline(
+                app.logger,
+                "backend",
+                lambda: [_backend_log_handler()],
+                queue_max=app.config.get("LOG_QUEUE_MAX", 10000),
+                batch_max=app.config.get("LOG_BATCH_MAX", 256),
+            )
+        else:
+            app.logger.addHandler(_backend_log_handler())
         app.logger.info("Logging a archivo inicializado.")
     except Exception as e:
         # Si no se puede escribir a disco, no rompemos la app
@@ -156,7 +315,12 @@ def create_app() -> Flask:
     load_models(app)
 
     # ---------------- Metrics logger ----------------
-    setup_metrics_logger(app.logger)
+    setup_metrics_logger(
+        app.logger,
+        async_enabled=log_async,
+        queue_max=app.config.get("LOG_QUEUE_MAX", 10000),
+        batch_max=app.config.get("LOG_BATCH_MAX", 256),
+    )
 
     # ---------------- Blueprints ----------------
     register_blueprints(app)
@@ -177,18 +341,13 @@ def create_app() -> Flask:
     from .realtime.events import init_realtime
     init_realtime(app)
 
-    # ---------------- Cliente HTTP con retry/backoff ----------------
+    # ---------------- Cliente HTTP (pool de conexiones) ----------------
+    # Sin `Retry` en el adapter: los reintentos de Rasa los hace `RasaClient`
+    # dentro del deadline del turno (ver backend/chat/rasa_client.py).
     http_session = requests.Session()
     try:
-        from urllib3.util.retry import Retry  # type: ignore
         from requests.adapters import HTTPAdapter
-        retries = Retry(
-            total=3,
-            backoff_factor=0.3,
-            status_forcelist=(502, 503, 504),
-            allowed_methods=frozenset(["GET", "POST", "PUT", "DELETE", "PATCH"])
-        )
-        adapter = HTTPAdapter(max_retries=retries)
+        adapter = HTTPAdapter(max_retries=0)
         http_session.mount("http://", adapter)
         http_session.mount("https://", adapter)
     except Exception:
@@ -197,7 +356,20 @@ def create_app() -> Flask:
 
     chat_service = ChatService(app, db, http_session)
     app.chat_service = chat_service
-    app.operational_metrics = OperationalMetrics(app.config.get("METRICS_WINDOW_SIZE", 500))
+    shared_metrics = SharedMetricsStore.from_config(app.config)
+    metrics.attach_shared(shared_metrics)
+    app.operational_metrics = OperationalMetrics(app.config.get("METRICS_WINDOW_SIZE", 500), shared=shared_metrics)
+    chat_admission = (
+        AdaptiveConcurrencyLimiter.from_config(app.config) if app.config.get("CHAT_ADMISSION_ENABLED", True) else None
+    )
+    app.chat_admission = chat_admission
+    chat_service.admission = chat_admission
+    app.tracer = Tracer.from_config(app.config)
+    app.tracer.init_app(app)
+    app.query_profiler = QueryProfiler.from_config(app.config)
+    if app.query_profiler is not None:
+        with app.app_context():
+            app.query_profiler.init_app(app, db.engine)
 
     # ---------------- Utiles internos ----------------
     def _json_error(msg: str, code: int = 400):
@@ -237,7 +409,15 @@ def create_app() -> Flask:
 
     @app.get("/metrics")
     def operational_metrics():
-        return jsonify(app.operational_metrics.snapshot()), 200
+        payload = app.operational_metrics.snapshot()
+        if chat_admission is not None:
+            payload["admission"] = chat_admission.snapshot()
+        payload["rasa"] = {
+            "breaker": chat_service.rasa.breaker.snapshot(),
+            "ready": chat_service.rasa_ready.snapshot(),
+        }
+        payload["logging"] = pipeline_stats()
+        return jsonify(payload), 200
 
     if limiter:
         limiter.exempt(operational_metrics)
@@ -265,7 +445,21 @@ def create_app() -> Flask:
             return _json_error("JSON invalido", 400)
 
         try:
+            # La admision (AdaptiveConcurrencyLimiter) se pide dentro, ya con el turno del sender.
             result = chat_service.send_message(data, request.headers, flask_session)
+        except ChatOverloaded as exc:
+            # Sobrecarga: respuesta rapida en vez de ocupar otro hilo esperando a Rasa/LLM.
+            status_code = exc.status_code
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            app.operational_metrics.record(
+                status_code=status_code,
+                latency_ms=elapsed_ms,
+                interaction_result=interaction_result,
+            )
+            metrics.inc_counter("chat_send_total", tags={"status": "shed", "code": status_code})
+            response = jsonify({"error": exc.message, "retry_after_s": exc.retry_after_s})
+            response.headers["Retry-After"] = str(exc.retry_after_s)
+            return response, status_code
         except ChatServiceError as exc:
             status = "error"
             status_code = exc.status_code
@@ -278,27 +472,113 @@ def create_app() -> Flask:
             metrics.inc_counter("chat_send_total", tags={"status": status, "code": status_code})
             metrics.observe_latency("chat_send_latency_ms", elapsed_ms, tags={"status": status})
             return _json_error(exc.message, exc.status_code)
-        status_code = result.status_code
-        interaction_result = result.interaction_result
-        elapsed_ms = (time.perf_counter() - started) * 1000
-        app.operational_metrics.record(
-            status_code=status_code,
-            latency_ms=elapsed_ms,
-            interaction_result=interaction_result,
+        else:
+            status_code = result.status_code
+            interaction_result = result.interaction_result
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            app.operational_metrics.record(
+                status_code=status_code,
+                latency_ms=elapsed_ms,
+                interaction_result=interaction_result,
+            )
+            metrics.inc_counter("chat_send_total", tags={"status": status, "code": status_code})
+            metrics.observe_latency("chat_send_latency_ms", elapsed_ms, tags={"status": status})
+            return jsonify(result.payload), result.status_code
+
+    def _sse(event: str, data: Any) -> str:
+        return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+    @app.post("/chat/stream")
+    def chat_stream():
+        """Igual que /chat/send pero emite eventos SSE (token, card, message, done, error)."""
+        started = time.perf_counter()
+        try:
+            data: Dict[str, Any] = request.get_json(force=True, silent=False)
+        except Exception:
+            db.session.rollback()
+            metrics.inc_counter("chat_stream_total", tags={"status": "error", "code": 400})
+            return _json_error("JSON invalido", 400)
+        try:
+            # Slot del sender y admision se toman aqui: un stream descartado es un 503 normal.
+            events = chat_service.stream_message(data, request.headers, flask_session)
+        except ChatOverloaded as exc:
+            metrics.inc_counter("chat_stream_total", tags={"status": "shed", "code": exc.status_code})
+            response = jsonify({"error": exc.message, "retry_after_s": exc.retry_after_s})
+            response.headers["Retry-After"] = str(exc.retry_after_s)
+            return response, exc.status_code
+        except ChatServiceError as exc:
+            metrics.inc_counter("chat_stream_total", tags={"status": "error", "code": exc.status_code})
+            return _json_error(exc.message, exc.status_code)
+
+        def generate():
+            status, status_code, interaction_result = "ok", 200, None
+            first = True
+            try:
+                for kind, value in events:
+                    if first:
+                        first = False
+                        metrics.observe_latency(
+                            "chat_stream_ttft_ms", (time.perf_counter() - started) * 1000, tags={"event": kind}
+                        )
+                    if kind == "done":
+                        interaction_result = value.get("interaction_result")
+                    yield _sse(kind, value)
+            except ChatServiceError as exc:
+                status, status_code = "error", exc.status_code
+                yield _sse("error", {"error": exc.message, "status": exc.status_code})
+            finally:
+                elapsed_ms = (time.perf_counter() - started) * 1000
+                app.operational_metrics.record(
+                    status_code=status_code,
+                    latency_ms=elapsed_ms,
+                    interaction_result=interaction_result,
+                    route="/chat/stream",
+                )
+                metrics.inc_counter("chat_stream_total", tags={"status": status, "code": status_code})
+                metrics.observe_latency("chat_stream_latency_ms", elapsed_ms, tags={"status": status})
+
+        return Response(
+            stream_with_context(generate()),
+            mimetype="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
         )
-        metrics.inc_counter("chat_send_total", tags={"status": status, "code": status_code})
-        metrics.observe_latency("chat_send_latency_ms", elapsed_ms, tags={"status": status})
-        return jsonify(result.payload), result.status_code
 
     @app.get("/chat/context/<sender>")
     def chat_context_get(sender: str):
         try:
             chat_id = request.args.get("chat_id")
-            result = chat_service.get_context(sender, chat_id, request.headers, flask_session)
+            resolve_plans = (request.args.get("resolve_plans") or "").strip().lower() in {"1", "true", "yes"}
+            result = chat_service.get_context(
+                sender, chat_id, request.headers, flask_session, resolve_plans=resolve_plans
+            )
         except ChatServiceError as exc:
             return _json_error(exc.message, exc.status_code)
         return jsonify(result.payload), result.status_code
 
+    @app.get("/chat/bootstrap/<sender>")
+    def chat_bootstrap(sender: str):
+        """Salud, contexto y perfil en un solo round-trip para el action server."""
+        try:
+            include_profile = (request.args.get("profile") or "1").strip().lower() not in {"0", "false", "no"}
+            result = chat_service.get_bootstrap(
+                sender, request.args.get("chat_id"), request.headers, flask_session, include_profile=include_profile
+            )
+        except ChatServiceError as exc:
+            return _json_error(exc.message, exc.status_code)
+        return jsonify(result.payload), result.status_code
+
+    @app.get("/chat/plans/<digest>")
+    def chat_plan_get(digest: str):
+        """Payload completo de un plan referenciado por `plan_ref` (sha256 del contenido)."""
+        try:
+            result = chat_service.get_plan(digest, request.headers, flask_session)
+        except ChatServiceError as exc:
+            return _json_error(exc.message, exc.status_code)
+        response = jsonify(result.payload)
+        # El contenido de un digest nunca cambia.
+        response.headers["Cache-Control"] = "private, max-age=31536000, immutable"
+        return response, result.status_code
+
     @app.post("/chat/context/<sender>")
     def chat_context_update(sender: str):
         try:
@@ -374,10 +654,12 @@ def create_app() -> Flask:
             return _json_error("El texto es demasiado largo.", 413)
 
         try:
-            resp = http_session.post(
+            resp = chat_service.rasa.post(
                 chat_service.rasa_url(app.config["RASA_PARSE_ENDPOINT"]),
-                json={"text": text},
-                timeout=app.config["RASA_TIMEOUT_PARSE"],
+                {"text": text},
+                timeout_s=app.config["RASA_TIMEOUT_PARSE"],
+                idempotent=True,
+                endpoint="nlu_parse",
             )
             resp.raise_for_status()
             payload = resp.json()
@@ -0,0 +1,176 @@
+"""Control de admision adaptativo para /chat/send.
+
+Cada turno de chat ocupa un hilo del worker durante el parse NLU, el webhook de
+Rasa (con sus reintentos) o el LLM. Sin un tope, un pico de trafico encola
+trabajo hasta que todas las latencias colapsan. `AdaptiveConcurrencyLimiter`
+limita los turnos simultaneos con un limite que se ajusta solo (estilo
+"gradient"):
+
+- `long_rtt`: referencia de latencia sin carga (baja de inmediato, sube despacio y
+  solo cuando hay poca carga);
+- `short_rtt`: media movil rapida (latencia actual);
+- gradiente = clamp(tolerancia * long_rtt / short_rtt, 0.5, 1.0): si la latencia
+  actual sube respecto de la referencia, el limite baja; si no, crece con
+  `sqrt(limite)` de margen. El paso se reparte entre ~`limite` muestras, asi que
+  el limite se mueve una vez por "ventana" y no oscila con cada respuesta;
+- errores 5xx/timeouts recortan el limite un 10% (decremento multiplicativo).
+
+Lo que excede el limite espera en una cola corta (`queue_max`, `queue_timeout_s`)
+y despues se descarta con un 503 rapido en vez de ocupar un hilo mas.
+"""
+from __future__ import annotations
+
+import math
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Deque, Dict, Optional
+
+from ..metrics import metrics
+
+
+@dataclass
+class AdmissionTicket:
+    inflight_at_start: int
+    queued_ms: float
+
+
+class AdaptiveConcurrencyLimiter:
+    def __init__(
+        self,
+        *,
+        initial_limit: int = 16,
+        min_limit: int = 2,
+        max_limit: int = 64,
+        queue_max: int = 32,
+        queue_timeout_s: float = 0.5,
+        tolerance: float = 1.5,
+        smoothing: float = 0.2,
+        long_window: int = 100,
+        short_window: int = 10,
+        name: str = "chat_send",
+    ) -> None:
+        self.min_limit = max(1, int(min_limit))
+        self.max_limit = max(self.min_limit, int(max_limit))
+        self.limit = float(min(self.max_limit, max(self.min_limit, int(initial_limit))))
+        self.queue_max = max(0, int(queue_max))
+        self.queue_timeout_s = max(0.0, float(queue_timeout_s))
+        self.tolerance = max(1.0, float(tolerance))
+        self.smoothing = min(1.0, max(0.01, float(smoothing)))
+        self._long_alpha = 2.0 / (max(1, int(long_window)) + 1)
+        self._short_alpha = 2.0 / (max(1, int(short_window)) + 1)
+        self.name = name
+        self.long_rtt: Optional[float] = None
+        self.short_rtt: Optional[float] = None
+        self.inflight = 0
+        self._waiters: Deque[object] = deque()
+        self._cond = threading.Condition()
+
+    @classmethod
+    def from_config(cls, config) -> "AdaptiveConcurrencyLimiter":
+        return cls(
+            initial_limit=int(config.get("CHAT_ADMISSION_INITIAL_LIMIT", 16)),
+            min_limit=int(config.get("CHAT_ADMISSION_MIN_LIMIT", 2)),
+            max_limit=int(config.get("CHAT_ADMISSION_MAX_LIMIT", 64)),
+            queue_max=int(config.get("CHAT_ADMISSION_QUEUE_MAX", 32)),
+            queue_timeout_s=float(config.get("CHAT_ADMISSION_QUEUE_TIMEOUT_S", 0.5)),
+        )
+
+    # -------- admision --------
+    def _has_capacity(self) -> bool:
+        return self.inflight < int(self.limit)
+
+    def acquire(self) -> Optional[AdmissionTicket]:
+        """Reserva un turno; None si la cola esta llena o vencio la espera (descartar)."""
+        started = time.monotonic()
+        with self._cond:
+            if self._has_capacity() and not self._waiters:
+                return self._admit(started, "admitted")
+            if len(self._waiters) >= self.queue_max or self.queue_timeout_s <= 0:
+                return self._shed()
+            token = object()
+            self._waiters.append(token)
+            self._publish()
+            deadline = started + self.queue_timeout_s
+            while not (self._has_capacity() and self._waiters[0] is token):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._waiters.remove(token)
+                    self._cond.notify_all()
+                    return self._shed()
+                self._cond.wait(remaining)
+            self._waiters.popleft()
+            self._cond.notify_all()
+            return self._admit(started, "queued")
+
+    def _admit(self, started: float, result: str) -> AdmissionTicket:
+        self.inflight += 1
+        queued_ms = (time.monotonic() - started) * 1000.0
+        metrics.inc_counter(f"{self.name}_admission_total", tags={"result": result})
+        if result == "queued":
+            metrics.observe_latency(f"{self.name}_admission_wait_ms", queued_ms)
+        self._publish()
+        return AdmissionTicket(self.inflight, queued_ms)
+
+    def _shed(self) -> None:
+        metrics.inc_counter(f"{self.name}_admission_total", tags={"result": "shed"})
+        self._publish()
+        return None
+
+    def release(self, ticket: Optional[AdmissionTicket], latency_ms: float, *, dropped: bool = False) -> None:
+        """Libera el turno y ajusta el limite con la latencia observada (sin la espera en cola)."""
+        if ticket is None:
+            return
+        with self._cond:
+            self.inflight = max(0, self.inflight - 1)
+            self._update(max(0.0, float(latency_ms) - ticket.queued_ms), ticket.inflight_at_start, dropped)
+            self._publish()
+            self._cond.notify_all()
+
+    # -------- limite adaptativo --------
+    def _update(self, rtt: float, inflight: int, dropped: bool) -> None:
+        if dropped:
+            self.limit = max(float(self.min_limit), self.limit * 0.9)
+            return
+        if rtt <= 0:
+            return
+        self.short_rtt = rtt if self.short_rtt is None else self.short_rtt + self._short_alpha * (rtt - self.short_rtt)
+        lightly_loaded = inflight <= max(self.min_limit, self.limit / 2)
+        if self.long_rtt is None or self.short_rtt < self.long_rtt:
+            # La referencia baja de inmediato...
+            self.long_rtt = self.short_rtt
+        elif lightly_loaded:
+            # ...y solo sube despacio con poca carga: bajo saturacion la latencia mide la cola,
+            # no el servicio, y seguirla haria crecer el limite sin fin.
+            self.long_rtt += self._long_alpha * (rtt - self.long_rtt)
+        # Con menos de la mitad del limite en uso la latencia no dice nada del limite.
+        if inflight < self.limit / 2:
+            return
+        # El ajuste completo se reparte entre ~limite muestras (una "ventana").
+        gradient = max(0.5, min(1.0, self.tolerance * self.long_rtt / self.short_rtt))
+        target = self.limit * gradient + math.sqrt(self.limit)
+        step = self.smoothing / max(1.0, self.limit) * 4.0
+        limit = self.limit + (target - self.limit) * min(1.0, step)
+        self.limit = float(min(self.max_limit, max(self.min_limit, limit)))
+
+    def _publish(self) -> None:
+        metrics.set_gauge(f"{self.name}_admission_limit", int(self.limit))
+        metrics.set_gauge(f"{self.name}_admission_inflight", self.inflight, mode="livesum")
+        metrics.set_gauge(f"{self.name}_admission_queue_depth", len(self._waiters), mode="livesum")
+
+    def retry_after_s(self) -> int:
+        """Sugerencia para `Retry-After`: aproximadamente una latencia reciente."""
+        rtt_ms = self.short_rtt or 1000.0
+        return max(1, int(math.ceil(rtt_ms / 1000.0)))
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "limit": int(self.limit),
+                "inflight": self.inflight,
+                "queue_depth": len(self._waiters),
+                "queue_max": self.queue_max,
+                "short_rtt_ms": round(self.short_rtt, 2) if self.short_rtt is not None else None,
+                "long_rtt_ms": round(self.long_rtt, 2) if self.long_rtt is not None else None,
+            }
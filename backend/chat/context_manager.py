@@ -2,9 +2,11 @@
 
 from __future__ import annotations
 
+from contextlib import contextmanager
 from dataclasses import dataclass
-from typing import Any, Dict, Optional
+from typing import Any, Dict, Iterator, Optional
 
+from ..extensions import db
 from .models import ChatUserContext, ProgressLog
 
 
@@ -12,12 +14,33 @@ from .models import ChatUserContext, ProgressLog
 class ChatContextManager:
     context: ChatUserContext
 
+    @contextmanager
+    def unit_of_work(self, enabled: bool = True) -> Iterator["ChatContextManager"]:
+        """Agrupa las mutaciones del turno: sin autoflush intermedio.
+
+        Los setters solo tocan el objeto en memoria (y encolan historial); en el commit
+        sale un unico UPDATE de `chat_user_context` con las columnas realmente
+        modificadas y un unico INSERT multi-fila en `chat_history_event`.
+        """
+        if not enabled:
+            yield self
+            return
+        with db.session.no_autoflush:
+            yield self
+
     def set_last_routine(self, payload: Dict[str, Any]) -> None:
         self.context.set_last_routine(payload)
 
     def set_last_diet(self, payload: Dict[str, Any]) -> None:
         self.context.set_last_diet(payload)
 
+    def plan_ref(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Referencia compacta a un plan (lo encola en `chat_plan_payload`)."""
+        return self.context.intern_plan(payload)
+
+    def resolve_plan(self, value: Any) -> Any:
+        return self.context.resolve_plan(value)
+
     def touch(self) -> None:
         self.context.touch()
 
@@ -98,5 +121,5 @@ class ChatContextManager:
     def to_metadata(self) -> Dict[str, Any]:
         return self.context.to_metadata()
 
-    def to_dict(self) -> Dict[str, Any]:
-        return self.context.to_dict()
+    def to_dict(self, *, resolve_plans: bool = False) -> Dict[str, Any]:
+        return self.context.to_dict(resolve_plans=resolve_plans)
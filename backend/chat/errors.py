@@ -5,3 +5,11 @@ class ChatServiceError(Exception):
         super().__init__(message)
         self.message = message
         self.status_code = status_code
+
+
+class ChatOverloaded(ChatServiceError):
+    """El limitador de admision descarto el turno: 503 con `Retry-After`."""
+
+    def __init__(self, retry_after_s: int) -> None:
+        super().__init__("Estamos con mucha demanda, intenta de nuevo en unos segundos.", 503)
+        self.retry_after_s = retry_after_s
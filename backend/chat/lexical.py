@@ -0,0 +1,203 @@
+"""Indice lexico BM25 para la busqueda de respaldo de `KnowledgeStore`.
+
+Funciona sin chromadb ni API de embeddings: los chunks de la base de conocimiento
+se tokenizan una vez (minusculas, sin tildes, sin stopwords y con un stemming
+ligero para espanol) y se guarda un indice invertido `termino -> [(chunk, tf)]`.
+Una consulta solo recorre las listas de sus terminos, por lo que el costo no
+depende del tamano total del corpus.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import math
+import os
+import re
+import unicodedata
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+LEXICAL_INDEX_VERSION = 1
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+_STOPWORDS = frozenset(
+    """
+    a al algo algun alguna algunas alguno algunos ante antes como con contra cual cuando de del desde
+    donde durante e el ella ellas ellos en entre era eran es esa esas ese eso esos esta estan estas
+    este esto estos fue fueron ha han hasta hay la las le les lo los mas me mi mis mucho muy ni no
+    nos o os otra otras otro otros para pero poco por porque que quien se sea ser si sin sobre solo
+    su sus tambien tiene tienen todo todos tu tus un una unas uno unos y ya yo
+    the and of to in for is on with
+    """.split()
+)
+
+# Sufijos derivativos frecuentes, del mas largo al mas corto.
+_SUFFIXES = (
+    "amientos", "imientos", "aciones", "uciones", "amiento", "imiento", "idades",
+    "ancias", "encias", "mente", "acion", "ucion", "istas", "ismos", "ables", "ibles",
+    "idad", "ancia", "encia", "ista", "ismo", "able", "ible", "osos", "osas",
+)
+
+
+def fold_accents(text: str) -> str:
+    """Minusculas y sin diacriticos (`proteína` -> `proteina`, `ñ` -> `n`)."""
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+def stem_es(word: str) -> str:
+    """Stemming ligero para espanol: sufijos derivativos, plural y genero."""
+    if len(word) <= 3 or word.isdigit():
+        return word
+    for suffix in _SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            return word[: -len(suffix)]
+    if word.endswith("es") and len(word) > 4:
+        word = word[:-2]
+    elif word.endswith("s") and len(word) > 3:
+        word = word[:-1]
+    if word[-1] in "aeo" and len(word) > 3:
+        word = word[:-1]
+    return word
+
+
+def tokenize(text: str) -> List[str]:
+    return [stem_es(tok) for tok in _TOKEN_RE.findall(fold_accents(text)) if tok not in _STOPWORDS]
+
+
+def sources_fingerprint(paths: Iterable[str]) -> str:
+    """Huella de las fuentes (ruta, tamano, mtime) para invalidar el indice persistido."""
+    digest = hashlib.sha1(f"v{LEXICAL_INDEX_VERSION}".encode("utf-8"))
+    for path in sorted(paths):
+        try:
+            stat = os.stat(path)
+            digest.update(f"{path}|{stat.st_size}|{stat.st_mtime_ns}\n".encode("utf-8"))
+        except OSError:
+            digest.update(f"{path}|missing\n".encode("utf-8"))
+    return digest.hexdigest()
+
+
+class BM25Index:
+    """Indice invertido BM25 (Okapi) sobre chunks `{text, source, chunk}`."""
+
+    def __init__(
+        self,
+        chunks: Sequence[Dict[str, Any]],
+        postings: Dict[str, List[Tuple[int, int]]],
+        doc_len: Sequence[int],
+        *,
+        fingerprint: str = "",
+        k1: float = 1.5,
+        b: float = 0.75,
+    ) -> None:
+        self.chunks = list(chunks)
+        self.postings = postings
+        self.doc_len = list(doc_len)
+        self.fingerprint = fingerprint
+        self.k1 = k1
+        self.b = b
+        n = len(self.doc_len)
+        self.avgdl = (sum(self.doc_len) / n) if n else 0.0
+        self.idf = {
+            term: math.log(1.0 + (n - len(plist) + 0.5) / (len(plist) + 0.5))
+            for term, plist in postings.items()
+        }
+
+    def __len__(self) -> int:
+        return len(self.chunks)
+
+    @classmethod
+    def build(cls, chunks: Sequence[Dict[str, Any]], *, fingerprint: str = "") -> "BM25Index":
+        postings: Dict[str, List[Tuple[int, int]]] = {}
+        doc_len: List[int] = []
+        for doc_id, chunk in enumerate(chunks):
+            terms = tokenize(chunk.get("text") or "")
+            doc_len.append(len(terms))
+            counts: Dict[str, int] = {}
+            for term in terms:
+                counts[term] = counts.get(term, 0) + 1
+            for term, tf in counts.items():
+                postings.setdefault(term, []).append((doc_id, tf))
+        return cls(chunks, postings, doc_len, fingerprint=fingerprint)
+
+    def search(self, query: str, limit: int = 4) -> List[Dict[str, Any]]:
+        terms = set(tokenize(query or ""))
+        if not terms or not self.chunks:
+            return []
+        k1, b = self.k1, self.b
+        norm = k1 * (1.0 - b)
+        slope = k1 * b / self.avgdl if self.avgdl else 0.0
+        scores: Dict[int, float] = {}
+        for term in terms:
+            plist = self.postings.get(term)
+            if not plist:
+                continue
+            idf = self.idf[term]
+            for doc_id, tf in plist:
+                denom = tf + norm + slope * self.doc_len[doc_id]
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (k1 + 1.0) / denom
+        best = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[: max(0, limit)]
+        return [
+            {
+                "text": self.chunks[doc_id]["text"],
+                "source": self.chunks[doc_id].get("source"),
+                "chunk": self.chunks[doc_id].get("chunk"),
+                "score": round(score, 4),
+            }
+            for doc_id, score in best
+        ]
+
+    # -------- persistencia --------
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "version": LEXICAL_INDEX_VERSION,
+            "fingerprint": self.fingerprint,
+            "k1": self.k1,
+            "b": self.b,
+            "chunks": self.chunks,
+            "doc_len": self.doc_len,
+            "postings": {term: [list(p) for p in plist] for term, plist in self.postings.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "BM25Index":
+        postings = {term: [(int(d), int(tf)) for d, tf in plist] for term, plist in data["postings"].items()}
+        return cls(
+            data["chunks"],
+            postings,
+            data["doc_len"],
+            fingerprint=data.get("fingerprint", ""),
+            k1=float(data.get("k1", 1.5)),
+            b=float(data.get("b", 0.75)),
+        )
+
+    def save(self, path: str) -> None:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as fh:
+            json.dump(self.to_dict(), fh, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str, fingerprint: Optional[str] = None) -> Optional["BM25Index"]:
+        """Carga el indice si existe, es de esta version y (si se pide) coincide la huella."""
+        try:
+            with open(path, "r", encoding="utf-8") as fh:
+                data = json.load(fh)
+        except (OSError, ValueError):
+            return None
+        if data.get("version") != LEXICAL_INDEX_VERSION:
+            return None
+        if fingerprint is not None and data.get("fingerprint") != fingerprint:
+            return None
+        try:
+            return cls.from_dict(data)
+        except (KeyError, TypeError, ValueError):
+            return None
+
+
+def lexical_index_path(rag_index_path: str) -> str:
+    """Archivo del indice BM25, junto al directorio del indice vectorial."""
+    return f"{rag_index_path.rstrip(os.sep)}_bm25.json"
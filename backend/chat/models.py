@@ -1,17 +1,105 @@
 """Persistence helpers for chat user context."""
 from __future__ import annotations
 
+import copy
+import threading
+from collections import OrderedDict
 from datetime import datetime
 from decimal import Decimal, InvalidOperation
-from typing import Any, Dict, Iterable, Optional
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import set_committed_value
 
 from ..extensions import db
+from ..planner.refs import PLAN_REF_KEY, canonical_plan_json, is_plan_payload, is_plan_ref, make_plan_ref, plan_digest
+
+# Entradas de historial que se exponen por contexto (to_dict/to_metadata/orquestador).
+HISTORY_WINDOW = 20
 
 
 def _now() -> datetime:
     return datetime.utcnow()
 
 
+class ChatHistoryEvent(db.Model):
+    """Historial de chat append-only: una fila por entrada, numerada por `seq` dentro del sender."""
+
+    __tablename__ = "chat_history_event"
+    __table_args__ = (
+        db.UniqueConstraint("sender_id", "seq", name="uq_chat_history_event_sender_seq"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    sender_id = db.Column(db.String(80), nullable=False)
+    chat_id = db.Column(db.String(80), nullable=True)
+    seq = db.Column(db.Integer, nullable=False)
+    type = db.Column(db.String(32), nullable=True)
+    payload = db.Column(db.JSON, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=_now)
+
+    @classmethod
+    def last_entries(
+        cls, sender_id: str, limit: int = HISTORY_WINDOW, *, before_seq: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """Ultimas `limit` entradas (orden cronologico) con lectura por keyset sobre (sender_id, seq)."""
+        query = cls.query.with_entities(cls.payload).filter(cls.sender_id == sender_id)
+        if before_seq is not None:
+            query = query.filter(cls.seq < before_seq)
+        rows = query.order_by(cls.seq.desc()).limit(max(0, limit)).all()
+        return [row[0] for row in reversed(rows)]
+
+
+class ChatPlanPayload(db.Model):
+    """Planes (rutinas/dietas) direccionados por contenido: sha256 del JSON canonico -> payload.
+
+    Contexto, historial, metadata de Rasa y slots guardan solo la referencia
+    (`backend.planner.refs.make_plan_ref`); el plan completo se escribe una vez aqui.
+    """
+
+    __tablename__ = "chat_plan_payload"
+
+    digest = db.Column(db.String(64), primary_key=True)
+    kind = db.Column(db.String(32), nullable=True)
+    payload = db.Column(db.JSON, nullable=False)
+    size_bytes = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, nullable=False, default=_now)
+
+    # Los payloads son inmutables: cache LRU por proceso digest -> payload.
+    _cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+    _cache_lock = threading.Lock()
+    _CACHE_SIZE = 256
+
+    @staticmethod
+    def row_for(payload: Dict[str, Any], digest: Optional[str] = None) -> Dict[str, Any]:
+        raw = canonical_plan_json(payload)
+        return {
+            "digest": digest or plan_digest(payload),
+            "kind": str(payload.get("type") or "")[:32] or None,
+            "payload": payload,
+            "size_bytes": len(raw.encode("utf-8")),
+            "created_at": _now(),
+        }
+
+    @classmethod
+    def fetch(cls, digest: str) -> Optional[Dict[str, Any]]:
+        """Payload completo de `digest` (copia), o None si no existe."""
+        with cls._cache_lock:
+            cached = cls._cache.get(digest)
+            if cached is not None:
+                cls._cache.move_to_end(digest)
+                return copy.deepcopy(cached)
+        row = cls.query.with_entities(cls.payload).filter(cls.digest == digest).first()
+        if row is None:
+            return None
+        with cls._cache_lock:
+            cls._cache[digest] = row[0]
+            while len(cls._cache) > cls._CACHE_SIZE:
+                cls._cache.popitem(last=False)
+        return copy.deepcopy(row[0])
+
+
 class ChatUserContext(db.Model):
     __tablename__ = "chat_user_context"
 
@@ -24,7 +112,9 @@ class ChatUserContext(db.Model):
     medical_conditions = db.Column(db.Text, nullable=True)
     last_routine = db.Column(db.JSON, nullable=True)
     last_diet = db.Column(db.JSON, nullable=True)
-    history = db.Column(db.JSON, nullable=False, default=list)
+    # Columna JSON previa a `chat_history_event`; solo se conserva para migraciones/rollback.
+    legacy_history = db.Column("history", db.JSON, nullable=False, default=list)
+    history_seq = db.Column(db.Integer, nullable=False, default=0)
     notes = db.Column(db.Text, nullable=True)
     consent_given = db.Column(db.Boolean, nullable=False, default=False)
     consent_version = db.Column(db.String(32), nullable=True)
@@ -62,49 +152,139 @@ class ChatUserContext(db.Model):
     def touch(self) -> None:
         self.last_interaction_at = _now()
 
+    def _assign(self, field: str, value: Any) -> bool:
+        """Asigna solo si cambia: columnas intactas (p.ej. JSON) no quedan marcadas ni se reescriben."""
+        if getattr(self, field) == value:
+            return False
+        setattr(self, field, value)
+        return True
+
     def set_allergies(self, value: Optional[str]) -> None:
-        self.allergies = value.strip() if value else None
+        self._assign("allergies", value.strip() if value else None)
         self.touch()
 
     def set_medical_conditions(self, value: Optional[str]) -> None:
-        self.medical_conditions = value.strip() if value else None
+        self._assign("medical_conditions", value.strip() if value else None)
         self.touch()
 
     def set_dislikes(self, value: Optional[str]) -> None:
-        self.dislikes = value.strip() if value else None
+        self._assign("dislikes", value.strip() if value else None)
         self.touch()
 
     def set_last_routine(self, routine_payload: Dict[str, Any]) -> None:
-        self.last_routine = routine_payload or None
+        ref = self.intern_plan(routine_payload) if routine_payload else None
+        self._assign("last_routine", ref)
         self.append_history(
             {
                 "type": "routine",
-                "data": routine_payload,
+                "data": ref,
                 "timestamp": _now().isoformat(),
             }
         )
 
     def set_last_diet(self, diet_payload: Dict[str, Any]) -> None:
-        self.last_diet = diet_payload or None
+        ref = self.intern_plan(diet_payload) if diet_payload else None
+        self._assign("last_diet", ref)
         self.append_history(
             {
                 "type": "diet",
-                "data": diet_payload,
+                "data": ref,
                 "timestamp": _now().isoformat(),
             }
         )
 
-    def append_history(self, entry: Dict[str, Any], *, max_items: int = 20) -> None:
-        history: Iterable[Dict[str, Any]] = self.history or []
-        items = list(history)
+    def intern_plan(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Encola el plan en `chat_plan_payload` y devuelve su referencia compacta.
+
+        Referencias y payloads que no son planes se devuelven sin cambios. El INSERT
+        (que ignora digests ya guardados) sale en el mismo flush que el historial.
+        """
+        if not is_plan_payload(payload):
+            return payload
+        digest = plan_digest(payload)
+        pending = self.__dict__.setdefault("_plan_pending", {})
+        if digest not in pending:
+            pending[digest] = ChatPlanPayload.row_for(payload, digest)
+        return make_plan_ref(payload, digest)
+
+    def resolve_plan(self, value: Any) -> Any:
+        """Plan completo para una referencia (encolada o persistida); otros valores tal cual."""
+        if not is_plan_ref(value):
+            return value
+        digest = value[PLAN_REF_KEY]
+        pending = (self.__dict__.get("_plan_pending") or {}).get(digest)
+        if pending is not None:
+            return copy.deepcopy(pending["payload"])
+        return ChatPlanPayload.fetch(digest)
+
+    def pending_plan_rows(self) -> List[Dict[str, Any]]:
+        return list((self.__dict__.get("_plan_pending") or {}).values())
+
+    @property
+    def history(self) -> List[Dict[str, Any]]:
+        return self.recent_history()
+
+    def recent_history(self, limit: int = HISTORY_WINDOW, *, before_seq: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Ultimas entradas del historial (orden cronologico), con keyset opcional `before_seq`.
+
+        Suma las entradas encoladas que aun no se escribieron, asi que no depende del
+        autoflush. La ventana por defecto se cachea en la instancia y `append_history`
+        la mantiene al dia.
+        """
+        cacheable = before_seq is None and limit <= HISTORY_WINDOW
+        if cacheable and "_history_tail" in self.__dict__:
+            tail = self.__dict__["_history_tail"]
+            return list(tail[-limit:]) if limit > 0 else []
+
+        window = HISTORY_WINDOW if cacheable else max(0, limit)
+        pending = self.__dict__.get("_history_pending") or []
+        unwritten = [row for row in pending if before_seq is None or row["seq"] < before_seq]
+        cutoff = unwritten[0]["seq"] if unwritten else before_seq
+        persisted: List[Dict[str, Any]] = []
+        if (self.history_seq or 0) > len(pending):
+            persisted = ChatHistoryEvent.last_entries(self.sender_id, window, before_seq=cutoff)
+        entries = (persisted + [row["payload"] for row in unwritten])[-window:] if window else []
+        if cacheable:
+            self.__dict__["_history_tail"] = entries
+            return list(entries[-limit:]) if limit > 0 else []
+        return entries
+
+    def append_history(self, entry: Dict[str, Any]) -> None:
+        """Encola una entrada para `chat_history_event` (no reescribe el historial previo).
+
+        Las entradas de la request se insertan juntas, en un solo INSERT multi-fila,
+        cuando la sesion hace flush (ver `_flush_pending_history`).
+        """
         if "timestamp" not in entry:
             entry["timestamp"] = _now().isoformat()
-        items.append(entry)
-        if len(items) > max_items:
-            items = items[-max_items:]
-        self.history = items
+        # `seq` provisional: el flush lo reasigna desde la fila en la base (ver
+        # `_flush_pending_history`), otra request del mismo sender puede haber escrito antes.
+        self.history_seq = (self.history_seq or 0) + 1
+        self.__dict__.setdefault("_history_pending", []).append(
+            {
+                "sender_id": self.sender_id,
+                "chat_id": self.chat_id,
+                "seq": self.history_seq,
+                "type": str(entry.get("type") or "")[:32] or None,
+                "payload": entry,
+                "created_at": _now(),
+            }
+        )
+        tail = self.__dict__.get("_history_tail")
+        if tail is not None:
+            tail.append(entry)
+            del tail[:-HISTORY_WINDOW]
         self.touch()
 
+    def pending_history_rows(self) -> List[Dict[str, Any]]:
+        """Entradas encoladas por `append_history` que aun no se escribieron."""
+        return list(self.__dict__.get("_history_pending") or [])
+
+    def discard_pending_history(self) -> None:
+        self.__dict__.pop("_history_pending", None)
+        self.__dict__.pop("_history_tail", None)
+        self.__dict__.pop("_plan_pending", None)
+
     def set_consent(self, *, given: bool, version: Optional[str] = None) -> None:
         prev_given = bool(self.consent_given)
         self.consent_given = bool(given)
@@ -126,23 +306,31 @@ class ChatUserContext(db.Model):
         self.last_routine = None
         self.last_diet = None
         self.notes = None
-        self.history = []
+        self.legacy_history = []
+        self.__dict__.pop("_history_pending", None)
+        self.__dict__.pop("_plan_pending", None)
+        ChatHistoryEvent.query.filter_by(sender_id=self.sender_id).delete(synchronize_session=False)
+        self.__dict__["_history_tail"] = []
         self.touch()
 
     def set_last_interaction_result(self, result: Optional[str]) -> None:
-        self.last_interaction_result = result.strip()[:32] if isinstance(result, str) and result.strip() else None
+        self._assign(
+            "last_interaction_result", result.strip()[:32] if isinstance(result, str) and result.strip() else None
+        )
         self.touch()
 
-    def to_dict(self) -> Dict[str, Any]:
+    def to_dict(self, *, resolve_plans: bool = False) -> Dict[str, Any]:
+        """Contexto serializable; con `resolve_plans` devuelve rutina/dieta completas en vez de referencias."""
+        resolve = self.resolve_plan if resolve_plans else (lambda value: value)
         return {
             "sender_id": self.sender_id,
             "user_id": self.user_id,
             "allergies": self.allergies,
             "dislikes": self.dislikes,
             "medical_conditions": self.medical_conditions,
-            "last_routine": self.last_routine,
-            "last_diet": self.last_diet,
-            "history": self.history or [],
+            "last_routine": resolve(self.last_routine),
+            "last_diet": resolve(self.last_diet),
+            "history": self.recent_history(),
             "notes": self.notes,
             "consent_given": self.consent_given,
             "consent_version": self.consent_version,
@@ -157,14 +345,15 @@ class ChatUserContext(db.Model):
         # Keep metadata compact to avoid inflating Rasa payloads.
         meta_history = []
         last_explanation = None
-        for item in reversed(self.history or []):
+        history = self.recent_history()
+        for item in reversed(history):
             if last_explanation:
                 break
             if isinstance(item, dict) and "explanation" in item:
                 exp = item.get("explanation")
                 if isinstance(exp, str) and exp.strip():
                     last_explanation = exp.strip()[:300]
-        for item in (self.history or [])[-5:]:
+        for item in history[-5:]:
             meta_history.append(
                 {
                     "type": item.get("type"),
@@ -175,8 +364,8 @@ class ChatUserContext(db.Model):
             "allergies": self.allergies,
             "dislikes": self.dislikes,
             "medical_conditions": self.medical_conditions,
-            "last_routine": self.last_routine,
-            "last_diet": self.last_diet,
+            "last_routine": _as_plan_ref(self.last_routine),
+            "last_diet": _as_plan_ref(self.last_diet),
             "consent_given": self.consent_given,
             "consent_version": self.consent_version,
             "recent_history": meta_history,
@@ -184,6 +373,89 @@ class ChatUserContext(db.Model):
         }
 
 
+def _as_plan_ref(value: Any) -> Any:
+    # Filas previas a `chat_plan_payload` pueden tener el plan completo en la columna.
+    return make_plan_ref(value) if is_plan_payload(value) else value
+
+
+def _insert_plans(session: Session, rows: List[Dict[str, Any]]) -> None:
+    """INSERT multi-fila en `chat_plan_payload` ignorando digests que ya existen."""
+    table = ChatPlanPayload.__table__
+    dialect = session.get_bind(mapper=ChatPlanPayload.__mapper__).dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        digests = [row["digest"] for row in rows]
+        existing = {
+            digest for (digest,) in session.execute(
+                select(table.c.digest).where(table.c.digest.in_(digests))
+            )
+        }
+        rows = [row for row in rows if row["digest"] not in existing]
+        if rows:
+            session.execute(table.insert(), rows)
+        return
+    session.execute(insert(table).on_conflict_do_nothing(index_elements=["digest"]), rows)
+
+
+@event.listens_for(Session, "before_flush")
+def _flush_pending_history(session: Session, flush_context, instances) -> None:
+    """Escribe planes e historial encolados de los contextos modificados (un INSERT multi-fila cada uno).
+
+    Para contextos ya persistidos el `seq` se reserva en la base: el UPDATE del
+    contexto lleva `history_seq = history_seq + n` y las filas se numeran en
+    `after_flush` con el valor resultante. Asi otra request del mismo sender que
+    escribio historial desde que se cargo el contexto (p.ej. POST /chat/context
+    durante un turno) no choca con `uq_chat_history_event_sender_seq`.
+    """
+    rows: List[Dict[str, Any]] = []
+    plans: Dict[str, Dict[str, Any]] = {}
+    allocating: List[Any] = []
+    for obj in list(session.new) + list(session.dirty):
+        if isinstance(obj, ChatUserContext):
+            plans.update(obj.__dict__.pop("_plan_pending", None) or {})
+            pending = obj.__dict__.pop("_history_pending", None)
+            if not pending:
+                continue
+            if obj in session.new:
+                rows.extend(pending)
+            else:
+                obj.history_seq = ChatUserContext.history_seq + len(pending)
+                allocating.append((obj, pending))
+    session.info["_history_allocating"] = allocating
+    if plans:
+        _insert_plans(session, list(plans.values()))
+    if rows:
+        session.execute(ChatHistoryEvent.__table__.insert(), rows)
+
+
+@event.listens_for(Session, "after_flush")
+def _insert_allocated_history(session: Session, flush_context) -> None:
+    allocating = session.info.pop("_history_allocating", None)
+    if not allocating:
+        return
+    table = ChatUserContext.__table__
+    rows: List[Dict[str, Any]] = []
+    for ctx, pending in allocating:
+        # El UPDATE del flush dejo la fila bloqueada hasta el commit: este valor es propio.
+        last = session.execute(select(table.c.history_seq).where(table.c.id == ctx.id)).scalar_one()
+        for offset, row in enumerate(pending):
+            row["seq"] = last - len(pending) + 1 + offset
+        set_committed_value(ctx, "history_seq", last)
+        rows.extend(pending)
+    session.execute(ChatHistoryEvent.__table__.insert(), rows)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_pending_history(session: Session, previous_transaction) -> None:
+    session.info.pop("_history_allocating", None)
+    for obj in list(session.identity_map.values()):
+        if isinstance(obj, ChatUserContext):
+            obj.discard_pending_history()
+
+
 class ProgressLog(db.Model):
     """Registro persistente de métricas de progreso del usuario (peso, reps, notas)."""
 
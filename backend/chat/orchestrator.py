@@ -10,15 +10,20 @@ from __future__ import annotations
 
 import json
 import os
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
 from dataclasses import dataclass
-from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+from threading import Lock
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
 
 from flask import current_app
 
 from .context_manager import ChatContextManager
 from .errors import ChatServiceError
-from ..planner import diets as diet_planner
-from ..planner import workouts as workout_planner
+from .lexical import BM25Index, lexical_index_path, sources_fingerprint
+from ..metrics import metrics
+from ..planner import cache as plan_cache
 from ..planner.common import build_health_notes, parse_health_flags
 
 # Lazy imports to keep startup fast
@@ -47,6 +52,29 @@ class LLMSettings:
     embeddings_model: str
     rag_max_results: int
     rag_index_path: str
+    tool_workers: int = 4
+    tool_timeout_s: float = 20.0
+
+
+class _ToolOutcome:
+    """Resultado de una tool del pool, registrado una sola vez.
+
+    El hilo de la request (al vencer `tool_timeout_s`) y la tarea del pool (al terminar)
+    compiten por registrarlo: solo el primero que llama a `claim` lo publica.
+    """
+
+    __slots__ = ("_lock", "_claimed")
+
+    def __init__(self) -> None:
+        self._lock = Lock()
+        self._claimed = False
+
+    def claim(self) -> bool:
+        with self._lock:
+            if self._claimed:
+                return False
+            self._claimed = True
+            return True
 
 
 def _chunk_text(text: str, chunk_size: int = 900, overlap: int = 120) -> List[str]:
@@ -141,7 +169,8 @@ class KnowledgeStore:
         self.logger = logger
         self._client = None
         self._collection = None
-        self._fallback_corpus: List[Tuple[str, str]] = []  # (source, text)
+        self._lexical: Optional[BM25Index] = None
+        self._build_lock = Lock()
         self._ready = False
 
     @property
@@ -181,9 +210,9 @@ class KnowledgeStore:
 
         return sources
 
-    def _load_documents(self) -> List[Tuple[str, str]]:
+    def _load_documents(self, sources: Optional[List[Tuple[str, str]]] = None) -> List[Tuple[str, str]]:
         loaded: List[Tuple[str, str]] = []
-        for display, path in self._iter_sources():
+        for display, path in sources if sources is not None else self._iter_sources():
             try:
                 with open(path, "r", encoding="utf-8", errors="ignore") as f:
                     text = f.read()
@@ -195,18 +224,49 @@ class KnowledgeStore:
                 self.logger.warning("No se pudo leer %s para el indice RAG: %s", path, exc)
         return loaded
 
+    def _build_lexical(self, sources: List[Tuple[str, str]], docs: Optional[List[Tuple[str, str]]]) -> Optional[BM25Index]:
+        """Indice BM25 persistido junto a `rag_index_path`; se reconstruye si cambian las fuentes."""
+        fingerprint = sources_fingerprint(path for _display, path in sources)
+        index_path = lexical_index_path(self.settings.rag_index_path) if self.settings.rag_index_path else ""
+        if index_path:
+            index = BM25Index.load(index_path, fingerprint)
+            if index is not None:
+                return index
+        if docs is None:
+            docs = self._load_documents(sources)
+        if not docs:
+            return None
+        chunks = [
+            {"text": chunk, "source": source, "chunk": chunk_idx}
+            for source, text in docs
+            for chunk_idx, chunk in enumerate(_chunk_text(text))
+        ]
+        index = BM25Index.build(chunks, fingerprint=fingerprint)
+        if index_path:
+            try:
+                index.save(index_path)
+            except OSError as exc:  # pragma: no cover - defensive
+                self.logger.warning("No se pudo guardar el indice BM25 en %s: %s", index_path, exc)
+        return index
+
     def build(self) -> None:
         if self._ready:
             return
+        with self._build_lock:
+            if not self._ready:
+                self._build()
 
-        docs = self._load_documents()
-        if not docs:
+    def _build(self) -> None:
+        sources = self._iter_sources()
+        if not self.enabled:
+            self._lexical = self._build_lexical(sources, None)
+            self._ready = self._lexical is not None
             return
-        self._fallback_corpus = list(docs)
 
-        if not self.enabled:
-            self._ready = True
+        docs = self._load_documents(sources)
+        if not docs:
             return
+        self._lexical = self._build_lexical(sources, docs)
 
         try:
             os.makedirs(self.settings.rag_index_path, exist_ok=True)
@@ -259,20 +319,17 @@ class KnowledgeStore:
             except Exception as exc:  # pragma: no cover - defensive
                 self.logger.warning("Busqueda RAG fallo, se usa fallback: %s", exc)
 
-        # fallback: naive keyword scan
-        scored: List[Tuple[float, Dict[str, Any]]] = []
-        lowered = query.lower()
-        for source, text in self._fallback_corpus:
-            if not text:
-                continue
-            score = text.lower().count(lowered)
-            if score:
-                scored.append((float(score), {"text": text[:600], "source": source, "score": score}))
-        scored.sort(key=lambda x: x[0], reverse=True)
-        return [item for _, item in scored[: self.settings.rag_max_results]]
+        # fallback: BM25 sobre los mismos chunks
+        if self._lexical is None:
+            return []
+        return self._lexical.search(query, self.settings.rag_max_results)
 
 
 class ToolCatalog:
+    # Tools sin escrituras directas en BD: pueden correr en paralelo (ver `compute`/`apply`).
+    # El resto (`log_progress`, `screen_user`) se ejecuta en el hilo escritor de la request.
+    CONCURRENT_TOOLS = frozenset({"generate_workout_plan", "generate_meal_plan", "search_kb", "validate_plan"})
+
     def __init__(self, kb: KnowledgeStore, format_explanation: Callable[[Dict[str, Any]], str]) -> None:
         self.kb = kb
         self.format_explanation = format_explanation
@@ -379,38 +436,59 @@ class ToolCatalog:
 
     def dispatch(self, name: str, args: Dict[str, Any], manager: ChatContextManager) -> Dict[str, Any]:
         name = (name or "").strip()
-        if name == "generate_workout_plan":
-            return self._do_workout(args, manager)
-        if name == "generate_meal_plan":
-            return self._do_meal(args, manager)
+        if name in self.CONCURRENT_TOOLS:
+            return self.apply(self.compute(name, args, self.profile(manager)), manager)
         if name == "log_progress":
             return self._do_log_progress(args, manager)
-        if name == "search_kb":
-            return self._do_search_kb(args)
         if name == "screen_user":
             return self._do_screen_user(args, manager)
+        raise ChatServiceError(f"Tool no soportada: {name}")
+
+    def profile(self, manager: ChatContextManager) -> Dict[str, Any]:
+        """Datos del contexto que usan las tools concurrentes (se leen en el hilo de la request)."""
+        ctx = manager.context
+        return {
+            "medical_conditions": ctx.medical_conditions,
+            "allergies": ctx.allergies,
+            "dislikes": ctx.dislikes,
+        }
+
+    def compute(self, name: str, args: Dict[str, Any], profile: Dict[str, Any]) -> Dict[str, Any]:
+        """Parte sin efectos de una tool concurrente; segura para ejecutar en otro hilo.
+
+        No toca la sesion de BD: los cambios de contexto quedan en `context_updates`
+        y los aplica `apply` desde el hilo escritor.
+        """
+        name = (name or "").strip()
+        if name == "generate_workout_plan":
+            return self._do_workout(args, profile)
+        if name == "generate_meal_plan":
+            return self._do_meal(args, profile)
+        if name == "search_kb":
+            return self._do_search_kb(args)
         if name == "validate_plan":
             return self._do_validate_plan(args)
         raise ChatServiceError(f"Tool no soportada: {name}")
 
-    def _do_workout(self, args: Dict[str, Any], manager: ChatContextManager) -> Dict[str, Any]:
-        ctx = manager.context
-        payload = workout_planner.generate_workout_plan(
+    def apply(self, tool_result: Dict[str, Any], manager: ChatContextManager) -> Dict[str, Any]:
+        """Aplica los cambios de contexto pendientes de `compute` (solo desde el hilo escritor)."""
+        self._apply_context_updates(tool_result.pop("context_updates", None) or {}, manager)
+        return tool_result
+
+    def _do_workout(self, args: Dict[str, Any], profile: Dict[str, Any]) -> Dict[str, Any]:
+        payload = plan_cache.cached_workout_plan(
             objetivo=args.get("objetivo") or "fuerza",
             nivel=args.get("nivel") or "intermedio",
             musculo=args.get("musculo") or "fullbody",
             equipamiento=args.get("equipamiento") or "mancuernas",
             ejercicios_num=int(args.get("ejercicios_num") or 5),
             tiempo_min=int(args.get("tiempo_min") or 40),
-            condiciones=args.get("condiciones") or ctx.medical_conditions,
-            alergias=args.get("alergias") or ctx.allergies,
-            dislikes=args.get("dislikes") or ctx.dislikes,
+            condiciones=args.get("condiciones") or profile.get("medical_conditions"),
+            alergias=args.get("alergias") or profile.get("allergies"),
+            dislikes=args.get("dislikes") or profile.get("dislikes"),
             profile_data=None,
         )
 
-        context_payload = payload.get("context_payload") or {}
-        self._apply_context_updates(context_payload, manager)
-
         routine_summary = payload.get("routine_summary") or {}
         explanation_dict = routine_summary.get("explanation") or {}
         routine_summary["explanation_text"] = self.format_explanation(explanation_dict) if explanation_dict else None
@@ -422,22 +500,22 @@ class ToolCatalog:
         validation = self._do_validate_plan({"plan": routine_summary})
         if validation.get("warnings"):
             response.setdefault("custom", {})["validation_warnings"] = validation["warnings"]
-        return {"result": payload, "responses": [response]}
+        return {
+            "result": payload,
+            "responses": [response],
+            "context_updates": payload.get("context_payload") or {},
+        }
 
-    def _do_meal(self, args: Dict[str, Any], manager: ChatContextManager) -> Dict[str, Any]:
-        ctx = manager.context
-        payload = diet_planner.generate_diet_plan(
+    def _do_meal(self, args: Dict[str, Any], profile: Dict[str, Any]) -> Dict[str, Any]:
+        payload = plan_cache.cached_diet_plan(
             objetivo=args.get("objetivo") or "equilibrada",
             nivel=args.get("nivel") or "intermedio",
-            alergias=args.get("alergias") or ctx.allergies,
-            dislikes=args.get("dislikes") or ctx.dislikes,
-            condiciones=args.get("condiciones") or ctx.medical_conditions,
+            alergias=args.get("alergias") or profile.get("allergies"),
+            dislikes=args.get("dislikes") or profile.get("dislikes"),
+            condiciones=args.get("condiciones") or profile.get("medical_conditions"),
             profile_data=None,
         )
 
-        context_payload = payload.get("context_payload") or {}
-        self._apply_context_updates(context_payload, manager)
-
         diet_payload = payload.get("diet_payload") or {}
         explanation_dict = diet_payload.get("explanation") or {}
         diet_payload["explanation_text"] = self.format_explanation(explanation_dict) if explanation_dict else None
@@ -449,7 +527,11 @@ class ToolCatalog:
         validation = self._do_validate_plan({"plan": diet_payload})
         if validation.get("warnings"):
             response.setdefault("custom", {})["validation_warnings"] = validation["warnings"]
-        return {"result": payload, "responses": [response]}
+        return {
+            "result": payload,
+            "responses": [response],
+            "context_updates": payload.get("context_payload") or {},
+        }
 
     def _do_log_progress(self, args: Dict[str, Any], manager: ChatContextManager) -> Dict[str, Any]:
         metric = args.get("metric")
@@ -558,6 +640,8 @@ class ChatOrchestrator:
         self.kb = KnowledgeStore(base_dir, self.settings, logger)
         self.tools = ToolCatalog(self.kb, format_explanation_block)
         self.client = self._build_client()
+        self._tool_pool: Optional[ThreadPoolExecutor] = None
+        self._tool_pool_lock = Lock()
 
     @property
     def enabled(self) -> bool:
@@ -576,6 +660,8 @@ class ChatOrchestrator:
             rag_max_results=int(cfg.get("RAG_MAX_RESULTS", 4)),
             rag_index_path=cfg.get("RAG_INDEX_PATH")
             or os.path.join(os.path.dirname(__file__), "kb_index"),
+            tool_workers=int(cfg.get("LLM_TOOL_WORKERS", 4)),
+            tool_timeout_s=float(cfg.get("LLM_TOOL_TIMEOUT_S", 20.0)),
         )
 
     def _build_client(self):
@@ -591,15 +677,17 @@ class ChatOrchestrator:
             )
         return OpenAI(api_key=self.settings.api_key, base_url=self.settings.base_url or None, timeout=20)
 
-    def _context_snapshot(self, manager: ChatContextManager) -> Dict[str, Any]:
+    def _context_snapshot(self, manager: ChatContextManager, *, resolve_plans: bool = False) -> Dict[str, Any]:
+        """Contexto para el modelo; rutina/dieta van como referencia salvo `resolve_plans`."""
         ctx = manager.context
+        resolve = manager.resolve_plan if resolve_plans else (lambda value: value)
         return {
             "allergies": ctx.allergies,
             "dislikes": ctx.dislikes,
             "medical_conditions": ctx.medical_conditions,
-            "last_routine": ctx.last_routine,
-            "last_diet": ctx.last_diet,
-            "recent_history": (ctx.history or [])[-5:],
+            "last_routine": resolve(ctx.last_routine),
+            "last_diet": resolve(ctx.last_diet),
+            "recent_history": ctx.recent_history(5),
         }
 
     def _system_prompt(self) -> str:
@@ -609,92 +697,289 @@ class ChatOrchestrator:
             "Incluye fuentes citables cuando uses search_kb. Prioriza seguridad y derivar a profesional si hay banderas rojas."
         )
 
-    def respond(
+    def _prepare_messages(
         self,
-        *,
         message: str,
         manager: ChatContextManager,
         parsed_intent: Optional[str],
-        parsed_entities: Optional[Sequence[Dict[str, Any]]],
-    ) -> List[Dict[str, Any]]:
-        if not self.enabled:
-            raise ChatServiceError("LLM orchestrator no configurado.")
-
-        # Pre-screen
+    ) -> Tuple[Optional[List[Dict[str, Any]]], List[Dict[str, Any]]]:
+        """Pre-screen + mensajes iniciales. Si hay banderas rojas devuelve sus respuestas."""
         screening = self.tools.dispatch(
             "screen_user", {"medical_conditions": manager.context.medical_conditions}, manager)
         if screening["result"].get("needs_clearance"):
-            return screening.get("responses") or []
+            return screening.get("responses") or [], []
 
-        messages: List[Dict[str, str]] = [
+        messages: List[Dict[str, Any]] = [
             {"role": "system", "content": self._system_prompt()},
             {
                 "role": "system",
-                "content": json.dumps({"context": self._context_snapshot(manager)}),
+                "content": json.dumps({"context": self._context_snapshot(manager, resolve_plans=True)}),
             },
             {"role": "user", "content": message},
         ]
         if parsed_intent:
             messages.append({"role": "system", "content": f"Intento NLU: {parsed_intent}"})
+        return None, messages
+
+    def _completion_kwargs(self, messages: List[Dict[str, Any]], with_tools: bool) -> Dict[str, Any]:
+        kwargs: Dict[str, Any] = {
+            "model": self.settings.model,
+            "temperature": self.settings.temperature,
+            "max_tokens": self.settings.max_tokens,
+            "messages": messages,
+        }
+        if with_tools:
+            kwargs["tools"] = self.tools.schemas()
+        return kwargs
 
-        first = self.client.chat.completions.create(
-            model=self.settings.model,
-            temperature=self.settings.temperature,
-            max_tokens=self.settings.max_tokens,
-            messages=messages,
-            tools=self.tools.schemas(),
-        )
+    def _tool_executor(self) -> Optional[ThreadPoolExecutor]:
+        if self.settings.tool_workers <= 0:
+            return None
+        if self._tool_pool is None:
+            with self._tool_pool_lock:
+                if self._tool_pool is None:
+                    self._tool_pool = ThreadPoolExecutor(
+                        max_workers=self.settings.tool_workers, thread_name_prefix="llm-tool"
+                    )
+        return self._tool_pool
+
+    def _compute_tool(
+        self, name: str, args: Dict[str, Any], profile: Dict[str, Any], outcome: _ToolOutcome
+    ) -> Dict[str, Any]:
+        """Tarea del pool. Si la request ya reporto `timeout`, el resultado tardio no se cuenta."""
+        started = time.perf_counter()
+        try:
+            with self.app.app_context():
+                computed = self.tools.compute(name, args, profile)
+        except Exception:
+            if outcome.claim():
+                self._observe_tool(name, "error", started)
+            raise
+        if outcome.claim():
+            self._observe_tool(name, "ok", started)
+        return computed
+
+    @staticmethod
+    def _observe_tool(name: str, status: str, started: float) -> None:
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        metrics.inc_counter("chat_tool_total", tags={"tool": name, "status": status})
+        metrics.observe_latency("chat_tool_latency_ms", elapsed_ms, tags={"tool": name, "status": status})
+
+    def _iter_tool_calls(
+        self,
+        calls: Sequence[Tuple[str, str, Optional[str]]],
+        manager: ChatContextManager,
+    ) -> Iterator[Tuple[List[Dict[str, Any]], Dict[str, Any]]]:
+        """Ejecuta las tool calls `(id, nombre, argumentos)` del modelo.
+
+        Las tools de `ToolCatalog.CONCURRENT_TOOLS` se lanzan todas a la vez en un pool
+        acotado; el resto y los cambios de contexto (`ToolCatalog.apply`) se hacen aqui,
+        en el hilo de la request, que es el unico que escribe en la sesion de BD. Los
+        resultados se entregan en el orden de `calls`, cada uno apenas esta listo. Una
+        tool que supera `tool_timeout_s` devuelve un error al modelo en lugar de bloquear
+        la respuesta y se cuenta una sola vez, como `timeout`.
+
+        Ojo: `Future.cancel()` solo evita tareas que aun no arrancaron. Una tool vencida
+        que ya corre sigue ocupando su hilo del pool (`tool_workers`) hasta terminar, y
+        mientras tanto las siguientes tools esperan en la cola del pool.
+        """
+        parsed: List[Tuple[str, str, Dict[str, Any]]] = []
+        for call_id, name, arguments in calls:
+            try:
+                args = json.loads(arguments or "{}")
+            except Exception:
+                args = {}
+            parsed.append((call_id, (name or "").strip(), args if isinstance(args, dict) else {}))
+
+        pool = self._tool_executor()
+        profile = self.tools.profile(manager) if pool is not None else {}
+        started = time.perf_counter()
+        futures: Dict[int, Future] = {}
+        outcomes: Dict[int, _ToolOutcome] = {}
+        if pool is not None:
+            for idx, (_call_id, name, args) in enumerate(parsed):
+                if name in ToolCatalog.CONCURRENT_TOOLS:
+                    outcomes[idx] = _ToolOutcome()
+                    futures[idx] = pool.submit(self._compute_tool, name, args, profile, outcomes[idx])
+
+        deadline = started + self.settings.tool_timeout_s
+        try:
+            for idx, (call_id, name, args) in enumerate(parsed):
+                future = futures.get(idx)
+                if future is None:
+                    call_started = time.perf_counter()
+                    try:
+                        tool_result = self.tools.dispatch(name, args, manager)
+                    except Exception:
+                        self._observe_tool(name, "error", call_started)
+                        raise
+                    self._observe_tool(name, "ok", call_started)
+                else:
+                    try:
+                        computed = future.result(timeout=max(0.0, deadline - time.perf_counter()))
+                    except FutureTimeoutError:
+                        future.cancel()
+                        if outcomes[idx].claim():
+                            self._observe_tool(name, "timeout", started)
+                        self.logger.warning("Tool %s excedio %.1fs", name, self.settings.tool_timeout_s)
+                        tool_result = {"result": {"error": f"La herramienta {name} no respondio a tiempo."}}
+                    else:
+                        tool_result = self.tools.apply(computed, manager)
+                tool_message = {
+                    "role": "tool",
+                    "tool_call_id": call_id,
+                    "content": json.dumps(tool_result.get("result", {})),
+                }
+                yield list(tool_result.get("responses") or []), tool_message
+        finally:
+            for future in futures.values():
+                future.cancel()
+
+    def _final_response(self, content: str, manager: ChatContextManager) -> Dict[str, Any]:
+        final_custom = {
+            "type": "assistant_message",
+            "explanation": format_explanation_block(
+                {
+                    "datos_usados": {"context": self._context_snapshot(manager)},
+                    "criterios": ["Respuesta directa del modelo."],
+                    "reglas": ["No inventar datos, adjuntar fuentes cuando existan."],
+                    "fuentes": [],
+                }
+            ),
+        }
+        return {"text": content, "custom": final_custom}
+
+    def _validated(self, item: Dict[str, Any], manager: ChatContextManager) -> Dict[str, Any]:
+        # Ensure validation on generated plans
+        custom = item.get("custom") if isinstance(item, dict) else None
+        if custom and isinstance(custom, dict) and custom.get("type") in {"routine_detail", "diet_plan"}:
+            result = self.tools.dispatch("validate_plan", {"plan": custom}, manager)
+            warnings = result.get("warnings") or []
+            if warnings:
+                custom["validation_warnings"] = warnings
+        return item
+
+    def respond(
+        self,
+        *,
+        message: str,
+        manager: ChatContextManager,
+        parsed_intent: Optional[str],
+        parsed_entities: Optional[Sequence[Dict[str, Any]]],
+    ) -> List[Dict[str, Any]]:
+        if not self.enabled:
+            raise ChatServiceError("LLM orchestrator no configurado.")
+
+        screened, messages = self._prepare_messages(message, manager, parsed_intent)
+        if screened is not None:
+            return screened
+
+        first = self.client.chat.completions.create(**self._completion_kwargs(messages, with_tools=True))
         choice = first.choices[0].message
         responses: List[Dict[str, Any]] = []
-        tool_messages: List[Dict[str, Any]] = []
 
         if choice.tool_calls:
             messages.append({"role": "assistant", "content": choice.content or "", "tool_calls": choice.tool_calls})
-            for tc in choice.tool_calls:
-                args = {}
-                try:
-                    args = json.loads(tc.function.arguments or "{}")
-                except Exception:
-                    args = {}
-                tool_result = self.tools.dispatch(tc.function.name, args, manager)
-                if tool_result.get("responses"):
-                    responses.extend(tool_result["responses"])
-                tool_messages.append(
-                    {"role": "tool", "tool_call_id": tc.id, "content": json.dumps(tool_result.get("result", {}))}
-                )
-            messages.extend(tool_messages)
-            follow_up = self.client.chat.completions.create(
-                model=self.settings.model,
-                temperature=self.settings.temperature,
-                max_tokens=self.settings.max_tokens,
-                messages=messages,
-            )
+            calls = [(tc.id, tc.function.name, tc.function.arguments) for tc in choice.tool_calls]
+            for tool_responses, tool_message in self._iter_tool_calls(calls, manager):
+                responses.extend(tool_responses)
+                messages.append(tool_message)
+            follow_up = self.client.chat.completions.create(**self._completion_kwargs(messages, with_tools=False))
             final_msg = follow_up.choices[0].message
         else:
             final_msg = choice
 
         if final_msg.content:
-            final_custom = {
-                "type": "assistant_message",
-                "explanation": format_explanation_block(
-                    {
-                        "datos_usados": {"context": self._context_snapshot(manager)},
-                        "criterios": ["Respuesta directa del modelo."],
-                        "reglas": ["No inventar datos, adjuntar fuentes cuando existan."],
-                        "fuentes": [],
-                    }
-                ),
-            }
-            responses.append({"text": final_msg.content, "custom": final_custom})
+            responses.append(self._final_response(final_msg.content, manager))
+        return [self._validated(item, manager) for item in responses]
+
+    def _stream_completion(
+        self, messages: List[Dict[str, Any]], with_tools: bool
+    ) -> Iterator[Tuple[str, Any]]:
+        """Completion con `stream=True`.
+
+        Emite ("token", texto) por cada delta de contenido y al final
+        ("message", (contenido, tool_calls)) con las tool calls ya ensambladas.
+        """
+        kwargs = self._completion_kwargs(messages, with_tools)
+        content: List[str] = []
+        calls: Dict[int, Dict[str, str]] = {}
+        for chunk in self.client.chat.completions.create(stream=True, **kwargs):
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta
+            if delta is None:
+                continue
+            if delta.content:
+                content.append(delta.content)
+                yield "token", delta.content
+            for tc in delta.tool_calls or []:
+                slot = calls.setdefault(tc.index, {"id": "", "name": "", "arguments": ""})
+                if tc.id:
+                    slot["id"] = tc.id
+                if tc.function is not None:
+                    slot["name"] += tc.function.name or ""
+                    slot["arguments"] += tc.function.arguments or ""
+        yield "message", ("".join(content), [calls[idx] for idx in sorted(calls)])
+
+    def respond_stream(
+        self,
+        *,
+        message: str,
+        manager: ChatContextManager,
+        parsed_intent: Optional[str],
+        parsed_entities: Optional[Sequence[Dict[str, Any]]],
+    ) -> Iterator[Tuple[str, Any]]:
+        """Version en streaming de `respond`.
+
+        Emite ("token", texto) a medida que llega el contenido del modelo,
+        ("card", respuesta) cuando una tool produce una tarjeta (`routine_detail`,
+        `diet_plan`, ...) y al final ("done", respuestas) con la misma lista que
+        devolveria `respond`. No persiste nada: el llamador hace commit al terminar.
+        """
+        if not self.enabled:
+            raise ChatServiceError("LLM orchestrator no configurado.")
 
-        # Ensure validation on generated plans
-        validated: List[Dict[str, Any]] = []
-        for item in responses:
-            custom = item.get("custom") if isinstance(item, dict) else None
-            if custom and isinstance(custom, dict) and custom.get("type") in {"routine_detail", "diet_plan"}:
-                result = self.tools.dispatch("validate_plan", {"plan": custom}, manager)
-                warnings = result.get("warnings") or []
-                if warnings:
-                    custom["validation_warnings"] = warnings
-            validated.append(item)
-        return validated
+        screened, messages = self._prepare_messages(message, manager, parsed_intent)
+        if screened is not None:
+            for item in screened:
+                yield "card", item
+            yield "done", screened
+            return
+
+        responses: List[Dict[str, Any]] = []
+        content, tool_calls = "", []
+        for kind, value in self._stream_completion(messages, with_tools=True):
+            if kind == "token":
+                yield kind, value
+            else:
+                content, tool_calls = value
+
+        if tool_calls:
+            messages.append(
+                {
+                    "role": "assistant",
+                    "content": content,
+                    "tool_calls": [
+                        {"id": tc["id"], "type": "function", "function": {"name": tc["name"], "arguments": tc["arguments"]}}
+                        for tc in tool_calls
+                    ],
+                }
+            )
+            calls = [(tc["id"], tc["name"], tc["arguments"]) for tc in tool_calls]
+            for tool_responses, tool_message in self._iter_tool_calls(calls, manager):
+                for item in tool_responses:
+                    item = self._validated(item, manager)
+                    responses.append(item)
+                    yield "card", item
+                messages.append(tool_message)
+            content = ""
+            for kind, value in self._stream_completion(messages, with_tools=False):
+                if kind == "token":
+                    yield kind, value
+                else:
+                    content = value[0]
+
+        if content:
+            responses.append(self._final_response(content, manager))
+        yield "done", responses
@@ -0,0 +1,287 @@
+"""Cliente HTTP de Rasa para `ChatService`: deadline por turno, reintentos y circuit breaker.
+
+Antes la sesion de `create_app` montaba `Retry(total=3, backoff_factor=0.3)` para
+todos los metodos: con Rasa lento un `/chat/send` podia gastar varias veces
+`RASA_TIMEOUT_SEND` antes de fallar, y `/ready` consultaba Rasa en cada llamada.
+
+- `Deadline`: presupuesto de extremo a extremo del turno (`RASA_DEADLINE_S`),
+  compartido por el parse y el webhook. Cada intento usa
+  `min(timeout, restante)` y solo se reintenta si queda presupuesto.
+- Reintentos (`RASA_RETRIES`, backoff exponencial `RASA_RETRY_BACKOFF_S`) ante
+  errores de conexion y 502/503/504. Un read timeout solo se reintenta en
+  llamadas idempotentes: en el webhook Rasa puede estar procesando el turno.
+- `CircuitBreaker`: tras `RASA_BREAKER_FAILURES` fallos seguidos se abre y las
+  llamadas fallan al instante con `RasaUnavailable` durante
+  `RASA_BREAKER_RESET_S`; luego deja pasar una sola llamada de prueba.
+- `RasaReadinessProber`: consulta `RASA_STATUS_ENDPOINT` en un hilo de fondo
+  cada `RASA_READY_INTERVAL_S` y `/ready` devuelve el ultimo estado. Un probe
+  exitoso con el circuito abierto adelanta la llamada de prueba.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+import requests
+
+from ..metrics import metrics
+
+RETRY_STATUSES = frozenset({502, 503, 504})
+
+
+class RasaUnavailable(requests.exceptions.ConnectionError):
+    """El circuito de Rasa esta abierto: no se hizo la llamada."""
+
+
+class Deadline:
+    """Presupuesto de tiempo absoluto (reloj monotono) para todas las llamadas de un turno."""
+
+    def __init__(self, budget_s: float) -> None:
+        self.budget_s = max(0.0, float(budget_s))
+        self.expires_at = time.monotonic() + self.budget_s
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0.0
+
+
+class CircuitBreaker:
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout_s: float = 15.0, *, name: str = "rasa") -> None:
+        self.failure_threshold = max(1, int(failure_threshold))
+        self.reset_timeout_s = max(0.0, float(reset_timeout_s))
+        self.name = name
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial_inflight = False
+        self._lock = threading.Lock()
+
+    def allow(self, *, trial: bool = True) -> bool:
+        """True si la llamada puede salir; en half-open solo pasa una llamada de prueba.
+
+        Con `trial=False` (llamadas best-effort como el parse) nunca se toma la
+        llamada de prueba: queda para la que el usuario espera.
+        """
+        with self._lock:
+            if self.state == self.OPEN:
+                if not self.reset_due():
+                    return False
+                if not trial:
+                    return False
+                self._set_state(self.HALF_OPEN)
+            if self.state == self.HALF_OPEN:
+                if self._trial_inflight or not trial:
+                    return False
+                self._trial_inflight = True
+            return True
+
+    def reset_due(self) -> bool:
+        """True si ya paso `reset_timeout_s` desde que se abrio (no toma el lock)."""
+        return time.monotonic() - self.opened_at >= self.reset_timeout_s
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self._trial_inflight = False
+            if self.state != self.CLOSED:
+                self._set_state(self.CLOSED)
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._trial_inflight = False
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+                if self.state != self.OPEN:
+                    self._set_state(self.OPEN)
+
+    def record_probe(self, ok: bool) -> None:
+        """Un probe de readiness exitoso habilita la llamada de prueba sin esperar el reset."""
+        with self._lock:
+            if ok and self.state == self.OPEN:
+                self._trial_inflight = False
+                self._set_state(self.HALF_OPEN)
+
+    def _set_state(self, state: str) -> None:
+        self.state = state
+        metrics.inc_counter(f"{self.name}_breaker_transition_total", tags={"state": state})
+        metrics.set_gauge(f"{self.name}_breaker_open", 1 if state == self.OPEN else 0, mode="max")
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"state": self.state, "failures": self.failures}
+
+
+class RasaClient:
+    """POST/GET a Rasa sobre una `requests.Session` sin reintentos propios."""
+
+    def __init__(
+        self,
+        session: requests.Session,
+        *,
+        retries: int = 2,
+        backoff_s: float = 0.3,
+        breaker: Optional[CircuitBreaker] = None,
+        min_attempt_s: float = 0.05,
+    ) -> None:
+        self.session = session
+        self.retries = max(0, int(retries))
+        self.backoff_s = max(0.0, float(backoff_s))
+        self.breaker = breaker or CircuitBreaker()
+        self.min_attempt_s = max(0.0, float(min_attempt_s))
+
+    @classmethod
+    def from_config(cls, session: requests.Session, config) -> "RasaClient":
+        return cls(
+            session,
+            retries=int(config.get("RASA_RETRIES", 2)),
+            backoff_s=float(config.get("RASA_RETRY_BACKOFF_S", 0.3)),
+            breaker=CircuitBreaker(
+                int(config.get("RASA_BREAKER_FAILURES", 5)),
+                float(config.get("RASA_BREAKER_RESET_S", 15.0)),
+            ),
+        )
+
+    def post(
+        self,
+        url: str,
+        payload: Any,
+        *,
+        timeout_s: float,
+        deadline: Optional[Deadline] = None,
+        idempotent: bool = False,
+        endpoint: str = "webhook",
+        claim_trial: bool = True,
+    ):
+        """POST con reintentos dentro del deadline; devuelve la ultima respuesta obtenida.
+
+        Lanza `RasaUnavailable` con el circuito abierto (o en half-open con
+        `claim_trial=False`) y `requests.Timeout` si el deadline se agota antes de
+        poder intentar. El llamador hace `raise_for_status`.
+        """
+        deadline = deadline or Deadline(timeout_s)
+        attempt = 0
+        while True:
+            remaining = deadline.remaining()
+            if remaining < self.min_attempt_s:
+                self._record(endpoint, "deadline")
+                raise requests.exceptions.Timeout(f"Deadline agotado antes de llamar a Rasa ({endpoint}).")
+            if not self.breaker.allow(trial=claim_trial):
+                self._record(endpoint, "circuit_open")
+                raise RasaUnavailable(f"Circuito de Rasa abierto ({endpoint}).")
+            started = time.monotonic()
+            try:
+                resp = self.session.post(url, json=payload, timeout=min(float(timeout_s), remaining))
+            except requests.exceptions.RequestException as exc:
+                self.breaker.record_failure()
+                self._record(endpoint, "error", started)
+                retryable = isinstance(exc, requests.exceptions.ConnectionError) or (
+                    idempotent and isinstance(exc, requests.exceptions.Timeout)
+                )
+                if not (retryable and self._backoff(attempt, deadline)):
+                    raise
+                attempt += 1
+                continue
+            except Exception:
+                self.breaker.record_failure()
+                raise
+            status_code = getattr(resp, "status_code", 200)
+            if status_code >= 500:
+                self.breaker.record_failure()
+                self._record(endpoint, "error", started)
+                if status_code in RETRY_STATUSES and self._backoff(attempt, deadline):
+                    attempt += 1
+                    continue
+                return resp
+            self.breaker.record_success()
+            self._record(endpoint, "ok", started)
+            return resp
+
+    def get(self, url: str, *, timeout_s: float):
+        """GET directo, sin reintentos ni breaker (lo usa el probe de readiness)."""
+        return self.session.get(url, timeout=timeout_s)
+
+    def _backoff(self, attempt: int, deadline: Deadline) -> bool:
+        """Duerme antes del siguiente intento si quedan reintentos y presupuesto para usarlo."""
+        if attempt >= self.retries:
+            return False
+        delay = self.backoff_s * (2 ** attempt)
+        if deadline.remaining() - delay < self.min_attempt_s:
+            return False
+        if delay:
+            time.sleep(delay)
+        return True
+
+    def _record(self, endpoint: str, result: str, started: Optional[float] = None) -> None:
+        metrics.inc_counter("rasa_request_total", tags={"endpoint": endpoint, "result": result})
+        if started is not None:
+            elapsed_ms = (time.monotonic() - started) * 1000.0
+            metrics.observe_latency("rasa_request_latency_ms", elapsed_ms, tags={"endpoint": endpoint})
+
+
+class RasaReadinessProber:
+    """Estado de readiness de Rasa refrescado en segundo plano.
+
+    El hilo arranca con la primera consulta (`state()`), que hace un probe sincrono;
+    con `interval_s <= 0` no hay hilo y cada consulta hace su propio probe.
+    """
+
+    def __init__(self, probe: Callable[[], bool], interval_s: float = 5.0,
+                 breaker: Optional[CircuitBreaker] = None) -> None:
+        self._probe = probe
+        self.interval_s = max(0.0, float(interval_s))
+        self.breaker = breaker
+        self._state: Optional[Dict[str, Any]] = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def state(self) -> Dict[str, Any]:
+        if self.interval_s <= 0:
+            return self.probe_once()
+        with self._lock:
+            first = self._thread is None
+            if first:
+                self._thread = threading.Thread(target=self._loop, name="rasa-ready-probe", daemon=True)
+        if first:
+            self.probe_once()
+            self._thread.start()
+        current = self._state
+        return dict(current) if current is not None else self.probe_once()
+
+    def probe_once(self) -> Dict[str, Any]:
+        started = time.monotonic()
+        try:
+            ok = bool(self._probe())
+        except Exception:
+            ok = False
+        state = {
+            "ready": ok,
+            "checked_at": time.time(),
+            "latency_ms": round((time.monotonic() - started) * 1000.0, 2),
+        }
+        self._state = state
+        metrics.set_gauge("rasa_ready", 1 if ok else 0, mode="min")
+        if self.breaker is not None:
+            self.breaker.record_probe(ok)
+        return dict(state)
+
+    def snapshot(self) -> Optional[Dict[str, Any]]:
+        """Ultimo estado conocido, sin disparar un probe."""
+        current = self._state
+        return dict(current) if current is not None else None
+
+    def _loop(self) -> None:
+        while not self._stop.wait(self.interval_s):
+            self.probe_once()
+
+    def stop(self) -> None:
+        self._stop.set()
@@ -0,0 +1,248 @@
+"""Serializacion por sender de los turnos de chat, entre hilos y entre workers.
+
+Dos mensajes del mismo sender no deben procesarse a la vez: ambos leerian y
+reescribirian la misma fila de `ChatUserContext`. `SenderLock` combina:
+
+- una cola local por sender (FIFO, acotada a `max_waiters`) que ordena los
+  mensajes que llegan al mismo proceso y evita que cada espera ocupe un recurso
+  del backend global;
+- un backend entre procesos elegido con `CHAT_SENDER_LOCK_BACKEND`:
+    memory    solo el proceso actual (defecto; un unico worker)
+    file      `flock` sobre un archivo por sender en `CHAT_SENDER_LOCK_PATH`
+              (workers del mismo host)
+    postgres  `pg_advisory_lock` con `lock_timeout` en una conexion dedicada
+              (todos los workers que comparten la base; la cola de Postgres es FIFO)
+
+`acquire` devuelve un token o None si la cola esta llena o vence `wait_s`; en ese
+caso el servicio responde el mensaje de "sigo trabajando" como antes.
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, Optional
+
+from ..metrics import metrics
+
+try:  # pragma: no cover - optional dependency
+    import fcntl
+except Exception:  # pragma: no cover - optional dependency
+    fcntl = None
+
+SENDER_LOCK_BACKENDS = ("memory", "file", "postgres")
+
+_POLL_MIN_S = 0.005
+_POLL_MAX_S = 0.05
+
+
+def sender_lock_key(sender: str) -> int:
+    """Clave int64 estable por sender (para `pg_advisory_lock`)."""
+    digest = hashlib.blake2b(sender.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big", signed=True)
+
+
+@dataclass
+class _Queue:
+    holder: Optional[object] = None
+    waiters: Deque[object] = field(default_factory=deque)
+
+
+class LocalSenderQueue:
+    """Exclusion por sender dentro del proceso, con espera FIFO acotada."""
+
+    def __init__(self, max_waiters: int = 0) -> None:
+        self.max_waiters = max(0, int(max_waiters))
+        self._cond = threading.Condition()
+        self._queues: Dict[str, _Queue] = {}
+
+    def acquire(self, sender: str, wait_s: float) -> Optional[object]:
+        token = object()
+        with self._cond:
+            queue = self._queues.setdefault(sender, _Queue())
+            if queue.holder is None and not queue.waiters:
+                queue.holder = token
+                return token
+            if len(queue.waiters) >= self.max_waiters or wait_s <= 0:
+                return None
+            queue.waiters.append(token)
+            deadline = time.monotonic() + wait_s
+            while not (queue.holder is None and queue.waiters[0] is token):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    queue.waiters.remove(token)
+                    if queue.holder is None and not queue.waiters:
+                        self._queues.pop(sender, None)
+                    self._cond.notify_all()
+                    return None
+                self._cond.wait(remaining)
+            queue.waiters.popleft()
+            queue.holder = token
+            return token
+
+    def release(self, sender: str, token: object) -> None:
+        with self._cond:
+            queue = self._queues.get(sender)
+            if queue is None or queue.holder is not token:
+                return
+            queue.holder = None
+            if queue.waiters:
+                self._cond.notify_all()
+            else:
+                self._queues.pop(sender, None)
+
+
+class FileLockBackend:
+    """`flock` exclusivo sobre `<dir>/<hash>.lock`: serializa workers del mismo host."""
+
+    def __init__(self, directory: str) -> None:
+        if fcntl is None:  # pragma: no cover - plataformas sin fcntl
+            raise RuntimeError("CHAT_SENDER_LOCK_BACKEND=file requiere fcntl (POSIX).")
+        self.directory = directory or os.path.join(tempfile.gettempdir(), "fitter-sender-locks")
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, sender: str) -> str:
+        name = hashlib.sha1(sender.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, f"{name}.lock")
+
+    def acquire(self, sender: str, wait_s: float) -> Optional[Any]:
+        fd = os.open(self._path(sender), os.O_RDWR | os.O_CREAT, 0o600)
+        deadline = time.monotonic() + max(0.0, wait_s)
+        delay = _POLL_MIN_S
+        while True:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return fd
+            except BlockingIOError:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    os.close(fd)
+                    return None
+                time.sleep(min(delay, remaining))
+                delay = min(delay * 2, _POLL_MAX_S)
+            except OSError:
+                os.close(fd)
+                raise
+
+    def release(self, sender: str, handle: Any) -> None:
+        try:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+        finally:
+            os.close(handle)
+
+
+class PostgresAdvisoryBackend:
+    """`pg_advisory_lock` por sender en una conexion propia (fuera de la sesion ORM).
+
+    El lock es de sesion de Postgres, asi que sobrevive a los commits del turno; se
+    libera con `pg_advisory_unlock` al devolver la conexion. Cada turno en curso
+    ocupa una conexion extra del pool.
+    """
+
+    def __init__(self, engine_getter) -> None:
+        self._engine_getter = engine_getter
+
+    def acquire(self, sender: str, wait_s: float) -> Optional[Any]:
+        from sqlalchemy import text
+        from sqlalchemy.exc import DBAPIError
+
+        key = sender_lock_key(sender)
+        # AUTOCOMMIT: la conexion no queda "idle in transaction" mientras dura el turno.
+        conn = self._engine_getter().connect().execution_options(isolation_level="AUTOCOMMIT")
+        try:
+            if wait_s <= 0:
+                got = conn.execute(text("SELECT pg_try_advisory_lock(:k)"), {"k": key}).scalar()
+                if not got:
+                    conn.close()
+                    return None
+                return conn, key
+            conn.execute(text(f"SET lock_timeout = '{max(1, int(wait_s * 1000))}ms'"))
+            try:
+                conn.execute(text("SELECT pg_advisory_lock(:k)"), {"k": key})
+            except DBAPIError:
+                # 55P03 lock_not_available: vencio la espera.
+                conn.close()
+                return None
+            conn.execute(text("SET lock_timeout = 0"))
+            return conn, key
+        except Exception:
+            conn.close()
+            raise
+
+    def release(self, sender: str, handle: Any) -> None:
+        from sqlalchemy import text
+
+        conn, key = handle
+        try:
+            conn.execute(text("SELECT pg_advisory_unlock(:k)"), {"k": key})
+        finally:
+            conn.close()
+
+
+@dataclass
+class SenderLockToken:
+    local: object
+    handle: Any = None
+
+
+class SenderLock:
+    """Cola local por sender + backend opcional entre procesos."""
+
+    def __init__(self, backend: str = "memory", *, max_waiters: int = 0, wait_s: float = 0.0,
+                 path: str = "", engine_getter=None) -> None:
+        self.backend_name = backend if backend in SENDER_LOCK_BACKENDS else "memory"
+        self.wait_s = max(0.0, float(wait_s))
+        self.local = LocalSenderQueue(max_waiters)
+        self.backend: Any = None
+        if self.backend_name == "file":
+            self.backend = FileLockBackend(path)
+        elif self.backend_name == "postgres":
+            if engine_getter is None:
+                raise ValueError("CHAT_SENDER_LOCK_BACKEND=postgres requiere engine_getter.")
+            self.backend = PostgresAdvisoryBackend(engine_getter)
+
+    @classmethod
+    def from_config(cls, config, engine_getter=None) -> "SenderLock":
+        backend = str(config.get("CHAT_SENDER_LOCK_BACKEND", "memory") or "memory").strip().lower()
+        return cls(
+            backend,
+            max_waiters=int(config.get("CHAT_SENDER_QUEUE_MAX", 0) or 0),
+            wait_s=float(config.get("CHAT_SENDER_WAIT_S", 0.0) or 0.0),
+            path=str(config.get("CHAT_SENDER_LOCK_PATH", "") or ""),
+            engine_getter=engine_getter,
+        )
+
+    def acquire(self, sender: str) -> Optional[SenderLockToken]:
+        started = time.perf_counter()
+        local = self.local.acquire(sender, self.wait_s)
+        handle = None
+        if local is not None and self.backend is not None:
+            remaining = self.wait_s - (time.perf_counter() - started)
+            try:
+                handle = self.backend.acquire(sender, max(0.0, remaining))
+            except Exception:
+                self.local.release(sender, local)
+                raise
+            if handle is None:
+                self.local.release(sender, local)
+                local = None
+        waited_ms = (time.perf_counter() - started) * 1000.0
+        result = "acquired" if local is not None else "busy"
+        metrics.inc_counter("chat_sender_lock_total", tags={"backend": self.backend_name, "result": result})
+        metrics.observe_latency("chat_sender_lock_wait_ms", waited_ms, tags={"backend": self.backend_name})
+        if local is None:
+            return None
+        return SenderLockToken(local, handle)
+
+    def release(self, sender: str, token: Optional[SenderLockToken]) -> None:
+        if token is None:
+            return
+        try:
+            if self.backend is not None and token.handle is not None:
+                self.backend.release(sender, token.handle)
+        finally:
+            self.local.release(sender, token.local)
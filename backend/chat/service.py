@@ -1,19 +1,34 @@
+import contextvars
 import json
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime
 from dataclasses import dataclass
 from threading import Lock
-from typing import Any, Dict, List, Mapping, MutableMapping, Optional, Tuple
+from typing import Any, Dict, Iterator, List, Mapping, MutableMapping, Optional, Tuple
 
 import requests
 from flask import Flask
 from sqlalchemy import text
-from .models import ChatUserContext
+from .models import ChatPlanPayload, ChatUserContext
 from .context_manager import ChatContextManager
-from .errors import ChatServiceError
+from .admission import AdaptiveConcurrencyLimiter, AdmissionTicket
+from .errors import ChatOverloaded, ChatServiceError
 from .orchestrator import ChatOrchestrator, format_explanation_block
+from .rasa_client import Deadline, RasaClient, RasaReadinessProber, RasaUnavailable
+from .sender_lock import SenderLock, SenderLockToken
+from ..metrics.tracing import span
 from ..security.session import context_api_key_valid, session_uid
 
 
+ParsedMessage = Tuple[Optional[str], Optional[float], Optional[List[Dict[str, Any]]]]
+
+BUSY_PAYLOAD = ({"text": "Sigo trabajando en tu solicitud anterior, dame unos segundos y vuelve a intentarlo."},)
+RASA_OFFLINE_PAYLOAD = (
+    {"text": "El asistente no esta disponible en este momento. Vuelve a intentarlo en unos minutos."},
+)
+
+
 @dataclass
 class ServiceResponse:
     payload: Any
@@ -27,10 +42,26 @@ class ChatService:
     def __init__(self, app: Flask, db, http_session: requests.Session) -> None:
         self.app = app
         self.db = db
-        self.http = http_session
-        self._inflight_requests: Dict[str, object] = {}
-        self._inflight_lock = Lock()
+        self.rasa = RasaClient.from_config(http_session, app.config)
+        self.rasa_ready = RasaReadinessProber(
+            self._probe_rasa,
+            float(app.config.get("RASA_READY_INTERVAL_S", 5.0)),
+            breaker=self.rasa.breaker,
+        )
+        self._sender_lock = SenderLock.from_config(app.config, engine_getter=lambda: db.engine)
+        self._parse_pool: Optional[ThreadPoolExecutor] = None
+        self._parse_pool_lock = Lock()
         self.orchestrator = ChatOrchestrator(app, app.logger)
+        # Limitador de concurrencia de turnos (lo asigna `create_app`); None = sin limite.
+        self.admission: Optional[AdaptiveConcurrencyLimiter] = None
+
+    @property
+    def http(self) -> requests.Session:
+        return self.rasa.session
+
+    @http.setter
+    def http(self, session: requests.Session) -> None:
+        self.rasa.session = session
 
     # -------- utilidades internas --------
     def rasa_url(self, path: str) -> str:
@@ -111,16 +142,23 @@ class ChatService:
             return False
 
     def check_rasa_ready(self) -> bool:
+        """Ultimo estado del probe de fondo (no llama a Rasa en cada `/ready`)."""
+        return bool(self.rasa_ready.state()["ready"])
+
+    def _probe_rasa(self) -> bool:
         status_path = str(self.app.config.get("RASA_STATUS_ENDPOINT", "/status"))
         try:
-            resp = self.http.get(
+            resp = self.rasa.get(
                 self.rasa_url(status_path),
-                timeout=self.app.config.get("RASA_TIMEOUT_PARSE", 3),
+                timeout_s=self.app.config.get("RASA_TIMEOUT_PARSE", 3),
             )
             return 200 <= resp.status_code < 300
         except Exception:
             return False
 
+    def _turn_deadline(self) -> Deadline:
+        return Deadline(float(self.app.config.get("RASA_DEADLINE_S", 20.0)))
+
     # -------- API publica --------
     def send_message(
         self,
@@ -128,83 +166,84 @@ class ChatService:
         headers: Mapping[str, str],
         flask_session: MutableMapping[str, Any],
     ) -> ServiceResponse:
-        data = self._ensure_dict(raw_data)
-        sender = str(data.get("sender", "web-user")).strip() or "web-user"
-        sender = sender[:80]
-        handoff_request = bool(data.get("handoff"))
-        message = str(data.get("message", "")).strip()
-        if not handoff_request:
-            if not message:
-                raise ChatServiceError("El campo 'message' es obligatorio.", 400)
-            if len(message) > self._max_message_len():
-                raise ChatServiceError("El mensaje es demasiado largo.", 413)
+        data, sender, message, handoff_request = self._read_message(raw_data)
 
-        inflight_token = self._acquire_sender_slot(sender)
+        with span("sender_wait"):
+            inflight_token = self._acquire_sender_slot(sender)
         if inflight_token is None:
-            # A previous request is still running for this sender; avoid piling up and tripping locks
-            return ServiceResponse(
-                [{"text": "Sigo trabajando en tu solicitud anterior, dame unos segundos y vuelve a intentarlo."}],
-                200,
-                "success",
-            )
+            # La cola del sender esta llena o vencio la espera: no apilar mas turnos
+            return ServiceResponse(list(BUSY_PAYLOAD), 200, "success")
+
+        ticket, admitted_at = self._admit_turn(sender, inflight_token)
+        return self._run_turn(
+            data, sender, message, handoff_request, headers, flask_session, inflight_token, ticket, admitted_at
+        )
 
-        ctx = ChatUserContext.get_or_create(sender, session_uid(flask_session))
+    def _run_turn(
+        self,
+        data: Dict[str, Any],
+        sender: str,
+        message: str,
+        handoff_request: bool,
+        headers: Mapping[str, str],
+        flask_session: MutableMapping[str, Any],
+        inflight_token: SenderLockToken,
+        ticket: Optional[AdmissionTicket],
+        admitted_at: float,
+    ) -> ServiceResponse:
+        """Turno completo con el slot del sender y la admision ya tomados; libera ambos."""
+        dropped = True
+        try:
+            with span("ctx_load"):
+                ctx = ChatUserContext.get_or_create(sender, session_uid(flask_session))
+        except Exception:
+            self._release_sender_slot(sender, inflight_token)
+            self._release_admission(ticket, admitted_at, dropped=True)
+            raise
         manager = ChatContextManager(ctx)
+        try:
+            with manager.unit_of_work(self._unit_of_work_enabled()):
+                result = self._send_turn(
+                    manager, data, sender, message, handoff_request, headers, flask_session, inflight_token
+                )
+            dropped = result.status_code >= 500
+            return result
+        except ChatServiceError as exc:
+            dropped = exc.status_code >= 500
+            raise
+        finally:
+            self._release_admission(ticket, admitted_at, dropped=dropped)
 
+    def _send_turn(
+        self,
+        manager: ChatContextManager,
+        data: Dict[str, Any],
+        sender: str,
+        message: str,
+        handoff_request: bool,
+        headers: Mapping[str, str],
+        flask_session: MutableMapping[str, Any],
+        inflight_token: SenderLockToken,
+    ) -> ServiceResponse:
+        ctx = manager.context
         if not ctx.consent_given:
+            self._release_sender_slot(sender, inflight_token)
             return self._block_no_consent(manager)
 
-        rasa_payload: Dict[str, Any] = {"sender": sender, "message": message}
-        metadata = manager.to_metadata()
-        if metadata:
-            rasa_payload["metadata"] = {"persisted_context": metadata}
+        rasa_payload = self._rasa_payload(sender, message, manager)
+        deadline = self._turn_deadline()
 
-        # Attempt to parse the user's message to capture intent/entities for history
+        # Attempt to parse the user's message to capture intent/entities for history.
+        # Sin orquestador LLM el parse solo alimenta historial/clasificacion, asi que
+        # puede correr en paralelo con el webhook y unirse despues.
         parsed_intent = None
         parsed_confidence = None
         parsed_entities = None
+        parse_future: Optional["Future[ParsedMessage]"] = None
         if handoff_request:
             parsed_intent = "handoff_human"
             parsed_confidence = 1.0
             parsed_entities = None
-        else:
-            try:
-                parse_resp = self.http.post(
-                    self.rasa_url(self.app.config["RASA_PARSE_ENDPOINT"]),
-                    json={"text": message},
-                    timeout=self.app.config.get("RASA_TIMEOUT_PARSE", 3),
-                )
-                parse_resp.raise_for_status()
-                parse_payload = parse_resp.json()
-                if isinstance(parse_payload, dict):
-                    intent_payload = parse_payload.get("intent") or {}
-                    parsed_intent = intent_payload.get("name")
-                    parsed_confidence = intent_payload.get("confidence")
-                    parsed_entities = [
-                        {"entity": e.get("entity"), "value": e.get("value")}
-                        for e in (parse_payload.get("entities") or [])
-                    ]
-            except Exception:
-                # parsing is best-effort; continue without failing the request
-                parsed_intent = None
-                parsed_confidence = None
-                parsed_entities = None
-
-        # record the user's message into history including parsed NLU metadata
-        if not handoff_request:
-            try:
-                entry = {"type": "user_message", "text": message}
-                if parsed_intent:
-                    entry["intent"] = parsed_intent
-                if isinstance(parsed_confidence, (int, float)):
-                    entry["confidence"] = round(float(parsed_confidence), 6)
-                if parsed_entities:
-                    entry["entities"] = parsed_entities
-                manager.add_history_entry(entry)
-            except Exception:
-                # do not fail the request if history append fails
-                pass
-        else:
             try:
                 entry = {
                     "type": "handoff_request",
@@ -213,6 +252,14 @@ class ChatService:
                 manager.add_history_entry(entry)
             except Exception:
                 pass
+        elif self._concurrent_parse_enabled():
+            # copy_context: el span del parse queda en la traza del request aunque corra en el pool.
+            parse_future = self._parse_executor().submit(
+                contextvars.copy_context().run, self._parse_message, message, deadline
+            )
+        else:
+            parsed_intent, parsed_confidence, parsed_entities = self._parse_message(message, deadline)
+            self._record_user_message(manager, message, parsed_intent, parsed_confidence, parsed_entities)
 
         try:
             self._ensure_context_access(ctx, headers, flask_session)
@@ -220,12 +267,13 @@ class ChatService:
             payload = None
             if self.orchestrator and self.orchestrator.enabled:
                 try:
-                    payload = self.orchestrator.respond(
-                        message=message,
-                        manager=manager,
-                        parsed_intent=parsed_intent,
-                        parsed_entities=parsed_entities,
-                    )
+                    with span("orchestrator"):
+                        payload = self.orchestrator.respond(
+                            message=message,
+                            manager=manager,
+                            parsed_intent=parsed_intent,
+                            parsed_entities=parsed_entities,
+                        )
                 except ChatServiceError:
                     raise
                 except Exception:
@@ -241,51 +289,17 @@ class ChatService:
                         }
                     ]
                 else:
-                    payload = self._call_rasa(rasa_payload)
+                    payload = self._call_rasa_or_offline(rasa_payload, deadline)
 
-            processed_payload, updated_context = self._process_bot_payload(payload, manager)
+            if parse_future is not None:
+                with span("rasa_parse_join"):
+                    parsed_intent, parsed_confidence, parsed_entities = self._join_parse(parse_future, deadline)
+                parse_future = None
+                self._record_user_message(manager, message, parsed_intent, parsed_confidence, parsed_entities)
 
-            (
-                interaction_result,
-                is_fallback,
-                is_handoff,
-                handoff_reason,
-                threshold_used,
-            ) = self._classify_interaction_result(
-                parsed_intent,
-                parsed_confidence,
-                parsed_entities,
-                processed_payload,
+            processed_payload, interaction_result = self._finish_turn(
+                manager, payload, parsed_intent, parsed_confidence, parsed_entities
             )
-            if interaction_result:
-                try:
-                    manager.add_history_entry(
-                        {
-                            "type": "interaction_result",
-                            "result": interaction_result,
-                            "nlu_intent": parsed_intent,
-                            "nlu_confidence": (
-                                round(float(parsed_confidence), 6)
-                                if isinstance(parsed_confidence, (int, float))
-                                else None
-                            ),
-                            "is_fallback": bool(is_fallback),
-                            "is_handoff": bool(is_handoff),
-                            "handoff_reason": handoff_reason,
-                            "threshold_used": threshold_used,
-                        }
-                    )
-                except Exception:
-                    pass
-                try:
-                    manager.set_last_interaction_result(interaction_result)
-                except Exception:
-                    pass
-
-            if not updated_context:
-                manager.touch()
-
-            self.db.session.commit()
             return ServiceResponse(processed_payload, 200, interaction_result)
         except ChatServiceError:
             self.db.session.rollback()
@@ -302,14 +316,147 @@ class ChatService:
             self.app.logger.exception("Error inesperado en /chat/send")
             raise ChatServiceError("No se pudo completar la solicitud.", 500) from exc
         finally:
+            if parse_future is not None:
+                parse_future.cancel()
             self._release_sender_slot(sender, inflight_token)
 
+    def stream_message(
+        self,
+        raw_data: Any,
+        headers: Mapping[str, str],
+        flask_session: MutableMapping[str, Any],
+    ) -> Iterator[Tuple[str, Any]]:
+        """Version en streaming de `send_message` para /chat/stream y SocketIO.
+
+        Valida la entrada, toma el slot del sender y la admision antes de devolver, asi
+        los errores (incluido `ChatOverloaded`, 503) se lanzan antes de abrir el stream.
+        Devuelve un iterador de eventos:
+          - ("token", texto): fragmentos del modelo a medida que llegan (orquestador LLM);
+          - ("card", respuesta): tarjetas de tools (`routine_detail`, `diet_plan`, ...);
+          - ("message", respuesta): mensajes completos (Rasa no entrega tokens);
+          - ("done", {"responses", "interaction_result"}): respuesta final ya persistida.
+        El historial y el commit ocurren al terminar el stream, igual que en `send_message`.
+        Sin orquestador (o en handoff) el turno se resuelve aqui mismo como en `send_message`
+        y se emiten sus mensajes.
+        """
+        data, sender, message, handoff_request = self._read_message(raw_data)
+        with span("sender_wait"):
+            inflight_token = self._acquire_sender_slot(sender)
+        if inflight_token is None:
+            return iter([
+                ("message", BUSY_PAYLOAD[0]),
+                ("done", {"responses": list(BUSY_PAYLOAD), "interaction_result": "success"}),
+            ])
+        ticket, admitted_at = self._admit_turn(sender, inflight_token)
+
+        if handoff_request or not (self.orchestrator and self.orchestrator.enabled):
+            result = self._run_turn(
+                data, sender, message, handoff_request, headers, flask_session, inflight_token, ticket, admitted_at
+            )
+            payload = result.payload if isinstance(result.payload, list) else [result.payload]
+            events: List[Tuple[str, Any]] = [("message", item) for item in payload]
+            events.append(("done", {"responses": result.payload, "interaction_result": result.interaction_result}))
+            return iter(events)
+
+        stream = self._stream_orchestrated(
+            sender, message, headers, flask_session, inflight_token, ticket, admitted_at
+        )
+        # Arranca el generador hasta su primer `yield`: desde ahi su `finally` suelta el
+        # slot y la admision aunque el cliente corte antes de leer el primer evento.
+        next(stream)
+        return stream
+
+    def _stream_orchestrated(
+        self,
+        sender: str,
+        message: str,
+        headers: Mapping[str, str],
+        flask_session: MutableMapping[str, Any],
+        inflight_token: SenderLockToken,
+        ticket: Optional[AdmissionTicket],
+        admitted_at: float,
+    ) -> Iterator[Tuple[str, Any]]:
+        dropped = True
+        try:
+            yield "ready", None  # lo consume `stream_message`
+            ctx = ChatUserContext.get_or_create(sender, session_uid(flask_session))
+            manager = ChatContextManager(ctx)
+            with manager.unit_of_work(self._unit_of_work_enabled()):
+                yield from self._stream_turn(manager, sender, message, headers, flask_session)
+            dropped = False
+        except ChatServiceError as exc:
+            dropped = exc.status_code >= 500
+            self.db.session.rollback()
+            raise
+        except requests.exceptions.RequestException as exc:
+            self.db.session.rollback()
+            self.app.logger.exception("Fallo al contactar Rasa en /chat/stream")
+            raise ChatServiceError(f"No se pudo contactar a Rasa: {exc}", 502)
+        except Exception as exc:
+            self.db.session.rollback()
+            self.app.logger.exception("Error inesperado en /chat/stream")
+            raise ChatServiceError("No se pudo completar la solicitud.", 500) from exc
+        finally:
+            self._release_sender_slot(sender, inflight_token)
+            self._release_admission(ticket, admitted_at, dropped=dropped)
+
+    def _stream_turn(
+        self,
+        manager: ChatContextManager,
+        sender: str,
+        message: str,
+        headers: Mapping[str, str],
+        flask_session: MutableMapping[str, Any],
+    ) -> Iterator[Tuple[str, Any]]:
+        ctx = manager.context
+        if not ctx.consent_given:
+            blocked = self._block_no_consent(manager)
+            yield "done", {"responses": blocked.payload, "interaction_result": blocked.interaction_result}
+            return
+
+        deadline = self._turn_deadline()
+        parsed_intent, parsed_confidence, parsed_entities = self._parse_message(message, deadline)
+        self._record_user_message(manager, message, parsed_intent, parsed_confidence, parsed_entities)
+        self._ensure_context_access(ctx, headers, flask_session)
+
+        payload = None
+        streamed = False
+        try:
+            for kind, value in self.orchestrator.respond_stream(
+                message=message,
+                manager=manager,
+                parsed_intent=parsed_intent,
+                parsed_entities=parsed_entities,
+            ):
+                if kind == "done":
+                    payload = value
+                else:
+                    streamed = True
+                    yield kind, value
+        except ChatServiceError:
+            raise
+        except Exception:
+            if streamed:
+                raise
+            self.app.logger.exception("LLM orchestrator fallo; se usa Rasa como respaldo")
+
+        if payload is None:
+            payload = self._call_rasa_or_offline(self._rasa_payload(sender, message, manager), deadline)
+            for item in payload:
+                yield "message", item
+
+        processed_payload, interaction_result = self._finish_turn(
+            manager, payload, parsed_intent, parsed_confidence, parsed_entities
+        )
+        yield "done", {"responses": processed_payload, "interaction_result": interaction_result}
+
     def get_context(
         self,
         raw_sender: str,
         chat_id: Optional[str],
         headers: Mapping[str, str],
         flask_session: MutableMapping[str, Any],
+        resolve_plans: bool = False,
     ) -> ServiceResponse:
         sender = (raw_sender or "").strip()[:80]
         if chat_id:
@@ -329,7 +476,66 @@ class ChatService:
             raise
         manager = ChatContextManager(ctx)
         self.db.session.commit()
-        return ServiceResponse({"context": manager.to_dict()}, 200)
+        return ServiceResponse({"context": manager.to_dict(resolve_plans=resolve_plans)}, 200)
+
+    def get_bootstrap(
+        self,
+        raw_sender: str,
+        chat_id: Optional[str],
+        headers: Mapping[str, str],
+        flask_session: MutableMapping[str, Any],
+        include_profile: bool = True,
+    ) -> ServiceResponse:
+        """Salud + contexto + perfil en una sola respuesta (lo consume el action server).
+
+        Reemplaza la secuencia GET /health, GET /chat/context y GET /profile/me. Un
+        sender sin contexto devuelve `context: None` con 200: el backend esta arriba
+        pero el usuario no tiene sesion de chat.
+        """
+        expected_key = self.app.config.get("CHAT_CONTEXT_API_KEY", "")
+        if not (context_api_key_valid(headers, expected_key) or session_uid(flask_session) is not None):
+            raise ChatServiceError("No autorizado para este contexto.", 401)
+        context = None
+        result = self.get_context(raw_sender, chat_id, headers, flask_session)
+        if result.status_code == 200:
+            context = result.payload.get("context")
+        profile = None
+        user_id = context.get("user_id") if isinstance(context, dict) else None
+        if include_profile and user_id:
+            from ..profile.routes import profile_snapshot_for_user
+
+            try:
+                profile = profile_snapshot_for_user(int(user_id))
+            except Exception:
+                self.db.session.rollback()
+                self.app.logger.exception("No se pudo leer el perfil para el bootstrap de chat")
+        return ServiceResponse(
+            {
+                "ok": True,
+                "service": self.app.config.get("SERVICE_NAME", "fitter-backend"),
+                "context": context,
+                "profile": profile,
+            },
+            200,
+        )
+
+    def get_plan(
+        self,
+        digest: str,
+        headers: Mapping[str, str],
+        flask_session: MutableMapping[str, Any],
+    ) -> ServiceResponse:
+        """Resuelve una referencia de plan (`plan_ref`) a su payload completo."""
+        expected_key = self.app.config.get("CHAT_CONTEXT_API_KEY", "")
+        if not (context_api_key_valid(headers, expected_key) or session_uid(flask_session) is not None):
+            raise ChatServiceError("No autorizado para leer planes.", 401)
+        digest = (digest or "").strip().lower()
+        if len(digest) != 64 or any(ch not in "0123456789abcdef" for ch in digest):
+            raise ChatServiceError("Referencia de plan invalida.", 400)
+        payload = ChatPlanPayload.fetch(digest)
+        if payload is None:
+            raise ChatServiceError("Plan no encontrado.", 404)
+        return ServiceResponse({"plan_ref": digest, "plan": payload}, 200)
 
     def get_sessions(
         self,
@@ -371,21 +577,33 @@ class ChatService:
         return ServiceResponse({"sessions": sessions}, 200)
 
     # -------- concurrency helpers --------
-    def _acquire_sender_slot(self, sender: str) -> Optional[object]:
-        token = object()
-        with self._inflight_lock:
-            if sender in self._inflight_requests:
-                return None
-            self._inflight_requests[sender] = token
-            return token
+    def _acquire_sender_slot(self, sender: str) -> Optional[SenderLockToken]:
+        """Turno exclusivo del sender; espera en cola (acotada) si hay otro mensaje en curso."""
+        return self._sender_lock.acquire(sender)
 
-    def _release_sender_slot(self, sender: str, token: Optional[object]) -> None:
-        if token is None:
-            return
-        with self._inflight_lock:
-            current = self._inflight_requests.get(sender)
-            if current is token:
-                self._inflight_requests.pop(sender, None)
+    def _release_sender_slot(self, sender: str, token: Optional[SenderLockToken]) -> None:
+        self._sender_lock.release(sender, token)
+
+    def _admit_turn(self, sender: str, inflight_token: SenderLockToken) -> Tuple[Optional[AdmissionTicket], float]:
+        """Turno del limitador de admision, pedido ya con el slot del sender en mano.
+
+        Asi los turnos del mismo sender que esperan en su cola no ocupan concurrencia
+        ni su espera entra en la latencia con la que se ajusta el limite. Si no hay
+        cupo se suelta el slot del sender y se lanza `ChatOverloaded` (503).
+        """
+        started = time.perf_counter()
+        if self.admission is None:
+            return None, started
+        with span("admission"):
+            ticket = self.admission.acquire()
+        if ticket is None:
+            self._release_sender_slot(sender, inflight_token)
+            raise ChatOverloaded(self.admission.retry_after_s())
+        return ticket, started
+
+    def _release_admission(self, ticket: Optional[AdmissionTicket], started: float, *, dropped: bool) -> None:
+        if ticket is not None and self.admission is not None:
+            self.admission.release(ticket, (time.perf_counter() - started) * 1000.0, dropped=dropped)
 
     def update_context(
         self,
@@ -507,14 +725,178 @@ class ChatService:
         )
 
     # -------- internal helpers --------
-    def _call_rasa(self, rasa_payload: Dict[str, Any]) -> List[Dict[str, Any]]:
-        resp = self.http.post(
-            self.rasa_url(self.app.config["RASA_REST_WEBHOOK"]),
-            json=rasa_payload,
-            timeout=self.app.config["RASA_TIMEOUT_SEND"],
+    def _read_message(self, raw_data: Any) -> Tuple[Dict[str, Any], str, str, bool]:
+        data = self._ensure_dict(raw_data)
+        sender = str(data.get("sender", "web-user")).strip() or "web-user"
+        sender = sender[:80]
+        handoff_request = bool(data.get("handoff"))
+        message = str(data.get("message", "")).strip()
+        if not handoff_request:
+            if not message:
+                raise ChatServiceError("El campo 'message' es obligatorio.", 400)
+            if len(message) > self._max_message_len():
+                raise ChatServiceError("El mensaje es demasiado largo.", 413)
+        return data, sender, message, handoff_request
+
+    def _rasa_payload(self, sender: str, message: str, manager: ChatContextManager) -> Dict[str, Any]:
+        rasa_payload: Dict[str, Any] = {"sender": sender, "message": message}
+        metadata = manager.to_metadata()
+        if metadata:
+            rasa_payload["metadata"] = {"persisted_context": metadata}
+        return rasa_payload
+
+    def _finish_turn(
+        self,
+        manager: ChatContextManager,
+        payload: Any,
+        parsed_intent: Optional[str],
+        parsed_confidence: Optional[float],
+        parsed_entities: Optional[List[Dict[str, Any]]],
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """Historial del bot, clasificacion de la interaccion y commit."""
+        with span("process_payload"):
+            processed_payload, updated_context = self._process_bot_payload(payload, manager)
+
+        (
+            interaction_result,
+            is_fallback,
+            is_handoff,
+            handoff_reason,
+            threshold_used,
+        ) = self._classify_interaction_result(
+            parsed_intent,
+            parsed_confidence,
+            parsed_entities,
+            processed_payload,
         )
-        resp.raise_for_status()
-        payload = resp.json()
+        if interaction_result:
+            try:
+                manager.add_history_entry(
+                    {
+                        "type": "interaction_result",
+                        "result": interaction_result,
+                        "nlu_intent": parsed_intent,
+                        "nlu_confidence": (
+                            round(float(parsed_confidence), 6)
+                            if isinstance(parsed_confidence, (int, float))
+                            else None
+                        ),
+                        "is_fallback": bool(is_fallback),
+                        "is_handoff": bool(is_handoff),
+                        "handoff_reason": handoff_reason,
+                        "threshold_used": threshold_used,
+                    }
+                )
+            except Exception:
+                pass
+            try:
+                manager.set_last_interaction_result(interaction_result)
+            except Exception:
+                pass
+
+        if not updated_context:
+            manager.touch()
+
+        with span("db_commit"):
+            self.db.session.commit()
+        return processed_payload, interaction_result
+
+    def _unit_of_work_enabled(self) -> bool:
+        return bool(self.app.config.get("CHAT_UNIT_OF_WORK", True))
+
+    def _concurrent_parse_enabled(self) -> bool:
+        if not self.app.config.get("RASA_CONCURRENT_PARSE", True):
+            return False
+        # El orquestador necesita el intent antes de responder: ahi el parse va primero.
+        return not (self.orchestrator and self.orchestrator.enabled)
+
+    def _parse_executor(self) -> ThreadPoolExecutor:
+        if self._parse_pool is None:
+            with self._parse_pool_lock:
+                if self._parse_pool is None:
+                    workers = max(1, int(self.app.config.get("RASA_PARSE_WORKERS", 8)))
+                    self._parse_pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="rasa-parse")
+        return self._parse_pool
+
+    def _parse_message(self, message: str, deadline: Optional[Deadline] = None) -> "ParsedMessage":
+        """Intent/confianza/entidades del NLU de Rasa; best-effort (None ante cualquier error)."""
+        try:
+            with span("rasa_parse"):
+                parse_resp = self.rasa.post(
+                    self.rasa_url(self.app.config["RASA_PARSE_ENDPOINT"]),
+                    {"text": message},
+                    timeout_s=self.app.config.get("RASA_TIMEOUT_PARSE", 3),
+                    deadline=deadline,
+                    idempotent=True,
+                    endpoint="parse",
+                    # Best-effort: en half-open la llamada de prueba es del webhook.
+                    claim_trial=False,
+                )
+            parse_resp.raise_for_status()
+            parse_payload = parse_resp.json()
+            if not isinstance(parse_payload, dict):
+                return None, None, None
+            intent_payload = parse_payload.get("intent") or {}
+            entities = [
+                {"entity": e.get("entity"), "value": e.get("value")}
+                for e in (parse_payload.get("entities") or [])
+            ]
+            return intent_payload.get("name"), intent_payload.get("confidence"), entities
+        except Exception:
+            # parsing is best-effort; continue without failing the request
+            return None, None, None
+
+    def _join_parse(self, future: "Future[ParsedMessage]", deadline: Optional[Deadline] = None) -> "ParsedMessage":
+        timeout = float(self.app.config.get("RASA_TIMEOUT_PARSE", 3))
+        if deadline is not None:
+            timeout = min(timeout, deadline.remaining())
+        try:
+            return future.result(timeout=timeout)
+        except Exception:
+            future.cancel()
+            return None, None, None
+
+    def _record_user_message(
+        self,
+        manager: ChatContextManager,
+        message: str,
+        parsed_intent: Optional[str],
+        parsed_confidence: Optional[float],
+        parsed_entities: Optional[List[Dict[str, Any]]],
+    ) -> None:
+        # record the user's message into history including parsed NLU metadata
+        try:
+            entry = {"type": "user_message", "text": message}
+            if parsed_intent:
+                entry["intent"] = parsed_intent
+            if isinstance(parsed_confidence, (int, float)):
+                entry["confidence"] = round(float(parsed_confidence), 6)
+            if parsed_entities:
+                entry["entities"] = parsed_entities
+            manager.add_history_entry(entry)
+        except Exception:
+            # do not fail the request if history append fails
+            pass
+
+    def _call_rasa_or_offline(self, rasa_payload: Dict[str, Any], deadline: Deadline) -> List[Dict[str, Any]]:
+        """Webhook de Rasa; con el circuito abierto responde al instante el mensaje offline."""
+        try:
+            return self._call_rasa(rasa_payload, deadline)
+        except RasaUnavailable:
+            self.app.logger.warning("Circuito de Rasa abierto; se responde el mensaje offline")
+            return [dict(item) for item in RASA_OFFLINE_PAYLOAD]
+
+    def _call_rasa(self, rasa_payload: Dict[str, Any], deadline: Optional[Deadline] = None) -> List[Dict[str, Any]]:
+        with span("rasa_webhook"):
+            resp = self.rasa.post(
+                self.rasa_url(self.app.config["RASA_REST_WEBHOOK"]),
+                rasa_payload,
+                timeout_s=self.app.config["RASA_TIMEOUT_SEND"],
+                deadline=deadline,
+                endpoint="webhook",
+            )
+            resp.raise_for_status()
+            payload = resp.json()
         if not isinstance(payload, (list, tuple)):
             payload = [payload]
         return list(payload)
@@ -544,7 +926,7 @@ class ChatService:
                 continue
 
             try:
-                manager.add_history_entry({"type": "bot_custom", "data": custom_payload})
+                manager.add_history_entry({"type": "bot_custom", "data": manager.plan_ref(custom_payload)})
             except Exception:
                 pass
 
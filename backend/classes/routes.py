@@ -4,6 +4,7 @@ from datetime import datetime
 from typing import Optional
 
 from flask import Blueprint, jsonify, request, session
+from sqlalchemy.orm import joinedload
 
 from ..extensions import db
 from .models import ClassBooking, ClassSession, FitnessClass
@@ -81,7 +82,8 @@ def list_public_sessions():
     start = _parse_datetime(request.args.get("start"))
     end = _parse_datetime(request.args.get("end"))
 
-    query = ClassSession.query
+    # `to_dict` lee `fitness_class`: se trae en el mismo SELECT (si no, una consulta por sesion).
+    query = ClassSession.query.options(joinedload(ClassSession.fitness_class))
     if class_id is not None:
         class_id_value = _parse_int(class_id)
         if class_id_value is None:
@@ -398,6 +400,7 @@ def my_bookings():
 
     bookings = (
         ClassBooking.query
+        .options(joinedload(ClassBooking.session).joinedload(ClassSession.fitness_class))
         .filter_by(user_id=uid, cancelled_at=None)
         .order_by(ClassBooking.booked_at.desc())
         .all()
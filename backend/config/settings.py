@@ -46,12 +46,50 @@ class AppConfig:
     RASA_STATUS_ENDPOINT: str = "/status"
     RASA_TIMEOUT_SEND: float = 15.0
     RASA_TIMEOUT_PARSE: float = 10.0
+    # Ejecuta el parse NLU en paralelo con el webhook (ver ChatService.send_message)
+    RASA_CONCURRENT_PARSE: bool = True
+    RASA_PARSE_WORKERS: int = 8
+    # Presupuesto de extremo a extremo por turno para parse + webhook + reintentos (ver backend/chat/rasa_client.py)
+    RASA_DEADLINE_S: float = 20.0
+    RASA_RETRIES: int = 2
+    RASA_RETRY_BACKOFF_S: float = 0.3
+    RASA_BREAKER_FAILURES: int = 5
+    RASA_BREAKER_RESET_S: float = 15.0
+    RASA_READY_INTERVAL_S: float = 5.0
     CHAT_CONTEXT_API_KEY: str = ""
+    # Agrupa las mutaciones del contexto de chat de un turno en un solo flush (ver ChatContextManager.unit_of_work)
+    CHAT_UNIT_OF_WORK: bool = True
+    # Serializacion por sender entre workers: memory | file | postgres (ver backend/chat/sender_lock.py)
+    CHAT_SENDER_LOCK_BACKEND: str = "memory"
+    CHAT_SENDER_LOCK_PATH: str = ""
+    # Mensajes del mismo sender que esperan turno (0 = rechazar de inmediato) y espera maxima
+    CHAT_SENDER_QUEUE_MAX: int = 2
+    CHAT_SENDER_WAIT_S: float = 8.0
+    # Limite adaptativo de turnos simultaneos en /chat/send (ver backend/chat/admission.py)
+    CHAT_ADMISSION_ENABLED: bool = True
+    CHAT_ADMISSION_INITIAL_LIMIT: int = 16
+    CHAT_ADMISSION_MIN_LIMIT: int = 2
+    CHAT_ADMISSION_MAX_LIMIT: int = 64
+    CHAT_ADMISSION_QUEUE_MAX: int = 32
+    CHAT_ADMISSION_QUEUE_TIMEOUT_S: float = 0.5
     MAX_CONTENT_LENGTH: int = 1024 * 1024
     MAX_MESSAGE_LEN: int = 5000
     DATA_RETENTION_DAYS: int = 730
     METRICS_API_KEY: str = ""
     METRICS_WINDOW_SIZE: int = 500
+    METRICS_SHARED_DIR: str = ""
+    METRICS_SHARED_GENERATION: str = ""
+    LOG_ASYNC_ENABLED: bool = True
+    LOG_QUEUE_MAX: int = 10000
+    LOG_BATCH_MAX: int = 256
+    TRACE_ROUTES: str = "/chat/send"
+    TRACE_SAMPLE_RATE: float = 0.0
+    TRACE_JSONL_PATH: str = ""
+    TRACE_SERVER_TIMING: bool = True
+    SQL_PROFILER_ENABLED: bool = False
+    SQL_SLOW_QUERY_MS: float = 200.0
+    SQL_NPLUS1_THRESHOLD: int = 5
+    SQL_PROFILER_MAX_FINGERPRINTS: int = 200
     CONSENT_VERSION: str = "2025-11-22"
     NLU_FALLBACK_THRESHOLD: float = 0.25
     LLM_PROVIDER: str = "disabled"
@@ -60,6 +98,8 @@ class AppConfig:
     LLM_BASE_URL: str = ""
     LLM_TEMPERATURE: float = 0.2
     LLM_MAX_TOKENS: int = 900
+    LLM_TOOL_WORKERS: int = 4
+    LLM_TOOL_TIMEOUT_S: float = 20.0
     EMBEDDINGS_MODEL: str = "text-embedding-3-small"
     RAG_MAX_RESULTS: int = 4
     RAG_INDEX_PATH: str = ""
@@ -109,9 +149,64 @@ class AppConfig:
             RASA_TIMEOUT_PARSE=_as_float(
                 env.get("RASA_TIMEOUT_PARSE"), cls.RASA_TIMEOUT_PARSE
             ),
+            RASA_CONCURRENT_PARSE=(
+                env.get("RASA_CONCURRENT_PARSE", "1").strip().lower() not in _FALSE_VALUES
+            ),
+            RASA_PARSE_WORKERS=_as_int(
+                env.get("RASA_PARSE_WORKERS"), cls.RASA_PARSE_WORKERS
+            ),
+            RASA_DEADLINE_S=_as_float(
+                env.get("RASA_DEADLINE_S"), cls.RASA_DEADLINE_S
+            ),
+            RASA_RETRIES=_as_int(
+                env.get("RASA_RETRIES"), cls.RASA_RETRIES
+            ),
+            RASA_RETRY_BACKOFF_S=_as_float(
+                env.get("RASA_RETRY_BACKOFF_S"), cls.RASA_RETRY_BACKOFF_S
+            ),
+            RASA_BREAKER_FAILURES=_as_int(
+                env.get("RASA_BREAKER_FAILURES"), cls.RASA_BREAKER_FAILURES
+            ),
+            RASA_BREAKER_RESET_S=_as_float(
+                env.get("RASA_BREAKER_RESET_S"), cls.RASA_BREAKER_RESET_S
+            ),
+            RASA_READY_INTERVAL_S=_as_float(
+                env.get("RASA_READY_INTERVAL_S"), cls.RASA_READY_INTERVAL_S
+            ),
             CHAT_CONTEXT_API_KEY=env.get(
                 "CHAT_CONTEXT_API_KEY", cls.CHAT_CONTEXT_API_KEY
             ),
+            CHAT_UNIT_OF_WORK=(
+                env.get("CHAT_UNIT_OF_WORK", "1").strip().lower() not in _FALSE_VALUES
+            ),
+            CHAT_SENDER_LOCK_BACKEND=(
+                env.get("CHAT_SENDER_LOCK_BACKEND", cls.CHAT_SENDER_LOCK_BACKEND).strip().lower()
+            ),
+            CHAT_SENDER_LOCK_PATH=env.get("CHAT_SENDER_LOCK_PATH", cls.CHAT_SENDER_LOCK_PATH),
+            CHAT_SENDER_QUEUE_MAX=_as_int(
+                env.get("CHAT_SENDER_QUEUE_MAX"), cls.CHAT_SENDER_QUEUE_MAX
+            ),
+            CHAT_SENDER_WAIT_S=_as_float(
+                env.get("CHAT_SENDER_WAIT_S"), cls.CHAT_SENDER_WAIT_S
+            ),
+            CHAT_ADMISSION_ENABLED=(
+                env.get("CHAT_ADMISSION_ENABLED", "1").strip().lower() not in _FALSE_VALUES
+            ),
+            CHAT_ADMISSION_INITIAL_LIMIT=_as_int(
+                env.get("CHAT_ADMISSION_INITIAL_LIMIT"), cls.CHAT_ADMISSION_INITIAL_LIMIT
+            ),
+            CHAT_ADMISSION_MIN_LIMIT=_as_int(
+                env.get("CHAT_ADMISSION_MIN_LIMIT"), cls.CHAT_ADMISSION_MIN_LIMIT
+            ),
+            CHAT_ADMISSION_MAX_LIMIT=_as_int(
+                env.get("CHAT_ADMISSION_MAX_LIMIT"), cls.CHAT_ADMISSION_MAX_LIMIT
+            ),
+            CHAT_ADMISSION_QUEUE_MAX=_as_int(
+                env.get("CHAT_ADMISSION_QUEUE_MAX"), cls.CHAT_ADMISSION_QUEUE_MAX
+            ),
+            CHAT_ADMISSION_QUEUE_TIMEOUT_S=_as_float(
+                env.get("CHAT_ADMISSION_QUEUE_TIMEOUT_S"), cls.CHAT_ADMISSION_QUEUE_TIMEOUT_S
+            ),
             MAX_CONTENT_LENGTH=_as_int(
                 env.get("MAX_CONTENT_LENGTH"), cls.MAX_CONTENT_LENGTH
             ),
@@ -125,6 +220,31 @@ class AppConfig:
             METRICS_WINDOW_SIZE=_as_int(
                 env.get("METRICS_WINDOW_SIZE"), cls.METRICS_WINDOW_SIZE
             ),
+            METRICS_SHARED_DIR=env.get("METRICS_SHARED_DIR", cls.METRICS_SHARED_DIR),
+            METRICS_SHARED_GENERATION=env.get(
+                "METRICS_SHARED_GENERATION", cls.METRICS_SHARED_GENERATION
+            ),
+            LOG_ASYNC_ENABLED=(
+                env.get("LOG_ASYNC_ENABLED", "1").strip().lower() not in _FALSE_VALUES
+            ),
+            LOG_QUEUE_MAX=_as_int(env.get("LOG_QUEUE_MAX"), cls.LOG_QUEUE_MAX),
+            LOG_BATCH_MAX=_as_int(env.get("LOG_BATCH_MAX"), cls.LOG_BATCH_MAX),
+            TRACE_ROUTES=env.get("TRACE_ROUTES", cls.TRACE_ROUTES),
+            TRACE_SAMPLE_RATE=_as_float(
+                env.get("TRACE_SAMPLE_RATE"), cls.TRACE_SAMPLE_RATE
+            ),
+            TRACE_JSONL_PATH=env.get("TRACE_JSONL_PATH", cls.TRACE_JSONL_PATH),
+            TRACE_SERVER_TIMING=(
+                env.get("TRACE_SERVER_TIMING", "1").strip().lower() not in _FALSE_VALUES
+            ),
+            SQL_PROFILER_ENABLED=(
+                env.get("SQL_PROFILER_ENABLED", "0").strip().lower() not in _FALSE_VALUES
+            ),
+            SQL_SLOW_QUERY_MS=_as_float(env.get("SQL_SLOW_QUERY_MS"), cls.SQL_SLOW_QUERY_MS),
+            SQL_NPLUS1_THRESHOLD=_as_int(env.get("SQL_NPLUS1_THRESHOLD"), cls.SQL_NPLUS1_THRESHOLD),
+            SQL_PROFILER_MAX_FINGERPRINTS=_as_int(
+                env.get("SQL_PROFILER_MAX_FINGERPRINTS"), cls.SQL_PROFILER_MAX_FINGERPRINTS
+            ),
             CONSENT_VERSION=env.get("CONSENT_VERSION", cls.CONSENT_VERSION),
             NLU_FALLBACK_THRESHOLD=_as_float(
                 env.get("NLU_FALLBACK_THRESHOLD"), cls.NLU_FALLBACK_THRESHOLD
@@ -135,6 +255,8 @@ class AppConfig:
             LLM_BASE_URL=env.get("LLM_BASE_URL", cls.LLM_BASE_URL),
             LLM_TEMPERATURE=_as_float(env.get("LLM_TEMPERATURE"), cls.LLM_TEMPERATURE),
             LLM_MAX_TOKENS=_as_int(env.get("LLM_MAX_TOKENS"), cls.LLM_MAX_TOKENS),
+            LLM_TOOL_WORKERS=_as_int(env.get("LLM_TOOL_WORKERS"), cls.LLM_TOOL_WORKERS),
+            LLM_TOOL_TIMEOUT_S=_as_float(env.get("LLM_TOOL_TIMEOUT_S"), cls.LLM_TOOL_TIMEOUT_S),
             EMBEDDINGS_MODEL=env.get("EMBEDDINGS_MODEL", cls.EMBEDDINGS_MODEL),
             RAG_MAX_RESULTS=_as_int(env.get("RAG_MAX_RESULTS"), cls.RAG_MAX_RESULTS),
             RAG_INDEX_PATH=env.get("RAG_INDEX_PATH", cls.RAG_INDEX_PATH),
@@ -1,49 +1,241 @@
 """Loader y utilidades para el catálogo de alimentos.
 Este módulo carga `backend/data/food_catalog.json` (o el path configurado) y ofrece funciones
 simples de búsqueda y filtrado para `ActionGenerarDieta`.
+
+Al cargar se construyen, una sola vez, los índices que usan las búsquedas:
+- índice invertido de alérgenos (alérgeno en minúsculas -> posiciones),
+- índice de categorías (categoría en minúsculas -> posiciones) y de tokens de categoría,
+- arreglos ordenados de kcal (por 100 g y por porción) para consultas por rango con `bisect`,
+- columnas numéricas de kcal/proteínas/carbohidratos/grasas (NumPy si está disponible).
 """
-from typing import List, Dict, Any, Optional
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, FrozenSet, Iterable, Sequence, Tuple
 import json
+import math
 import os
+import re
+import threading
+
+try:  # pragma: no cover - optional dependency
+    import numpy as np  # type: ignore
+except Exception:  # pragma: no cover - optional dependency
+    np = None
 
 DEFAULT_CATALOG_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "food_catalog_sample.json")
 
+# Columnas numéricas expuestas por `FoodCatalog.column`
+NUTRIENT_FIELDS: Dict[str, str] = {
+    "kcal": "energy_kcal_100g",
+    "protein": "proteins_g_100g",
+    "carbs": "carbs_g_100g",
+    "fats": "fats_g_100g",
+}
+
+_CATEGORY_TOKEN_RE = re.compile(r"[^\w]+", re.UNICODE)
+
+# Entradas por memo de consultas (LRU): las claves vienen del llamador.
+_MEMO_MAX_ENTRIES = 512
+
+
+def _file_signature(path: str) -> Optional[Tuple[int, int]]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def _as_float(value: Any) -> Optional[float]:
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
 
 class FoodCatalog:
     def __init__(self, path: Optional[str] = None):
         self.path = path or DEFAULT_CATALOG_PATH
         self._items: List[Dict[str, Any]] = []
+        self.signature: Optional[Tuple[int, int]] = None
         self._load()
 
     def _load(self):
+        self.signature = _file_signature(self.path)
         try:
             with open(self.path, "r", encoding="utf-8") as f:
                 self._items = json.load(f)
         except FileNotFoundError:
             self._items = []
+        self._build_indexes()
+
+    @property
+    def version(self) -> str:
+        """Identificador estable del contenido cargado (mtime + tamaño del archivo)."""
+        if not self.signature:
+            return "0-0"
+        return f"{self.signature[0]:x}-{self.signature[1]:x}"
+
+    def is_stale(self) -> bool:
+        """True si el archivo en disco cambió desde la carga."""
+        return _file_signature(self.path) != self.signature
+
+    def _build_indexes(self) -> None:
+        allergen_index: Dict[str, set] = {}
+        category_index: Dict[str, set] = {}
+        token_index: Dict[str, set] = {}
+        columns: Dict[str, List[float]] = {name: [] for name in NUTRIENT_FIELDS}
+        kcal_pairs: List[Tuple[float, int]] = []
+        serving_pairs: List[Tuple[float, int]] = []
+
+        for pos, it in enumerate(self._items):
+            for allergen in it.get("allergens", []) or []:
+                allergen_index.setdefault(str(allergen).lower(), set()).add(pos)
+            for cat in it.get("categories", []) or []:
+                cat_norm = str(cat).lower()
+                category_index.setdefault(cat_norm, set()).add(pos)
+                for token in _CATEGORY_TOKEN_RE.split(cat_norm):
+                    if token:
+                        token_index.setdefault(token, set()).add(pos)
+            for name, field in NUTRIENT_FIELDS.items():
+                value = _as_float(it.get(field))
+                columns[name].append(float("nan") if value is None else value)
+            ek = it.get("energy_kcal_100g")
+            if ek is not None:
+                kcal_pairs.append((ek, pos))
+                serving = it.get("serving_size_g")
+                if serving:
+                    serving_pairs.append((ek * (serving / 100.0), pos))
+
+        kcal_pairs.sort()
+        serving_pairs.sort()
+        self._allergen_index: Dict[str, FrozenSet[int]] = {k: frozenset(v) for k, v in allergen_index.items()}
+        self._category_index: Dict[str, FrozenSet[int]] = {k: frozenset(v) for k, v in category_index.items()}
+        self._category_token_index: Dict[str, FrozenSet[int]] = {k: frozenset(v) for k, v in token_index.items()}
+        self._kcal_sorted: List[float] = [k for k, _ in kcal_pairs]
+        self._kcal_order: List[int] = [p for _, p in kcal_pairs]
+        self._serving_kcal_sorted: List[float] = [k for k, _ in serving_pairs]
+        self._serving_kcal_order: List[int] = [p for _, p in serving_pairs]
+        if np is not None:
+            self._columns = {name: np.asarray(values, dtype=np.float64) for name, values in columns.items()}
+        else:
+            self._columns = {name: array("d", values) for name, values in columns.items()}
+        # memo LRU de consultas repetidas (el catálogo es inmutable tras la carga)
+        self._memo_lock = threading.Lock()
+        self._excluded_cache: "OrderedDict[FrozenSet[str], FrozenSet[int]]" = OrderedDict()
+        self._category_cache: "OrderedDict[str, Tuple[int, ...]]" = OrderedDict()
+
+    def _memo_get(self, memo: OrderedDict, key: Any) -> Any:
+        with self._memo_lock:
+            value = memo.get(key)
+            if value is not None:
+                memo.move_to_end(key)
+            return value
+
+    def _memo_put(self, memo: OrderedDict, key: Any, value: Any) -> None:
+        with self._memo_lock:
+            memo[key] = value
+            memo.move_to_end(key)
+            while len(memo) > _MEMO_MAX_ENTRIES:
+                memo.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._items)
 
     def all(self) -> List[Dict[str, Any]]:
         return self._items
 
+    def items_at(self, positions: Iterable[int]) -> List[Dict[str, Any]]:
+        """Materializa posiciones del índice como items, en orden de catálogo."""
+        items = self._items
+        return [items[p] for p in sorted(positions)]
+
+    def column(self, name: str):
+        """Columna numérica (`kcal`, `protein`, `carbs`, `fats`) alineada con `all()`.
+
+        Los valores ausentes se representan con NaN. Devuelve un `numpy.ndarray`
+        cuando NumPy está instalado y un `array('d')` en caso contrario.
+        """
+        try:
+            return self._columns[name]
+        except KeyError:
+            raise KeyError(f"Columna desconocida: {name}") from None
+
+    # --- índices de alérgenos -------------------------------------------------
+    def excluded_positions(self, allergens: Sequence[str], *, memo: bool = True) -> FrozenSet[int]:
+        """Posiciones de items que contienen alguno de los alérgenos (coincidencia exacta).
+
+        `memo=False` calcula sin leer ni guardar en el memo (consultas atípicas).
+        """
+        key = frozenset(a.lower() for a in allergens or [])
+        if not key:
+            return frozenset()
+        cached = self._memo_get(self._excluded_cache, key) if memo else None
+        if cached is None:
+            excluded: set = set()
+            for allergen in key:
+                excluded.update(self._allergen_index.get(allergen, ()))
+            cached = frozenset(excluded)
+            if memo:
+                self._memo_put(self._excluded_cache, key, cached)
+        return cached
+
+    def allowed_positions(self, allergens: Sequence[str]) -> List[int]:
+        """Posiciones (en orden de catálogo) de items sin los alérgenos indicados."""
+        excluded = self.excluded_positions(allergens)
+        if not excluded:
+            return list(range(len(self._items)))
+        return [p for p in range(len(self._items)) if p not in excluded]
+
     def filter_allergens(self, allergens: List[str]) -> List[Dict[str, Any]]:
         if not allergens:
             return self._items
-        normalized = [a.lower() for a in allergens]
-        out = []
-        for it in self._items:
-            item_all = [a.lower() for a in it.get("allergens", [])]
-            if any(a in item_all for a in normalized):
-                continue
-            out.append(it)
-        return out
+        items = self._items
+        return [items[p] for p in self.allowed_positions(allergens)]
+
+    # --- índices de categorías ------------------------------------------------
+    def category_positions(self, category_tag: str, *, memo: bool = True) -> Tuple[int, ...]:
+        """Posiciones de items con alguna categoría que contenga `category_tag`.
+
+        Recorre las categorías distintas (no los items) y une sus posiciones.
+        `memo=False` calcula sin leer ni guardar en el memo.
+        """
+        tag = (category_tag or "").lower()
+        cached = self._memo_get(self._category_cache, tag) if memo else None
+        if cached is None:
+            matched: set = set()
+            for cat, positions in self._category_index.items():
+                if tag in cat:
+                    matched.update(positions)
+            cached = tuple(sorted(matched))
+            if memo:
+                self._memo_put(self._category_cache, tag, cached)
+        return cached
+
+    def category_token_positions(self, token: str) -> FrozenSet[int]:
+        """Posiciones de items cuya categoría contiene el token exacto (p.ej. `beverages`)."""
+        return self._category_token_index.get((token or "").lower(), frozenset())
 
     def by_category(self, category_tag: str) -> List[Dict[str, Any]]:
-        out = []
-        for it in self._items:
-            cats = it.get("categories", []) or []
-            if any(category_tag.lower() in c.lower() for c in cats):
-                out.append(it)
-        return out
+        items = self._items
+        return [items[p] for p in self.category_positions(category_tag)]
+
+    # --- rangos de kcal -------------------------------------------------------
+    def kcal_range_positions(self, low: float, high: float, per_serving: bool = False) -> List[int]:
+        """Posiciones con kcal en [low, high] usando búsqueda binaria sobre el arreglo ordenado.
+
+        Un límite no finito (NaN o infinito) no acota nada: devuelve `[]`.
+        """
+        if not (math.isfinite(low) and math.isfinite(high)):
+            return []
+        keys = self._serving_kcal_sorted if per_serving else self._kcal_sorted
+        order = self._serving_kcal_order if per_serving else self._kcal_order
+        start = bisect_left(keys, low)
+        end = bisect_right(keys, high)
+        return sorted(order[start:end])
 
     def find_by_kcal_approx(self, target_kcal: float, tolerance_pct: float = 30.0, per_serving: bool = False) -> List[Dict[str, Any]]:
         """Return items whose energy_kcal_100g is within tolerance of target_kcal (interpreting per 100g).
@@ -52,33 +244,33 @@ class FoodCatalog:
         if not self._items:
             return []
         tol = tolerance_pct / 100.0
-        out = []
-        for it in self._items:
-            ek = it.get("energy_kcal_100g")
-            if ek is None:
-                continue
-            # compute kcal per serving if required
-            kcal_value = ek
-            if per_serving:
-                serving = it.get("serving_size_g")
-                if serving:
-                    kcal_value = ek * (serving / 100.0)
-                else:
-                    # can't compute serving, skip
-                    continue
-            low = target_kcal * (1 - tol)
-            high = target_kcal * (1 + tol)
-            if low <= kcal_value <= high:
-                out.append(it)
-        return out
+        low = target_kcal * (1 - tol)
+        high = target_kcal * (1 + tol)
+        items = self._items
+        return [items[p] for p in self.kcal_range_positions(low, high, per_serving=per_serving)]
 
 
-# convenience: module-level catalog instance
-_catalog_instance: Optional[FoodCatalog] = None
+# convenience: process-wide catalog instances, one per path
+_catalog_instances: Dict[str, FoodCatalog] = {}
+_last_path: Optional[str] = None
+_catalog_lock = threading.Lock()
 
 
 def get_catalog(path: Optional[str] = None) -> FoodCatalog:
-    global _catalog_instance
-    if _catalog_instance is None or (path and _catalog_instance.path != path):
-        _catalog_instance = FoodCatalog(path)
-    return _catalog_instance
+    """Catálogo compartido del proceso para `path`.
+
+    Se carga una vez por ruta y se recarga solo si el archivo cambió (mtime/tamaño).
+    Sin `path` devuelve el último catálogo solicitado (o el de ejemplo).
+    """
+    global _last_path
+    key = os.path.abspath(path or _last_path or DEFAULT_CATALOG_PATH)
+    catalog = _catalog_instances.get(key)
+    if catalog is None or catalog.is_stale():
+        with _catalog_lock:
+            catalog = _catalog_instances.get(key)
+            if catalog is None or catalog.is_stale():
+                catalog = FoodCatalog(path or _last_path)
+                _catalog_instances[key] = catalog
+    if path:
+        _last_path = path
+    return catalog
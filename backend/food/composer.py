@@ -5,14 +5,16 @@ creates a diet split into meals approximating the energy target. This is
 intended as a pragmatic, explainable fallback before training a ML model.
 
 API:
-  compose_diet(target_kcal, n_meals=3, catalog_path=None, exclude_allergens=None)
+  compose_diet(target_kcal, n_meals=3, catalog_path=None, exclude_allergens=None, engine="vectorized", strategy="greedy")
 
 Returns a dict with keys: diet_id, header, summary, meals (list of meals with items).
 """
-from .catalog import get_catalog
+from .catalog import FoodCatalog, get_catalog
 from typing import List, Dict, Any, Optional, Set, Tuple
 from collections import defaultdict
+import threading
 import uuid
+import weakref
 from math import floor
 import os
 
@@ -452,79 +454,96 @@ def _pick_candidate(
     return None
 
 
-def compose_diet(target_kcal: int, n_meals: int = 3, catalog_path: Optional[str] = None, exclude_allergens: Optional[List[str]] = None, objetivo: Optional[str] = None, weight_kg: Optional[float] = None) -> Dict[str, Any]:
-    """Compose a simple diet close to target_kcal split in n_meals.
+GAIN_OBJECTIVES = {'hipertrofia', 'ganar masa', 'ganar_masa'}
+LOSS_OBJECTIVES = {'bajar_grasa', 'perder_peso', 'perder_grasa'}
 
-    Strategy (greedy): for each meal, target meal_kcal = target_kcal / n_meals.
-    Repeatedly select high-kcal-density items and compute a grams portion so the
-    item contributes a significant share toward remaining meal kcal.
-    """
-    cat = get_catalog(path=catalog_path)
-    items = cat.all()
-    # apply allergen filter
-    if exclude_allergens:
-        items = cat.filter_allergens(exclude_allergens)
-
-    # Remove items without kcal info
-    items = [it for it in items if it.get('energy_kcal_100g')]
-    if not items:
-        return {
-            'diet_id': str(uuid.uuid4()),
-            'header': 'Dieta generada',
-            'summary': {'target_kcal': target_kcal},
-            'meals': []
-        }
+COMPOSER_ENGINES = ("vectorized", "scan")
+COMPOSER_STRATEGIES = ("greedy", "milp")
 
-    meals: List[Dict[str, Any]] = []
-    used_counts: Dict[str, int] = {}
-    text_cache: Dict[str, str] = {}
 
-    meal_target = float(target_kcal) / max(1, n_meals)
+def _objective_group(objetivo_norm: str) -> str:
+    if objetivo_norm in GAIN_OBJECTIVES:
+        return "gain"
+    if objetivo_norm in LOSS_OBJECTIVES:
+        return "loss"
+    return "balanced"
 
-    # normalize objective
-    objetivo_norm = (objetivo or '').strip().lower()
 
-    # scoring: build a simple score per item depending on objective
-    def score_item(it: Dict[str, Any]) -> float:
-        ek = it.get('energy_kcal_100g') or 0.0
-        prot = it.get('proteins_g_100g') or 0.0
-        # base score favors energy density
-        if objetivo_norm in {'hipertrofia', 'ganar masa', 'ganar_masa'}:
-            # favor high energy and decent protein
-            return ek * 0.7 + prot * 10.0
-        elif objetivo_norm in {'bajar_grasa', 'perder_peso', 'perder_grasa'}:
-            # favor high protein and lower energy
-            return prot * 15.0 - ek * 0.3
-        else:
-            # balanced
-            return ek * 0.5 + prot * 8.0
-
-    # pre-sort items according to objective to bias selection
-    if objetivo_norm in {'hipertrofia', 'ganar masa', 'ganar_masa'}:
+def _objective_sort_key(group: str):
+    """Clave de orden (descendente) usada para sesgar la selección según objetivo."""
+    if group == "gain":
         # prefer high energy density and reasonable protein
-        items.sort(key=lambda it: ((it.get('energy_kcal_100g') or 0.0) * 0.7 +
-                   (it.get('proteins_g_100g') or 0.0) * 8.0), reverse=True)
-    elif objetivo_norm in {'bajar_grasa', 'perder_peso', 'perder_grasa'}:
+        return lambda it: ((it.get('energy_kcal_100g') or 0.0) * 0.7 + (it.get('proteins_g_100g') or 0.0) * 8.0)
+    if group == "loss":
         # prefer higher protein and lower energy density
-        items.sort(key=lambda it: ((it.get('proteins_g_100g') or 0.0) * 12.0 -
-                   (it.get('energy_kcal_100g') or 0.0) * 0.5), reverse=True)
-    else:
-        items.sort(key=score_item, reverse=True)
+        return lambda it: ((it.get('proteins_g_100g') or 0.0) * 12.0 - (it.get('energy_kcal_100g') or 0.0) * 0.5)
+    # balanced
+    return lambda it: ((it.get('energy_kcal_100g') or 0.0) * 0.5 + (it.get('proteins_g_100g') or 0.0) * 8.0)
+
+
+def _portion_fraction(group: str) -> float:
+    if group == "gain":
+        return 0.55
+    if group == "loss":
+        return 0.3
+    return 0.4
+
+
+def _meal_template_for_index(idx: int) -> Dict[str, Any]:
+    if idx < len(MEAL_TEMPLATES):
+        return MEAL_TEMPLATES[idx]
+    # fallback template for extra snacks/comidas
+    return {
+        "name": f"Comida {idx + 1}",
+        "keywords": [],
+        "allow_sweets": False,
+        "note": None,
+        "required_tags": [],
+    }
+
+
+def _portion_qty(remaining: float, frac: float, ek: float) -> int:
+    qty = floor((remaining * frac) / ek * 100)
+    if qty < 30:
+        qty = 30
+    if qty > 450:
+        qty = 450
+    return qty
+
+
+def _meal_item(candidate: Dict[str, Any], qty: int, ek: float) -> Dict[str, Any]:
+    return {
+        'id': candidate.get('id'),
+        'name': candidate.get('name'),
+        'qty_g': int(qty),
+        'kcal': round(ek * qty / 100.0, 1),
+        'energy_kcal_100g': ek,
+        'proteins_g_100g': candidate.get('proteins_g_100g'),
+        'carbs_g_100g': candidate.get('carbs_g_100g'),
+        'fats_g_100g': candidate.get('fats_g_100g'),
+    }
+
+
+def _close_meal(m: int, template: Dict[str, Any], meal_items: List[Dict[str, Any]], pending_tags: Set[str], meal_tag_counts: Dict[str, int]) -> Dict[str, Any]:
+    return {
+        'name': template.get('name', f'Comida {m+1}'),
+        'items': meal_items,
+        'kcal': round(sum(it['kcal'] for it in meal_items), 1),
+        'notes': template.get('note'),
+        'pending_tags': list(pending_tags),
+        'meal_tag_counts': dict(meal_tag_counts),
+    }
 
-    def meal_template_for_index(idx: int) -> Dict[str, Any]:
-        if idx < len(MEAL_TEMPLATES):
-            return MEAL_TEMPLATES[idx]
-        # fallback template for extra snacks/comidas
-        return {
-            "name": f"Comida {idx + 1}",
-            "keywords": [],
-            "allow_sweets": False,
-            "note": None,
-            "required_tags": [],
-        }
+
+def _greedy_meals_scan(items: List[Dict[str, Any]], n_meals: int, meal_target: float, group: str) -> List[Dict[str, Any]]:
+    """Greedy original: recorre la lista ordenada en cada selección."""
+    meals: List[Dict[str, Any]] = []
+    used_counts: Dict[str, int] = {}
+    text_cache: Dict[str, str] = {}
+    frac = _portion_fraction(group)
 
     for m in range(n_meals):
-        template = meal_template_for_index(m)
+        template = _meal_template_for_index(m)
         remaining = meal_target
         meal_items: List[Dict[str, Any]] = []
         used_in_meal: Set[str] = set()
@@ -585,31 +604,10 @@ def compose_diet(target_kcal: int, n_meals: int = 3, catalog_path: Optional[str]
                     pass
                 continue
 
-            if objetivo_norm in {'hipertrofia', 'ganar masa', 'ganar_masa'}:
-                frac = 0.55
-            elif objetivo_norm in {'bajar_grasa', 'perder_peso', 'perder_grasa'}:
-                frac = 0.3
-            else:
-                frac = 0.4
-
-            qty = floor((remaining * frac) / ek * 100)
-            if qty < 30:
-                qty = 30
-            if qty > 450:
-                qty = 450
-
-            kcal_added = ek * qty / 100.0
+            qty = _portion_qty(remaining, frac, ek)
+            entry = _meal_item(candidate, qty, ek)
             item_id = candidate.get('id') or candidate.get('name')
-            meal_items.append({
-                'id': candidate.get('id'),
-                'name': candidate.get('name'),
-                'qty_g': int(qty),
-                'kcal': round(kcal_added, 1),
-                'energy_kcal_100g': ek,
-                'proteins_g_100g': candidate.get('proteins_g_100g'),
-                'carbs_g_100g': candidate.get('carbs_g_100g'),
-                'fats_g_100g': candidate.get('fats_g_100g'),
-            })
+            meal_items.append(entry)
             tags = _tags_for_text(_normalized_text(candidate, text_cache))
             for tag in tags:
                 if tag in pending_tags:
@@ -625,17 +623,307 @@ def compose_diet(target_kcal: int, n_meals: int = 3, catalog_path: Optional[str]
                         items.remove(candidate)
                     except ValueError:
                         pass
-            remaining -= kcal_added
-
-        meal_kcal = round(sum(it['kcal'] for it in meal_items), 1)
-        meals.append({
-            'name': template.get('name', f'Comida {m+1}'),
-            'items': meal_items,
-            'kcal': meal_kcal,
-            'notes': template.get('note'),
-            'pending_tags': list(pending_tags),
-            'meal_tag_counts': dict(meal_tag_counts),
-        })
+            remaining -= ek * qty / 100.0
+
+        meals.append(_close_meal(m, template, meal_items, pending_tags, meal_tag_counts))
+    return meals
+
+
+_TAG_NAMES: Tuple[str, ...] = tuple(TAG_KEYWORDS)
+
+
+class _RankedView:
+    """Bitsets (enteros de Python) en el orden de un objetivo: bit r = r-ésimo item del orden."""
+
+    __slots__ = ("order", "rank", "valid", "tag_bits", "keyword_bits", "sweet_bits", "group_bits")
+
+    def __init__(self, index: "_ComposerIndex", group: str) -> None:
+        items = index.items
+        key = _objective_sort_key(group)
+        # mismo orden estable que `items.sort(key, reverse=True)` sobre la lista filtrada
+        self.order: List[int] = sorted(
+            (p for p in range(len(items)) if items[p].get('energy_kcal_100g')),
+            key=lambda p: key(items[p]),
+            reverse=True,
+        )
+        self.rank: Dict[int, int] = {p: r for r, p in enumerate(self.order)}
+        self.valid = 0
+        self.tag_bits = [0] * len(_TAG_NAMES)
+        self.keyword_bits = [0] * len(index.template_keywords)
+        self.sweet_bits = 0
+        self.group_bits: Dict[str, int] = {}
+        for r, p in enumerate(self.order):
+            bit = 1 << r
+            cid = index.cids[p]
+            if not cid:
+                continue
+            self.valid |= bit
+            self.group_bits[cid] = self.group_bits.get(cid, 0) | bit
+            flags = index.flags[p]
+            self._set_flags(bit, flags)
+
+    def _set_flags(self, bit: int, flags: Tuple[int, int, bool]) -> None:
+        tag_mask, kw_mask, sweet = flags
+        for i in range(len(self.tag_bits)):
+            if tag_mask >> i & 1:
+                self.tag_bits[i] |= bit
+        for i in range(len(self.keyword_bits)):
+            if kw_mask >> i & 1:
+                self.keyword_bits[i] |= bit
+        if sweet:
+            self.sweet_bits |= bit
+
+    def patched(self, index: "_ComposerIndex", allowed: int) -> "_RankedView":
+        """Copia en la que los ids duplicados heredan las banderas del primer item permitido.
+
+        Replica la caché de texto por id del recorrido original, que reutiliza el
+        texto del primer item con ese id que encuentra en la lista ordenada.
+        """
+        view = object.__new__(_RankedView)
+        view.order, view.rank, view.valid = self.order, self.rank, self.valid
+        view.group_bits = self.group_bits
+        view.tag_bits = list(self.tag_bits)
+        view.keyword_bits = list(self.keyword_bits)
+        view.sweet_bits = self.sweet_bits
+        for positions in index.conflicting_groups:
+            members = sorted(self.rank[p] for p in positions if p in self.rank and allowed >> self.rank[p] & 1)
+            if len(members) < 2:
+                continue
+            rep_flags = index.flags[self.order[members[0]]]
+            for r in members[1:]:
+                bit = 1 << r
+                view.tag_bits = [b & ~bit for b in view.tag_bits]
+                view.keyword_bits = [b & ~bit for b in view.keyword_bits]
+                view.sweet_bits &= ~bit
+                view._set_flags(bit, rep_flags)
+        return view
+
+
+class _ComposerIndex:
+    """Banderas precalculadas por item para el modo vectorizado de `compose_diet`.
+
+    Se construye una vez por catálogo cargado: bitmask de tags, bitmask de
+    coincidencia con las keywords de cada `MEAL_TEMPLATES` y bandera de dulce.
+    """
+
+    def __init__(self, catalog: FoodCatalog) -> None:
+        self.catalog = catalog
+        self.items = catalog.all()
+        self.template_keywords: Tuple[Tuple[str, ...], ...] = tuple(tuple(t.get("keywords", [])) for t in MEAL_TEMPLATES)
+        self.cids: List[Optional[str]] = []
+        self.flags: List[Tuple[int, int, bool]] = []
+        groups: Dict[str, List[int]] = defaultdict(list)
+        for pos, it in enumerate(self.items):
+            cid = it.get("id") or it.get("name")
+            self.cids.append(cid)
+            # sin caché por id: cada item guarda sus propias banderas
+            text = _normalized_text(it, {})
+            tags = _tags_for_text(text)
+            tag_mask = 0
+            for i, tag in enumerate(_TAG_NAMES):
+                if tag in tags:
+                    tag_mask |= 1 << i
+            kw_mask = 0
+            for i, keywords in enumerate(self.template_keywords):
+                if _matches_keywords(text, list(keywords)):
+                    kw_mask |= 1 << i
+            self.flags.append((tag_mask, kw_mask, _is_sweet(text)))
+            if cid:
+                groups[cid].append(pos)
+        # ids repetidos cuyas banderas difieren entre items
+        self.conflicting_groups: List[List[int]] = [
+            positions for positions in groups.values()
+            if len(positions) > 1 and len({self.flags[p] for p in positions}) > 1
+        ]
+        self._views: Dict[str, _RankedView] = {}
+        self._allowed_cache: Dict[Tuple[str, frozenset], int] = {}
+
+    def view(self, group: str) -> _RankedView:
+        view = self._views.get(group)
+        if view is None:
+            view = _RankedView(self, group)
+            self._views[group] = view
+        return view
+
+    def allowed_bits(self, view: _RankedView, group: str, exclude_allergens: Optional[List[str]]) -> int:
+        key = (group, frozenset(a.lower() for a in exclude_allergens or []))
+        cached = self._allowed_cache.get(key)
+        if cached is None:
+            cached = view.valid
+            for p in self.catalog.excluded_positions(exclude_allergens or []):
+                r = view.rank.get(p)
+                if r is not None:
+                    cached &= ~(1 << r)
+            self._allowed_cache[key] = cached
+        return cached
+
+
+_composer_indexes: "weakref.WeakKeyDictionary[FoodCatalog, _ComposerIndex]" = weakref.WeakKeyDictionary()
+_composer_index_lock = threading.Lock()
+
+
+def _composer_index(catalog: FoodCatalog) -> _ComposerIndex:
+    index = _composer_indexes.get(catalog)
+    if index is None or index.template_keywords != tuple(tuple(t.get("keywords", [])) for t in MEAL_TEMPLATES):
+        with _composer_index_lock:
+            index = _composer_indexes.get(catalog)
+            if index is None or index.template_keywords != tuple(tuple(t.get("keywords", [])) for t in MEAL_TEMPLATES):
+                index = _ComposerIndex(catalog)
+                _composer_indexes[catalog] = index
+    return index
+
+
+def _greedy_meals_vectorized(catalog: FoodCatalog, exclude_allergens: Optional[List[str]], n_meals: int, meal_target: float, group: str) -> Optional[List[Dict[str, Any]]]:
+    """Misma selección greedy que `_greedy_meals_scan`, con operaciones de bitmask.
+
+    Cada filtro de `_pick_candidate` es un bitset sobre el orden del objetivo;
+    el candidato es el bit encendido más bajo de la intersección.
+    Devuelve None si no hay items elegibles.
+    """
+    index = _composer_index(catalog)
+    view = index.view(group)
+    allowed = index.allowed_bits(view, group, exclude_allergens)
+    if not allowed:
+        return None
+    if index.conflicting_groups:
+        view = view.patched(index, allowed)
+    items = index.items
+    full = (1 << len(view.order)) - 1
+    non_sweet = full ^ view.sweet_bits
+    tag_bit = {tag: view.tag_bits[i] for i, tag in enumerate(_TAG_NAMES)}
+
+    meals: List[Dict[str, Any]] = []
+    used_counts: Dict[str, int] = {}
+    active = allowed
+    frac = _portion_fraction(group)
+
+    for m in range(n_meals):
+        template = _meal_template_for_index(m)
+        keyword_mask = view.keyword_bits[m] if m < len(view.keyword_bits) and template.get("keywords") else full
+        allow_sweets = template.get("allow_sweets", False)
+        tag_limits = template.get("meal_tag_limits") or {}
+        remaining = meal_target
+        meal_items: List[Dict[str, Any]] = []
+        in_meal = 0
+        meal_tag_counts: Dict[str, int] = defaultdict(int)
+        pending_tags: Set[str] = set(template.get("required_tags", []))
+        attempts = 0
+
+        while remaining > MIN_MEAL_KCAL and attempts < 12 and len(meal_items) < 5:
+            attempts += 1
+            base = active & ~in_meal
+            for tag in _TAG_NAMES:
+                if meal_tag_counts.get(tag, 0) >= tag_limits.get(tag, 999):
+                    base &= ~tag_bit[tag]
+            if pending_tags:
+                pending_mask = 0
+                for tag in pending_tags:
+                    pending_mask |= tag_bit.get(tag, 0)
+                base &= pending_mask
+            candidates = base & keyword_mask & (full if allow_sweets else non_sweet)
+            if not candidates:
+                # relax keyword restriction, then sweets restriction as last resort
+                candidates = base & (full if allow_sweets else non_sweet)
+            if not candidates and not allow_sweets:
+                candidates = base
+            if not candidates:
+                break
+
+            r = (candidates & -candidates).bit_length() - 1
+            pos = view.order[r]
+            candidate = items[pos]
+            ek = candidate.get('energy_kcal_100g') or 0.0
+            if ek <= 0:
+                active &= ~(1 << r)
+                continue
+
+            qty = _portion_qty(remaining, frac, ek)
+            entry = _meal_item(candidate, qty, ek)
+            item_id = candidate.get('id') or candidate.get('name')
+            meal_items.append(entry)
+            # mismo orden de inserción que `_tags_for_text` para iterar igual el set
+            tags: Set[str] = set()
+            for tag in _TAG_NAMES:
+                if tag_bit[tag] >> r & 1:
+                    tags.add(tag)
+            for tag in tags:
+                if tag in pending_tags:
+                    pending_tags.discard(tag)
+                    break
+            for tag in tags:
+                meal_tag_counts[tag] += 1
+            if item_id:
+                used_counts[item_id] = used_counts.get(item_id, 0) + 1
+                in_meal |= view.group_bits[item_id]
+                if used_counts[item_id] >= MAX_DUPLICATES_PER_ITEM:
+                    active &= ~view.group_bits[item_id]
+            remaining -= ek * qty / 100.0
+
+        meals.append(_close_meal(m, template, meal_items, pending_tags, meal_tag_counts))
+    return meals
+
+
+def diet_error(meals: List[Dict[str, Any]], target_kcal: float, weight_kg: Optional[float] = None) -> Dict[str, float]:
+    """Desviación relativa de kcal y macros de un menú respecto de los objetivos."""
+    weight_ref = weight_kg or 70.0
+    totals = _compute_macros(meals)
+    targets = {"kcal": float(target_kcal)}
+    targets.update({k: v * weight_ref for k, v in MACRO_TARGETS_PER_KG.items()})
+    errors = {k: abs(totals[k] - t) / t if t else 0.0 for k, t in targets.items()}
+    errors["macro_mean"] = (errors["protein"] + errors["carbs"] + errors["fats"]) / 3.0
+    return errors
+
+
+def compose_diet(target_kcal: int, n_meals: int = 3, catalog_path: Optional[str] = None, exclude_allergens: Optional[List[str]] = None, objetivo: Optional[str] = None, weight_kg: Optional[float] = None, engine: str = "vectorized", strategy: str = "greedy", time_budget_s: float = 1.0) -> Dict[str, Any]:
+    """Compose a simple diet close to target_kcal split in n_meals.
+
+    Strategy (greedy): for each meal, target meal_kcal = target_kcal / n_meals.
+    Repeatedly select high-kcal-density items and compute a grams portion so the
+    item contributes a significant share toward remaining meal kcal.
+
+    `engine` selects how candidates are picked: "vectorized" (default) uses the
+    per-catalog bitmask index; "scan" walks the sorted list like the original
+    implementation. Both produce the same meals.
+
+    `strategy="milp"` solves kcal, macro targets, required tags and tag limits
+    jointly (see `backend.food.solver`) within `time_budget_s`, starting from the
+    greedy menu and keeping it when the solver does not improve on it.
+    """
+    if engine not in COMPOSER_ENGINES:
+        raise ValueError(f"engine desconocido: {engine}")
+    if strategy not in COMPOSER_STRATEGIES:
+        raise ValueError(f"strategy desconocida: {strategy}")
+    if strategy == "milp":
+        return _compose_diet_milp(target_kcal, n_meals, catalog_path, exclude_allergens, objetivo, weight_kg, engine, time_budget_s)
+    cat = get_catalog(path=catalog_path)
+
+    meal_target = float(target_kcal) / max(1, n_meals)
+
+    # normalize objective
+    objetivo_norm = (objetivo or '').strip().lower()
+    group = _objective_group(objetivo_norm)
+
+    if engine == "vectorized":
+        meals = _greedy_meals_vectorized(cat, exclude_allergens, n_meals, meal_target, group)
+    else:
+        items = cat.all()
+        # apply allergen filter
+        if exclude_allergens:
+            items = cat.filter_allergens(exclude_allergens)
+
+        # Remove items without kcal info
+        items = [it for it in items if it.get('energy_kcal_100g')]
+        # pre-sort items according to objective to bias selection
+        items.sort(key=_objective_sort_key(group), reverse=True)
+        meals = _greedy_meals_scan(items, n_meals, meal_target, group) if items else None
+
+    if meals is None:
+        return {
+            'diet_id': str(uuid.uuid4()),
+            'header': 'Dieta generada',
+            'summary': {'target_kcal': target_kcal},
+            'meals': []
+        }
 
     # Completa tags faltantes con fallbacks limpios y refuerza macros según peso.
     _fill_missing_tags(meals)
@@ -669,6 +957,43 @@ def compose_diet(target_kcal: int, n_meals: int = 3, catalog_path: Optional[str]
     }
 
 
+def _compose_diet_milp(target_kcal: int, n_meals: int, catalog_path: Optional[str], exclude_allergens: Optional[List[str]], objetivo: Optional[str], weight_kg: Optional[float], engine: str, time_budget_s: float) -> Dict[str, Any]:
+    from . import solver
+
+    greedy = compose_diet(target_kcal, n_meals=n_meals, catalog_path=catalog_path, exclude_allergens=exclude_allergens, objetivo=objetivo, weight_kg=weight_kg, engine=engine)
+    greedy.setdefault('summary', {})['strategy'] = 'greedy'
+    if not solver.available() or not greedy.get('meals'):
+        return greedy
+
+    group = _objective_group((objetivo or '').strip().lower())
+    meals = solver.solve_meals_milp(
+        get_catalog(path=catalog_path),
+        exclude_allergens,
+        n_meals,
+        float(target_kcal),
+        group,
+        weight_kg,
+        warm_meals=greedy['meals'],
+        time_budget_s=time_budget_s,
+    )
+    if not meals:
+        return greedy
+
+    def score(candidate_meals: List[Dict[str, Any]]) -> float:
+        err = diet_error(candidate_meals, target_kcal, weight_kg)
+        return solver.WEIGHT_KCAL * err["kcal"] + solver.WEIGHT_MACRO * (err["protein"] + err["carbs"] + err["fats"])
+
+    if score(meals) >= score(greedy['meals']):
+        return greedy
+    totals = _compute_macros(meals)
+    return {
+        'diet_id': str(uuid.uuid4()),
+        'header': 'Dieta optimizada (MILP)',
+        'summary': {'target_kcal': target_kcal, 'approx_kcal': round(totals["kcal"], 1), 'strategy': 'milp'},
+        'meals': meals,
+    }
+
+
 def _manual_balanced_menu(weight_kg: float, target_kcal: int) -> Dict[str, Any]:
     """Fallback simple y limpio cuando el catálogo no puede cubrir variedad/macros."""
     scale = min(1.3, max(0.7, (target_kcal or 2000) / 2000.0))
@@ -0,0 +1,243 @@
+"""Solver de programación lineal entera (MILP) para `compose_diet(strategy="milp")`.
+
+Formula el menú completo en un solo problema:
+  - y[m,i] binaria: el candidato i se usa en la comida m; q[m,i] porción en unidades de 100 g.
+  - Restricciones duras: `required_tags` y `meal_tag_limits` por comida, máximo 5 items por
+    comida, `MAX_DUPLICATES_PER_ITEM` por item del catálogo entre comidas, porción 30–450 g.
+  - Objetivo: desviación L1 relativa de kcal totales y de proteínas/carbohidratos/grasas
+    respecto de `MACRO_TARGETS_PER_KG`, más una penalización menor por desbalance entre
+    comidas y por usar `FALLBACK_ITEMS` en vez de alimentos del catálogo.
+
+Los candidatos de cada comida salen del índice del composer (mismo orden por objetivo que el
+greedy) más los items que eligió el greedy, que se usa como solución de partida: si el solver
+no encuentra algo mejor dentro del presupuesto de tiempo se conserva el resultado greedy.
+Requiere SciPy (HiGHS vía `scipy.optimize.milp`); sin SciPy `solve_meals_milp` devuelve None.
+"""
+from __future__ import annotations
+
+from typing import Any, Dict, List, Optional, Tuple
+
+from .catalog import FoodCatalog
+from . import composer
+
+try:  # pragma: no cover - optional dependency
+    import numpy as np  # type: ignore
+    from scipy.optimize import Bounds, LinearConstraint, milp  # type: ignore
+except Exception:  # pragma: no cover - optional dependency
+    np = None
+    milp = None
+
+# Candidatos por comida: primeros N del orden por objetivo + N por tag requerido
+POOL_TOP_N = 24
+POOL_PER_TAG = 8
+# Pesos del objetivo (desviaciones relativas)
+WEIGHT_KCAL = 4.0
+WEIGHT_MACRO = 1.0
+WEIGHT_MEAL_BALANCE = 0.25
+FALLBACK_PENALTY = 0.02
+
+
+def available() -> bool:
+    return milp is not None
+
+
+def _candidate_pool(
+    index: "composer._ComposerIndex",
+    view: "composer._RankedView",
+    allowed: int,
+    m: int,
+    template: Dict[str, Any],
+    warm_ids: List[str],
+) -> List[int]:
+    """Posiciones de catálogo candidatas para la comida m (sin repetir, en orden de objetivo)."""
+    full = (1 << len(view.order)) - 1
+    base = allowed
+    if not template.get("allow_sweets", False):
+        base &= full ^ view.sweet_bits
+    tag_bit = {tag: view.tag_bits[i] for i, tag in enumerate(composer._TAG_NAMES)}
+    for tag, limit in (template.get("meal_tag_limits") or {}).items():
+        if limit <= 0 and tag in tag_bit:
+            base &= ~tag_bit[tag]
+
+    ranks: List[int] = []
+    seen = set()
+
+    def take(mask: int, n: int) -> None:
+        while mask and n > 0:
+            r = (mask & -mask).bit_length() - 1
+            mask &= mask - 1
+            if r not in seen:
+                seen.add(r)
+                ranks.append(r)
+                n -= 1
+
+    keyword_mask = view.keyword_bits[m] if m < len(view.keyword_bits) and template.get("keywords") else full
+    take(base & keyword_mask, POOL_TOP_N)
+    take(base, POOL_TOP_N // 2)
+    for tag in template.get("required_tags", []):
+        take(base & tag_bit.get(tag, 0), POOL_PER_TAG)
+    for cid in warm_ids:
+        bits = view.group_bits.get(cid, 0) & allowed
+        take(bits, 1)
+    return [view.order[r] for r in ranks]
+
+
+def _fallback_candidates() -> List[Tuple[Dict[str, Any], set]]:
+    out = []
+    for key, fb in composer.FALLBACK_ITEMS.items():
+        tags = set(composer._tags_for_text(str(fb.get("name", "")).lower()))
+        if key in composer.TAG_KEYWORDS:
+            tags.add(key)
+        out.append((fb, tags))
+    return out
+
+
+def solve_meals_milp(
+    catalog: FoodCatalog,
+    exclude_allergens: Optional[List[str]],
+    n_meals: int,
+    target_kcal: float,
+    group: str,
+    weight_kg: Optional[float],
+    warm_meals: List[Dict[str, Any]],
+    time_budget_s: float = 1.0,
+) -> Optional[List[Dict[str, Any]]]:
+    """Resuelve el menú con MILP. Devuelve comidas en el formato de `compose_diet` o None."""
+    if milp is None or n_meals <= 0:
+        return None
+    index = composer._composer_index(catalog)
+    view = index.view(group)
+    allowed = index.allowed_bits(view, group, exclude_allergens)
+    if not allowed:
+        return None
+    if index.conflicting_groups:
+        view = view.patched(index, allowed)
+
+    weight_ref = weight_kg or 70.0
+    macro_targets = {k: v * weight_ref for k, v in composer.MACRO_TARGETS_PER_KG.items()}
+    meal_target = float(target_kcal) / n_meals
+    fallbacks = _fallback_candidates()
+    rank_tags = {tag: view.tag_bits[i] for i, tag in enumerate(composer._TAG_NAMES)}
+
+    # (meal, item dict, tags, cid or None for fallbacks)
+    slots: List[Tuple[int, Dict[str, Any], set, Optional[str]]] = []
+    for m in range(n_meals):
+        template = composer._meal_template_for_index(m)
+        warm_ids = [it.get("id") or it.get("name") for it in (warm_meals[m].get("items", []) if m < len(warm_meals) else [])]
+        for pos in _candidate_pool(index, view, allowed, m, template, [w for w in warm_ids if w]):
+            r = view.rank[pos]
+            tags = {tag for tag, bits in rank_tags.items() if bits >> r & 1}
+            slots.append((m, index.items[pos], tags, index.cids[pos]))
+        for fb, tags in fallbacks:
+            slots.append((m, fb, tags, None))
+
+    n_slots = len(slots)
+    # variables: y[0..S), q[S..2S), then deviations (pos/neg) for kcal + 3 macros + per-meal kcal
+    n_dev = 2 * (4 + n_meals)
+    n_vars = 2 * n_slots + n_dev
+    y0, q0, d0 = 0, n_slots, 2 * n_slots
+
+    def col(slot: int, var: str) -> int:
+        return (y0 if var == "y" else q0) + slot
+
+    nutrients = np.array([
+        [
+            float(it.get("energy_kcal_100g") or 0.0),
+            float(it.get("proteins_g_100g") or 0.0),
+            float(it.get("carbs_g_100g") or 0.0),
+            float(it.get("fats_g_100g") or 0.0),
+        ]
+        for _, it, _, _ in slots
+    ])
+
+    rows: List[np.ndarray] = []
+    lower: List[float] = []
+    upper: List[float] = []
+
+    def add_row(coeffs: Dict[int, float], lo: float, hi: float) -> None:
+        row = np.zeros(n_vars)
+        for c, v in coeffs.items():
+            row[c] += v
+        rows.append(row)
+        lower.append(lo)
+        upper.append(hi)
+
+    # porción ligada a la selección: 0.3*y <= q <= 4.5*y
+    for s in range(n_slots):
+        add_row({col(s, "q"): 1.0, col(s, "y"): -0.3}, 0.0, np.inf)
+        add_row({col(s, "q"): 1.0, col(s, "y"): -4.5}, -np.inf, 0.0)
+
+    by_meal: Dict[int, List[int]] = {}
+    by_cid: Dict[str, List[int]] = {}
+    for s, (m, _, _, cid) in enumerate(slots):
+        by_meal.setdefault(m, []).append(s)
+        if cid:
+            by_cid.setdefault(cid, []).append(s)
+
+    for m in range(n_meals):
+        template = composer._meal_template_for_index(m)
+        meal_slots = by_meal.get(m, [])
+        add_row({col(s, "y"): 1.0 for s in meal_slots}, 1.0, 5.0)
+        for tag in template.get("required_tags", []):
+            add_row({col(s, "y"): 1.0 for s in meal_slots if tag in slots[s][2]}, 1.0, np.inf)
+        for tag, limit in (template.get("meal_tag_limits") or {}).items():
+            tagged = {col(s, "y"): 1.0 for s in meal_slots if tag in slots[s][2]}
+            if tagged:
+                add_row(tagged, -np.inf, float(limit))
+        # desviación de kcal por comida
+        dev = d0 + 2 * (4 + m)
+        coeffs = {col(s, "q"): nutrients[s, 0] for s in meal_slots}
+        coeffs[dev] = -1.0
+        coeffs[dev + 1] = 1.0
+        add_row(coeffs, meal_target, meal_target)
+
+    for slots_for_id in by_cid.values():
+        add_row({col(s, "y"): 1.0 for s in slots_for_id}, -np.inf, float(composer.MAX_DUPLICATES_PER_ITEM))
+
+    targets = [float(target_kcal), macro_targets["protein"], macro_targets["carbs"], macro_targets["fats"]]
+    for k, target in enumerate(targets):
+        dev = d0 + 2 * k
+        coeffs = {col(s, "q"): nutrients[s, k] for s in range(n_slots)}
+        coeffs[dev] = -1.0
+        coeffs[dev + 1] = 1.0
+        add_row(coeffs, target, target)
+
+    c = np.zeros(n_vars)
+    for k, target in enumerate(targets):
+        weight = WEIGHT_KCAL if k == 0 else WEIGHT_MACRO
+        c[d0 + 2 * k] = c[d0 + 2 * k + 1] = weight / max(target, 1.0)
+    for m in range(n_meals):
+        c[d0 + 2 * (4 + m)] = c[d0 + 2 * (4 + m) + 1] = WEIGHT_MEAL_BALANCE / n_meals / max(meal_target, 1.0)
+    for s, (_, _, _, cid) in enumerate(slots):
+        if cid is None:
+            c[col(s, "y")] = FALLBACK_PENALTY
+
+    integrality = np.zeros(n_vars)
+    integrality[y0:y0 + n_slots] = 1
+    lb = np.zeros(n_vars)
+    ub = np.full(n_vars, np.inf)
+    ub[y0:y0 + n_slots] = 1.0
+    ub[q0:q0 + n_slots] = 4.5
+
+    result = milp(
+        c,
+        constraints=LinearConstraint(np.vstack(rows), np.array(lower), np.array(upper)),
+        integrality=integrality,
+        bounds=Bounds(lb, ub),
+        options={"time_limit": max(0.05, float(time_budget_s)), "disp": False},
+    )
+    if result.x is None:
+        return None
+
+    x = result.x
+    meals: List[Dict[str, Any]] = []
+    for m in range(n_meals):
+        template = composer._meal_template_for_index(m)
+        meal: Dict[str, Any] = {"name": template.get("name", f"Comida {m+1}"), "items": [], "kcal": 0.0, "notes": template.get("note")}
+        for s in by_meal.get(m, []):
+            if x[col(s, "y")] < 0.5:
+                continue
+            qty = int(round(x[col(s, "q")] * 100 / 5.0) * 5)
+            composer._add_item_to_meal(meal, slots[s][1], max(30, min(450, qty)))
+        meals.append(meal)
+    return meals
@@ -0,0 +1,238 @@
+"""Logging sin bloqueo: cola acotada + hilo escritor con escrituras por lotes.
+
+Antes el `RotatingFileHandler` de la app y el `FileHandler` de metricas
+escribian (y hacian flush) dentro del hilo del request, varias veces por cada
+`/chat/send`. Con `LogPipeline`:
+
+- El logger solo tiene un `DroppingQueueHandler`: encolar es un `append` a un
+  deque y no toca disco. El mensaje se resuelve al encolar (`getMessage`), pero
+  el formato final y las trazas de excepciones quedan para el hilo escritor.
+- `submit` encola un mensaje crudo (los eventos de `MetricsCollector`): el
+  `LogRecord` y el `json.dumps` se hacen recien en el hilo escritor.
+- La cola es acotada (`queue_max`): si el disco no da abasto se descartan los
+  registros nuevos y se cuentan (`stats()["dropped"]` y el gauge
+  `log_dropped_total`) en vez de frenar los requests.
+- El hilo escritor vacia la cola en lotes de hasta `batch_max`, los escribe sin
+  flush por registro y hace un solo flush por lote.
+- `stop()` (tambien via atexit) vacia la cola antes de cerrar los handlers.
+"""
+from __future__ import annotations
+
+import atexit
+import logging
+import os
+import threading
+from collections import deque
+from logging.handlers import QueueHandler, RotatingFileHandler
+from typing import Any, Callable, Deque, Dict, List, Optional, Sequence
+
+_pipelines: Dict[str, "LogPipeline"] = {}
+_registry_lock = threading.Lock()
+
+
+class _BatchFlushMixin:
+    """Handlers de archivo que posponen el flush hasta el final del lote."""
+
+    _deferred = False
+
+    def flush(self) -> None:
+        if not self._deferred:
+            super().flush()
+
+    def emit_batch(self, records: Sequence[logging.LogRecord]) -> None:
+        self._deferred = True
+        try:
+            for record in records:
+                if record.levelno >= self.level:
+                    self.handle(record)
+        finally:
+            self._deferred = False
+            self.flush()
+
+
+class BatchedFileHandler(_BatchFlushMixin, logging.FileHandler):
+    pass
+
+
+class BatchedRotatingFileHandler(_BatchFlushMixin, RotatingFileHandler):
+    pass
+
+
+class BatchedStreamHandler(_BatchFlushMixin, logging.StreamHandler):
+    pass
+
+
+class DroppingQueueHandler(QueueHandler):
+    def __init__(self, pipeline: "LogPipeline") -> None:
+        super().__init__(pipeline.buffer)
+        self.pipeline = pipeline
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Mismo proceso: no hace falta volver el registro picklable ni formatearlo aca.
+        if record.args:
+            record.msg = record.getMessage()
+            record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        self.pipeline.put(record)
+
+
+class LogPipeline:
+    def __init__(
+        self,
+        name: str,
+        handlers: Sequence[logging.Handler],
+        *,
+        queue_max: int = 10000,
+        batch_max: int = 256,
+        idle_wait_s: float = 0.5,
+    ) -> None:
+        self.name = name
+        self.handlers: List[logging.Handler] = list(handlers)
+        # deque: append/popleft son atomicos sin tomar un lock por registro (a diferencia
+        # de queue.Queue); el tope se chequea con len() y puede pasarse por unos pocos.
+        self.buffer: Deque[Any] = deque()
+        self.queue_max = max(1, int(queue_max))
+        self.batch_max = max(1, int(batch_max))
+        self.idle_wait_s = idle_wait_s
+        self.handler = DroppingQueueHandler(self)
+        self._wakeup = threading.Event()
+        self._stopping = False
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self._drop_lock = threading.Lock()
+        # `dropped` lo suben los hilos de request (con lock); el resto solo el hilo escritor.
+        self._counts = {"written": 0, "dropped": 0, "batches": 0, "errors": 0}
+
+    def start(self) -> "LogPipeline":
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+                return self
+            # Tras un fork el hilo escritor no existe en el hijo: se crea de nuevo.
+            self._pid = os.getpid()
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name=f"log-{self.name}", daemon=True)
+            self._thread.start()
+        return self
+
+    def put(self, item: Any) -> None:
+        """Encola un `LogRecord` o un mensaje crudo (`submit`); descarta si la cola esta llena."""
+        if self._pid != os.getpid():
+            self.start()
+        if len(self.buffer) >= self.queue_max:
+            with self._drop_lock:
+                self._counts["dropped"] += 1
+                dropped = self._counts["dropped"]
+            _publish_dropped(self.name, dropped)
+            return
+        self.buffer.append(item)
+        if not self._wakeup.is_set():
+            self._wakeup.set()
+
+    def submit(self, message: Any) -> None:
+        """Encola un mensaje sin crear el `LogRecord` en el hilo que llama (lo arma el escritor)."""
+        self.put(message)
+
+    def pending(self) -> int:
+        return len(self.buffer)
+
+    def stop(self, timeout: float = 5.0) -> None:
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+        if thread is None or self._pid != os.getpid():
+            return
+        self._stopping = True
+        self._wakeup.set()
+        thread.join(timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        data = dict(self._counts)
+        data["pending"] = len(self.buffer)
+        return data
+
+    def _run(self) -> None:
+        buffer = self.buffer
+        while True:
+            self._wakeup.wait(self.idle_wait_s)
+            # Limpiar antes de vaciar: un `put` posterior vuelve a despertar al hilo.
+            self._wakeup.clear()
+            while buffer:
+                batch = []
+                while buffer and len(batch) < self.batch_max:
+                    batch.append(buffer.popleft())
+                self._write(batch)
+            if self._stopping:
+                return
+
+    def _write(self, batch: List[Any]) -> None:
+        records = [item if isinstance(item, logging.LogRecord) else self._record(item) for item in batch]
+        for handler in self.handlers:
+            try:
+                if isinstance(handler, _BatchFlushMixin):
+                    handler.emit_batch(records)
+                else:
+                    for record in records:
+                        if record.levelno >= handler.level:
+                            handler.handle(record)
+            except Exception:
+                self._counts["errors"] += 1
+        self._counts["written"] += len(records)
+        self._counts["batches"] += 1
+
+    def _record(self, message: Any) -> logging.LogRecord:
+        return logging.makeLogRecord(
+            {"name": self.name, "msg": message, "levelno": logging.INFO, "levelname": "INFO"}
+        )
+
+
+def _publish_dropped(name: str, total: int) -> None:
+    try:
+        from .metrics import metrics
+    except Exception:  # pragma: no cover - import circular en el arranque
+        return
+    # Gauge (no contador): `inc_counter` vuelve a loguear y el log es lo que se esta descartando.
+    metrics.set_gauge("log_dropped_total", total, tags={"pipeline": name})
+
+
+def install_pipeline(
+    logger: logging.Logger,
+    name: str,
+    make_handlers: Callable[[], Sequence[logging.Handler]],
+    *,
+    queue_max: int = 10000,
+    batch_max: int = 256,
+) -> LogPipeline:
+    """Agrega a `logger` el handler de cola del pipeline `name`.
+
+    Idempotente: `create_app` corre varias veces por proceso (tests, scripts) y
+    `make_handlers` solo se llama la primera, asi no se abren archivos de mas.
+    """
+    with _registry_lock:
+        pipeline = _pipelines.get(name)
+        if pipeline is None:
+            pipeline = LogPipeline(name, make_handlers(), queue_max=queue_max, batch_max=batch_max)
+            _pipelines[name] = pipeline
+    if pipeline.handler not in logger.handlers:
+        logger.addHandler(pipeline.handler)
+    return pipeline.start()
+
+
+def pipeline_stats() -> Dict[str, Dict[str, Any]]:
+    with _registry_lock:
+        pipelines = list(_pipelines.values())
+    return {pipeline.name: pipeline.stats() for pipeline in pipelines}
+
+
+def shutdown_pipelines() -> None:
+    with _registry_lock:
+        pipelines = list(_pipelines.values())
+    for pipeline in pipelines:
+        pipeline.stop()
+        for handler in pipeline.handlers:
+            handler.close()
+
+
+atexit.register(shutdown_pipelines)
@@ -1,4 +1,8 @@
-"""Colección simple de métricas en memoria con volcado a log."""
+"""Colección simple de métricas en memoria con volcado a log.
+
+Con `attach_shared` (ver `shared.py`) cada escritura tambien va al archivo mmap
+del proceso y `snapshot`/`collect` agregan los de todos los workers.
+"""
 
 from __future__ import annotations
 
@@ -9,6 +13,10 @@ import time
 from collections import defaultdict
 from typing import Any, Dict, Iterable, Mapping, MutableMapping, Optional, Tuple
 
+from ..log_pipeline import BatchedFileHandler, BatchedStreamHandler, LogPipeline, install_pipeline
+from .shared import COUNTER, GAUGE, LAT_BUCKET, LAT_COUNT, LAT_MAX, LAT_TOTAL, SharedMetricsStore
+from .sketch import LatencySketch
+
 _EMPTY_TAGS: Tuple[Tuple[str, str], ...] = tuple()
 
 
@@ -28,12 +36,27 @@ class MetricsCollector:
         self._counters: MutableMapping[Tuple[str, Tuple[Tuple[str, str], ...]], int] = defaultdict(int)
         self._latency: MutableMapping[
             Tuple[str, Tuple[Tuple[str, str], ...]], Dict[str, float]
-        ] = defaultdict(lambda: {"count": 0, "total": 0.0, "max": 0.0})
+        ] = defaultdict(lambda: {"count": 0, "total": 0.0, "max": 0.0, "buckets": {}})
+        self._gauges: MutableMapping[Tuple[str, Tuple[Tuple[str, str], ...]], float] = {}
         self._lock = threading.Lock()
         self._logger: Optional[logging.Logger] = None
+        self._pipeline: Optional[LogPipeline] = None
+        self._shared: Optional[SharedMetricsStore] = None
+        self.indexer = LatencySketch()
+
+    def attach_shared(self, store: Optional[SharedMetricsStore]) -> None:
+        """Agrega entre procesos a traves de `store`; None vuelve a memoria del proceso."""
+        with self._lock:
+            self._shared = store
+
+    @property
+    def shared(self) -> Optional[SharedMetricsStore]:
+        return self._shared
 
-    def set_logger(self, logger: logging.Logger) -> None:
+    def set_logger(self, logger: logging.Logger, *, pipeline: Optional[LogPipeline] = None) -> None:
+        """Con `pipeline` el evento va directo a su cola: ni `LogRecord` ni `json.dumps` en el request."""
         self._logger = logger
+        self._pipeline = pipeline
 
     def _log_event(self, kind: str, name: str, value: float, tags: Tuple[Tuple[str, str], ...]) -> None:
         if not self._logger:
@@ -46,7 +69,11 @@ class MetricsCollector:
             "tags": dict(tags),
         }
         try:
-            self._logger.info(json.dumps(payload, ensure_ascii=False))
+            # El dict se serializa en el formatter (`_JsonMessageFormatter`), fuera del request.
+            if self._pipeline is not None:
+                self._pipeline.submit(payload)
+            else:
+                self._logger.info(payload)
         except Exception:
             # No rompemos métricas por problemas de logging.
             pass
@@ -55,52 +82,147 @@ class MetricsCollector:
         key_tags = _tags_key(tags)
         with self._lock:
             self._counters[(name, key_tags)] += value
+            if self._shared is not None:
+                self._shared.add(COUNTER, name, key_tags, value)
         self._log_event("counter", name, value, key_tags)
 
     def observe_latency(self, name: str, ms: float, *, tags: Optional[Mapping[str, Any]] = None) -> None:
         key_tags = _tags_key(tags)
+        idx = self.indexer.index(ms)
         with self._lock:
             stats = self._latency[(name, key_tags)]
             stats["count"] += 1
             stats["total"] += ms
             if ms > stats["max"]:
                 stats["max"] = ms
+            stats["buckets"][idx] = stats["buckets"].get(idx, 0) + 1
+            shared = self._shared
+            if shared is not None:
+                shared.add(LAT_COUNT, name, key_tags, 1)
+                shared.add(LAT_TOTAL, name, key_tags, ms)
+                shared.set_max(LAT_MAX, name, key_tags, ms)
+                shared.add(LAT_BUCKET, name, key_tags, 1, idx)
         self._log_event("latency", name, ms, key_tags)
 
-    def snapshot(self) -> Dict[str, Iterable[Dict[str, Any]]]:
+    def set_gauge(
+        self, name: str, value: float, *, tags: Optional[Mapping[str, Any]] = None, mode: str = "all"
+    ) -> None:
+        """Valor instantaneo (limites, colas). No se vuelca al log: cambia en cada request.
+
+        `mode` dice como se combina entre workers con store compartido: `all` (una serie
+        por worker, etiqueta `pid`), `livesum`, `max` o `min`.
+        """
+        key_tags = _tags_key(tags)
+        with self._lock:
+            self._gauges[(name, key_tags)] = value
+            if self._shared is not None:
+                self._shared.set(GAUGE, name, key_tags, value, mode)
+
+    def collect(self) -> Dict[str, Any]:
+        """Estado crudo `{"counters", "gauges", "latency", "workers"}` (agregado si hay store compartido)."""
+        shared = self._shared
+        if shared is not None:
+            return shared.collect()
         with self._lock:
-            counters = [
-                {"name": name, "value": value, "tags": dict(tags)}
-                for (name, tags), value in self._counters.items()
-            ]
-            latency = []
-            for (name, tags), stats in self._latency.items():
-                count = max(1, stats["count"])
-                latency.append(
-                    {
-                        "name": name,
-                        "count": stats["count"],
-                        "avg_ms": round(stats["total"] / count, 2),
-                        "max_ms": round(stats["max"], 2),
-                        "tags": dict(tags),
-                    }
-                )
-        return {"counters": counters, "latency": latency}
+            return {
+                "counters": dict(self._counters),
+                "gauges": dict(self._gauges),
+                "latency": {
+                    key: {**stats, "buckets": dict(stats["buckets"])} for key, stats in self._latency.items()
+                },
+                "workers": 1,
+            }
+
+    def latency_sketch(self, stats: Mapping[str, Any]) -> LatencySketch:
+        """Reconstruye un `LatencySketch` a partir de los buckets de `collect()`."""
+        sketch = LatencySketch(self.indexer.relative_accuracy, self.indexer.min_value)
+        for idx, n in stats["buckets"].items():
+            if idx is None:
+                sketch.zero += int(n)
+            else:
+                sketch.counts[int(idx)] = sketch.counts.get(int(idx), 0) + int(n)
+        sketch.count = int(stats["count"])
+        sketch.total = float(stats["total"])
+        sketch.min = 0.0
+        sketch.max = float(stats["max"])
+        return sketch
+
+    def snapshot(self) -> Dict[str, Iterable[Dict[str, Any]]]:
+        data = self.collect()
+        counters = [
+            {"name": name, "value": _number(value), "tags": dict(tags)}
+            for (name, tags), value in data["counters"].items()
+        ]
+        latency = []
+        for (name, tags), stats in data["latency"].items():
+            count = max(1, stats["count"])
+            quantiles = self.latency_sketch(stats).quantiles((0.5, 0.95, 0.99))
+            latency.append(
+                {
+                    "name": name,
+                    "count": _number(stats["count"]),
+                    "avg_ms": round(stats["total"] / count, 2),
+                    "max_ms": round(stats["max"], 2),
+                    "p50_ms": round(quantiles[0.5], 2),
+                    "p95_ms": round(quantiles[0.95], 2),
+                    "p99_ms": round(quantiles[0.99], 2),
+                    "tags": dict(tags),
+                }
+            )
+        gauges = [
+            {"name": name, "value": _number(value), "tags": dict(tags)}
+            for (name, tags), value in data["gauges"].items()
+        ]
+        return {"counters": counters, "latency": latency, "gauges": gauges, "workers": data["workers"]}
+
+
+def _number(value: float) -> float:
+    # Los archivos compartidos guardan doubles; los conteos vuelven como int.
+    return int(value) if isinstance(value, float) and value.is_integer() else value
 
 
 metrics = MetricsCollector()
 
 
-def setup_metrics_logger(app_logger: logging.Logger) -> None:
+class _JsonMessageFormatter(logging.Formatter):
+    """Serializa el payload del evento al escribir (en el hilo del pipeline si es asincrono)."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        if isinstance(record.msg, dict):
+            return json.dumps(record.msg, ensure_ascii=False)
+        return super().format(record)
+
+
+def _metrics_log_handler(async_enabled: bool) -> logging.Handler:
+    try:
+        handler: logging.Handler = (BatchedFileHandler if async_enabled else logging.FileHandler)(
+            "backend/logs/metrics.log", encoding="utf-8"
+        )
+    except Exception:
+        handler = BatchedStreamHandler() if async_enabled else logging.StreamHandler()
+    handler.setFormatter(_JsonMessageFormatter("%(message)s"))
+    return handler
+
+
+def setup_metrics_logger(
+    app_logger: logging.Logger,
+    *,
+    async_enabled: bool = True,
+    queue_max: int = 10000,
+    batch_max: int = 256,
+) -> None:
     logger = logging.getLogger("metrics")
     logger.setLevel(logging.INFO)
     logger.propagate = False
-    if not logger.handlers:
-        handler = None
-        try:
-            handler = logging.FileHandler("backend/logs/metrics.log", encoding="utf-8")
-        except Exception:
-            handler = logging.StreamHandler()
-        handler.setFormatter(logging.Formatter("%(message)s"))
-        logger.addHandler(handler)
-    metrics.set_logger(logger)
+    pipeline = None
+    if async_enabled:
+        pipeline = install_pipeline(
+            logger,
+            "metrics",
+            lambda: [_metrics_log_handler(True)],
+            queue_max=queue_max,
+            batch_max=batch_max,
+        )
+    elif not logger.handlers:
+        logger.addHandler(_metrics_log_handler(False))
+    metrics.set_logger(logger, pipeline=pipeline)
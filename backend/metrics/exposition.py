@@ -0,0 +1,76 @@
+"""Formato de texto de Prometheus (0.0.4) para `MetricsCollector.collect()`.
+
+Contadores y gauges salen tal cual; cada latencia sale como histograma con
+buckets `le` fijos en ms. Los buckets del sketch se ubican por su cota superior
+(recortada al maximo observado), igual que los cuantiles de `/metrics/summary`.
+"""
+from __future__ import annotations
+
+import re
+from typing import Any, Dict, Iterable, List, Mapping, Sequence, Tuple
+
+from .sketch import LatencySketch
+
+DEFAULT_BUCKETS_MS: Tuple[float, ...] = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+_INVALID = re.compile(r"[^a-zA-Z0-9_:]")
+
+
+def _metric_name(name: str) -> str:
+    cleaned = _INVALID.sub("_", name)
+    return f"_{cleaned}" if cleaned[:1].isdigit() else cleaned
+
+
+def _labels(tags: Iterable[Tuple[str, str]], extra: Sequence[Tuple[str, str]] = ()) -> str:
+    parts = []
+    for key, value in list(tags) + list(extra):
+        escaped = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        parts.append(f'{_metric_name(key)}="{escaped}"')
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _value(value: float) -> str:
+    value = float(value)
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+def _grouped(entries: Mapping[Tuple[str, Any], Any]) -> Dict[str, List[Tuple[Any, Any]]]:
+    groups: Dict[str, List[Tuple[Any, Any]]] = {}
+    for (name, tags), value in sorted(entries.items(), key=lambda item: (item[0][0], item[0][1])):
+        groups.setdefault(_metric_name(name), []).append((tags, value))
+    return groups
+
+
+def render_prometheus(
+    data: Mapping[str, Any],
+    indexer: LatencySketch,
+    *,
+    buckets_ms: Sequence[float] = DEFAULT_BUCKETS_MS,
+) -> str:
+    lines: List[str] = []
+    for name, series in _grouped(data["counters"]).items():
+        lines.append(f"# TYPE {name} counter")
+        lines.extend(f"{name}{_labels(tags)} {_value(value)}" for tags, value in series)
+    for name, series in _grouped(data["gauges"]).items():
+        lines.append(f"# TYPE {name} gauge")
+        lines.extend(f"{name}{_labels(tags)} {_value(value)}" for tags, value in series)
+    bounds = sorted(float(b) for b in buckets_ms)
+    for name, series in _grouped(data["latency"]).items():
+        lines.append(f"# TYPE {name} histogram")
+        for tags, stats in series:
+            per_bound = [0.0] * (len(bounds) + 1)
+            for idx, n in stats["buckets"].items():
+                upper = min(indexer.bucket_value(None if idx is None else int(idx)), float(stats["max"]))
+                slot = next((i for i, bound in enumerate(bounds) if upper <= bound), len(bounds))
+                per_bound[slot] += n
+            running = 0.0
+            for bound, n in zip(bounds, per_bound):
+                running += n
+                lines.append(f"{name}_bucket{_labels(tags, [('le', _value(bound))])} {_value(running)}")
+            lines.append(f"{name}_bucket{_labels(tags, [('le', '+Inf')])} {_value(stats['count'])}")
+            lines.append(f"{name}_sum{_labels(tags)} {_value(stats['total'])}")
+            lines.append(f"{name}_count{_labels(tags)} {_value(stats['count'])}")
+    lines.append("# TYPE metrics_workers gauge")
+    lines.append(f"metrics_workers {_value(data.get('workers', 1))}")
+    return "\n".join(lines) + "\n"
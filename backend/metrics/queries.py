@@ -0,0 +1,275 @@
+"""Perfilado de consultas SQL por request (opt-in con `SQL_PROFILER_ENABLED`).
+
+Se cuelga de los eventos `before/after_cursor_execute` del engine y, por cada
+request, junta cantidad de consultas, tiempo total de DB y cuantas veces se
+repitio cada sentencia (por *fingerprint*: literales y listas `IN (?, ?, ...)`
+normalizados). Al cerrar el request:
+
+- `sql_queries_total{route}` y `sql_request_db_ms{route}` en `backend.metrics`;
+- una sentencia repetida `SQL_NPLUS1_THRESHOLD` veces o mas en el mismo request
+  se marca como N+1 (`sql_n_plus_one_total{route}` + warning `sql_n_plus_one`);
+- las consultas sobre `SQL_SLOW_QUERY_MS` se loguean (`sql_slow_query`) aunque
+  ocurran fuera de un request.
+
+Los agregados por ruta y por fingerprint (acotados a `SQL_PROFILER_MAX_FINGERPRINTS`)
+se ven en GET /metrics/queries. `query_budget` sirve en tests para fijar un tope
+de consultas a un endpoint.
+"""
+from __future__ import annotations
+
+import logging
+import re
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional
+
+from sqlalchemy import event
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER_LIST = re.compile(r"\(\s*(?:\?|%s|%\(\w+\)s|:\w+)(?:\s*,\s*(?:\?|%s|%\(\w+\)s|:\w+))+\s*\)")
+_SPACES = re.compile(r"\s+")
+_FINGERPRINT_CACHE_MAX = 2048
+
+
+def fingerprint(statement: str) -> str:
+    """Sentencia normalizada: mismos fingerprints = misma consulta con otros parametros."""
+    text = _STRING.sub("?", statement)
+    text = _NUMBER.sub("?", text)
+    text = _PLACEHOLDER_LIST.sub("(?+)", text)
+    return _SPACES.sub(" ", text).strip()
+
+
+class _RequestStats:
+    __slots__ = ("route", "queries", "db_ms", "fingerprints")
+
+    def __init__(self, route: str) -> None:
+        self.route = route
+        self.queries = 0
+        self.db_ms = 0.0
+        self.fingerprints: Dict[str, List[float]] = {}  # fingerprint -> [veces, ms]
+
+
+_current: ContextVar[Optional[_RequestStats]] = ContextVar("sql_request_stats", default=None)
+
+
+class QueryProfiler:
+    def __init__(
+        self,
+        *,
+        slow_query_ms: float = 200.0,
+        n_plus_one_threshold: int = 5,
+        max_fingerprints: int = 200,
+    ) -> None:
+        self.slow_query_ms = max(0.0, float(slow_query_ms))
+        self.n_plus_one_threshold = max(2, int(n_plus_one_threshold))
+        self.max_fingerprints = max(1, int(max_fingerprints))
+        self._lock = threading.Lock()
+        self._fingerprints: Dict[str, str] = {}  # sentencia -> fingerprint (cache)
+        self._routes: Dict[str, Dict[str, Any]] = {}
+        self._statements: Dict[str, Dict[str, Any]] = {}
+        self._dropped_fingerprints = 0
+
+    @classmethod
+    def from_config(cls, config) -> Optional["QueryProfiler"]:
+        if not config.get("SQL_PROFILER_ENABLED", False):
+            return None
+        return cls(
+            slow_query_ms=float(config.get("SQL_SLOW_QUERY_MS", 200.0)),
+            n_plus_one_threshold=int(config.get("SQL_NPLUS1_THRESHOLD", 5)),
+            max_fingerprints=int(config.get("SQL_PROFILER_MAX_FINGERPRINTS", 200)),
+        )
+
+    # -------- engine --------
+    def attach(self, engine) -> None:
+        event.listen(engine, "before_cursor_execute", self._before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", self._after_cursor_execute)
+
+    def detach(self, engine) -> None:
+        event.remove(engine, "before_cursor_execute", self._before_cursor_execute)
+        event.remove(engine, "after_cursor_execute", self._after_cursor_execute)
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        conn.info.setdefault("_profiler_started", []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        started = conn.info.get("_profiler_started")
+        if not started:
+            return
+        elapsed_ms = (time.perf_counter() - started.pop()) * 1000.0
+        fp = self._fingerprint(statement)
+        stats = _current.get()
+        if stats is not None:
+            stats.queries += 1
+            stats.db_ms += elapsed_ms
+            entry = stats.fingerprints.get(fp)
+            if entry is None:
+                stats.fingerprints[fp] = [1, elapsed_ms]
+            else:
+                entry[0] += 1
+                entry[1] += elapsed_ms
+        if self.slow_query_ms and elapsed_ms >= self.slow_query_ms:
+            route = stats.route if stats is not None else "-"
+            metrics.inc_counter("sql_slow_query_total", tags={"route": route})
+            logger.warning(
+                "sql_slow_query",
+                extra={"route": route, "elapsed_ms": round(elapsed_ms, 1), "statement": fp[:500]},
+            )
+
+    def _fingerprint(self, statement: str) -> str:
+        fp = self._fingerprints.get(statement)
+        if fp is None:
+            fp = fingerprint(statement)
+            if len(self._fingerprints) >= _FINGERPRINT_CACHE_MAX:
+                self._fingerprints.clear()
+            self._fingerprints[statement] = fp
+        return fp
+
+    # -------- requests --------
+    @contextmanager
+    def track(self, route: str) -> Iterator[_RequestStats]:
+        stats = _RequestStats(route)
+        token = _current.set(stats)
+        try:
+            yield stats
+        finally:
+            _current.reset(token)
+            self.finish(stats)
+
+    def finish(self, stats: _RequestStats) -> List[str]:
+        """Publica el request en metricas y agregados; devuelve los fingerprints N+1."""
+        suspects = [fp for fp, (count, _) in stats.fingerprints.items() if count >= self.n_plus_one_threshold]
+        if stats.queries:
+            metrics.inc_counter("sql_queries_total", value=stats.queries, tags={"route": stats.route})
+            metrics.observe_latency("sql_request_db_ms", stats.db_ms, tags={"route": stats.route})
+        for fp in suspects:
+            metrics.inc_counter("sql_n_plus_one_total", tags={"route": stats.route})
+            logger.warning(
+                "sql_n_plus_one",
+                extra={"route": stats.route, "count": int(stats.fingerprints[fp][0]), "statement": fp[:500]},
+            )
+        with self._lock:
+            route = self._routes.setdefault(
+                stats.route, {"requests": 0, "queries": 0, "db_ms": 0.0, "max_queries": 0, "n_plus_one": 0}
+            )
+            route["requests"] += 1
+            route["queries"] += stats.queries
+            route["db_ms"] += stats.db_ms
+            route["max_queries"] = max(route["max_queries"], stats.queries)
+            route["n_plus_one"] += 1 if suspects else 0
+            for fp, (count, elapsed_ms) in stats.fingerprints.items():
+                entry = self._statements.get(fp)
+                if entry is None:
+                    if len(self._statements) >= self.max_fingerprints:
+                        self._dropped_fingerprints += 1
+                        continue
+                    entry = self._statements[fp] = {
+                        "calls": 0, "db_ms": 0.0, "max_per_request": 0, "n_plus_one": 0, "routes": set()
+                    }
+                entry["calls"] += count
+                entry["db_ms"] += elapsed_ms
+                entry["max_per_request"] = max(entry["max_per_request"], count)
+                entry["n_plus_one"] += 1 if count >= self.n_plus_one_threshold else 0
+                if len(entry["routes"]) < 10:
+                    entry["routes"].add(stats.route)
+        return suspects
+
+    def snapshot(self, top: int = 20) -> Dict[str, Any]:
+        with self._lock:
+            routes = {
+                name: {
+                    **data,
+                    "db_ms": round(data["db_ms"], 2),
+                    "avg_queries": round(data["queries"] / data["requests"], 2) if data["requests"] else 0.0,
+                }
+                for name, data in self._routes.items()
+            }
+            statements = sorted(self._statements.items(), key=lambda item: item[1]["db_ms"], reverse=True)
+            top_statements = [
+                {
+                    "statement": fp,
+                    "calls": data["calls"],
+                    "db_ms": round(data["db_ms"], 2),
+                    "max_per_request": data["max_per_request"],
+                    "n_plus_one": data["n_plus_one"],
+                    "routes": sorted(data["routes"]),
+                }
+                for fp, data in statements[: max(0, int(top))]
+            ]
+            dropped = self._dropped_fingerprints
+        return {
+            "slow_query_ms": self.slow_query_ms,
+            "n_plus_one_threshold": self.n_plus_one_threshold,
+            "routes": routes,
+            "statements": top_statements,
+            "untracked_fingerprints": dropped,
+        }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._routes.clear()
+            self._statements.clear()
+            self._dropped_fingerprints = 0
+
+    def init_app(self, app, engine) -> None:
+        """Perfila cada request de `app` (ruta = endpoint de Flask) sobre `engine`."""
+        from flask import g, request
+
+        self.attach(engine)
+
+        @app.before_request
+        def _start_sql_profile():
+            route = request.url_rule.rule if request.url_rule is not None else "<unmatched>"
+            manager = self.track(f"{request.method} {route}")
+            manager.__enter__()
+            g._sql_profile = manager
+
+        @app.teardown_request
+        def _finish_sql_profile(_exc):
+            manager = g.pop("_sql_profile", None)
+            if manager is not None:
+                manager.__exit__(None, None, None)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class QueryBudget:
+    """Resultado de `query_budget`: consultas vistas dentro del bloque."""
+
+    def __init__(self) -> None:
+        self.statements: List[str] = []
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        self.statements.append(statement)
+
+
+@contextmanager
+def query_budget(engine, max_queries: Optional[int] = None) -> Iterator[QueryBudget]:
+    """Cuenta las consultas emitidas en el bloque y falla si superan `max_queries`.
+
+    Uso en tests::
+
+        with query_budget(db.engine, max_queries=2):
+            client.get("/classes/my-bookings")
+    """
+    budget = QueryBudget()
+    event.listen(engine, "after_cursor_execute", budget._record)
+    try:
+        yield budget
+    finally:
+        event.remove(engine, "after_cursor_execute", budget._record)
+    if max_queries is not None and budget.count > max_queries:
+        listing = "\n".join(f"  {i + 1}. {fingerprint(s)[:200]}" for i, s in enumerate(budget.statements))
+        raise QueryBudgetExceeded(f"Se esperaban <= {max_queries} consultas y hubo {budget.count}:\n{listing}")
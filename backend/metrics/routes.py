@@ -1,8 +1,9 @@
 from __future__ import annotations
 
-from flask import Blueprint, current_app, jsonify, request
+from flask import Blueprint, Response, current_app, jsonify, request, session
 
 from . import metrics
+from .exposition import CONTENT_TYPE, render_prometheus
 
 bp = Blueprint("metrics", __name__, url_prefix="/metrics")
 
@@ -35,3 +36,25 @@ def summary():
     if not _authorized():
         return jsonify({"error": "No autorizado"}), 401
     return jsonify(metrics.snapshot()), 200
+
+
+@bp.get("/prometheus")
+def prometheus():
+    if not _authorized():
+        return jsonify({"error": "No autorizado"}), 401
+    return Response(render_prometheus(metrics.collect(), metrics.indexer), content_type=CONTENT_TYPE)
+
+
+@bp.get("/queries")
+def queries():
+    """Agregados del perfilado SQL (por ruta y sentencias mas costosas)."""
+    if not (_authorized() or session.get("is_admin")):
+        return jsonify({"error": "No autorizado"}), 401
+    profiler = getattr(current_app, "query_profiler", None)
+    if profiler is None:
+        return jsonify({"enabled": False}), 200
+    try:
+        top = max(1, min(int(request.args.get("top", 20)), 200))
+    except (TypeError, ValueError):
+        top = 20
+    return jsonify({"enabled": True, **profiler.snapshot(top=top)}), 200
@@ -0,0 +1,260 @@
+"""Metricas compartidas entre workers de gunicorn sobre archivos mmap.
+
+Con varios workers cada uno tenia su `MetricsCollector` en memoria y
+`/metrics/summary` mostraba solo el worker que atendia. Con `METRICS_SHARED_DIR`
+cada proceso escribe en su propio archivo mmap (`<dir>/<generacion>/<pid>.metrics`)
+y la lectura suma los archivos de todos:
+
+- Sin locks entre procesos: cada archivo tiene un solo escritor (su proceso;
+  entre hilos lo protege el lock del collector). Una entrada nueva se escribe
+  completa antes de mover el puntero `used` del encabezado, asi un lector nunca
+  ve entradas a medias; los valores son `double` alineados a 8 bytes.
+- Formato (igual idea que el modo multiproceso de prometheus_client): encabezado
+  `u32 used` + padding; cada entrada `u32 len` + clave JSON + padding a 8 + `f64`.
+- Contadores y buckets se suman y `max` toma el mayor. Los gauges solo cuentan
+  procesos vivos (un worker reiniciado no deja su gauge colgado, pero si sus
+  contadores) y se combinan segun el modo de cada uno, como en prometheus_client:
+  `all` (defecto: una serie por worker con etiqueta `pid`), `livesum`, `max` o `min`.
+- La generacion es `METRICS_SHARED_GENERATION` o el pid del padre (el master de
+  gunicorn): un reinicio del servicio empieza de cero y las generaciones de
+  masters que ya no existen se borran al iniciar.
+"""
+from __future__ import annotations
+
+import json
+import mmap
+import os
+import shutil
+import struct
+import threading
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+_HEADER = 8
+_INITIAL_SIZE = 64 * 1024
+_U32 = struct.Struct("<I")
+_F64 = struct.Struct("<d")
+
+# Tipos de entrada: contador, gauge, latencia (conteo, suma, max, bucket).
+COUNTER, GAUGE, LAT_COUNT, LAT_TOTAL, LAT_MAX, LAT_BUCKET = "c", "g", "lc", "ls", "lm", "lb"
+
+TagsKey = Tuple[Tuple[str, str], ...]
+
+# Como combinar un gauge entre workers vivos (ver `MetricsCollector.set_gauge`).
+GAUGE_MODES = frozenset({"all", "livesum", "max", "min"})
+
+
+def _pid_alive(pid: int) -> bool:
+    if pid <= 0:
+        return False
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    except OSError:
+        return False
+    return True
+
+
+class _MmapFile:
+    """Archivo de un solo escritor con entradas clave -> double."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        if os.fstat(self._fd).st_size < _INITIAL_SIZE:
+            os.ftruncate(self._fd, _INITIAL_SIZE)
+        self._capacity = os.fstat(self._fd).st_size
+        self._map = mmap.mmap(self._fd, self._capacity)
+        self._used = _U32.unpack_from(self._map, 0)[0] or _HEADER
+        self._positions: Dict[str, int] = {key: pos for key, _, pos in _iter_entries(self._map, self._used)}
+
+    def _append(self, key: str, value: float) -> int:
+        raw = key.encode("utf-8")
+        padded = (_U32.size + len(raw) + 7) & ~7
+        needed = self._used + padded + _F64.size
+        if needed > self._capacity:
+            capacity = self._capacity
+            while capacity < needed:
+                capacity *= 2
+            os.ftruncate(self._fd, capacity)
+            self._map.resize(capacity)
+            self._capacity = capacity
+        start = self._used
+        _U32.pack_into(self._map, start, len(raw))
+        self._map[start + _U32.size:start + _U32.size + len(raw)] = raw
+        value_pos = start + padded
+        _F64.pack_into(self._map, value_pos, value)
+        self._used = needed
+        _U32.pack_into(self._map, 0, self._used)  # publica la entrada ya completa
+        self._positions[key] = value_pos
+        return value_pos
+
+    def add(self, key: str, delta: float) -> None:
+        pos = self._positions.get(key)
+        if pos is None:
+            self._append(key, delta)
+        else:
+            _F64.pack_into(self._map, pos, _F64.unpack_from(self._map, pos)[0] + delta)
+
+    def set(self, key: str, value: float) -> None:
+        pos = self._positions.get(key)
+        if pos is None:
+            self._append(key, value)
+        else:
+            _F64.pack_into(self._map, pos, value)
+
+    def set_max(self, key: str, value: float) -> None:
+        pos = self._positions.get(key)
+        if pos is None:
+            self._append(key, value)
+        elif value > _F64.unpack_from(self._map, pos)[0]:
+            _F64.pack_into(self._map, pos, value)
+
+    def close(self) -> None:
+        try:
+            self._map.close()
+        finally:
+            os.close(self._fd)
+
+
+def _iter_entries(buf, used: int) -> Iterator[Tuple[str, float, int]]:
+    pos = _HEADER
+    while pos + _U32.size <= used:
+        length = _U32.unpack_from(buf, pos)[0]
+        padded = (_U32.size + length + 7) & ~7
+        value_pos = pos + padded
+        if value_pos + _F64.size > used:
+            break
+        key = bytes(buf[pos + _U32.size:pos + _U32.size + length]).decode("utf-8")
+        yield key, _F64.unpack_from(buf, value_pos)[0], value_pos
+        pos = value_pos + _F64.size
+
+
+def read_file(path: str) -> Iterator[Tuple[str, float]]:
+    """Entradas publicadas de un archivo (lo puede estar escribiendo otro proceso)."""
+    with open(path, "rb") as fh:
+        data = fh.read()
+    if len(data) < _HEADER:
+        return iter(())
+    used = min(_U32.unpack_from(data, 0)[0], len(data))
+    return ((key, value) for key, value, _ in _iter_entries(data, used))
+
+
+class SharedMetricsStore:
+    def __init__(self, directory: str, generation: Optional[str] = None) -> None:
+        self.root = os.path.abspath(directory)
+        self.generation = str(generation or os.getppid())
+        self.directory = os.path.join(self.root, self.generation)
+        os.makedirs(self.directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._file: Optional[_MmapFile] = None
+        self._pid: Optional[int] = None
+        self._keys: Dict[Tuple[str, str, TagsKey, Any], str] = {}
+        self._cleanup_stale_generations()
+
+    @classmethod
+    def from_config(cls, config) -> Optional["SharedMetricsStore"]:
+        directory = (config.get("METRICS_SHARED_DIR") or "").strip()
+        if not directory:
+            return None
+        return cls(directory, (config.get("METRICS_SHARED_GENERATION") or "").strip() or None)
+
+    def _cleanup_stale_generations(self) -> None:
+        for name in os.listdir(self.root):
+            if name == self.generation or not name.isdigit():
+                continue
+            if not _pid_alive(int(name)):
+                shutil.rmtree(os.path.join(self.root, name), ignore_errors=True)
+
+    def _writer(self) -> _MmapFile:
+        pid = os.getpid()
+        if self._file is None or self._pid != pid:
+            # Tras un fork el hijo escribe en su propio archivo.
+            self._file = _MmapFile(os.path.join(self.directory, f"{pid}.metrics"))
+            self._pid = pid
+        return self._file
+
+    @staticmethod
+    def key(kind: str, name: str, tags: TagsKey, extra: Any = None) -> str:
+        return json.dumps([kind, name, [list(item) for item in tags], extra], separators=(",", ":"))
+
+    def _cached_key(self, kind: str, name: str, tags: TagsKey, extra: Any = None) -> str:
+        # Se llama con el lock tomado; la cardinalidad es la de las metricas.
+        ident = (kind, name, tags, extra)
+        key = self._keys.get(ident)
+        if key is None:
+            key = self._keys[ident] = self.key(kind, name, tags, extra)
+        return key
+
+    def add(self, kind: str, name: str, tags: TagsKey, delta: float, extra: Any = None) -> None:
+        with self._lock:
+            self._writer().add(self._cached_key(kind, name, tags, extra), delta)
+
+    def set(self, kind: str, name: str, tags: TagsKey, value: float, extra: Any = None) -> None:
+        with self._lock:
+            self._writer().set(self._cached_key(kind, name, tags, extra), value)
+
+    def set_max(self, kind: str, name: str, tags: TagsKey, value: float) -> None:
+        with self._lock:
+            self._writer().set_max(self._cached_key(kind, name, tags), value)
+
+    def collect(self) -> Dict[str, Any]:
+        """Suma los archivos de todos los workers de la generacion actual.
+
+        Devuelve `{"counters", "gauges", "latency", "workers"}` con claves
+        `(name, tags)`; `latency` trae `count`, `total`, `max` y `buckets`.
+        """
+        counters: Dict[Tuple[str, TagsKey], float] = {}
+        gauges: Dict[Tuple[str, TagsKey], float] = {}
+        latency: Dict[Tuple[str, TagsKey], Dict[str, Any]] = {}
+        workers = 0
+        for filename in sorted(os.listdir(self.directory)):
+            if not filename.endswith(".metrics"):
+                continue
+            try:
+                pid = int(filename.split(".", 1)[0])
+                entries = list(read_file(os.path.join(self.directory, filename)))
+            except (ValueError, OSError):
+                continue
+            alive = _pid_alive(pid)
+            workers += 1 if alive else 0
+            for raw, value in entries:
+                kind, name, tags, extra = json.loads(raw)
+                ident = (name, tuple(tuple(item) for item in tags))
+                if kind == COUNTER:
+                    counters[ident] = counters.get(ident, 0.0) + value
+                elif kind == GAUGE:
+                    if not alive:
+                        continue
+                    mode = extra if extra in GAUGE_MODES else "all"
+                    if mode == "all":
+                        gauges[(name, tuple(sorted(ident[1] + (("pid", str(pid)),))))] = value
+                    elif ident not in gauges:
+                        gauges[ident] = value
+                    elif mode == "livesum":
+                        gauges[ident] += value
+                    elif mode == "max":
+                        gauges[ident] = max(gauges[ident], value)
+                    else:
+                        gauges[ident] = min(gauges[ident], value)
+                else:
+                    stats = latency.setdefault(ident, {"count": 0.0, "total": 0.0, "max": 0.0, "buckets": {}})
+                    if kind == LAT_COUNT:
+                        stats["count"] += value
+                    elif kind == LAT_TOTAL:
+                        stats["total"] += value
+                    elif kind == LAT_MAX:
+                        stats["max"] = max(stats["max"], value)
+                    elif kind == LAT_BUCKET:
+                        stats["buckets"][extra] = stats["buckets"].get(extra, 0.0) + value
+        return {"counters": counters, "gauges": gauges, "latency": latency, "workers": workers}
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None and self._pid == os.getpid():
+                self._file.close()
+            self._file = None
@@ -0,0 +1,318 @@
+"""Sketches de latencia en streaming para `OperationalMetrics`.
+
+`LatencySketch` es un histograma de buckets logaritmicos (estilo DDSketch): el
+bucket `i` cubre `(gamma^(i-1), gamma^i]` con `gamma = (1 + a) / (1 - a)`.
+Registrar es O(1) (un `log` y un incremento en un dict), dos sketches se
+combinan sumando buckets (`merge`) y un valor se puede restar (`remove`) para
+ventanas por cantidad de eventos. Los cuantiles se leen recorriendo los buckets
+ocupados (acotados por el rango de latencias, no por el trafico) y devuelven la
+cota superior del bucket recortada al maximo observado: nunca subestiman y el
+error relativo es a lo sumo `2a` (~1% con el `a` por defecto).
+
+`WindowedLatency` mantiene ventanas deslizantes por tiempo (1m/5m/1h) para
+varias series (total, por ruta, por resultado) sobre un anillo de slices de
+10 s; cada ventana cubre su duracion mas el slice en curso.
+"""
+from __future__ import annotations
+
+import math
+import time
+from typing import Any, Callable, Dict, Iterable, Mapping, Optional, Sequence, Tuple
+
+DEFAULT_QUANTILES: Tuple[float, ...] = (0.5, 0.9, 0.95, 0.99)
+DEFAULT_WINDOWS: Mapping[str, float] = {"1m": 60.0, "5m": 300.0, "1h": 3600.0}
+_UNSET: Any = object()
+
+
+class LatencySketch:
+    __slots__ = ("relative_accuracy", "min_value", "_log_gamma", "_gamma", "counts", "zero", "count", "total",
+                 "min", "max")
+
+    def __init__(self, relative_accuracy: float = 0.005, min_value: float = 1e-3) -> None:
+        if not 0.0 < relative_accuracy < 1.0:
+            raise ValueError("relative_accuracy debe estar entre 0 y 1")
+        self.relative_accuracy = relative_accuracy
+        self.min_value = min_value
+        self._gamma = (1.0 + relative_accuracy) / (1.0 - relative_accuracy)
+        self._log_gamma = math.log(self._gamma)
+        self.counts: Dict[int, int] = {}
+        self.zero = 0
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = 0.0
+
+    def index(self, value: float) -> Optional[int]:
+        """Bucket de `value`; None para valores bajo `min_value` (bucket cero)."""
+        if value <= self.min_value:
+            return None
+        return math.ceil(math.log(value) / self._log_gamma)
+
+    def bucket_value(self, idx: Optional[int]) -> float:
+        """Cota superior del bucket `idx` (la misma que devuelven los cuantiles)."""
+        return self.min_value if idx is None else self._gamma ** idx
+
+    def add(self, value: float, idx: Optional[int] = None) -> None:
+        """Registra `value`; `idx` permite reutilizar un `index()` ya calculado."""
+        if idx is None:
+            idx = self.index(value)
+        if idx is None:
+            self.zero += 1
+        else:
+            self.counts[idx] = self.counts.get(idx, 0) + 1
+        self.count += 1
+        self.total += value
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def remove(self, value: float, idx: Optional[int] = None) -> None:
+        """Resta un valor registrado antes (min/max no se recalculan)."""
+        if idx is None:
+            idx = self.index(value)
+        if idx is None:
+            self.zero -= 1
+        else:
+            left = self.counts.get(idx, 0) - 1
+            if left > 0:
+                self.counts[idx] = left
+            else:
+                self.counts.pop(idx, None)
+        self.count -= 1
+        self.total -= value
+
+    def merge(self, other: "LatencySketch") -> None:
+        if other._gamma != self._gamma:
+            raise ValueError("Solo se combinan sketches con la misma precision")
+        for idx, n in other.counts.items():
+            self.counts[idx] = self.counts.get(idx, 0) + n
+        self.zero += other.zero
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def clear(self) -> None:
+        self.counts.clear()
+        self.zero = 0
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = 0.0
+
+    def quantiles(
+        self,
+        qs: Sequence[float] = DEFAULT_QUANTILES,
+        *,
+        lo: Optional[float] = None,
+        hi: Optional[float] = None,
+    ) -> Dict[float, float]:
+        """Cuantiles por rango mas cercano (`ceil(q * n)`), todos en una pasada.
+
+        `lo`/`hi` recortan el resultado; por defecto el min/max registrados.
+        """
+        if self.count <= 0:
+            return {q: 0.0 for q in qs}
+        lo = self.min if lo is None else lo
+        hi = self.max if hi is None else hi
+        if lo == math.inf:
+            lo = 0.0
+        buckets = iter(sorted(self.counts))
+        seen = self.zero
+        value = self.min_value if self.zero else 0.0
+        out: Dict[float, float] = {}
+        for rank, q in sorted((max(1, math.ceil(q * self.count)), q) for q in qs):
+            while seen < rank:
+                idx = next(buckets, None)
+                if idx is None:
+                    break
+                seen += self.counts[idx]
+                value = self._gamma ** idx
+            out[q] = min(max(value, lo), hi)
+        return out
+
+    def summary(self, qs: Sequence[float] = DEFAULT_QUANTILES, **kwargs) -> Dict[str, float]:
+        values = self.quantiles(qs, **kwargs)
+        data: Dict[str, float] = {"count": self.count}
+        for q in qs:
+            data[_quantile_label(q)] = round(values[q], 3)
+        data["max"] = round(self.max if self.count else 0.0, 3)
+        data["avg"] = round(self.total / self.count, 3) if self.count else 0.0
+        return data
+
+
+def _quantile_label(q: float) -> str:
+    pct = q * 100.0
+    return f"p{int(pct)}" if float(pct).is_integer() else f"p{pct:g}".replace(".", "_")
+
+
+class _Slice:
+    __slots__ = ("slice_id", "counts", "stats")
+
+    def __init__(self) -> None:
+        self.slice_id = -1
+        self.counts: Dict[Tuple[str, Optional[int]], int] = {}  # (serie, bucket) -> n
+        self.stats: Dict[str, list] = {}  # serie -> [n, total, max]
+
+    def reset(self, slice_id: int) -> None:
+        self.slice_id = slice_id
+        self.counts = {}
+        self.stats = {}
+
+
+class _Window:
+    __slots__ = ("span", "counts", "stats")
+
+    def __init__(self, span: int) -> None:
+        self.span = span  # en slices
+        self.counts: Dict[Tuple[str, Optional[int]], int] = {}
+        self.stats: Dict[str, list] = {}  # serie -> [n, total]
+
+    def apply(self, piece: _Slice, sign: int) -> None:
+        for key, n in piece.counts.items():
+            left = self.counts.get(key, 0) + sign * n
+            if left > 0:
+                self.counts[key] = left
+            else:
+                self.counts.pop(key, None)
+        for series, (n, total, _max) in piece.stats.items():
+            acc = self.stats.setdefault(series, [0, 0.0])
+            acc[0] += sign * n
+            acc[1] += sign * total
+            if acc[0] <= 0:
+                del self.stats[series]
+
+
+class WindowedLatency:
+    """Ventanas deslizantes por tiempo (1m/5m/1h) para varias series a la vez.
+
+    Un solo anillo de slices de `slice_s` segundos cubre la ventana mas larga.
+    Registrar toca solo el slice actual (un par de incrementos por serie). Cada
+    ventana mantiene un agregado de los slices cerrados que cubre: al rotar se
+    suma el slice que se cierra y se resta el que sale (los buckets son conteos,
+    la resta es exacta). `snapshot` combina agregado + slice abierto, O(buckets).
+    """
+
+    def __init__(
+        self,
+        windows: Mapping[str, float] = DEFAULT_WINDOWS,
+        *,
+        slice_s: float = 10.0,
+        relative_accuracy: float = 0.005,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.relative_accuracy = relative_accuracy
+        self._indexer = LatencySketch(relative_accuracy)
+        self.slice_s = float(slice_s)
+        self._clock = clock
+        self._windows: Dict[str, _Window] = {
+            name: _Window(max(1, int(round(float(span_s) / self.slice_s)))) for name, span_s in windows.items()
+        }
+        self._ring = [_Slice() for _ in range(max(w.span for w in self._windows.values()))]
+        self._current = self._ring[0]
+        self._current_id: Optional[int] = None
+
+    def add(self, value: float, keys: Iterable[str], *, idx: Any = _UNSET, now: Optional[float] = None) -> None:
+        """Registra `value` en cada serie de `keys`; `idx` reutiliza un `LatencySketch.index` ya calculado."""
+        if idx is _UNSET:
+            idx = self._indexer.index(value)
+        slice_id = int((self._clock() if now is None else now) // self.slice_s)
+        if slice_id != self._current_id:
+            self._rotate(slice_id)
+        piece = self._current
+        counts = piece.counts
+        stats = piece.stats
+        for key in keys:
+            bucket = (key, idx)
+            counts[bucket] = counts.get(bucket, 0) + 1
+            entry = stats.get(key)
+            if entry is None:
+                stats[key] = [1, value, value]
+            else:
+                entry[0] += 1
+                entry[1] += value
+                if value > entry[2]:
+                    entry[2] = value
+
+    def _rotate(self, slice_id: int) -> None:
+        size = len(self._ring)
+        previous = self._current_id
+        if previous is None or slice_id < previous or slice_id - previous > size:
+            # Arranque, reloj hacia atras o hueco mas largo que el anillo: empezar de cero.
+            for piece in self._ring:
+                piece.reset(-1)
+            for window in self._windows.values():
+                window.counts.clear()
+                window.stats.clear()
+        else:
+            for closing in range(previous, slice_id):
+                closed = self._ring[closing % size]
+                if closed.slice_id == closing:
+                    for window in self._windows.values():
+                        window.apply(closed, +1)
+                for window in self._windows.values():
+                    # Al abrir `closing + 1` la ventana deja de cubrir `closing + 1 - span`.
+                    leaving_id = closing + 1 - window.span
+                    leaving = self._ring[leaving_id % size]
+                    if leaving.slice_id == leaving_id:
+                        window.apply(leaving, -1)
+        self._current = self._ring[slice_id % size]
+        self._current.reset(slice_id)
+        self._current_id = slice_id
+
+    def snapshot(
+        self, qs: Sequence[float] = DEFAULT_QUANTILES, now: Optional[float] = None
+    ) -> Dict[str, Dict[str, Dict[str, float]]]:
+        """`{serie: {ventana: {count, p50, ..., max, avg}}}`."""
+        slice_id = int((self._clock() if now is None else now) // self.slice_s)
+        if slice_id != self._current_id:
+            self._rotate(slice_id)
+        current = self._current
+        maxima = self._window_maxima(slice_id)
+        out: Dict[str, Dict[str, Dict[str, float]]] = {}
+        for name, window in self._windows.items():
+            sketches: Dict[str, LatencySketch] = {}
+            for source in (window.counts, current.counts):
+                for (series, idx), n in source.items():
+                    sketch = sketches.get(series)
+                    if sketch is None:
+                        sketch = sketches[series] = LatencySketch(self.relative_accuracy)
+                    if idx is None:
+                        sketch.zero += n
+                    else:
+                        sketch.counts[idx] = sketch.counts.get(idx, 0) + n
+                    sketch.count += n
+            for series, sketch in sketches.items():
+                closed = window.stats.get(series, (0, 0.0))
+                opened = current.stats.get(series, (0, 0.0, 0.0))
+                sketch.total = closed[1] + opened[1]
+                sketch.min = 0.0
+                sketch.max = maxima[name].get(series, 0.0)
+                out.setdefault(series, {})[name] = sketch.summary(qs)
+        for series in out:
+            for name in self._windows:
+                out[series].setdefault(name, LatencySketch(self.relative_accuracy).summary(qs))
+        return out
+
+    def _window_maxima(self, slice_id: int) -> Dict[str, Dict[str, float]]:
+        """Maximo exacto por serie y ventana: una pasada por el anillo (no es restable)."""
+        size = len(self._ring)
+        spans = sorted((window.span, name) for name, window in self._windows.items())
+        running: Dict[str, float] = {}
+        maxima: Dict[str, Dict[str, float]] = {}
+        pos = 0
+        for offset in range(spans[-1][0]):
+            piece = self._ring[(slice_id - offset) % size]
+            if piece.slice_id == slice_id - offset:
+                for series, entry in piece.stats.items():
+                    if entry[2] > running.get(series, 0.0):
+                        running[series] = entry[2]
+            while pos < len(spans) and spans[pos][0] == offset + 1:
+                maxima[spans[pos][1]] = dict(running)
+                pos += 1
+        return maxima
+
+    @property
+    def window_names(self) -> Iterable[str]:
+        return tuple(self._windows)
@@ -0,0 +1,268 @@
+"""Spans livianos para desglosar el tiempo de un turno de chat por etapa.
+
+`chat_send_latency_ms` solo da el total. Con `span("etapa")` alrededor de cada
+paso de `ChatService` (carga de contexto, parse y webhook de Rasa, orquestador,
+proceso de la respuesta, commit) se obtiene:
+
+- `chat_stage_latency_ms{stage=...}` en `backend.metrics` por cada span;
+- un header `Server-Timing` en la respuesta (`rasa_webhook;dur=120.4, ...`),
+  visible en las devtools del navegador;
+- trazas completas muestreadas (`TRACE_SAMPLE_RATE`, o el flag `sampled` de un
+  `traceparent` W3C entrante) en un JSONL local con el formato OTLP/JSON de
+  OpenTelemetry (una linea por traza, la lee el receiver `otlpjsonfile` del
+  collector). La escritura va por un `LogPipeline`: no bloquea el request.
+
+Sin traza activa (`Tracer.init_app` solo la abre en `TRACE_ROUTES`) `span` no
+hace nada, asi que el mismo codigo corre tal cual en streaming, jobs y tests.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import random
+import re
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from ..log_pipeline import BatchedFileHandler, install_pipeline
+from . import _JsonMessageFormatter, metrics
+
+STAGE_METRIC = "chat_stage_latency_ms"
+_TRACEPARENT = re.compile(r"^[0-9a-f]{2}-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+_current_trace: ContextVar[Optional["Trace"]] = ContextVar("current_trace", default=None)
+_current_span: ContextVar[Optional[str]] = ContextVar("current_span", default=None)
+
+
+def _new_id(bits: int) -> str:
+    value = 0
+    while not value:  # W3C: ids en cero son invalidos
+        value = random.getrandbits(bits)
+    return f"{value:0{bits // 4}x}"
+
+
+class Trace:
+    __slots__ = ("name", "trace_id", "span_id", "remote_parent_id", "sampled", "start_unix_ns", "_t0", "spans",
+                 "duration_ns", "attrs")
+
+    def __init__(self, name: str, *, traceparent: Optional[str] = None, sample_rate: float = 0.0) -> None:
+        self.name = name
+        self.remote_parent_id: Optional[str] = None
+        match = _TRACEPARENT.match((traceparent or "").strip().lower())
+        if match and int(match.group(1), 16) and int(match.group(2), 16):
+            self.trace_id = match.group(1)
+            self.remote_parent_id = match.group(2)
+            self.sampled = bool(int(match.group(3), 16) & 1) or random.random() < sample_rate
+        else:
+            self.trace_id = _new_id(128)
+            self.sampled = random.random() < sample_rate
+        self.span_id = _new_id(64)
+        self.start_unix_ns = time.time_ns()
+        self._t0 = time.perf_counter_ns()
+        # (nombre, span_id, parent_id, inicio relativo ns, duracion ns, atributos)
+        self.spans: List[Tuple[str, str, str, int, int, Dict[str, Any]]] = []
+        self.duration_ns: Optional[int] = None
+        self.attrs: Dict[str, Any] = {}
+
+    def finish(self) -> None:
+        if self.duration_ns is None:
+            self.duration_ns = time.perf_counter_ns() - self._t0
+
+    def stages(self) -> List[Tuple[str, float]]:
+        """Duracion en ms por etapa, sumando spans repetidos, en orden de aparicion."""
+        totals: Dict[str, float] = {}
+        for name, _, _, _, duration_ns, _ in sorted(self.spans, key=lambda item: item[3]):
+            totals[name] = totals.get(name, 0.0) + duration_ns / 1e6
+        return list(totals.items())
+
+    def server_timing(self) -> str:
+        parts = [f"{name};dur={ms:.1f}" for name, ms in self.stages()]
+        if self.duration_ns is not None:
+            parts.append(f"total;dur={self.duration_ns / 1e6:.1f}")
+        return ", ".join(parts)
+
+    def to_otlp(self, service_name: str) -> Dict[str, Any]:
+        """Una traza en el formato OTLP/JSON (`ExportTraceServiceRequest`)."""
+        end_ns = self.start_unix_ns + (self.duration_ns or 0)
+        spans = [
+            _otlp_span(self.trace_id, self.span_id, self.remote_parent_id, self.name, 2,
+                       self.start_unix_ns, end_ns, self.attrs)
+        ]
+        for name, span_id, parent_id, offset_ns, duration_ns, attrs in self.spans:
+            start = self.start_unix_ns + offset_ns
+            spans.append(_otlp_span(self.trace_id, span_id, parent_id, name, 1, start, start + duration_ns, attrs))
+        return {
+            "resourceSpans": [
+                {
+                    "resource": {"attributes": _otlp_attributes({"service.name": service_name})},
+                    "scopeSpans": [{"scope": {"name": "backend.metrics.tracing"}, "spans": spans}],
+                }
+            ]
+        }
+
+
+def _otlp_attributes(attrs: Dict[str, Any]) -> List[Dict[str, Any]]:
+    out = []
+    for key, value in attrs.items():
+        if isinstance(value, bool):
+            typed = {"boolValue": value}
+        elif isinstance(value, int):
+            typed = {"intValue": str(value)}
+        elif isinstance(value, float):
+            typed = {"doubleValue": value}
+        else:
+            typed = {"stringValue": str(value)}
+        out.append({"key": key, "value": typed})
+    return out
+
+
+def _otlp_span(
+    trace_id: str,
+    span_id: str,
+    parent_id: Optional[str],
+    name: str,
+    kind: int,
+    start_ns: int,
+    end_ns: int,
+    attrs: Dict[str, Any],
+) -> Dict[str, Any]:
+    data = {
+        "traceId": trace_id,
+        "spanId": span_id,
+        "name": name,
+        "kind": kind,  # 1 = INTERNAL, 2 = SERVER
+        "startTimeUnixNano": str(start_ns),
+        "endTimeUnixNano": str(end_ns),
+        "attributes": _otlp_attributes(attrs),
+    }
+    if parent_id:
+        data["parentSpanId"] = parent_id
+    if attrs.get("error"):
+        data["status"] = {"code": 2}
+    return data
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+@contextmanager
+def span(name: str, **attrs: Any) -> Iterator[Optional[Dict[str, Any]]]:
+    """Mide una etapa de la traza activa; sin traza no hace nada.
+
+    Devuelve el dict de atributos para agregar datos durante la etapa. En un
+    hilo de pool usar `contextvars.copy_context().run` para heredar la traza.
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        yield None
+        return
+    parent_id = _current_span.get() or trace.span_id
+    span_id = _new_id(64)
+    token = _current_span.set(span_id)
+    started = time.perf_counter_ns()
+    try:
+        yield attrs
+    except BaseException as exc:
+        attrs["error"] = type(exc).__name__
+        raise
+    finally:
+        duration_ns = time.perf_counter_ns() - started
+        _current_span.reset(token)
+        trace.spans.append((name, span_id, parent_id, started - trace._t0, duration_ns, attrs))
+        metrics.observe_latency(STAGE_METRIC, duration_ns / 1e6, tags={"stage": name})
+
+
+class Tracer:
+    def __init__(
+        self,
+        *,
+        service_name: str = "fitter-backend",
+        routes: Sequence[str] = ("/chat/send",),
+        sample_rate: float = 0.0,
+        jsonl_path: str = "",
+        server_timing: bool = True,
+    ) -> None:
+        self.service_name = service_name
+        self.routes = frozenset(routes)
+        self.sample_rate = min(1.0, max(0.0, float(sample_rate)))
+        self.server_timing = server_timing
+        self.jsonl_path = jsonl_path
+        # Sin archivo no se exporta nada (ni con `traceparent` muestreado).
+        self._pipeline = self._export_pipeline(jsonl_path) if jsonl_path else None
+
+    @classmethod
+    def from_config(cls, config) -> "Tracer":
+        routes = [r.strip() for r in str(config.get("TRACE_ROUTES", "/chat/send") or "").split(",") if r.strip()]
+        return cls(
+            service_name=config.get("SERVICE_NAME", "fitter-backend"),
+            routes=routes,
+            sample_rate=float(config.get("TRACE_SAMPLE_RATE", 0.0) or 0.0),
+            jsonl_path=(config.get("TRACE_JSONL_PATH") or "").strip(),
+            server_timing=bool(config.get("TRACE_SERVER_TIMING", True)),
+        )
+
+    @staticmethod
+    def _export_pipeline(path: str):
+        def _handlers():
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            handler = BatchedFileHandler(path, encoding="utf-8")
+            handler.setFormatter(_JsonMessageFormatter("%(message)s"))
+            return [handler]
+
+        logger = logging.getLogger("traces")
+        logger.propagate = False
+        # Un pipeline por archivo: `create_app` puede correr con rutas distintas (tests).
+        return install_pipeline(logger, f"traces:{os.path.abspath(path)}", _handlers)
+
+    @contextmanager
+    def trace(self, name: str, *, traceparent: Optional[str] = None) -> Iterator[Trace]:
+        trace = Trace(name, traceparent=traceparent, sample_rate=self.sample_rate)
+        trace_token = _current_trace.set(trace)
+        span_token = _current_span.set(None)
+        try:
+            yield trace
+        finally:
+            trace.finish()
+            _current_span.reset(span_token)
+            _current_trace.reset(trace_token)
+            self.export(trace)
+
+    def export(self, trace: Trace) -> None:
+        if trace.sampled and self._pipeline is not None:
+            self._pipeline.submit(trace.to_otlp(self.service_name))
+
+    def init_app(self, app) -> None:
+        """Abre una traza por request en `routes` y agrega `Server-Timing` a la respuesta."""
+        from flask import g, request
+
+        @app.before_request
+        def _start_trace():
+            if request.path not in self.routes:
+                return
+            manager = self.trace(f"{request.method} {request.path}", traceparent=request.headers.get("traceparent"))
+            g._trace_cm = manager
+            g._trace = manager.__enter__()
+            g._trace.attrs.update({"http.method": request.method, "http.route": request.path})
+
+        @app.after_request
+        def _server_timing(response):
+            trace = g.pop("_trace", None)
+            manager = g.pop("_trace_cm", None)
+            if manager is None:
+                return response
+            trace.attrs["http.status_code"] = response.status_code
+            manager.__exit__(None, None, None)
+            if self.server_timing:
+                response.headers["Server-Timing"] = trace.server_timing()
+            return response
+
+        @app.teardown_request
+        def _close_trace(_exc):
+            # Si `after_request` no corrio (excepcion no manejada) igual se cierra la traza.
+            manager = g.pop("_trace_cm", None)
+            g.pop("_trace", None)
+            if manager is not None:
+                manager.__exit__(None, None, None)
@@ -1,13 +1,17 @@
 # backend/notifications/routes.py
 from __future__ import annotations
 
+import hashlib
 import json
 import os
-from typing import Optional
+import threading
+from collections import OrderedDict
+from typing import Any, List, Optional, Tuple
 
-from flask import Blueprint, jsonify, request, session, send_file
+from flask import Blueprint, current_app, jsonify, request, session, send_file
 
 from ..extensions import db
+from ..food.catalog import FoodCatalog, get_catalog
 from ..login.models import User
 from .email import send_email
 from .document_generator import (
@@ -181,6 +185,98 @@ def download_routine():
         return jsonify({"error": "No se pudo generar el documento", "details": str(exc)}), 500
 
 
+def _catalog_path() -> Optional[str]:
+    base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+    candidates = [
+        os.path.join(base_dir, 'data', 'food_catalog.json'),
+        os.path.join(base_dir, 'data', 'food_catalog_sample.json')
+    ]
+    for p in candidates:
+        if os.path.exists(p):
+            return p
+    return None
+
+
+# Resultados por consulta y páginas serializadas; se invalidan solos porque la
+# versión del catálogo (mtime + tamaño) forma parte de la llave.
+_CATALOG_CACHE_SIZE = 256
+# Tope de `limit` por página y de bytes cacheados: la query string la arma el
+# cliente, sin tope bastaría variarla para llenar la memoria del worker.
+_CATALOG_MAX_LIMIT = 200
+_CATALOG_PAGE_MAX_BYTES = 128 * 1024
+_CATALOG_PAGE_CACHE_MAX_BYTES = 8 * 1024 * 1024
+_CATALOG_MAX_KCAL = 5000
+_CATALOG_MAX_FILTER_LEN = 64
+_catalog_query_cache: "OrderedDict[Tuple[Any, ...], Tuple[int, ...]]" = OrderedDict()
+_catalog_page_cache: "OrderedDict[Tuple[Any, ...], bytes]" = OrderedDict()
+_catalog_page_bytes = 0
+_catalog_cache_lock = threading.Lock()
+
+
+def _cache_get(cache: OrderedDict, key: Tuple[Any, ...]):
+    with _catalog_cache_lock:
+        value = cache.get(key)
+        if value is not None:
+            cache.move_to_end(key)
+        return value
+
+
+def _cache_put(cache: OrderedDict, key: Tuple[Any, ...], value: Any) -> None:
+    with _catalog_cache_lock:
+        cache[key] = value
+        cache.move_to_end(key)
+        while len(cache) > _CATALOG_CACHE_SIZE:
+            cache.popitem(last=False)
+
+
+def _page_cache_put(key: Tuple[Any, ...], body: bytes) -> None:
+    """Como `_cache_put`, pero acotando también los bytes totales de las páginas."""
+    global _catalog_page_bytes
+    if len(body) > _CATALOG_PAGE_MAX_BYTES:
+        return
+    with _catalog_cache_lock:
+        previous = _catalog_page_cache.pop(key, None)
+        if previous is not None:
+            _catalog_page_bytes -= len(previous)
+        _catalog_page_cache[key] = body
+        _catalog_page_bytes += len(body)
+        while _catalog_page_cache and (
+            len(_catalog_page_cache) > _CATALOG_CACHE_SIZE or _catalog_page_bytes > _CATALOG_PAGE_CACHE_MAX_BYTES
+        ):
+            _, evicted = _catalog_page_cache.popitem(last=False)
+            _catalog_page_bytes -= len(evicted)
+
+
+def _cacheable_filters(category: str, kcal: Optional[float], exclude: List[str]) -> bool:
+    """Solo se cachean filtros "normales": kcal entero y en rango, textos cortos.
+
+    Vale para los caches de esta ruta y para los memos del catálogo compartido.
+    """
+    if kcal is not None and not (kcal.is_integer() and 0 <= kcal <= _CATALOG_MAX_KCAL):
+        return False
+    if len(category) > _CATALOG_MAX_FILTER_LEN or len(exclude) > 16:
+        return False
+    return all(len(tag) <= _CATALOG_MAX_FILTER_LEN for tag in exclude)
+
+
+def _catalog_positions(
+    catalog: FoodCatalog, category: Optional[str], kcal: Optional[float], exclude: List[str], *, memo: bool = True
+) -> Tuple[int, ...]:
+    if category:
+        positions = catalog.category_positions(category, memo=memo)
+    else:
+        positions = tuple(range(len(catalog)))
+    if exclude:
+        excluded = catalog.excluded_positions(exclude, memo=memo)
+        positions = tuple(p for p in positions if p not in excluded)
+    if kcal is not None:
+        # approximate match within 30%
+        tol = 0.3
+        in_range = set(catalog.kcal_range_positions(kcal * (1 - tol), kcal * (1 + tol)))
+        positions = tuple(p for p in positions if p in in_range)
+    return positions
+
+
 @bp.get('/catalog')
 def get_food_catalog():
     """Endpoint simple para consultar el catálogo local de alimentos.
@@ -188,73 +284,75 @@ def get_food_catalog():
       - category: filtro por categoría/tag parcial
       - kcal: número (target kcal, se usa rango por defecto)
       - exclude_allergens: comma-separated list
-      - limit: máximo items
+      - limit: máximo items (tope 200)
+      - cursor: valor `next_cursor` de la página anterior
+
+    Usa el catálogo compartido del proceso (`get_catalog`), cachea resultados por
+    consulta y responde 304 si `If-None-Match` coincide con el ETag de la página.
     """
     params = request.args or {}
     category = params.get('category')
     kcal_raw = params.get('kcal')
     exclude_raw = params.get('exclude_allergens')
     limit_raw = params.get('limit')
+    cursor_raw = params.get('cursor')
 
     try:
         limit = int(limit_raw) if limit_raw else 50
     except Exception:
         limit = 50
+    limit = max(0, min(limit, _CATALOG_MAX_LIMIT))
 
     try:
         kcal = float(kcal_raw) if kcal_raw else None
     except Exception:
         kcal = None
 
-    exclude = [s.strip().lower() for s in (exclude_raw or '').split(',') if s.strip()]
+    try:
+        offset = max(0, int(cursor_raw)) if cursor_raw else 0
+    except Exception:
+        offset = 0
 
-    # localizar archivo de catálogo
-    base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
-    candidates = [
-        os.path.join(base_dir, 'data', 'food_catalog.json'),
-        os.path.join(base_dir, 'data', 'food_catalog_sample.json')
-    ]
-    catalog_path = None
-    for p in candidates:
-        if os.path.exists(p):
-            catalog_path = p
-            break
+    exclude = sorted({s.strip().lower() for s in (exclude_raw or '').split(',') if s.strip()})
+
+    catalog_path = _catalog_path()
     if not catalog_path:
         return jsonify({'items': []})
 
     try:
-        with open(catalog_path, 'r', encoding='utf-8') as f:
-            items = json.load(f)
+        catalog = get_catalog(catalog_path)
     except Exception:
         return jsonify({'items': []})
 
-    # apply filters
-    def item_ok(it):
-        if category:
-            cats = [c.lower() for c in (it.get('categories') or [])]
-            if not any(category.lower() in c for c in cats):
-                return False
-        if exclude:
-            item_all = [a.lower() for a in (it.get('allergens') or [])]
-            if any(e in item_all for e in exclude):
-                return False
-        return True
-
-    filtered = [it for it in items if item_ok(it)]
-
-    if kcal is not None:
-        # approximate match within 30%
-        tol = 0.3
-        out = []
-        for it in filtered:
-            ek = it.get('energy_kcal_100g')
-            if ek is None:
-                continue
-            if kcal * (1 - tol) <= ek <= kcal * (1 + tol):
-                out.append(it)
-        filtered = out
-
-    return jsonify({'items': filtered[:limit]})
+    category_key = (category or '').strip().lower()
+    cacheable = _cacheable_filters(category_key, kcal, exclude)
+    query_key = (catalog.path, catalog.version, category_key, kcal, tuple(exclude))
+    page_key = query_key + (offset, limit)
+    etag = hashlib.sha1(repr(page_key).encode('utf-8')).hexdigest()
+    if request.if_none_match.contains(etag):
+        response = current_app.response_class(status=304)
+        response.set_etag(etag)
+        return response
+
+    body = _cache_get(_catalog_page_cache, page_key) if cacheable else None
+    if body is None:
+        positions = _cache_get(_catalog_query_cache, query_key) if cacheable else None
+        if positions is None:
+            positions = _catalog_positions(catalog, category_key, kcal, exclude, memo=cacheable)
+            if cacheable:
+                _cache_put(_catalog_query_cache, query_key, positions)
+        window = positions[offset:offset + limit]
+        end = offset + len(window)
+        next_cursor = str(end) if limit > 0 and end < len(positions) else None
+        items = catalog.all()
+        payload = {'items': [items[p] for p in window], 'next_cursor': next_cursor, 'total': len(positions)}
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        if cacheable:
+            _page_cache_put(page_key, body)
+
+    response = current_app.response_class(body, mimetype='application/json')
+    response.set_etag(etag)
+    return response
 
 
 @bp.post("/diet")
@@ -0,0 +1,478 @@
+"""Cache de planes generados (rutinas y dietas).
+
+`generate_workout_plan` y `generate_diet_plan` dependen solo de sus parámetros, pero se
+recalculan en cada turno del chat. Este módulo memoiza el resultado con:
+
+- claves canónicas: texto en minúsculas y sin espacios extra, alergias/no deseados como
+  lista ordenada sin duplicados (`parse_allergy_list`), equipamiento vía `equip_key_norm`;
+- una capa en memoria LRU + TTL por proceso;
+- una capa compartida opcional (SQLite o directorio de archivos JSON) para que el proceso
+  Flask y el action server de Rasa reutilicen los mismos planes;
+- una dimensión explícita de variantes: la rutina usa `random.shuffle` al elegir
+  ejercicios, así que se guardan hasta `PLAN_CACHE_VARIANTS` rutinas distintas por clave
+  y cada solicitud sin variante fija elige una al azar.
+
+Configuración por entorno (la leen ambos procesos):
+    PLAN_CACHE_BACKEND      memory (defecto) | sqlite | file | off
+    PLAN_CACHE_PATH         archivo SQLite o directorio para el backend compartido
+    PLAN_CACHE_TTL_S        segundos de vida de cada entrada (defecto 600)
+    PLAN_CACHE_MAX_ENTRIES  entradas en memoria (defecto 512)
+    PLAN_CACHE_VARIANTS     variantes de rutina por clave (defecto 3)
+
+Los aciertos/fallos se cuentan en `backend.metrics.metrics` como `plan_cache.hit`,
+`plan_cache.miss` y `plan_cache.bypass` (tags `kind` y, en aciertos, `layer`).
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, Mapping, Optional, Tuple
+
+from ..metrics import metrics
+from .common import equip_key_norm, parse_allergy_list
+
+# Se incrementa cuando cambia el formato de los planes para invalidar caches compartidos.
+PLAN_CACHE_VERSION = 2
+
+PLAN_CACHE_BACKENDS = ("memory", "sqlite", "file", "off")
+
+_EMPTY_VALUES = {"", "ninguna", "ninguno", "ningunas", "ningunos", "no", "sin"}
+
+Env = Mapping[str, str]
+
+
+def _as_int(value: Optional[str], default: int) -> int:
+    try:
+        return int(str(value).strip())
+    except (TypeError, ValueError):
+        return default
+
+
+def _as_float(value: Optional[str], default: float) -> float:
+    try:
+        return float(str(value).strip())
+    except (TypeError, ValueError):
+        return default
+
+
+@dataclass(frozen=True)
+class PlanCacheConfig:
+    backend: str = "memory"
+    path: str = ""
+    ttl_s: float = 600.0
+    max_entries: int = 512
+    variants: int = 3
+
+    @classmethod
+    def from_env(cls, env: Optional[Env] = None) -> "PlanCacheConfig":
+        env = os.environ if env is None else env
+        backend = (env.get("PLAN_CACHE_BACKEND") or cls.backend).strip().lower()
+        if backend not in PLAN_CACHE_BACKENDS:
+            backend = cls.backend
+        return cls(
+            backend=backend,
+            path=(env.get("PLAN_CACHE_PATH") or "").strip(),
+            ttl_s=max(0.0, _as_float(env.get("PLAN_CACHE_TTL_S"), cls.ttl_s)),
+            max_entries=max(1, _as_int(env.get("PLAN_CACHE_MAX_ENTRIES"), cls.max_entries)),
+            variants=max(1, _as_int(env.get("PLAN_CACHE_VARIANTS"), cls.variants)),
+        )
+
+
+# =========================================================
+# Claves canónicas
+# =========================================================
+
+
+def normalize_text(value: Any) -> Optional[str]:
+    """Minúsculas y espacios colapsados; vacío o "ninguna" se normaliza a None."""
+    if value is None:
+        return None
+    text = " ".join(str(value).split()).lower()
+    if text in _EMPTY_VALUES:
+        return None
+    return text
+
+
+def normalize_list(value: Any) -> Optional[str]:
+    """Lista de alergias/no deseados ordenada y sin duplicados, unida por comas."""
+    if isinstance(value, (list, tuple, set, frozenset)):
+        value = ",".join(str(v) for v in value)
+    items = sorted({" ".join(item.split()) for item in parse_allergy_list(value)})
+    return ", ".join(items) or None
+
+
+def plan_cache_key(kind: str, params: Mapping[str, Any], variant: int = 0) -> str:
+    """Clave estable (sha1) para `kind` + parámetros ya normalizados + variante."""
+    raw = json.dumps(
+        {"v": PLAN_CACHE_VERSION, "kind": kind, "variant": int(variant), "params": params},
+        sort_keys=True,
+        ensure_ascii=False,
+        default=str,
+    )
+    return f"{kind}:{hashlib.sha1(raw.encode('utf-8')).hexdigest()}"
+
+
+# =========================================================
+# Backends compartidos
+# =========================================================
+
+
+class SQLitePlanStore:
+    """Tabla clave/valor en SQLite; segura entre procesos (WAL + timeout de bloqueo)."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS plan_cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.path, timeout=5.0)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT value, expires_at FROM plan_cache WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None or row[1] < time.time():
+            return None
+        return row[0]
+
+    def put(self, key: str, value: str, ttl_s: float) -> None:
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO plan_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, value, now + ttl_s),
+            )
+            conn.execute("DELETE FROM plan_cache WHERE expires_at < ?", (now,))
+
+    def clear(self) -> None:
+        with self._connect() as conn:
+            conn.execute("DELETE FROM plan_cache")
+
+
+class FilePlanStore:
+    """Un archivo JSON por clave en un directorio; escritura atómica con `os.replace`."""
+
+    def __init__(self, directory: str) -> None:
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _file(self, key: str) -> str:
+        return os.path.join(self.directory, hashlib.sha1(key.encode("utf-8")).hexdigest() + ".json")
+
+    def get(self, key: str) -> Optional[str]:
+        try:
+            with open(self._file(key), "r", encoding="utf-8") as fh:
+                entry = json.load(fh)
+        except (OSError, ValueError):
+            return None
+        if entry.get("key") != key or entry.get("expires_at", 0) < time.time():
+            return None
+        return entry.get("value")
+
+    def put(self, key: str, value: str, ttl_s: float) -> None:
+        target = self._file(key)
+        tmp = f"{target}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as fh:
+            json.dump({"key": key, "value": value, "expires_at": time.time() + ttl_s}, fh, ensure_ascii=False)
+        os.replace(tmp, target)
+
+    def clear(self) -> None:
+        for name in os.listdir(self.directory):
+            if name.endswith(".json"):
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError:
+                    pass
+
+
+def _default_shared_path(backend: str) -> str:
+    base = os.path.join(os.path.dirname(__file__), "..", "data")
+    if backend == "sqlite":
+        return os.path.join(base, "plan_cache.sqlite3")
+    return os.path.join(base, "plan_cache")
+
+
+# =========================================================
+# Cache
+# =========================================================
+
+
+class PlanCache:
+    """LRU + TTL en memoria con una capa compartida opcional.
+
+    Los valores se guardan serializados (JSON), así cada acierto entrega una copia
+    independiente que el llamador puede modificar sin afectar al cache.
+    """
+
+    def __init__(self, config: Optional[PlanCacheConfig] = None) -> None:
+        self.config = config or PlanCacheConfig()
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.shared = None
+        if self.config.backend in {"sqlite", "file"}:
+            path = self.config.path or _default_shared_path(self.config.backend)
+            try:
+                self.shared = SQLitePlanStore(path) if self.config.backend == "sqlite" else FilePlanStore(path)
+            except (OSError, sqlite3.Error):
+                self.shared = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.config.backend != "off"
+
+    def pick_variant(self, variant: Optional[int] = None) -> int:
+        """Variante a usar: la indicada (acotada) o una al azar entre las configuradas."""
+        if variant is None:
+            return random.randrange(self.config.variants)
+        return int(variant) % self.config.variants
+
+    def _memory_get(self, key: str) -> Optional[str]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < now:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def _memory_put(self, key: str, value: str) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.config.ttl_s, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.config.max_entries:
+                self._entries.popitem(last=False)
+
+    def get(self, key: str, *, kind: str = "plan") -> Optional[Any]:
+        value = self._memory_get(key)
+        layer = "memory"
+        if value is None and self.shared is not None:
+            try:
+                value = self.shared.get(key)
+            except (OSError, sqlite3.Error):
+                value = None
+            if value is not None:
+                layer = "shared"
+                self._memory_put(key, value)
+        if value is None:
+            metrics.inc_counter("plan_cache.miss", tags={"kind": kind})
+            return None
+        metrics.inc_counter("plan_cache.hit", tags={"kind": kind, "layer": layer})
+        return json.loads(value)
+
+    def put(self, key: str, value: Any) -> None:
+        raw = json.dumps(value, ensure_ascii=False)
+        self._memory_put(key, raw)
+        if self.shared is not None:
+            try:
+                self.shared.put(key, raw, self.config.ttl_s)
+            except (OSError, sqlite3.Error):
+                pass
+
+    def get_or_compute(
+        self,
+        kind: str,
+        params: Mapping[str, Any],
+        compute: Callable[[], Any],
+        *,
+        variant: int = 0,
+    ) -> Any:
+        """Devuelve el valor cacheado para (kind, params, variant) o lo calcula y guarda."""
+        if not self.enabled:
+            metrics.inc_counter("plan_cache.bypass", tags={"kind": kind})
+            return compute()
+        key = plan_cache_key(kind, params, variant)
+        cached = self.get(key, kind=kind)
+        if cached is not None:
+            return cached
+        value = compute()
+        try:
+            self.put(key, value)
+        except (TypeError, ValueError):
+            # Valor no serializable: se entrega sin cachear.
+            pass
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+        if self.shared is not None:
+            self.shared.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+
+_plan_cache: Optional[PlanCache] = None
+_plan_cache_lock = threading.Lock()
+
+
+def get_plan_cache() -> PlanCache:
+    """Cache del proceso, configurado desde el entorno en el primer uso."""
+    global _plan_cache
+    if _plan_cache is None:
+        with _plan_cache_lock:
+            if _plan_cache is None:
+                _plan_cache = PlanCache(PlanCacheConfig.from_env())
+    return _plan_cache
+
+
+def set_plan_cache(cache: Optional[PlanCache]) -> None:
+    """Reemplaza el cache del proceso (None fuerza releer la configuración)."""
+    global _plan_cache
+    with _plan_cache_lock:
+        _plan_cache = cache
+
+
+# =========================================================
+# Planes cacheados
+# =========================================================
+
+
+def _profile_key(profile_data: Optional[Dict[str, Any]]) -> Optional[str]:
+    if not profile_data:
+        return None
+    return json.dumps(profile_data, sort_keys=True, ensure_ascii=False, default=str)
+
+
+def cached_workout_plan(
+    *,
+    objetivo: str,
+    nivel: str,
+    musculo: str,
+    equipamiento: str,
+    ejercicios_num: int,
+    tiempo_min: int,
+    condiciones: Optional[str] = None,
+    alergias: Optional[str] = None,
+    dislikes: Optional[str] = None,
+    profile_data: Optional[Dict[str, Any]] = None,
+    variant: Optional[int] = None,
+    cache: Optional[PlanCache] = None,
+) -> Dict[str, Any]:
+    """`generate_workout_plan` memoizado sobre los parámetros normalizados.
+
+    `variant=None` elige al azar una de las variantes configuradas (preserva la
+    variedad de `pick_exercises`); un entero fija la variante.
+    """
+    from .workouts import generate_workout_plan
+
+    if cache is None:
+        cache = get_plan_cache()
+    params = {
+        "objetivo": normalize_text(objetivo) or "fuerza",
+        "nivel": normalize_text(nivel) or "intermedio",
+        "musculo": normalize_text(musculo) or "fullbody",
+        "equipamiento": equip_key_norm(equipamiento or "mixto"),
+        "ejercicios_num": int(ejercicios_num),
+        "tiempo_min": int(tiempo_min),
+        "condiciones": normalize_text(condiciones),
+        "alergias": normalize_list(alergias),
+        "dislikes": normalize_list(dislikes),
+        "profile": _profile_key(profile_data),
+    }
+
+    # El generador recibe los mismos parámetros normalizados que arman la clave:
+    # cualquier petición equivalente obtiene exactamente el texto guardado.
+    def compute() -> Dict[str, Any]:
+        return generate_workout_plan(
+            objetivo=params["objetivo"],
+            nivel=params["nivel"],
+            musculo=params["musculo"],
+            equipamiento=params["equipamiento"].replace("_", " "),
+            ejercicios_num=params["ejercicios_num"],
+            tiempo_min=params["tiempo_min"],
+            condiciones=params["condiciones"],
+            alergias=params["alergias"],
+            dislikes=params["dislikes"],
+            profile_data=profile_data,
+        )
+
+    payload = cache.get_or_compute("workout", params, compute, variant=cache.pick_variant(variant))
+    routine = payload.get("routine_summary")
+    if isinstance(routine, dict):
+        # El id identifica la entrega, no el contenido: se renueva en cada respuesta.
+        routine["routine_id"] = f"rutina-{int(datetime.now().timestamp())}"
+    return payload
+
+
+def cached_diet_plan(
+    *,
+    objetivo: str,
+    nivel: str,
+    alergias: Optional[str],
+    dislikes: Optional[str],
+    condiciones: Optional[str],
+    profile_data: Optional[Dict[str, Any]] = None,
+    peso_slot: Optional[float] = None,
+    enable_calc: bool = False,
+    cache: Optional[PlanCache] = None,
+    **catalog_kwargs: Any,
+) -> Dict[str, Any]:
+    """`generate_diet_plan` memoizado sobre los parámetros normalizados.
+
+    Con callbacks o items de catálogo (`compose_callback`, `catalog_items`,
+    `catalog_loader`) el resultado depende de código externo y no se cachea.
+    """
+    from .diets import generate_diet_plan
+
+    if cache is None:
+        cache = get_plan_cache()
+    params = {
+        "objetivo": normalize_text(objetivo) or "equilibrada",
+        "nivel": normalize_text(nivel) or "intermedio",
+        "alergias": normalize_list(alergias),
+        "dislikes": normalize_list(dislikes),
+        "condiciones": normalize_text(condiciones),
+        "profile": _profile_key(profile_data),
+        "peso": peso_slot,
+        "enable_calc": bool(enable_calc),
+    }
+
+    def compute() -> Dict[str, Any]:
+        return generate_diet_plan(
+            objetivo=params["objetivo"],
+            nivel=params["nivel"],
+            alergias=params["alergias"],
+            dislikes=params["dislikes"],
+            condiciones=params["condiciones"],
+            profile_data=profile_data,
+            peso_slot=peso_slot,
+            enable_calc=enable_calc,
+            **catalog_kwargs,
+        )
+
+    if any(catalog_kwargs.get(name) for name in ("compose_callback", "catalog_items", "catalog_loader")):
+        metrics.inc_counter("plan_cache.bypass", tags={"kind": "diet"})
+        return compute()
+    params["catalog"] = bool(catalog_kwargs.get("enable_catalog"))
+    params["catalog_path"] = catalog_kwargs.get("catalog_path")
+    return cache.get_or_compute("diet", params, compute)
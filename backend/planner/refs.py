@@ -0,0 +1,55 @@
+"""Referencias por contenido a planes generados (rutinas y dietas).
+
+Un plan se identifica por el sha256 de su JSON canónico, así que el backend y el
+action server de Rasa calculan la misma referencia sin coordinarse. La referencia
+es un dict pequeño que viaja en metadata de Rasa, historial, slots y contexto:
+
+    {"plan_ref": "<sha256>", "type": "routine_detail", "header": "Rutina - Pecho"}
+
+El payload completo se guarda una sola vez en `chat_plan_payload` (backend) y solo
+se resuelve cuando alguien necesita el plan entero.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+from typing import Any, Dict, Optional
+
+PLAN_REF_KEY = "plan_ref"
+
+PLAN_TYPES = frozenset({"routine_detail", "diet_plan"})
+
+# Campos de cabecera que se copian a la referencia para poder mostrarla sin resolverla.
+_LABEL_FIELDS = ("type", "routine_id", "header", "objective", "title")
+_LABEL_MAX_LEN = 120
+
+
+def canonical_plan_json(payload: Dict[str, Any]) -> str:
+    return json.dumps(payload, sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=str)
+
+
+def plan_digest(payload: Dict[str, Any]) -> str:
+    """sha256 hex del JSON canónico del plan."""
+    return hashlib.sha256(canonical_plan_json(payload).encode("utf-8")).hexdigest()
+
+
+def is_plan_ref(value: Any) -> bool:
+    return isinstance(value, dict) and isinstance(value.get(PLAN_REF_KEY), str)
+
+
+def is_plan_payload(value: Any) -> bool:
+    """True si `value` es un plan completo (rutina/dieta) que conviene referenciar."""
+    return isinstance(value, dict) and not is_plan_ref(value) and value.get("type") in PLAN_TYPES
+
+
+def make_plan_ref(payload: Dict[str, Any], digest: Optional[str] = None) -> Dict[str, Any]:
+    """Referencia compacta al plan; si ya es una referencia se devuelve tal cual."""
+    if is_plan_ref(payload):
+        return payload
+    ref: Dict[str, Any] = {PLAN_REF_KEY: digest or plan_digest(payload)}
+    for field in _LABEL_FIELDS:
+        value = payload.get(field)
+        if isinstance(value, str) and value.strip():
+            ref[field] = value.strip()[:_LABEL_MAX_LEN]
+    return ref
@@ -482,60 +482,100 @@ DIET_BASES: Dict[str, Dict[str, Any]] = {
 # Banco de ejercicios y selección
 # =========================================================
 
+Exercise = Tuple[str, str]
 
-def _build_bank_por_prioridad(grupo: str, equip: str) -> List[Tuple[str, str]]:
+# Índice precompilado (se construye al importar con `rebuild_exercise_index`):
+# - _EXERCISE_INDEX: grupo -> equipo -> tupla de (nombre, url)
+# - _MIXTO_ORDER:    grupo -> orden de equipos para el round-robin del modo mixto
+# - _BANKS:          (grupo, equipo) -> pool por prioridad ya deduplicado; grupo/equipo
+#                    desconocidos se agrupan en la clave None (mismo pool de fallback)
+# - _NAME_LOWER:     nombre -> nombre en minúsculas (para `exclude`)
+_EXERCISE_INDEX: Dict[str, Dict[str, Tuple[Exercise, ...]]] = {}
+_MIXTO_ORDER: Dict[str, Tuple[str, ...]] = {}
+_BANKS: Dict[Tuple[Optional[str], Optional[str]], Tuple[Exercise, ...]] = {}
+_NAME_LOWER: Dict[str, str] = {}
+
+
+def _equip_order(equipos: List[str]) -> Tuple[str, ...]:
+    """Primero los equipos de la lista de preferencia (en ese orden), luego el resto."""
+    orden = [eq for eq in EQUIPOS_MIXTO_PREFERENCIA if eq in equipos]
+    orden += [eq for eq in equipos if eq not in orden]
+    return tuple(orden)
+
+
+def _compile_bank(g: Optional[str], e: Optional[str]) -> Tuple[Exercise, ...]:
     """
     Construye un pool de ejercicios (nombre, url):
-    - equip == "mixto": mezcla balanceada de todos los equipos disponibles para el grupo.
-    - equip específico: prioriza ese equipo y completa con el resto si hace falta.
-    - fallback final: fullbody + mancuernas.
+    - e == "mixto": mezcla balanceada de todos los equipos disponibles para el grupo.
+    - equipo específico: prioriza ese equipo y completa con el resto si hace falta.
+    - fallback final: fullbody + máquinas (o mancuernas).
     """
-    g = (grupo or "").strip().lower()
-    e = equip_key_norm(equip)
-
-    pool: List[Tuple[str, str]] = []
+    pool: List[Exercise] = []
     seen: set = set()
 
-    def _add(items: List[Tuple[str, str, str]]) -> None:
-        for n, u, _src in items:
-            if n not in seen:
-                seen.add(n)
-                pool.append((n, u))
+    def _add(items: Tuple[Exercise, ...]) -> None:
+        for item in items:
+            if item[0] not in seen:
+                seen.add(item[0])
+                pool.append(item)
 
+    grupo = _EXERCISE_INDEX.get(g) if g is not None else None
+    fullbody = _EXERCISE_INDEX.get("fullbody", {})
     if e == "mixto":
-        # Modo mixto: recoge 1-2 ejercicios de cada tipo de equipo disponible,
-        # respetando el orden de preferencia, para garantizar variedad real.
-        if g in CATALOGO:
-            equip_disponible = list(CATALOGO[g].keys())
-            # Primero los que están en la lista de preferencia, en ese orden
-            orden = [eq for eq in EQUIPOS_MIXTO_PREFERENCIA if eq in equip_disponible]
-            # Luego los que no están en la lista de preferencia
-            orden += [eq for eq in equip_disponible if eq not in orden]
-            for eq in orden:
-                _add(CATALOGO[g][eq])
-        # fallback
-        if "fullbody" in CATALOGO:
-            for eq in EQUIPOS_MIXTO_PREFERENCIA:
-                if eq in CATALOGO["fullbody"]:
-                    _add(CATALOGO["fullbody"][eq])
+        if grupo:
+            for eq in _MIXTO_ORDER[g]:
+                _add(grupo[eq])
+        for eq in EQUIPOS_MIXTO_PREFERENCIA:
+            if eq in fullbody:
+                _add(fullbody[eq])
     else:
-        # Equipo específico: primero el equipo solicitado
-        if g in CATALOGO and e in CATALOGO[g]:
-            _add(CATALOGO[g][e])
-
-        # Luego el resto para completar si hay pocos ejercicios
-        if g in CATALOGO:
-            for e2, lista in CATALOGO[g].items():
+        if grupo:
+            if e in grupo:
+                _add(grupo[e])
+            for e2, lista in grupo.items():
                 if e2 != e:
                     _add(lista)
+        if "máquinas" in fullbody:
+            _add(fullbody["máquinas"])
+        elif "mancuernas" in fullbody:
+            _add(fullbody["mancuernas"])
+    return tuple(pool)
+
+
+def rebuild_exercise_index() -> None:
+    """(Re)compila el índice a partir de `CATALOGO`; llamar si el catálogo se modifica."""
+    _EXERCISE_INDEX.clear()
+    _MIXTO_ORDER.clear()
+    _BANKS.clear()
+    _NAME_LOWER.clear()
+    for grupo, equipos in CATALOGO.items():
+        _EXERCISE_INDEX[grupo] = {
+            equip: tuple((name, url) for name, url, _src in items) for equip, items in equipos.items()
+        }
+        _MIXTO_ORDER[grupo] = _equip_order(list(equipos.keys()))
+        for items in equipos.values():
+            for name, _url, _src in items:
+                _NAME_LOWER[name] = name.lower()
+    for grupo, equipos in _EXERCISE_INDEX.items():
+        for equip in list(equipos.keys()) + ["mixto", None]:
+            _BANKS[(grupo, equip)] = _compile_bank(grupo, equip)
+    _BANKS[(None, "mixto")] = _compile_bank(None, "mixto")
+    _BANKS[(None, None)] = _compile_bank(None, None)
+
+
+def _bank(grupo: str, equip: str) -> Tuple[Exercise, ...]:
+    g = (grupo or "").strip().lower()
+    e = equip_key_norm(equip)
+    if g not in _EXERCISE_INDEX:
+        g = None
+    if e != "mixto" and (g is None or e not in _EXERCISE_INDEX[g]):
+        e = None
+    return _BANKS[(g, e)]
 
-        # fallback
-        if "fullbody" in CATALOGO and "máquinas" in CATALOGO["fullbody"]:
-            _add(CATALOGO["fullbody"]["máquinas"])
-        elif "fullbody" in CATALOGO and "mancuernas" in CATALOGO["fullbody"]:
-            _add(CATALOGO["fullbody"]["mancuernas"])
 
-    return pool
+def _build_bank_por_prioridad(grupo: str, equip: str) -> List[Tuple[str, str]]:
+    """Pool por prioridad (nombre, url) para grupo/equipo, leído del índice precompilado."""
+    return list(_bank(grupo, equip))
 
 
 def _pick_mixto_balanceado(grupo: str, n: int) -> List[Tuple[str, str]]:
@@ -544,25 +584,17 @@ def _pick_mixto_balanceado(grupo: str, n: int) -> List[Tuple[str, str]]:
     garantizar variedad real (no todos del mismo tipo).
     """
     g = (grupo or "").strip().lower()
-    if g not in CATALOGO:
+    equipos = _EXERCISE_INDEX.get(g)
+    if not equipos:
         return []
 
-    equip_disponible = list(CATALOGO[g].keys())
-    orden = [eq for eq in EQUIPOS_MIXTO_PREFERENCIA if eq in equip_disponible]
-    orden += [eq for eq in equip_disponible if eq not in orden]
-
-    # Construye listas aleatorias por equipo
-    buckets: List[List[Tuple[str, str]]] = []
-    for eq in orden:
-        items = [(name, url) for name, url, _ in CATALOGO[g][eq]]
-        random.shuffle(items)
-        buckets.append(items)
+    # Orden aleatorio por equipo (permutación de la tupla precompilada)
+    buckets = [random.sample(equipos[eq], len(equipos[eq])) for eq in _MIXTO_ORDER[g]]
 
     # Round-robin: 1 ejercicio de cada equipo en ciclos
     result: List[Tuple[str, str]] = []
     seen: set = set()
     idx = [0] * len(buckets)
-    cycle = 0
     while len(result) < n:
         added_in_cycle = 0
         for b, bucket in enumerate(buckets):
@@ -576,13 +608,23 @@ def _pick_mixto_balanceado(grupo: str, n: int) -> List[Tuple[str, str]]:
                     result.append((name, url))
                     added_in_cycle += 1
                     break
-        cycle += 1
         if added_in_cycle == 0:
             break  # todos los buckets agotados
 
     return result
 
 
+def _exclude_set(exclude: Optional[List[str]]) -> set:
+    return {x.lower().strip() for x in (exclude or [])}
+
+
+def _without(items: Any, exclude_set: set) -> List[Tuple[str, str]]:
+    if not exclude_set:
+        return list(items)
+    lower = _NAME_LOWER
+    return [item for item in items if lower.get(item[0], item[0].lower()) not in exclude_set]
+
+
 def pick_exercises(
     grupo: str,
     equip: str,
@@ -599,23 +641,30 @@ def pick_exercises(
         n:       Número de ejercicios a devolver.
         exclude: Lista de nombres de ejercicios a omitir (insensible a mayúsculas).
     """
-    exclude_set: set = {x.lower().strip() for x in (exclude or [])}
-
-    def _filter(lst: List[Tuple[str, str]]) -> List[Tuple[str, str]]:
-        if not exclude_set:
-            return lst
-        return [(name, url) for name, url in lst if name.lower() not in exclude_set]
-
-    e = equip_key_norm(equip)
-    if e == "mixto":
-        result = _filter(_pick_mixto_balanceado(grupo, n + len(exclude_set)))
+    exclude_set = _exclude_set(exclude)
+    if equip_key_norm(equip) == "mixto":
+        result = _without(_pick_mixto_balanceado(grupo, n + len(exclude_set)), exclude_set)
         if result:
             return result[:n]
-    pool = _filter(_build_bank_por_prioridad(grupo, equip))
+    pool = _bank(grupo, equip)
+    if exclude_set:
+        pool = _without(pool, exclude_set)
     if not pool:
         return []
-    random.shuffle(pool)
-    return pool[:max(0, n)]
+    # Muestra uniforme sin reemplazo: equivale a barajar el pool completo y cortar
+    return random.sample(pool, min(len(pool), max(0, n)))
+
+
+def available_exercise_count(grupo: str, equip: str, exclude: Optional[List[str]] = None) -> int:
+    """Cantidad de ejercicios del pool de (grupo, equipo) que quedan tras `exclude`."""
+    pool = _bank(grupo, equip)
+    exclude_set = _exclude_set(exclude)
+    if not exclude_set:
+        return len(pool)
+    return len(_without(pool, exclude_set))
+
+
+rebuild_exercise_index()
 
 
 def _build_conversational_rules(
@@ -676,8 +725,12 @@ def generate_workout_plan(
     alergias: Optional[str] = None,
     dislikes: Optional[str] = None,
     profile_data: Optional[Dict[str, Any]] = None,
+    exclude: Optional[List[str]] = None,
 ) -> Dict[str, Any]:
-    """Genera un JSON estructurado de rutina y texto explicativo."""
+    """Genera un JSON estructurado de rutina y texto explicativo.
+
+    `exclude` omite ejercicios por nombre (insensible a mayúsculas), como en `pick_exercises`.
+    """
     objetivo_norm = (objetivo or "fuerza").strip().lower()
     nivel_norm = (nivel or "intermedio").strip().lower()
     musculo_norm = (musculo or "fullbody").strip().lower()
@@ -703,10 +756,10 @@ def generate_workout_plan(
     if health_flags.get("diabetes") and "Revisa glucosa" not in health_notes:
         health_notes.append("Revisa glucosa antes y despues de entrenar.")
 
-    ejercicios = pick_exercises(musculo_norm, equip_norm, ejercicios_num)
+    ejercicios = pick_exercises(musculo_norm, equip_norm, ejercicios_num, exclude=exclude)
     fallback_notice = ""
     if not ejercicios:
-        ejercicios = pick_exercises("fullbody", "mancuernas", ejercicios_num)
+        ejercicios = pick_exercises("fullbody", "mancuernas", ejercicios_num, exclude=exclude)
         fallback_notice = " (fallback a fullbody por catalogo no disponible)"
 
     structured: List[Dict[str, Any]] = []
@@ -899,3 +952,40 @@ def generate_workout_plan(
         "routine_summary": routine_summary,
         "context_payload": context_payload,
     }
+
+
+def generate_workout_plan_batch(
+    sessions: List[Dict[str, Any]],
+    *,
+    rotate_exercises: bool = True,
+    **defaults: Any,
+) -> List[Dict[str, Any]]:
+    """Genera varias rutinas en una llamada (p.ej. un split de 4 semanas).
+
+    Cada elemento de `sessions` sobrescribe los parámetros comunes de `defaults`
+    (los mismos de `generate_workout_plan`). Con `rotate_exercises` las sesiones que
+    repiten grupo muscular y equipamiento evitan los ejercicios ya usados mientras el
+    pool tenga suficientes; al agotarse se reinicia la rotación de ese grupo.
+    """
+    used: Dict[Tuple[str, str], List[str]] = {}
+    stamp = int(datetime.now().timestamp())
+    plans: List[Dict[str, Any]] = []
+    for idx, session in enumerate(sessions, start=1):
+        params = {**defaults, **session}
+        exclude = list(params.pop("exclude", None) or [])
+        if rotate_exercises:
+            key = (
+                (params.get("musculo") or "fullbody").strip().lower(),
+                equip_key_norm(params.get("equipamiento") or "mixto"),
+            )
+            history = used.setdefault(key, [])
+            needed = int(params.get("ejercicios_num") or 0)
+            if available_exercise_count(key[0], key[1], exclude + history) < needed:
+                history.clear()
+            plan = generate_workout_plan(**params, exclude=exclude + history)
+            history.extend(ex["nombre"] for ex in plan["routine_summary"]["exercises"])
+        else:
+            plan = generate_workout_plan(**params, exclude=exclude or None)
+        plan["routine_summary"]["routine_id"] = f"rutina-{stamp}-{idx}"
+        plans.append(plan)
+    return plans
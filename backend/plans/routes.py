@@ -354,3 +354,99 @@ def delete_routine_plan(plan_id: str):
     db.session.delete(plan)
     db.session.commit()
     return ("", 204)
+
+
+# ---------------------------
+# Bulk (action server)
+# ---------------------------
+
+BULK_MAX_ITEMS = 100
+_BULK_MODELS = {
+    "diet": (DietPlan, "goal"),
+    "routine": (RoutinePlan, "objective"),
+}
+
+
+def _plan_pk(pid: uuid.UUID):
+    # En SQLite la columna es String(36); en Postgres UUID nativo.
+    return pid if db.engine.dialect.name == "postgresql" else str(pid)
+
+
+@plans_bp.post("/plans/bulk")
+def bulk_create_plans():
+    """Guarda un lote de planes en un solo commit (cola de trabajos del action server).
+
+    Cada item trae su `id` (uuid generado por el cliente): si ya existe se responde
+    200 sin duplicar, asi los reintentos son idempotentes. Solo con `X-Context-Key`.
+    """
+    expected = current_app.config.get("CHAT_CONTEXT_API_KEY", "")
+    if not context_api_key_valid(request.headers, expected):
+        return jsonify({"error": "No autenticado"}), 401
+
+    payload = request.get_json(silent=True) or {}
+    items = payload.get("items") if isinstance(payload, dict) else None
+    if not isinstance(items, list) or not items:
+        return jsonify({"error": "items_required"}), 400
+    if len(items) > BULK_MAX_ITEMS:
+        return jsonify({"error": "too_many_items", "max": BULK_MAX_ITEMS}), 400
+
+    results = []
+    pending = []
+    user_ids = set()
+    for index, item in enumerate(items):
+        if not isinstance(item, dict) or item.get("kind") not in _BULK_MODELS:
+            results.append({"index": index, "status": 400, "error": "invalid_kind"})
+            continue
+        try:
+            pid = uuid.UUID(str(item.get("id")))
+            user_id = int(item.get("user_id"))
+        except (TypeError, ValueError):
+            results.append({"index": index, "status": 400, "error": "invalid_id"})
+            continue
+        title = item.get("title")
+        if not isinstance(title, str) or not title.strip():
+            results.append({"index": index, "id": str(pid), "status": 400, "error": "invalid_title"})
+            continue
+        if not is_json_object(item.get("content")):
+            results.append({"index": index, "id": str(pid), "status": 400, "error": "content_must_be_object"})
+            continue
+        results.append({"index": index, "id": str(pid), "status": 201})
+        pending.append((len(results) - 1, pid, user_id, item))
+        user_ids.add(user_id)
+
+    known_users = {
+        uid for (uid,) in db.session.query(User.id).filter(User.id.in_(user_ids)).all()
+    } if user_ids else set()
+    existing = set()
+    for kind, (model, _field) in _BULK_MODELS.items():
+        keys = [_plan_pk(pid) for _, pid, _, item in pending if item["kind"] == kind]
+        if keys:
+            existing.update(str(pk) for (pk,) in db.session.query(model.id).filter(model.id.in_(keys)).all())
+
+    seen = set()
+    for slot, pid, user_id, item in pending:
+        if str(pid) in existing or str(pid) in seen:
+            results[slot]["status"] = 200
+            continue
+        if user_id not in known_users:
+            results[slot].update(status=404, error="user_not_found")
+            continue
+        model, field = _BULK_MODELS[item["kind"]]
+        db.session.add(
+            model(
+                id=_plan_pk(pid),
+                user_id=user_id,
+                title=item["title"].strip()[:120],
+                content=item["content"],
+                **{field: str(item.get(field) or "").strip()[:120]},
+            )
+        )
+        seen.add(str(pid))
+
+    try:
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify({"error": "db_error"}), 500
+
+    return jsonify({"results": results}), 200
@@ -85,6 +85,15 @@ def _profile_to_response(profile: UserProfile) -> Dict[str, object]:
     return data
 
 
+def profile_snapshot_for_user(user_id: int) -> Optional[Dict[str, object]]:
+    """Perfil descifrado de `user_id` para llamadas internas ya autorizadas (bootstrap de chat)."""
+    user = User.query.get(user_id)
+    profile = _get_profile(user, create_if_missing=False) if user else None
+    if profile is None:
+        return None
+    return _profile_to_response(profile)
+
+
 @bp.get("/me")
 def profile_me():
     user = _current_user()
@@ -99,4 +99,26 @@ def init_realtime(app: Any) -> None:  # noqa: ANN001
         except Exception:
             logger.exception("realtime: on_join_admin failed for uid=%s", uid)
 
+    @socketio.on("chat_send")
+    def on_chat_send(data: Dict[str, Any]) -> None:  # type: ignore[misc]
+        """Stream a chat turn back to the caller as chat_token/chat_card/chat_message/chat_done."""
+        from flask import current_app as _app
+        from flask import request as _req
+        from flask import session as _session
+        from flask_socketio import emit
+
+        from ..chat.errors import ChatOverloaded
+        from ..chat.service import ChatServiceError
+
+        try:
+            for kind, value in _app.chat_service.stream_message(data, _req.headers, _session):
+                emit(f"chat_{kind}", value)
+        except ChatOverloaded as exc:
+            emit("chat_error", {"error": exc.message, "status": exc.status_code, "retry_after_s": exc.retry_after_s})
+        except ChatServiceError as exc:
+            emit("chat_error", {"error": exc.message, "status": exc.status_code})
+        except Exception:
+            logger.exception("realtime: chat_send failed for sid=%s", _req.sid)
+            emit("chat_error", {"error": "No se pudo completar la solicitud.", "status": 500})
+
     app.logger.info("realtime: SocketIO event handlers registered.")
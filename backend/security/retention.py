@@ -2,15 +2,44 @@
 
 from __future__ import annotations
 
+import re
 from datetime import datetime, timedelta
-from typing import Dict, Optional
+from typing import Dict, Optional, Set
 
 from flask import Flask
+from sqlalchemy import Text, cast, select
 
-from ..chat.models import ChatUserContext
+from ..chat.models import ChatHistoryEvent, ChatPlanPayload, ChatUserContext
 from ..login.models import User
 from ..profile.models import UserProfile
 
+# Un digest de plan es un sha256 hex: no colisiona con otro texto del JSON.
+_DIGEST_RE = re.compile(r"\b[0-9a-f]{64}\b")
+_SCAN_BATCH = 500
+
+
+def _referenced_plan_digests(db) -> Set[str]:
+    """Digests de plan mencionados en contextos o en el historial (una pasada por tabla).
+
+    Las referencias viajan anidadas (`last_routine`, `data` de un `bot_custom`,
+    metadata...), asi que se extraen del JSON serializado en vez de recorrer cada
+    estructura. Los slots `ultima_rutina`/`ultima_dieta` de Rasa viven en su tracker
+    store, pero el mismo plan queda como `bot_custom` en el historial del sender.
+    """
+    columns = (
+        (cast(ChatUserContext.last_routine, Text), cast(ChatUserContext.last_diet, Text),
+         cast(ChatUserContext.legacy_history, Text)),
+        (cast(ChatHistoryEvent.payload, Text),),
+    )
+    referenced: Set[str] = set()
+    for cols in columns:
+        rows = db.session.execute(select(*cols).execution_options(yield_per=_SCAN_BATCH))
+        for row in rows:
+            for raw in row:
+                if raw:
+                    referenced.update(_DIGEST_RE.findall(raw))
+    return referenced
+
 
 def purge_stale_data(app: Flask, db, *, retention_days: Optional[int] = None, dry_run: bool = False) -> Dict[str, int]:
     """Elimina o anonimiza datos luego del periodo de retencion."""
@@ -23,8 +52,27 @@ def purge_stale_data(app: Flask, db, *, retention_days: Optional[int] = None, dr
     stale_ctx_q = ChatUserContext.query.filter(ChatUserContext.last_interaction_at < cutoff)
     stale_ctx_count = stale_ctx_q.count()
     if not dry_run and stale_ctx_count:
+        stale_senders = select(ChatUserContext.sender_id).where(ChatUserContext.last_interaction_at < cutoff)
+        ChatHistoryEvent.query.filter(ChatHistoryEvent.sender_id.in_(stale_senders)).delete(
+            synchronize_session=False
+        )
         stale_ctx_q.delete(synchronize_session=False)
 
+    # Planes direccionados por contenido que ya no referencia ningun contexto ni historial:
+    # se juntan las referencias una vez y se descuentan de los candidatos (anti-join en memoria).
+    candidates = {
+        digest for (digest,) in db.session.execute(
+            select(ChatPlanPayload.digest).where(ChatPlanPayload.created_at < cutoff)
+        )
+    }
+    stale_digests = sorted(candidates - _referenced_plan_digests(db)) if candidates else []
+    stale_plans_count = len(stale_digests)
+    if not dry_run:
+        for start in range(0, stale_plans_count, _SCAN_BATCH):
+            ChatPlanPayload.query.filter(
+                ChatPlanPayload.digest.in_(stale_digests[start:start + _SCAN_BATCH])
+            ).delete(synchronize_session=False)
+
     # Anonimiza perfiles sin actividad reciente (no admins)
     profiles_q = (
         UserProfile.query.join(User, UserProfile.user_id == User.id)
@@ -47,16 +95,19 @@ def purge_stale_data(app: Flask, db, *, retention_days: Optional[int] = None, dr
 
     if logger:
         logger.info(
-            "Retencion ejecutada (days=%s, dry_run=%s): chat_context purgados=%s, perfiles_anonimizados=%s",
+            "Retencion ejecutada (days=%s, dry_run=%s): chat_context purgados=%s, planes purgados=%s, "
+            "perfiles_anonimizados=%s",
             days,
             dry_run,
             stale_ctx_count,
+            stale_plans_count,
             anonymized_profiles,
         )
 
     return {
         "retention_days": days,
         "chat_contexts_deleted": stale_ctx_count,
+        "chat_plans_deleted": stale_plans_count,
         "profiles_anonymized": anonymized_profiles,
         "dry_run": dry_run,
     }
@@ -0,0 +1,143 @@
+"""Servidor local compatible con `/v1/chat/completions` para probar el orquestador.
+
+Comportamiento guionado:
+  - si la conversacion ya tiene un mensaje `tool`, responde texto final;
+  - si el ultimo mensaje del usuario menciona "rutina", pide `generate_workout_plan`;
+  - en otro caso responde texto.
+Soporta `stream=True` (chunks SSE + `data: [DONE]`) y respuestas JSON normales.
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+FINAL_TEXT = "Listo, aqui tienes tu plan."
+CHAT_TEXT = "Hola, soy Fitter. En que te ayudo?"
+WORKOUT_ARGS = {
+    "objetivo": "hipertrofia",
+    "nivel": "intermedio",
+    "musculo": "pecho",
+    "equipamiento": "mancuernas",
+    "ejercicios_num": 4,
+    "tiempo_min": 40,
+}
+
+
+def _script(messages):
+    if any(m.get("role") == "tool" for m in messages):
+        return FINAL_TEXT, None
+    user = next((m.get("content") or "" for m in reversed(messages) if m.get("role") == "user"), "")
+    if "rutina" in user.lower():
+        return "", {"id": "call_1", "name": "generate_workout_plan", "arguments": json.dumps(WORKOUT_ARGS)}
+    return CHAT_TEXT, None
+
+
+def _chunks(text, size=6):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+class FakeLLMServer:
+    """Arranca el servidor en un hilo; `base_url` apunta a `/v1`."""
+
+    def __init__(self, token_delay_s=0.0):
+        self.token_delay_s = token_delay_s
+        self.requests = []
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self._server.server_port}/v1"
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _handler(self):
+        owner = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):  # silencio
+                pass
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = json.loads(self.rfile.read(length) or b"{}")
+                owner.requests.append(body)
+                text, call = _script(body.get("messages") or [])
+                if body.get("stream"):
+                    self._stream(body, text, call)
+                else:
+                    self._complete(body, text, call)
+
+            def _complete(self, body, text, call):
+                if owner.token_delay_s:
+                    time.sleep(owner.token_delay_s * len(_chunks(text)))
+                message = {"role": "assistant", "content": text or None}
+                if call:
+                    message["tool_calls"] = [
+                        {"id": call["id"], "type": "function",
+                         "function": {"name": call["name"], "arguments": call["arguments"]}}
+                    ]
+                raw = json.dumps({
+                    "id": "cmpl-fake",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": body.get("model") or "fake",
+                    "choices": [{"index": 0, "message": message,
+                                 "finish_reason": "tool_calls" if call else "stop"}],
+                }).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(raw)))
+                self.end_headers()
+                self.wfile.write(raw)
+
+            def _stream(self, body, text, call):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                model = body.get("model") or "fake"
+
+                def send(delta, finish=None):
+                    chunk = {
+                        "id": "cmpl-fake",
+                        "object": "chat.completion.chunk",
+                        "created": int(time.time()),
+                        "model": model,
+                        "choices": [{"index": 0, "delta": delta, "finish_reason": finish}],
+                    }
+                    self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+                    self.wfile.flush()
+
+                send({"role": "assistant", "content": ""})
+                for piece in _chunks(text):
+                    if owner.token_delay_s:
+                        time.sleep(owner.token_delay_s)
+                    send({"content": piece})
+                if call:
+                    args = call["arguments"]
+                    half = len(args) // 2
+                    send({"tool_calls": [{"index": 0, "id": call["id"], "type": "function",
+                                          "function": {"name": call["name"], "arguments": args[:half]}}]})
+                    send({"tool_calls": [{"index": 0, "function": {"arguments": args[half:]}}]})
+                send({}, "tool_calls" if call else "stop")
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.wfile.flush()
+                self.close_connection = True
+
+        return Handler
@@ -0,0 +1,171 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from backend.app import create_app
+from backend.chat.admission import AdaptiveConcurrencyLimiter
+from backend.chat.service import ServiceResponse
+from backend.extensions import db
+from backend.metrics import metrics
+
+
+def _drive(limiter, rtt_ms, rounds):
+    """Ocupa todo el limite y devuelve cada turno con la latencia indicada."""
+    for _ in range(rounds):
+        tickets = [limiter.acquire() for _ in range(int(limiter.limit))]
+        for ticket in tickets:
+            limiter.release(ticket, rtt_ms)
+
+
+def test_limit_grows_when_latency_is_stable_and_shrinks_when_it_rises():
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=8, min_limit=2, max_limit=40, queue_max=0, long_window=200)
+    _drive(limiter, 100.0, 20)
+    grown = limiter.limit
+    assert grown > 8
+
+    _drive(limiter, 600.0, 1)
+    assert 2 <= limiter.limit < grown * 0.9
+
+    before = limiter.limit
+    limiter.release(limiter.acquire(), 0.0, dropped=True)
+    assert limiter.limit == pytest.approx(max(2, before * 0.9))
+
+
+def test_excess_is_queued_briefly_then_shed():
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=1, min_limit=1, queue_max=1, queue_timeout_s=2.0)
+    first = limiter.acquire()
+    assert first is not None
+    got = []
+    waiter = threading.Thread(target=lambda: got.append(limiter.acquire()))
+    waiter.start()
+    while limiter.snapshot()["queue_depth"] == 0:
+        pass
+    assert limiter.acquire() is None  # cola llena -> descartar
+    limiter.release(first, 50.0)
+    waiter.join(2)
+    assert got and got[0] is not None and got[0].queued_ms > 0
+    assert limiter.snapshot()["inflight"] == 1
+
+
+@pytest.fixture
+def app(monkeypatch):
+    monkeypatch.setenv("SQLALCHEMY_DATABASE_URI", "sqlite:///:memory:")
+    monkeypatch.setenv("CHAT_ADMISSION_INITIAL_LIMIT", "1")
+    monkeypatch.setenv("CHAT_ADMISSION_MIN_LIMIT", "1")
+    monkeypatch.setenv("CHAT_ADMISSION_QUEUE_MAX", "0")
+    app = create_app()
+    app.config.update(TESTING=True, RATELIMIT_ENABLED=False)
+    with app.app_context():
+        db.create_all()
+    yield app
+    with app.app_context():
+        db.drop_all()
+
+
+def test_chat_send_sheds_with_503_when_saturated(app, monkeypatch):
+    entered = threading.Event()
+    finish = threading.Event()
+
+    def slow_turn(manager, data, sender, message, handoff, headers, session, token):
+        entered.set()
+        finish.wait(5)
+        app.chat_service._release_sender_slot(sender, token)
+        return ServiceResponse([{"text": "ok"}], 200, "success")
+
+    monkeypatch.setattr(app.chat_service, "_send_turn", slow_turn)
+    statuses = []
+    worker = threading.Thread(
+        target=lambda: statuses.append(
+            app.test_client().post("/chat/send", json={"sender": "a", "message": "hola"}).status_code
+        )
+    )
+    worker.start()
+    assert entered.wait(5)
+
+    resp = app.test_client().post("/chat/send", json={"sender": "b", "message": "hola"})
+    assert resp.status_code == 503
+    assert int(resp.headers["Retry-After"]) >= 1
+    assert resp.get_json()["retry_after_s"] >= 1
+
+    finish.set()
+    worker.join(5)
+    assert statuses == [200]
+    admission = app.test_client().get("/metrics").get_json()["admission"]
+    assert admission["inflight"] == 0 and admission["limit"] >= 1
+    gauges = {g["name"] for g in metrics.snapshot()["gauges"]}
+    assert {"chat_send_admission_limit", "chat_send_admission_queue_depth"} <= gauges
+
+
+@pytest.mark.parametrize("orchestrated", [False, True])
+def test_chat_stream_sheds_with_503_before_opening_the_stream(app, monkeypatch, orchestrated):
+    entered = threading.Event()
+    finish = threading.Event()
+
+    def slow_turn(manager, data, sender, message, handoff, headers, session, token):
+        entered.set()
+        finish.wait(5)
+        app.chat_service._release_sender_slot(sender, token)
+        return ServiceResponse([{"text": "ok"}], 200, "success")
+
+    monkeypatch.setattr(app.chat_service, "_send_turn", slow_turn)
+    worker = threading.Thread(
+        target=lambda: app.test_client().post("/chat/send", json={"sender": "a", "message": "hola"})
+    )
+    worker.start()
+    assert entered.wait(5)
+    if orchestrated:
+        # La admision se decide antes de tocar el orquestador.
+        monkeypatch.setattr(app.chat_service, "orchestrator", SimpleNamespace(enabled=True))
+
+    resp = app.test_client().post("/chat/stream", json={"sender": "b", "message": "hola"})
+    assert resp.status_code == 503
+    assert resp.mimetype == "application/json"
+    assert int(resp.headers["Retry-After"]) >= 1
+    assert resp.get_json()["retry_after_s"] >= 1
+
+    finish.set()
+    worker.join(5)
+    assert app.chat_service.admission.snapshot()["inflight"] == 0
+    assert not app.chat_service._sender_lock.local._queues.get("b")
+
+
+def test_same_sender_queue_does_not_hold_admission_slots(app, monkeypatch):
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=2, min_limit=2, max_limit=2, queue_max=0)
+    monkeypatch.setattr(app.chat_service, "admission", limiter)
+    entered = threading.Event()
+    finish = threading.Event()
+
+    def turn(manager, data, sender, message, handoff, headers, session, token):
+        if message == "lento":
+            entered.set()
+            finish.wait(5)
+        app.chat_service._release_sender_slot(sender, token)
+        return ServiceResponse([{"text": message}], 200, "success")
+
+    monkeypatch.setattr(app.chat_service, "_send_turn", turn)
+
+    def _post(sender, message, out):
+        out.append(app.test_client().post("/chat/send", json={"sender": sender, "message": message}).status_code)
+
+    statuses = []
+    first = threading.Thread(target=_post, args=("a", "lento", statuses))
+    first.start()
+    assert entered.wait(5)
+    queued = threading.Thread(target=_post, args=("a", "segundo", statuses))
+    queued.start()
+    queues = app.chat_service._sender_lock.local._queues
+    while not (queues.get("a") and queues["a"].waiters):
+        time.sleep(0.01)  # el segundo turno de "a" espera su slot de sender, no la admision
+    assert limiter.snapshot()["inflight"] == 1
+
+    other = []
+    _post("b", "hola", other)
+    assert other == [200]
+
+    finish.set()
+    first.join(5)
+    queued.join(5)
+    assert statuses == [200, 200]
+    assert limiter.snapshot()["inflight"] == 0
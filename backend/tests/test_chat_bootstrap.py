@@ -0,0 +1,63 @@
+import pytest
+from cryptography.fernet import Fernet
+
+from backend.app import create_app
+from backend.chat.models import ChatUserContext
+from backend.extensions import db
+from backend.login.models import User
+
+SENDER = "bootstrap-user"
+HEADERS = {"X-Context-Key": "k"}
+
+
+@pytest.fixture
+def app(monkeypatch):
+    monkeypatch.setenv("SQLALCHEMY_DATABASE_URI", "sqlite:///:memory:")
+    monkeypatch.setenv("CHAT_CONTEXT_API_KEY", "k")
+    monkeypatch.setenv("PROFILE_ENCRYPTION_KEY", Fernet.generate_key().decode())
+    app = create_app()
+    app.config.update(TESTING=True, RATELIMIT_ENABLED=False)
+    with app.app_context():
+        db.create_all()
+    yield app
+    with app.app_context():
+        db.drop_all()
+
+
+def _link_user(app, client):
+    assert client.post(f"/chat/context/{SENDER}", headers=HEADERS, json={"consent_given": True}).status_code == 200
+    with app.app_context():
+        user = User(email="boot@test.com", username="boot", full_name="Boot Test")
+        db.session.add(user)
+        db.session.flush()
+        profile = user.ensure_profile()
+        profile.update_from_payload({"weight_kg": 72.5, "height_cm": 180, "primary_goal": "fuerza"})
+        ChatUserContext.query.filter_by(sender_id=SENDER).one().user_id = user.id
+        db.session.commit()
+        return user.id
+
+
+def test_bootstrap_returns_context_and_decrypted_profile(app):
+    client = app.test_client()
+    user_id = _link_user(app, client)
+
+    resp = client.get(f"/chat/bootstrap/{SENDER}", headers=HEADERS)
+    assert resp.status_code == 200
+    data = resp.get_json()
+    assert data["ok"] is True
+    assert data["context"]["user_id"] == user_id
+    assert data["context"] == client.get(f"/chat/context/{SENDER}", headers=HEADERS).get_json()["context"]
+    assert data["profile"]["weight_kg"] == 72.5
+    assert data["profile"]["primary_goal"] == "fuerza"
+
+    without_profile = client.get(f"/chat/bootstrap/{SENDER}?profile=0", headers=HEADERS).get_json()
+    assert without_profile["profile"] is None and without_profile["context"]["user_id"] == user_id
+
+
+def test_bootstrap_unknown_sender_and_auth(app):
+    client = app.test_client()
+    resp = client.get("/chat/bootstrap/nadie", headers=HEADERS)
+    assert resp.status_code == 200
+    assert resp.get_json()["context"] is None and resp.get_json()["profile"] is None
+
+    assert client.get(f"/chat/bootstrap/{SENDER}").status_code == 401
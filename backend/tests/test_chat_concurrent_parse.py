@@ -0,0 +1,104 @@
+import threading
+
+import pytest
+
+from backend.app import create_app
+from backend.chat.models import ChatUserContext
+from backend.extensions import db
+
+
+class _Resp:
+    def __init__(self, payload):
+        self._payload = payload
+        self.status_code = 200
+
+    def raise_for_status(self):
+        return None
+
+    def json(self):
+        return self._payload
+
+
+class _OverlapSession:
+    """Sesion HTTP falsa: el parse espera a que el webhook haya empezado."""
+
+    def __init__(self, parse_payload=None, wait_s=2.0):
+        self.wait_s = wait_s
+        self.webhook_started = threading.Event()
+        self.parse_saw_webhook = None
+        self.parse_payload = parse_payload or {
+            "intent": {"name": "saludar", "confidence": 0.93},
+            "entities": [{"entity": "musculo", "value": "pecho"}],
+        }
+
+    def post(self, url, json=None, timeout=None):
+        if url.endswith("/model/parse"):
+            self.parse_saw_webhook = self.webhook_started.wait(timeout=self.wait_s)
+            return _Resp(self.parse_payload)
+        self.webhook_started.set()
+        return _Resp([{"text": "Hola!"}])
+
+
+@pytest.fixture
+def app(monkeypatch):
+    monkeypatch.setenv("SQLALCHEMY_DATABASE_URI", "sqlite:///:memory:")
+    monkeypatch.setenv("CHAT_CONTEXT_API_KEY", "ctx-key")
+    app = create_app()
+    app.config.update(TESTING=True, SQLALCHEMY_DATABASE_URI="sqlite:///:memory:")
+    with app.app_context():
+        db.create_all()
+    yield app
+    with app.app_context():
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    client = app.test_client()
+    resp = client.post("/chat/context/u1", headers={"X-Context-Key": "ctx-key"}, json={"consent_given": True})
+    assert resp.status_code == 200
+    return client
+
+
+def _send(client):
+    return client.post("/chat/send", headers={"X-Context-Key": "ctx-key"}, json={"sender": "u1", "message": "hola"})
+
+
+def test_parse_runs_concurrently_with_webhook(app, client):
+    fake = _OverlapSession()
+    app.chat_service.http = fake
+
+    resp = _send(client)
+    assert resp.status_code == 200
+    assert resp.get_json() == [{"text": "Hola!"}]
+    assert fake.parse_saw_webhook is True
+
+    with app.app_context():
+        history = ChatUserContext.query.filter_by(sender_id="u1").one().history
+    kinds = [entry.get("type") for entry in history]
+    assert kinds.index("user_message") < kinds.index("bot_message")
+    user_entry = next(e for e in history if e.get("type") == "user_message")
+    assert user_entry["intent"] == "saludar"
+    assert user_entry["entities"] == [{"entity": "musculo", "value": "pecho"}]
+
+
+def test_sequential_mode_parses_first(app, client):
+    app.config["RASA_CONCURRENT_PARSE"] = False
+    fake = _OverlapSession(wait_s=0.2)
+    app.chat_service.http = fake
+
+    resp = _send(client)
+    assert resp.status_code == 200
+    assert fake.parse_saw_webhook is False
+
+
+def test_parse_failure_does_not_fail_request(app, client):
+    fake = _OverlapSession(parse_payload={"entities": [None]})
+    app.chat_service.http = fake
+
+    resp = _send(client)
+    assert resp.status_code == 200
+    with app.app_context():
+        history = ChatUserContext.query.filter_by(sender_id="u1").one().history
+    user_entry = next(e for e in history if e.get("type") == "user_message")
+    assert "intent" not in user_entry
@@ -0,0 +1,148 @@
+import pytest
+from sqlalchemy.orm import Session
+
+from backend.app import create_app
+from backend.chat.models import HISTORY_WINDOW, ChatHistoryEvent, ChatUserContext
+from backend.extensions import db
+
+
+@pytest.fixture
+def app(monkeypatch):
+    monkeypatch.setenv("SQLALCHEMY_DATABASE_URI", "sqlite:///:memory:")
+    app = create_app()
+    app.config.update(TESTING=True, SQLALCHEMY_DATABASE_URI="sqlite:///:memory:")
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.drop_all()
+
+
+def _fresh(sender):
+    db.session.expunge_all()
+    return ChatUserContext.query.filter_by(sender_id=sender).one()
+
+
+def test_append_inserts_rows_without_rewriting_context(app):
+    ctx = ChatUserContext.get_or_create("h1")
+    for i in range(3):
+        ctx.append_history({"type": "user_message", "text": f"m{i}"})
+    db.session.commit()
+
+    rows = ChatHistoryEvent.query.filter_by(sender_id="h1").order_by(ChatHistoryEvent.seq).all()
+    assert [(r.seq, r.type) for r in rows] == [(1, "user_message"), (2, "user_message"), (3, "user_message")]
+    ctx = _fresh("h1")
+    assert ctx.legacy_history == []
+    assert ctx.history_seq == 3
+    assert [e["text"] for e in ctx.history] == ["m0", "m1", "m2"]
+    assert all("timestamp" in e for e in ctx.history)
+
+
+def test_recent_history_window_and_keyset(app):
+    ctx = ChatUserContext.get_or_create("h2")
+    for i in range(HISTORY_WINDOW + 5):
+        ctx.append_history({"type": "bot_message", "text": str(i)})
+    db.session.commit()
+    assert len(ctx.history) == HISTORY_WINDOW
+    assert ctx.history[-1]["text"] == str(HISTORY_WINDOW + 4)
+
+    ctx = _fresh("h2")
+    assert [e["text"] for e in ctx.recent_history(3)] == [str(i) for i in range(HISTORY_WINDOW + 2, HISTORY_WINDOW + 5)]
+    assert [e["text"] for e in ctx.recent_history(2, before_seq=4)] == ["1", "2"]
+    assert len(ctx.recent_history(50)) == HISTORY_WINDOW + 5
+
+
+def test_metadata_and_reset_use_event_table(app):
+    ctx = ChatUserContext.get_or_create("h3")
+    ctx.append_history({"type": "explanation", "explanation": "Porque si."})
+    for i in range(6):
+        ctx.append_history({"type": "user_message", "text": str(i)})
+    db.session.commit()
+
+    meta = _fresh("h3").to_metadata()
+    assert meta["last_explanation"] == "Porque si."
+    assert [e["type"] for e in meta["recent_history"]] == ["user_message"] * 5
+
+    ctx = _fresh("h3")
+    ctx.reset_sensitive_context()
+    db.session.commit()
+    assert ChatHistoryEvent.query.filter_by(sender_id="h3").count() == 0
+    assert _fresh("h3").history == []
+
+
+def test_unit_of_work_single_insert_and_update(app):
+    from sqlalchemy import event
+
+    from backend.chat.context_manager import ChatContextManager
+
+    ctx = ChatUserContext.get_or_create("h4")
+    ctx.append_history({"type": "user_message", "text": "previo"})
+    db.session.commit()
+
+    statements = []
+
+    def _count(conn, cursor, statement, parameters, context, executemany):
+        words = statement.split()
+        statements.append(" ".join(words[:3]).upper() if words[0].upper() == "INSERT" else words[0].upper())
+
+    event.listen(db.engine, "before_cursor_execute", _count)
+    try:
+        manager = ChatContextManager(_fresh("h4"))
+        with manager.unit_of_work():
+            manager.add_history_entry({"type": "user_message", "text": "hola"})
+            manager.set_allergies("mani")
+            assert [e["text"] for e in manager.context.recent_history(2)] == ["previo", "hola"]
+            manager.set_last_routine({"type": "routine_detail", "routine_id": "r1"})
+            manager.set_last_interaction_result("success")
+            manager.touch()
+            db.session.commit()
+    finally:
+        event.remove(db.engine, "before_cursor_execute", _count)
+
+    assert statements.count("INSERT INTO CHAT_HISTORY_EVENT") == 1
+    assert statements.count("INSERT INTO CHAT_PLAN_PAYLOAD") == 1
+    assert statements.count("UPDATE") == 1
+    ctx = _fresh("h4")
+    assert [e["type"] for e in ctx.history] == ["user_message", "user_message", "routine"]
+    assert ctx.allergies == "mani"
+
+
+def test_unchanged_fields_are_not_marked_dirty(app):
+    ctx = ChatUserContext.get_or_create("h5")
+    ctx.set_allergies("mani")
+    db.session.commit()
+
+    ctx = _fresh("h5")
+    ctx.set_allergies(" mani ")
+    assert not db.inspect(ctx).attrs.allergies.history.has_changes()
+
+
+def test_concurrent_sessions_allocate_distinct_seqs(monkeypatch, tmp_path):
+    # Archivo y no :memory: para que cada sesion tenga su propia conexion.
+    monkeypatch.setenv("SQLALCHEMY_DATABASE_URI", f"sqlite:///{tmp_path / 'chat.db'}")
+    app = create_app()
+    app.config.update(TESTING=True)
+    with app.app_context():
+        db.create_all()
+        ctx = ChatUserContext.get_or_create("h6")
+        ctx.append_history({"type": "user_message", "text": "previo"})
+        db.session.commit()
+
+        turn = _fresh("h6")  # turno de chat en curso: cargo history_seq = 1
+        other = Session(db.engine)
+        try:
+            # POST /chat/context del mismo sender escribe historial mientras tanto.
+            concurrent = other.query(ChatUserContext).filter_by(sender_id="h6").one()
+            concurrent.set_last_diet({"type": "diet_plan", "title": "Dieta"})
+            other.commit()
+        finally:
+            other.close()
+
+        turn.append_history({"type": "user_message", "text": "hola"})
+        turn.append_history({"type": "bot_message", "text": "respuesta"})
+        db.session.commit()
+
+        rows = ChatHistoryEvent.query.filter_by(sender_id="h6").order_by(ChatHistoryEvent.seq).all()
+        assert [(r.seq, r.type) for r in rows] == [(1, "user_message"), (2, "diet"), (3, "user_message"), (4, "bot_message")]
+        assert turn.history_seq == 4
+        assert _fresh("h6").history_seq == 4
+        db.drop_all()
@@ -0,0 +1,61 @@
+import logging
+import os
+
+from backend.chat.lexical import BM25Index, fold_accents, lexical_index_path, stem_es, tokenize
+from backend.chat.orchestrator import KnowledgeStore, LLMSettings
+
+
+def _settings(index_path):
+    return LLMSettings(
+        provider="disabled", model="x", api_key="", base_url="", temperature=0.2, max_tokens=10,
+        embeddings_model="x", rag_max_results=3, rag_index_path=index_path,
+    )
+
+
+def _write(path, text):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as fh:
+        fh.write(text)
+
+
+def test_tokenize_folds_accents_and_stems():
+    assert fold_accents("Proteína Ñandú") == "proteina nandu"
+    assert stem_es("ejercicios") == stem_es("ejercicio")
+    assert stem_es("rutinas") == stem_es("rutina")
+    assert tokenize("Las proteínas del día") == tokenize("proteina dia")
+
+
+def test_bm25_ranks_matching_chunk_first():
+    chunks = [
+        {"text": "Politica de privacidad y datos personales.", "source": "a", "chunk": 0},
+        {"text": "Rutina de pecho con mancuernas y press inclinado.", "source": "b", "chunk": 0},
+        {"text": "Dieta alta en proteína vegetal: lentejas, garbanzos.", "source": "b", "chunk": 1},
+    ]
+    index = BM25Index.build(chunks)
+    [best] = index.search("proteinas vegetales", limit=1)
+    assert (best["source"], best["chunk"]) == ("b", 1)
+    assert best["score"] > 0
+    assert index.search("zzz inexistente") == []
+    assert [m["chunk"] for m in BM25Index.from_dict(index.to_dict()).search("mancuerna")] == [0]
+
+
+def test_knowledge_store_persists_and_invalidates_index(tmp_path):
+    doc = tmp_path / "docs" / "guia.md"
+    _write(str(doc), "La hidratación es clave.\n" + "relleno " * 200 + "\nCalentamiento antes de sentadillas.")
+    index_path = str(tmp_path / "kb_index")
+
+    store = KnowledgeStore(str(tmp_path), _settings(index_path), logging.getLogger(__name__))
+    matches = store.search("sentadilla")
+    assert matches and matches[0]["source"] == str(doc)
+    assert "sentadillas" in matches[0]["text"].lower()
+    assert len(matches[0]["text"]) <= 900
+    assert os.path.isfile(lexical_index_path(index_path))
+
+    reloaded = KnowledgeStore(str(tmp_path), _settings(index_path), logging.getLogger(__name__))
+    assert reloaded.search("hidratacion")[0]["source"] == str(doc)
+
+    _write(str(doc), "Solo movilidad de cadera.")
+    os.utime(str(doc), ns=(1, 1))
+    rebuilt = KnowledgeStore(str(tmp_path), _settings(index_path), logging.getLogger(__name__))
+    assert rebuilt.search("hidratacion") == []
+    assert rebuilt.search("cadera")
@@ -0,0 +1,152 @@
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+from backend.app import create_app
+from backend.chat.models import ChatHistoryEvent, ChatPlanPayload, ChatUserContext
+from backend.extensions import db
+from backend.metrics.queries import query_budget
+from backend.planner.refs import PLAN_REF_KEY, is_plan_ref, make_plan_ref, plan_digest
+from backend.security.retention import purge_stale_data
+
+ROUTINE = {
+    "type": "routine_detail",
+    "routine_id": "r-1",
+    "header": "Rutina - Pecho",
+    "exercises": [{"nombre": f"ejercicio {i}", "series": 3, "reps": "8-12"} for i in range(8)],
+    "explanation": "Volumen moderado para hipertrofia. " * 10,
+}
+
+
+class _Resp:
+    status_code = 200
+
+    def __init__(self, payload):
+        self._payload = payload
+
+    def raise_for_status(self):
+        return None
+
+    def json(self):
+        return self._payload
+
+
+class _RasaStub:
+    def __init__(self):
+        self.webhook_bodies = []
+
+    def post(self, url, json=None, timeout=None):
+        if url.endswith("/model/parse"):
+            return _Resp({"intent": {"name": "pedir_rutina", "confidence": 0.9}, "entities": []})
+        self.webhook_bodies.append(json)
+        return _Resp([{"text": "Aqui va tu rutina."}, {"custom": ROUTINE}])
+
+
+@pytest.fixture
+def app(monkeypatch):
+    monkeypatch.setenv("SQLALCHEMY_DATABASE_URI", "sqlite:///:memory:")
+    monkeypatch.setenv("CHAT_CONTEXT_API_KEY", "k")
+    monkeypatch.setenv("LLM_PROVIDER", "disabled")
+    app = create_app()
+    app.config.update(TESTING=True, SQLALCHEMY_DATABASE_URI="sqlite:///:memory:", RATELIMIT_ENABLED=False)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.drop_all()
+
+
+def test_plan_ref_is_content_addressed():
+    reordered = dict(reversed(list(ROUTINE.items())))
+    assert plan_digest(reordered) == plan_digest(ROUTINE)
+    ref = make_plan_ref(ROUTINE)
+    assert ref == {PLAN_REF_KEY: plan_digest(ROUTINE), "type": "routine_detail", "routine_id": "r-1",
+                   "header": "Rutina - Pecho"}
+    assert make_plan_ref(ref) is ref
+    assert plan_digest({**ROUTINE, "header": "otra"}) != ref[PLAN_REF_KEY]
+
+
+def test_context_stores_refs_and_interns_once(app):
+    ctx = ChatUserContext.get_or_create("p1")
+    ctx.set_last_routine(ROUTINE)
+    ctx.set_last_routine(dict(ROUTINE))
+    assert ctx.resolve_plan(ctx.last_routine) == ROUTINE
+    db.session.commit()
+
+    assert ChatPlanPayload.query.count() == 1
+    db.session.expunge_all()
+    ctx = ChatUserContext.query.filter_by(sender_id="p1").one()
+    assert is_plan_ref(ctx.last_routine)
+    assert all(is_plan_ref(e["data"]) for e in ctx.history if e["type"] == "routine")
+    assert len(json.dumps(ctx.to_metadata()["last_routine"])) < len(json.dumps(ROUTINE)) / 4
+    assert ctx.to_dict(resolve_plans=True)["last_routine"] == ROUTINE
+
+    ctx.set_last_routine(ROUTINE)
+    db.session.commit()
+    assert ChatPlanPayload.query.count() == 1
+
+
+def test_rasa_metadata_and_history_carry_refs(app):
+    app.chat_service.http = rasa = _RasaStub()
+    client = app.test_client()
+    headers = {"X-Context-Key": "k"}
+    client.post("/chat/context/p2", headers=headers, json={"consent_given": True})
+
+    for _ in range(2):
+        resp = client.post("/chat/send", headers=headers, json={"sender": "p2", "message": "rutina"})
+        assert resp.status_code == 200
+    assert resp.get_json()[1]["custom"]["exercises"] == ROUTINE["exercises"]
+
+    meta = rasa.webhook_bodies[-1]["metadata"]["persisted_context"]
+    assert meta["last_routine"] == make_plan_ref(ROUTINE)
+    customs = ChatHistoryEvent.query.filter_by(sender_id="p2", type="bot_custom").all()
+    assert customs and all(is_plan_ref(row.payload["data"]) for row in customs)
+    assert ChatPlanPayload.query.count() == 1
+
+    digest = plan_digest(ROUTINE)
+    resp = client.get(f"/chat/plans/{digest}", headers=headers)
+    assert resp.status_code == 200
+    assert resp.get_json()["plan"] == ROUTINE
+    assert "immutable" in resp.headers["Cache-Control"]
+    assert client.get(f"/chat/plans/{digest}").status_code == 401
+    assert client.get(f"/chat/plans/{'0' * 64}", headers=headers).status_code == 404
+    assert client.get("/chat/plans/nope", headers=headers).status_code == 400
+
+    context = client.get("/chat/context/p2?resolve_plans=1", headers=headers).get_json()["context"]
+    assert context["last_routine"] == ROUTINE
+
+
+def test_retention_keeps_plans_referenced_from_history(app):
+    old = datetime.utcnow() - timedelta(days=1000)
+    plans = {name: dict(ROUTINE, routine_id=name) for name in ("history", "context", "orphan")}
+    for payload in plans.values():
+        db.session.add(ChatPlanPayload(**dict(ChatPlanPayload.row_for(payload), created_at=old)))
+    ctx = ChatUserContext(sender_id="activo", last_diet=make_plan_ref(plans["context"]), history_seq=1)
+    db.session.add(ctx)
+    db.session.add(
+        ChatHistoryEvent(
+            sender_id="activo", seq=1, type="bot_custom",
+            payload={"type": "bot_custom", "data": make_plan_ref(plans["history"])},
+        )
+    )
+    db.session.commit()
+
+    assert purge_stale_data(app, db, retention_days=730)["chat_plans_deleted"] == 1
+    remaining = {row.digest for row in ChatPlanPayload.query.all()}
+    assert remaining == {plan_digest(plans["history"]), plan_digest(plans["context"])}
+
+
+def test_retention_plan_scan_does_not_grow_with_plan_count(app):
+    old = datetime.utcnow() - timedelta(days=1000)
+    for i in range(60):
+        db.session.add(ChatPlanPayload(**dict(ChatPlanPayload.row_for(dict(ROUTINE, routine_id=f"o{i}")), created_at=old)))
+    kept = dict(ROUTINE, routine_id="kept")
+    db.session.add(ChatPlanPayload(**dict(ChatPlanPayload.row_for(kept), created_at=old)))
+    db.session.add(ChatHistoryEvent(sender_id="s", seq=1, type="bot_custom", payload={"data": make_plan_ref(kept)}))
+    db.session.commit()
+
+    with query_budget(db.engine) as budget:
+        assert purge_stale_data(app, db, retention_days=730)["chat_plans_deleted"] == 60
+    assert budget.count <= 8
+    assert not any("LIKE" in statement for statement in budget.statements)
+    assert [row.digest for row in ChatPlanPayload.query.all()] == [plan_digest(kept)]
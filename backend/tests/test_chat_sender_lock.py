@@ -0,0 +1,156 @@
+import multiprocessing
+import os
+import threading
+import time
+
+import pytest
+
+from backend.chat.sender_lock import LocalSenderQueue, SenderLock
+
+SENDER = "lock-user"
+
+
+def test_local_queue_is_fifo_and_bounded():
+    queue = LocalSenderQueue(max_waiters=2)
+    holder = queue.acquire(SENDER, 0)
+    assert holder is not None
+    order = []
+
+    def _wait(label):
+        token = queue.acquire(SENDER, 5)
+        order.append(label)
+        time.sleep(0.01)
+        queue.release(SENDER, token)
+
+    threads = []
+    for label in ("a", "b"):
+        thread = threading.Thread(target=_wait, args=(label,))
+        thread.start()
+        threads.append(thread)
+        time.sleep(0.05)
+    assert queue.acquire(SENDER, 5) is None  # cola llena
+    assert queue.acquire("otro", 0) is not None
+
+    queue.release(SENDER, holder)
+    for thread in threads:
+        thread.join(5)
+    assert order == ["a", "b"]
+    assert queue.acquire(SENDER, 0) is not None
+
+
+def test_wait_times_out_and_frees_slot(tmp_path):
+    lock = SenderLock("file", max_waiters=1, wait_s=0.1, path=str(tmp_path))
+    token = lock.acquire(SENDER)
+    started = time.monotonic()
+    assert lock.acquire(SENDER) is None
+    assert time.monotonic() - started >= 0.09
+    lock.release(SENDER, token)
+    lock.release(SENDER, lock.acquire(SENDER))
+
+
+class _Resp:
+    status_code = 200
+
+    def __init__(self, payload):
+        self._payload = payload
+
+    def raise_for_status(self):
+        return None
+
+    def json(self):
+        return self._payload
+
+
+class _SlowRasa:
+    """Rasa falso que anota en un archivo compartido cuando entra y sale cada turno."""
+
+    def __init__(self, log_path):
+        self.log_path = log_path
+
+    def post(self, url, json=None, timeout=None):
+        if url.endswith("/model/parse"):
+            return _Resp({"intent": {"name": "saludo", "confidence": 0.9}, "entities": []})
+        start = time.time()
+        time.sleep(0.15)
+        with open(self.log_path, "a", encoding="utf-8") as fh:
+            fh.write(f"{start} {time.time()} {json['message']}\n")
+        return _Resp([{"text": f"eco {json['message']}"}])
+
+
+def _worker(db_uri, lock_dir, log_path, worker, messages, results):
+    os.environ.update(
+        SQLALCHEMY_DATABASE_URI=db_uri,
+        SECRET_KEY="x",
+        CHAT_CONTEXT_API_KEY="k",
+        LLM_PROVIDER="disabled",
+        CHAT_SENDER_LOCK_BACKEND="file",
+        CHAT_SENDER_LOCK_PATH=lock_dir,
+        CHAT_SENDER_QUEUE_MAX="8",
+        CHAT_SENDER_WAIT_S="20",
+        RASA_CONCURRENT_PARSE="0",
+    )
+    from backend.app import create_app
+
+    app = create_app()
+    app.config.update(TESTING=True, RATELIMIT_ENABLED=False)
+    app.chat_service.http = _SlowRasa(log_path)
+    client = app.test_client()
+
+    def _send(i):
+        resp = client.post(
+            "/chat/send", headers={"X-Context-Key": "k"}, json={"sender": SENDER, "message": f"w{worker}-{i}"}
+        )
+        results.put((resp.status_code, (resp.get_json() or [{}])[0].get("text")))
+
+    threads = [threading.Thread(target=_send, args=(i,)) for i in range(messages)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+@pytest.mark.skipif(os.name != "posix", reason="usa fork y flock")
+def test_parallel_messages_across_processes_are_serialized(tmp_path, monkeypatch):
+    db_uri = f"sqlite:///{tmp_path / 'chat.db'}"
+    monkeypatch.setenv("SQLALCHEMY_DATABASE_URI", db_uri)
+    monkeypatch.setenv("CHAT_CONTEXT_API_KEY", "k")
+    from backend.app import create_app
+    from backend.extensions import db
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+    client = app.test_client()
+    assert client.post(f"/chat/context/{SENDER}", headers={"X-Context-Key": "k"},
+                       json={"consent_given": True}).status_code == 200
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+    ctx = multiprocessing.get_context("fork")
+    results = ctx.Queue()
+    log_path = str(tmp_path / "turns.log")
+    procs = [
+        ctx.Process(target=_worker, args=(db_uri, str(tmp_path / "locks"), log_path, w, 2, results))
+        for w in range(3)
+    ]
+    for proc in procs:
+        proc.start()
+    for proc in procs:
+        proc.join(60)
+        assert proc.exitcode == 0
+
+    replies = [results.get(timeout=5) for _ in range(6)]
+    assert all(code == 200 and text.startswith("eco ") for code, text in replies), replies
+    with open(log_path, encoding="utf-8") as fh:
+        turns = sorted(tuple(float(v) for v in line.split()[:2]) for line in fh)
+    assert len(turns) == 6
+    for (_, prev_end), (next_start, _) in zip(turns, turns[1:]):
+        assert next_start >= prev_end
+
+    with app.app_context():
+        from backend.chat.models import ChatHistoryEvent, ChatUserContext
+
+        ctx_row = ChatUserContext.query.filter_by(sender_id=SENDER).one()
+        seqs = [row.seq for row in ChatHistoryEvent.query.filter_by(sender_id=SENDER).all()]
+        assert sorted(seqs) == list(range(1, ctx_row.history_seq + 1))
@@ -0,0 +1,123 @@
+import json
+
+import pytest
+
+from backend.app import create_app
+from backend.chat.models import ChatUserContext
+from backend.extensions import db
+from backend.tests.fixtures.fake_llm import CHAT_TEXT, FINAL_TEXT, FakeLLMServer
+
+
+class _Resp:
+    def __init__(self, payload):
+        self._payload = payload
+        self.status_code = 200
+
+    def raise_for_status(self):
+        return None
+
+    def json(self):
+        return self._payload
+
+
+class _RasaStub:
+    def __init__(self):
+        self.webhook_calls = 0
+
+    def post(self, url, json=None, timeout=None):
+        if url.endswith("/model/parse"):
+            return _Resp({"intent": {"name": "pedir_rutina", "confidence": 0.9}, "entities": []})
+        self.webhook_calls += 1
+        return _Resp([{"text": "respuesta de Rasa"}])
+
+
+@pytest.fixture
+def llm():
+    with FakeLLMServer() as server:
+        yield server
+
+
+@pytest.fixture
+def app(monkeypatch, llm):
+    monkeypatch.setenv("SQLALCHEMY_DATABASE_URI", "sqlite:///:memory:")
+    monkeypatch.setenv("CHAT_CONTEXT_API_KEY", "ctx-key")
+    monkeypatch.setenv("LLM_PROVIDER", "openai")
+    monkeypatch.setenv("LLM_API_KEY", "test")
+    monkeypatch.setenv("LLM_BASE_URL", llm.base_url)
+    monkeypatch.setenv("PLAN_CACHE_BACKEND", "off")
+    app = create_app()
+    app.config.update(TESTING=True, SQLALCHEMY_DATABASE_URI="sqlite:///:memory:")
+    app.chat_service.http = _RasaStub()
+    with app.app_context():
+        db.create_all()
+    yield app
+    with app.app_context():
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    client = app.test_client()
+    resp = client.post("/chat/context/u1", headers={"X-Context-Key": "ctx-key"}, json={"consent_given": True})
+    assert resp.status_code == 200
+    return client
+
+
+def _events(resp):
+    events = []
+    for block in resp.get_data(as_text=True).split("\n\n"):
+        if not block.strip():
+            continue
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+def _stream(client, message):
+    return client.post(
+        "/chat/stream", headers={"X-Context-Key": "ctx-key"}, json={"sender": "u1", "message": message}
+    )
+
+
+def test_stream_emits_tokens_then_done(app, client):
+    resp = _stream(client, "hola")
+    assert resp.status_code == 200
+    assert resp.mimetype == "text/event-stream"
+    events = _events(resp)
+    kinds = [kind for kind, _ in events]
+    assert kinds[-1] == "done"
+    assert kinds.count("token") > 1
+    assert "".join(data for kind, data in events if kind == "token") == CHAT_TEXT
+    done = events[-1][1]
+    assert done["responses"][-1]["text"] == CHAT_TEXT
+    assert app.chat_service.http.webhook_calls == 0
+
+
+def test_stream_emits_card_before_final_text(app, client):
+    events = _events(_stream(client, "quiero una rutina de pecho"))
+    kinds = [kind for kind, _ in events]
+    card_idx = kinds.index("card")
+    assert events[card_idx][1]["custom"]["type"] == "routine_detail"
+    first_token = kinds.index("token")
+    assert card_idx < first_token < kinds.index("done")
+    assert "".join(data for kind, data in events[card_idx:] if kind == "token") == FINAL_TEXT
+
+    with app.app_context():
+        history = ChatUserContext.query.filter_by(sender_id="u1").one().history
+    types = [entry.get("type") for entry in history]
+    assert types.index("user_message") < types.index("bot_message")
+
+
+def test_stream_validation_errors_are_plain_json(client):
+    resp = client.post("/chat/stream", headers={"X-Context-Key": "ctx-key"}, json={"sender": "u1"})
+    assert resp.status_code == 400
+    assert resp.mimetype == "application/json"
+
+
+def test_send_still_uses_non_streaming_completion(app, client, llm):
+    resp = client.post(
+        "/chat/send", headers={"X-Context-Key": "ctx-key"}, json={"sender": "u1", "message": "hola"}
+    )
+    assert resp.status_code == 200
+    assert resp.get_json()[-1]["text"] == CHAT_TEXT
+    assert llm.requests and not llm.requests[-1].get("stream")
@@ -0,0 +1,143 @@
+import dataclasses
+import json
+import threading
+import time
+
+import pytest
+
+from backend.app import create_app
+from backend.chat.context_manager import ChatContextManager
+from backend.chat.models import ChatUserContext
+from backend.extensions import db
+from backend.metrics import metrics
+
+
+@pytest.fixture
+def app(monkeypatch):
+    monkeypatch.setenv("SQLALCHEMY_DATABASE_URI", "sqlite:///:memory:")
+    app = create_app()
+    app.config.update(TESTING=True, SQLALCHEMY_DATABASE_URI="sqlite:///:memory:")
+    with app.app_context():
+        db.create_all()
+    yield app
+    with app.app_context():
+        db.drop_all()
+
+
+@pytest.fixture
+def orchestrator(app):
+    return app.chat_service.orchestrator
+
+
+@pytest.fixture
+def manager(app):
+    with app.app_context():
+        ctx = ChatUserContext.get_or_create("tools-user")
+        db.session.flush()
+        yield ChatContextManager(ctx)
+
+
+def _slow_search(delay_s, threads):
+    def _search(args):
+        threads.append(threading.get_ident())
+        time.sleep(delay_s)
+        return {"result": [{"query": args.get("query")}], "responses": []}
+    return _search
+
+
+def test_concurrent_tools_run_in_parallel_and_keep_order(orchestrator, manager, monkeypatch):
+    threads = []
+    monkeypatch.setattr(orchestrator.tools, "_do_search_kb", _slow_search(0.2, threads))
+    calls = [(f"c{i}", "search_kb", json.dumps({"query": f"q{i}"})) for i in range(3)]
+
+    started = time.perf_counter()
+    results = list(orchestrator._iter_tool_calls(calls, manager))
+    elapsed = time.perf_counter() - started
+
+    assert elapsed < 0.5
+    assert [msg["tool_call_id"] for _, msg in results] == ["c0", "c1", "c2"]
+    assert [json.loads(msg["content"])[0]["query"] for _, msg in results] == ["q0", "q1", "q2"]
+    assert threading.get_ident() not in threads
+
+
+def test_tool_timeout_returns_error_to_model(orchestrator, manager, monkeypatch):
+    monkeypatch.setattr(orchestrator, "settings", dataclasses.replace(orchestrator.settings, tool_timeout_s=0.05))
+    monkeypatch.setattr(orchestrator.tools, "_do_search_kb", _slow_search(0.3, []))
+
+    [(responses, message)] = list(orchestrator._iter_tool_calls([("c1", "search_kb", "{}")], manager))
+    assert responses == []
+    assert "error" in json.loads(message["content"])
+    timeouts = [
+        c for c in metrics.snapshot()["counters"]
+        if c["name"] == "chat_tool_total" and c["tags"] == {"tool": "search_kb", "status": "timeout"}
+    ]
+    assert timeouts and timeouts[0]["value"] >= 1
+
+
+def test_timed_out_tool_is_counted_once(orchestrator, manager, monkeypatch):
+    monkeypatch.setattr(orchestrator, "settings", dataclasses.replace(orchestrator.settings, tool_timeout_s=0.05))
+    done = threading.Event()
+
+    def _search(args):
+        time.sleep(0.2)
+        done.set()
+        return {"result": [], "responses": []}
+
+    monkeypatch.setattr(orchestrator.tools, "_do_search_kb", _search)
+
+    def _count(status):
+        return sum(
+            c["value"] for c in metrics.snapshot()["counters"]
+            if c["name"] == "chat_tool_total" and c["tags"] == {"tool": "search_kb", "status": status}
+        )
+
+    before = {status: _count(status) for status in ("ok", "timeout")}
+    list(orchestrator._iter_tool_calls([("c1", "search_kb", "{}")], manager))
+    assert done.wait(2)
+    time.sleep(0.05)  # la tarea del pool termina de registrar tras devolver
+    assert _count("timeout") == before["timeout"] + 1
+    assert _count("ok") == before["ok"]
+
+
+def test_writes_happen_on_request_thread(orchestrator, manager, monkeypatch):
+    writer_threads = []
+    compute_threads = []
+    apply_updates = orchestrator.tools._apply_context_updates
+
+    def _workout(args, profile):
+        compute_threads.append(threading.get_ident())
+        return {"result": {}, "responses": [{"text": "rutina"}], "context_updates": {"allergies": "mani"}}
+
+    def _record_apply(payload, mgr):
+        writer_threads.append(threading.get_ident())
+        apply_updates(payload, mgr)
+
+    def _record_log(args, mgr):
+        writer_threads.append(threading.get_ident())
+        return {"result": {"ok": True}, "responses": [{"text": "anotado"}]}
+
+    monkeypatch.setattr(orchestrator.tools, "_do_workout", _workout)
+    monkeypatch.setattr(orchestrator.tools, "_apply_context_updates", _record_apply)
+    monkeypatch.setattr(orchestrator.tools, "_do_log_progress", _record_log)
+
+    calls = [("c1", "generate_workout_plan", "{}"), ("c2", "log_progress", '{"metric": "peso"}')]
+    results = list(orchestrator._iter_tool_calls(calls, manager))
+
+    assert [r[0][0]["text"] for r in results] == ["rutina", "anotado"]
+    assert compute_threads and compute_threads[0] != threading.get_ident()
+    assert writer_threads == [threading.get_ident()] * 2
+    assert manager.context.allergies == "mani"
+    latencies = {
+        (m["tags"]["tool"], m["tags"]["status"]) for m in metrics.snapshot()["latency"]
+        if m["name"] == "chat_tool_latency_ms"
+    }
+    assert {("generate_workout_plan", "ok"), ("log_progress", "ok")} <= latencies
+
+
+def test_pool_disabled_runs_inline(orchestrator, manager, monkeypatch):
+    threads = []
+    monkeypatch.setattr(orchestrator, "settings", dataclasses.replace(orchestrator.settings, tool_workers=0))
+    monkeypatch.setattr(orchestrator.tools, "_do_search_kb", _slow_search(0, threads))
+
+    list(orchestrator._iter_tool_calls([("c1", "search_kb", "{}")], manager))
+    assert threads == [threading.get_ident()]
@@ -0,0 +1,111 @@
+import json
+import time
+
+import pytest
+
+from backend.app import create_app
+from backend.extensions import db
+from backend.log_pipeline import pipeline_stats
+from backend.metrics import metrics
+from backend.metrics.tracing import STAGE_METRIC, Trace, span
+
+
+class _Resp:
+    status_code = 200
+
+    def __init__(self, payload):
+        self._payload = payload
+
+    def raise_for_status(self):
+        return None
+
+    def json(self):
+        return self._payload
+
+
+class _FakeRasa:
+    def post(self, url, json=None, timeout=None):
+        if url.endswith("/model/parse"):
+            return _Resp({"intent": {"name": "saludar", "confidence": 0.9}, "entities": []})
+        time.sleep(0.02)
+        return _Resp([{"text": "Hola!"}])
+
+
+@pytest.fixture
+def app(monkeypatch, tmp_path):
+    monkeypatch.setenv("SQLALCHEMY_DATABASE_URI", "sqlite:///:memory:")
+    monkeypatch.setenv("CHAT_CONTEXT_API_KEY", "ctx-key")
+    monkeypatch.setenv("TRACE_JSONL_PATH", str(tmp_path / "traces.jsonl"))
+    app = create_app()
+    app.config.update(TESTING=True, RATELIMIT_ENABLED=False)
+    app.chat_service.http = _FakeRasa()
+    with app.app_context():
+        db.create_all()
+    yield app
+    with app.app_context():
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    client = app.test_client()
+    resp = client.post("/chat/context/u1", headers={"X-Context-Key": "ctx-key"}, json={"consent_given": True})
+    assert resp.status_code == 200
+    return client
+
+
+def _send(client, **headers):
+    return client.post(
+        "/chat/send", headers={"X-Context-Key": "ctx-key", **headers}, json={"sender": "u1", "message": "hola"}
+    )
+
+
+def _timings(resp):
+    parts = [item.split(";dur=") for item in resp.headers["Server-Timing"].split(", ")]
+    return {name: float(dur) for name, dur in parts}
+
+
+def test_send_returns_server_timing_per_stage(client):
+    resp = _send(client)
+    assert resp.status_code == 200
+    timings = _timings(resp)
+    for stage in ("ctx_load", "rasa_parse", "rasa_webhook", "process_payload", "db_commit", "total"):
+        assert stage in timings, timings
+    assert timings["rasa_webhook"] >= 20.0
+    assert timings["total"] >= timings["rasa_webhook"]
+
+    stages = {m["tags"]["stage"] for m in metrics.snapshot()["latency"] if m["name"] == STAGE_METRIC}
+    assert {"ctx_load", "rasa_parse", "rasa_webhook", "db_commit"} <= stages
+    # Otras rutas no abren traza.
+    assert "Server-Timing" not in client.get("/health").headers
+
+
+def test_sampled_traceparent_is_exported_as_otlp_json(app, client, tmp_path):
+    trace_id = "4bf92f3577b34da6a3ce929d0e0e4736"
+    assert _send(client).status_code == 200  # sin muestreo: no se exporta
+    resp = _send(client, traceparent=f"00-{trace_id}-00f067aa0ba902b7-01")
+    assert resp.status_code == 200
+    app.tracer._pipeline.stop()
+
+    lines = (tmp_path / "traces.jsonl").read_text(encoding="utf-8").splitlines()
+    assert len(lines) == 1
+    spans = json.loads(lines[0])["resourceSpans"][0]["scopeSpans"][0]["spans"]
+    root = spans[0]
+    assert root["traceId"] == trace_id
+    assert root["parentSpanId"] == "00f067aa0ba902b7"
+    assert root["name"] == "POST /chat/send"
+    by_name = {s["name"]: s for s in spans[1:]}
+    assert {"ctx_load", "rasa_parse", "rasa_webhook", "db_commit"} <= set(by_name)
+    assert all(s["traceId"] == trace_id for s in spans)
+    # El parse corre en el pool de hilos pero cuelga de la misma traza.
+    assert by_name["rasa_parse"]["parentSpanId"] in {root["spanId"], by_name["rasa_parse_join"]["spanId"]}
+    assert int(by_name["rasa_webhook"]["endTimeUnixNano"]) <= int(root["endTimeUnixNano"])
+    assert pipeline_stats()[f"traces:{tmp_path / 'traces.jsonl'}"]["dropped"] == 0
+
+
+def test_span_without_trace_is_a_noop():
+    with span("suelto") as attrs:
+        assert attrs is None
+    trace = Trace("manual", traceparent="00-" + "0" * 32 + "-00f067aa0ba902b7-01")
+    assert len(trace.trace_id) == 32 and trace.trace_id != "0" * 32
+    assert trace.remote_parent_id is None
@@ -0,0 +1,100 @@
+import pytest
+
+from backend.app import create_app
+from backend.extensions import db
+from backend.food.catalog import get_catalog
+from backend.notifications import routes as notification_routes
+
+
+@pytest.fixture
+def app(monkeypatch):
+    monkeypatch.setenv("SQLALCHEMY_DATABASE_URI", "sqlite:///:memory:")
+    app = create_app()
+    app.config.update(TESTING=True, SQLALCHEMY_DATABASE_URI="sqlite:///:memory:")
+    with app.app_context():
+        db.create_all()
+    yield app
+    with app.app_context():
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def test_catalog_filters_match_linear_scan(client):
+    items = []
+    cursor = "0"
+    while cursor:
+        resp = client.get(
+            f"/notifications/catalog?limit=5000&exclude_allergens=en:gluten,EN:MILK&kcal=200&cursor={cursor}"
+        )
+        assert resp.status_code == 200
+        page = resp.get_json()
+        assert len(page["items"]) <= notification_routes._CATALOG_MAX_LIMIT
+        items.extend(page["items"])
+        cursor = page["next_cursor"]
+
+    catalog = get_catalog(notification_routes._catalog_path())
+    expected = [
+        it for it in catalog.all()
+        if not {"en:gluten", "en:milk"} & {a.lower() for a in it.get("allergens") or []}
+        and it.get("energy_kcal_100g") is not None and 140 <= it["energy_kcal_100g"] <= 260
+    ]
+    assert [it["id"] for it in items] == [it["id"] for it in expected]
+
+
+def test_catalog_cursor_pagination(client):
+    first = client.get("/notifications/catalog?limit=20").get_json()
+    assert len(first["items"]) == 20
+    assert first["next_cursor"]
+
+    second = client.get(f"/notifications/catalog?limit=20&cursor={first['next_cursor']}").get_json()
+    both = client.get("/notifications/catalog?limit=40").get_json()
+    assert [it["id"] for it in first["items"] + second["items"]] == [it["id"] for it in both["items"]]
+
+
+def test_catalog_etag_not_modified(client):
+    resp = client.get("/notifications/catalog?limit=200")
+    etag = resp.headers.get("ETag")
+    assert etag
+
+    cached = client.get("/notifications/catalog?limit=200", headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.data == b""
+
+    other = client.get("/notifications/catalog?limit=10", headers={"If-None-Match": etag})
+    assert other.status_code == 200
+
+
+def test_catalog_page_cache_is_bounded(client, monkeypatch):
+    monkeypatch.setattr(notification_routes, "_catalog_page_cache", type(notification_routes._catalog_page_cache)())
+    monkeypatch.setattr(notification_routes, "_catalog_page_bytes", 0)
+    monkeypatch.setattr(notification_routes, "_CATALOG_PAGE_CACHE_MAX_BYTES", 150 * 1024)
+
+    # kcal no entero: se responde igual pero no entra a la caché
+    resp = client.get("/notifications/catalog?kcal=200.123&limit=5")
+    assert resp.status_code == 200
+    assert not notification_routes._catalog_page_cache
+
+    for offset in range(0, 600, 200):
+        assert client.get(f"/notifications/catalog?limit=200&cursor={offset}").status_code == 200
+    cache = notification_routes._catalog_page_cache
+    assert 1 <= len(cache) < 3
+    assert notification_routes._catalog_page_bytes == sum(len(body) for body in cache.values()) <= 150 * 1024
+
+
+def test_catalog_uncacheable_filters_skip_catalog_memos(client):
+    catalog = get_catalog(notification_routes._catalog_path())
+    categories, excluded = len(catalog._category_cache), len(catalog._excluded_cache)
+    for i in range(20):
+        tag = f"{i:03d}" + "x" * 70
+        resp = client.get(f"/notifications/catalog?category={tag}&exclude_allergens={tag}&limit=1")
+        assert resp.status_code == 200
+    assert len(catalog._category_cache) == categories
+    assert len(catalog._excluded_cache) == excluded
+
+    for raw in ("nan", "inf"):
+        data = client.get(f"/notifications/catalog?kcal={raw}").get_json()
+        assert data["items"] == [] and data["total"] == 0
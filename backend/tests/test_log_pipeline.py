@@ -0,0 +1,103 @@
+import json
+import logging
+import threading
+
+from backend.log_pipeline import BatchedFileHandler, LogPipeline
+from backend.metrics import MetricsCollector, _JsonMessageFormatter
+
+
+class _GatedHandler(logging.Handler):
+    """Bloquea el hilo escritor hasta `gate` para simular un disco lento."""
+
+    def __init__(self, gate):
+        super().__init__()
+        self.gate = gate
+        self.messages = []
+
+    def emit(self, record):
+        self.gate.wait(5)
+        self.messages.append(record.getMessage())
+
+
+def _logger(name, pipeline):
+    logger = logging.getLogger(name)
+    logger.handlers = [pipeline.handler]
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    return logger
+
+
+def test_full_queue_drops_instead_of_blocking():
+    gate = threading.Event()
+    sink = _GatedHandler(gate)
+    pipeline = LogPipeline("test-drop", [sink], queue_max=5, batch_max=100).start()
+    logger = _logger("test.pipeline.drop", pipeline)
+
+    logger.info("primero")  # lo toma el hilo escritor y queda bloqueado
+    while pipeline.pending():
+        pass
+    for i in range(20):
+        logger.info("evento %s", i)
+    stats = pipeline.stats()
+    assert stats["dropped"] == 15
+    assert stats["pending"] == 5
+
+    gate.set()
+    pipeline.stop()
+    assert sink.messages == ["primero"] + [f"evento {i}" for i in range(5)]
+    assert pipeline.stats()["written"] == 6
+
+
+def test_batches_flush_once_and_format_in_writer(tmp_path):
+    path = tmp_path / "app.log"
+    flushes = []
+
+    class _CountingHandler(BatchedFileHandler):
+        def flush(self):
+            if not self._deferred:
+                flushes.append(1)
+            super().flush()
+
+    gate = threading.Event()
+    handler = _CountingHandler(str(path), encoding="utf-8")
+    handler.setFormatter(logging.Formatter("%(levelname)s %(message)s"))
+    pipeline = LogPipeline("test-batch", [_GatedHandler(gate), handler], batch_max=1000).start()
+    logger = _logger("test.pipeline.batch", pipeline)
+    logger.info("primero")
+    while pipeline.pending():
+        pass
+    for i in range(200):
+        logger.info("linea %d", i)
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        logger.exception("fallo")
+    gate.set()
+    pipeline.stop()
+
+    assert pipeline.stats()["batches"] == 2  # "primero" solo y luego los 201 juntos
+    assert len(flushes) == 2
+    handler.close()
+    text = path.read_text(encoding="utf-8")
+    assert text.count("INFO linea") == 200
+    assert "ValueError: boom" in text
+
+
+def test_metrics_payload_is_serialized_by_the_writer(tmp_path):
+    path = tmp_path / "metrics.log"
+    handler = BatchedFileHandler(str(path), encoding="utf-8")
+    handler.setFormatter(_JsonMessageFormatter("%(message)s"))
+    pipeline = LogPipeline("test-metrics", [handler]).start()
+    collector = MetricsCollector()
+    collector.set_logger(_logger("test.pipeline.metrics", pipeline))
+
+    collector.inc_counter("chat_send_total", tags={"status": "ok"})
+    collector.observe_latency("chat_send_latency_ms", 12.5, tags={"status": "ok"})
+    pipeline.stop()
+    handler.close()
+
+    events = [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+    assert [(e["kind"], e["name"], e["value"], e["tags"]) for e in events] == [
+        ("counter", "chat_send_total", 1, {"status": "ok"}),
+        ("latency", "chat_send_latency_ms", 12.5, {"status": "ok"}),
+    ]
@@ -0,0 +1,192 @@
+import multiprocessing
+import os
+import threading
+
+import pytest
+
+from backend.chat.service import ServiceResponse
+from backend.metrics import MetricsCollector, metrics
+from backend.metrics.exposition import render_prometheus
+from backend.metrics.shared import SharedMetricsStore
+
+pytestmark = pytest.mark.skipif(os.name != "posix", reason="usa fork y mmap compartido")
+
+
+@pytest.fixture(autouse=True)
+def _detach_shared():
+    yield
+    metrics.attach_shared(None)
+
+
+def _store_worker(directory, worker, rounds):
+    collector = MetricsCollector()
+    collector.attach_shared(SharedMetricsStore(directory, "gen"))
+
+    def _hammer():
+        for i in range(rounds):
+            collector.inc_counter("jobs_total", tags={"kind": "a" if i % 2 else "b"})
+            collector.observe_latency("job_ms", float(10 + i % 90))
+
+    threads = [threading.Thread(target=_hammer) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for i in range(2000):
+        collector.inc_counter("wide_total", tags={"worker": worker, "i": i})  # obliga a crecer el archivo
+    collector.set_gauge("queue_depth", 7)
+
+
+def test_counters_and_histograms_are_summed_across_processes(tmp_path):
+    directory = str(tmp_path / "metrics")
+    ctx = multiprocessing.get_context("fork")
+    procs = [ctx.Process(target=_store_worker, args=(directory, w, 500)) for w in range(4)]
+    for proc in procs:
+        proc.start()
+    for proc in procs:
+        proc.join(60)
+        assert proc.exitcode == 0
+
+    collector = MetricsCollector()
+    store = SharedMetricsStore(directory, "gen")
+    collector.attach_shared(store)
+    data = collector.collect()
+    assert data["counters"][("jobs_total", (("kind", "a"),))] == 4 * 4 * 250
+    assert data["counters"][("jobs_total", (("kind", "b"),))] == 4 * 4 * 250
+    latency = data["latency"][("job_ms", ())]
+    assert latency["count"] == 4 * 4 * 500
+    assert sum(latency["buckets"].values()) == latency["count"]
+    assert latency["max"] == 99.0
+    # Los workers ya terminaron: sus contadores quedan, sus gauges no.
+    assert ("queue_depth", ()) not in data["gauges"]
+    assert data["workers"] == 0
+    assert sum(1 for name, _ in data["counters"] if name == "wide_total") == 4 * 2000
+    assert all(os.path.getsize(os.path.join(store.directory, f)) > 64 * 1024 for f in os.listdir(store.directory))
+
+    collector.set_gauge("queue_depth", 3)
+    snap = collector.snapshot()
+    assert snap["workers"] == 1
+    assert {g["name"]: g["value"] for g in snap["gauges"]} == {"queue_depth": 3}
+    job_ms = next(item for item in snap["latency"] if item["name"] == "job_ms")
+    assert 50.0 <= job_ms["p50_ms"] <= 56.0
+
+    text = render_prometheus(collector.collect(), collector.indexer)
+    assert '# TYPE jobs_total counter' in text
+    assert 'jobs_total{kind="a"} 4000' in text
+    assert 'job_ms_bucket{le="100"} 8000' in text
+    assert 'job_ms_bucket{le="+Inf"} 8000' in text
+    assert "job_ms_count 8000" in text
+    store.close()
+
+
+def _gauge_worker(directory, worker, ready, release):
+    collector = MetricsCollector()
+    collector.attach_shared(SharedMetricsStore(directory, "gen"))
+    collector.set_gauge("rasa_ready", 0 if worker == 1 else 1, mode="min")
+    collector.set_gauge("breaker_open", 1 if worker == 2 else 0, mode="max")
+    collector.set_gauge("inflight", worker + 1, mode="livesum")
+    collector.set_gauge("limit", 10 * (worker + 1))
+    ready.release()
+    release.wait(30)
+
+
+def test_gauges_are_combined_per_mode_across_live_workers(tmp_path):
+    directory = str(tmp_path / "metrics")
+    ctx = multiprocessing.get_context("fork")
+    ready, release = ctx.Semaphore(0), ctx.Event()
+    procs = [ctx.Process(target=_gauge_worker, args=(directory, w, ready, release)) for w in range(3)]
+    for proc in procs:
+        proc.start()
+    try:
+        for _ in procs:
+            assert ready.acquire(timeout=30)
+        data = SharedMetricsStore(directory, "gen").collect()
+    finally:
+        release.set()
+        for proc in procs:
+            proc.join(30)
+
+    gauges = data["gauges"]
+    assert gauges[("rasa_ready", ())] == 0
+    assert gauges[("breaker_open", ())] == 1
+    assert gauges[("inflight", ())] == 6
+    limits = {tags: value for (name, tags), value in gauges.items() if name == "limit"}
+    assert sorted(limits.values()) == [10, 20, 30]
+    assert {tags[0][0] for tags in limits} == {"pid"}
+    assert {dict(tags)["pid"] for tags in limits} == {str(proc.pid) for proc in procs}
+
+    text = render_prometheus(data, MetricsCollector().indexer)
+    assert "rasa_ready 0" in text and "inflight 6" in text
+    assert f'limit{{pid="{procs[0].pid}"}} 10' in text
+
+
+def test_stale_generations_are_removed(tmp_path):
+    ctx = multiprocessing.get_context("fork")
+    proc = ctx.Process(target=os._exit, args=(0,))
+    proc.start()
+    proc.join(10)
+    stale = tmp_path / str(proc.pid)
+    stale.mkdir()
+    (stale / "1.metrics").write_bytes(b"")
+    SharedMetricsStore(str(tmp_path), "actual")
+    assert not stale.exists()
+    assert (tmp_path / "actual").is_dir()
+
+
+def _app_worker(directory, requests_per_worker):
+    os.environ.update(
+        SQLALCHEMY_DATABASE_URI="sqlite:///:memory:",
+        SECRET_KEY="x",
+        METRICS_SHARED_DIR=directory,
+        METRICS_SHARED_GENERATION="test",
+    )
+    from backend.app import create_app
+
+    app = create_app()
+    app.config.update(TESTING=True, RATELIMIT_ENABLED=False)
+    results = iter(["fallback", "success"] * requests_per_worker)
+    app.chat_service.send_message = lambda *_: ServiceResponse([{"text": "ok"}], 200, next(results))
+    client = app.test_client()
+    for _ in range(requests_per_worker):
+        assert client.post("/chat/send", json={"sender": "u1", "message": "hola"}).status_code == 200
+
+
+def test_metrics_endpoints_aggregate_all_workers(tmp_path, monkeypatch):
+    directory = str(tmp_path / "metrics")
+    ctx = multiprocessing.get_context("fork")
+    procs = [ctx.Process(target=_app_worker, args=(directory, 6)) for _ in range(3)]
+    for proc in procs:
+        proc.start()
+    for proc in procs:
+        proc.join(60)
+        assert proc.exitcode == 0
+
+    monkeypatch.setenv("SQLALCHEMY_DATABASE_URI", "sqlite:///:memory:")
+    monkeypatch.setenv("METRICS_SHARED_DIR", directory)
+    monkeypatch.setenv("METRICS_SHARED_GENERATION", "test")
+    monkeypatch.setenv("METRICS_API_KEY", "secreto")
+    from backend.app import create_app
+
+    app = create_app()
+    client = app.test_client()
+
+    payload = client.get("/metrics").get_json()
+    assert payload["window_size"] == 0  # el worker que atiende no vio trafico
+    cluster = payload["cluster"]
+    assert cluster["requests"] == 18
+    assert cluster["count_2xx"] == 18
+    assert cluster["fallback_rate"] == 0.5
+    assert cluster["routes"]["/chat/send"]["count"] == 18
+
+    summary = client.get("/metrics/summary", headers={"X-Api-Key": "secreto"}).get_json()
+    sent = sum(c["value"] for c in summary["counters"] if c["name"] == "chat_send_total")
+    assert sent == 18
+
+    assert client.get("/metrics/prometheus").status_code == 401
+    resp = client.get("/metrics/prometheus", headers={"Authorization": "Bearer secreto"})
+    assert resp.status_code == 200
+    assert resp.content_type.startswith("text/plain; version=0.0.4")
+    text = resp.get_data(as_text=True)
+    assert 'chat_send_total{code="200",status="ok"} 18' in text
+    assert 'operational_requests_total{result="fallback",route="/chat/send",status="2xx"} 9' in text
+    assert 'chat_send_latency_ms_count{status="ok"} 18' in text
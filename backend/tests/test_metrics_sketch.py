@@ -0,0 +1,90 @@
+import math
+import random
+
+import pytest
+
+from backend.app import OperationalMetrics
+from backend.metrics.sketch import LatencySketch, WindowedLatency
+
+
+def _exact(values, q):
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(q * len(ordered)) - 1)]
+
+
+def test_sketch_quantiles_within_relative_error_and_never_below():
+    rng = random.Random(7)
+    values = [rng.lognormvariate(4.0, 1.2) for _ in range(50_000)]
+    sketch = LatencySketch()
+    for value in values:
+        sketch.add(value)
+
+    for q, estimate in sketch.quantiles((0.5, 0.9, 0.95, 0.99)).items():
+        exact = _exact(values, q)
+        assert exact <= estimate <= exact * 1.0101
+
+
+def test_sketches_merge_like_one_stream_and_support_remove():
+    rng = random.Random(3)
+    a, b, both = LatencySketch(), LatencySketch(), LatencySketch()
+    for i in range(4000):
+        value = rng.uniform(1, 500)
+        (a if i % 2 else b).add(value)
+        both.add(value)
+    a.merge(b)
+    assert a.counts == both.counts and a.count == both.count
+    assert a.quantiles() == both.quantiles()
+
+    extra = LatencySketch()
+    extra.add(10.0)
+    extra.add(900.0)
+    extra.remove(900.0)
+    assert extra.count == 1 and extra.quantiles((0.99,), hi=10.0) == {0.99: 10.0}
+
+
+def test_time_windows_forget_old_samples():
+    now = [0.0]
+    series = WindowedLatency({"1m": 60.0, "1h": 3600.0}, clock=lambda: now[0])
+    for _ in range(100):
+        series.add(1000.0, ("a",))
+    now[0] = 30.0
+    series.add(5.0, ("a", "b"))
+    now[0] = 120.0
+    for _ in range(10):
+        series.add(10.0, ("a",))
+
+    snap = series.snapshot()
+    assert snap["a"]["1m"]["count"] == 10 and snap["a"]["1m"]["max"] == 10.0
+    assert snap["a"]["1h"]["count"] == 111 and snap["a"]["1h"]["p50"] == 1000.0
+    assert snap["b"]["1m"]["count"] == 0 and snap["b"]["1h"]["count"] == 1
+
+    now[0] = 3600.0 + 25.0  # salieron los slices de t=0 pero no el de t=30
+    assert series.snapshot()["a"]["1h"]["count"] == 11
+    now[0] = 10 * 3600.0  # hueco mas largo que el anillo
+    assert series.snapshot() == {}
+
+
+def test_operational_metrics_tracks_routes_and_results():
+    now = [1000.0]
+    metrics = OperationalMetrics(window_size=3, clock=lambda: now[0])
+    metrics.record(status_code=200, latency_ms=40.0, interaction_result="success")
+    metrics.record(status_code=200, latency_ms=400.0, interaction_result="fallback", route="/chat/stream")
+    metrics.record(status_code=503, latency_ms=1.0, interaction_result=None)
+    metrics.record(status_code=200, latency_ms=20.0, interaction_result="success")
+
+    snap = metrics.snapshot()
+    # ventana por cantidad: el primer evento ya salio
+    assert snap["window_size"] == 3
+    assert snap["count_2xx"] == 2 and snap["count_5xx"] == 1
+    assert snap["fallback_rate"] == pytest.approx(0.3333, abs=1e-4)
+    assert snap["p99_latency_ms"] == 400.0 and snap["p50_latency_ms"] == pytest.approx(20.0, rel=0.011)
+
+    assert snap["latency_ms"]["1m"]["count"] == 4
+    assert snap["routes"]["/chat/send"]["5m"]["count"] == 3
+    assert snap["routes"]["/chat/stream"]["1h"]["p95"] == 400.0
+    assert snap["interaction_results"]["success"]["1m"]["count"] == 2
+
+    now[0] += 3600.0
+    later = metrics.snapshot()
+    assert later["latency_ms"]["1h"]["count"] == 0
+    assert later["window_size"] == 3  # los campos historicos no dependen del reloj
@@ -0,0 +1,76 @@
+import uuid
+
+import pytest
+
+from backend.app import create_app
+from backend.extensions import db
+from backend.login.models import User
+from backend.plans.models import DietPlan, RoutinePlan
+
+HEADERS = {"X-Context-Key": "k"}
+
+
+@pytest.fixture
+def app(monkeypatch):
+    monkeypatch.setenv("SQLALCHEMY_DATABASE_URI", "sqlite:///:memory:")
+    monkeypatch.setenv("CHAT_CONTEXT_API_KEY", "k")
+    app = create_app()
+    app.config.update(TESTING=True)
+    with app.app_context():
+        db.create_all()
+    yield app
+    with app.app_context():
+        db.drop_all()
+
+
+@pytest.fixture
+def user_id(app):
+    with app.app_context():
+        user = User(email="bulk@test.com", username="bulk", full_name="Bulk Test")
+        db.session.add(user)
+        db.session.commit()
+        return user.id
+
+
+def _items(user_id):
+    return [
+        {"kind": "routine", "id": str(uuid.uuid4()), "user_id": user_id, "title": "Rutina", "objective": "fuerza",
+         "content": {"dias": []}},
+        {"kind": "diet", "id": str(uuid.uuid4()), "user_id": user_id, "title": "Dieta", "goal": "cutting",
+         "content": {"meals": []}},
+    ]
+
+
+def test_bulk_is_idempotent_on_client_ids(app, user_id):
+    client = app.test_client()
+    items = _items(user_id)
+
+    resp = client.post("/api/plans/bulk", headers=HEADERS, json={"items": items})
+    assert resp.status_code == 200
+    assert [r["status"] for r in resp.get_json()["results"]] == [201, 201]
+
+    retry = client.post("/api/plans/bulk", headers=HEADERS, json={"items": items})
+    assert [r["status"] for r in retry.get_json()["results"]] == [200, 200]
+    with app.app_context():
+        assert RoutinePlan.query.count() == 1 and DietPlan.query.count() == 1
+        assert RoutinePlan.query.one().objective == "fuerza"
+
+    listed = client.get("/api/diet-plans", headers=HEADERS, query_string={"user_id": user_id}).get_json()
+    assert [p["id"] for p in listed] == [items[1]["id"]]
+
+
+def test_bulk_reports_invalid_items_without_failing_batch(app, user_id):
+    client = app.test_client()
+    good = _items(user_id)[0]
+    bad = [
+        {"kind": "otro", "id": str(uuid.uuid4()), "user_id": user_id, "title": "x", "content": {}},
+        {"kind": "diet", "id": "no-uuid", "user_id": user_id, "title": "x", "content": {}},
+        {"kind": "diet", "id": str(uuid.uuid4()), "user_id": user_id, "title": "x", "content": []},
+        {"kind": "diet", "id": str(uuid.uuid4()), "user_id": 9999, "title": "x", "content": {}},
+    ]
+    resp = client.post("/api/plans/bulk", headers=HEADERS, json={"items": [good, *bad]})
+    assert resp.status_code == 200
+    assert [r["status"] for r in resp.get_json()["results"]] == [201, 400, 400, 400, 404]
+
+    assert client.post("/api/plans/bulk", json={"items": [good]}).status_code == 401
+    assert client.post("/api/plans/bulk", headers=HEADERS, json={"items": []}).status_code == 400
@@ -0,0 +1,95 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import select
+
+from backend.app import create_app
+from backend.classes.models import ClassBooking, ClassSession, FitnessClass
+from backend.extensions import db
+from backend.metrics import metrics
+from backend.metrics.queries import QueryBudgetExceeded, fingerprint, query_budget
+
+
+@pytest.fixture
+def app(monkeypatch):
+    monkeypatch.setenv("SQLALCHEMY_DATABASE_URI", "sqlite:///:memory:")
+    monkeypatch.setenv("METRICS_API_KEY", "metrics-key")
+    monkeypatch.setenv("SQL_PROFILER_ENABLED", "1")
+    monkeypatch.setenv("SQL_NPLUS1_THRESHOLD", "3")
+    app = create_app()
+    app.config.update(TESTING=True, RATELIMIT_ENABLED=False)
+    with app.app_context():
+        db.create_all()
+        start = datetime(2030, 1, 1, 9, 0)
+        for i in range(6):
+            fitness_class = FitnessClass(name=f"Clase {i}", duration_min=45, capacity=12)
+            db.session.add(fitness_class)
+            db.session.flush()
+            item = ClassSession(class_id=fitness_class.id, start_time=start + timedelta(days=i))
+            db.session.add(item)
+            db.session.flush()
+            db.session.add(ClassBooking(session_id=item.id, user_id=1))
+        db.session.commit()
+    yield app
+    with app.app_context():
+        db.drop_all()
+
+
+def test_list_endpoints_stay_within_query_budget(app):
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess["uid"] = 1
+    with app.app_context():
+        engine = db.engine
+    with query_budget(engine, max_queries=3):
+        resp = client.get("/classes/public/sessions")
+    assert resp.status_code == 200
+    assert {s["class_name"] for s in resp.get_json()["sessions"]} == {f"Clase {i}" for i in range(6)}
+    with query_budget(engine, max_queries=3):
+        resp = client.get("/classes/my-bookings")
+    assert resp.status_code == 200
+    assert len(resp.get_json()["bookings"]) == 6
+
+    with pytest.raises(QueryBudgetExceeded, match="Se esperaban <= 1 consultas"):
+        with app.app_context(), query_budget(engine, max_queries=1):
+            for class_id in (1, 2):
+                db.session.execute(select(FitnessClass).where(FitnessClass.id == class_id)).all()
+
+
+def test_repeated_statement_is_flagged_as_n_plus_one(app):
+    profiler = app.query_profiler
+    with app.app_context(), profiler.track("GET /manual") as stats:
+        for class_id in range(1, 5):
+            db.session.execute(select(FitnessClass).where(FitnessClass.id == class_id)).all()
+    # Cada SELECT de clase arrastra el `selectin` de sus sesiones: dos sentencias repetidas.
+    assert stats.queries == 8
+    statements = profiler.snapshot()["statements"]
+    assert len(statements) == 2
+    (statement,) = [s for s in statements if "WHERE fitness_class.id = ?" in s["statement"]]
+    assert statement["max_per_request"] == 4
+    assert statement["n_plus_one"] == 1
+    assert profiler.snapshot()["routes"]["GET /manual"] == {
+        "requests": 1, "queries": 8, "db_ms": pytest.approx(stats.db_ms, abs=0.01), "max_queries": 8,
+        "n_plus_one": 1, "avg_queries": 8.0,
+    }
+    counters = {(c["name"], c["tags"].get("route")): c["value"] for c in metrics.snapshot()["counters"]}
+    assert counters[("sql_n_plus_one_total", "GET /manual")] >= 1
+
+    assert fingerprint("SELECT * FROM t WHERE id IN (?, ?, ?) AND name = 'x' LIMIT 10") == (
+        "SELECT * FROM t WHERE id IN (?+) AND name = ? LIMIT ?"
+    )
+
+
+def test_queries_endpoint_requires_key_and_reports_routes(app):
+    client = app.test_client()
+    assert client.get("/classes/public/sessions").status_code == 200
+    assert client.get("/metrics/queries").status_code == 401
+
+    resp = client.get("/metrics/queries", headers={"X-Api-Key": "metrics-key"})
+    assert resp.status_code == 200
+    data = resp.get_json()
+    assert data["enabled"] is True
+    route = data["routes"]["GET /classes/public/sessions"]
+    assert route["requests"] == 1
+    assert 1 <= route["max_queries"] <= 3
+    assert route["n_plus_one"] == 0
@@ -0,0 +1,170 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from backend.app import create_app
+from backend.chat.service import RASA_OFFLINE_PAYLOAD
+from backend.extensions import db
+
+SENDER = "rasa-client-user"
+HEADERS = {"X-Context-Key": "k"}
+
+
+class _StubRasa:
+    """Rasa local sobre HTTP real: latencia y status configurables por ruta."""
+
+    def __init__(self):
+        self.delay_s = {}
+        self.status = {}
+        self.hits = {}
+        stub = self
+
+        class _Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                return None
+
+            def _reply(self, body):
+                path = self.path
+                stub.hits[path] = stub.hits.get(path, 0) + 1
+                time.sleep(stub.delay_s.get(path, stub.delay_s.get("*", 0.0)))
+                data = json.dumps(body).encode("utf-8")
+                self.send_response(stub.status.get(path, stub.status.get("*", 200)))
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                self._reply({"model_file": "stub.tar.gz"})
+
+            def do_POST(self):
+                payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                if self.path == "/model/parse":
+                    self._reply({"intent": {"name": "saludo", "confidence": 0.9}, "entities": []})
+                else:
+                    self._reply([{"text": f"eco {payload.get('message')}"}])
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def rasa():
+    stub = _StubRasa()
+    yield stub
+    stub.close()
+
+
+def _make_app(monkeypatch, rasa, **env):
+    monkeypatch.setenv("SQLALCHEMY_DATABASE_URI", "sqlite:///:memory:")
+    monkeypatch.setenv("CHAT_CONTEXT_API_KEY", "k")
+    monkeypatch.setenv("LLM_PROVIDER", "disabled")
+    monkeypatch.setenv("RASA_BASE_URL", rasa.url)
+    monkeypatch.setenv("RASA_CONCURRENT_PARSE", "0")
+    monkeypatch.setenv("RASA_RETRY_BACKOFF_S", "0.05")
+    for key, value in env.items():
+        monkeypatch.setenv(key, str(value))
+    app = create_app()
+    app.config.update(TESTING=True, RATELIMIT_ENABLED=False)
+    with app.app_context():
+        db.create_all()
+    client = app.test_client()
+    assert client.post(f"/chat/context/{SENDER}", headers=HEADERS, json={"consent_given": True}).status_code == 200
+    return app, client
+
+
+def _send(client, message="hola"):
+    return client.post("/chat/send", headers=HEADERS, json={"sender": SENDER, "message": message})
+
+
+def test_retries_stay_within_turn_deadline(monkeypatch, rasa):
+    app, client = _make_app(
+        monkeypatch, rasa, RASA_DEADLINE_S="1.0", RASA_RETRIES="10", RASA_BREAKER_FAILURES="100"
+    )
+    rasa.status["/webhooks/rest/webhook"] = 503
+    rasa.delay_s["/webhooks/rest/webhook"] = 0.3
+
+    started = time.monotonic()
+    resp = _send(client)
+    elapsed = time.monotonic() - started
+
+    assert resp.status_code == 502
+    assert rasa.hits["/webhooks/rest/webhook"] >= 2  # reintento dentro del presupuesto
+    assert elapsed < 1.5  # antes: hasta 4 intentos x RASA_TIMEOUT_SEND
+
+
+def test_breaker_opens_serves_offline_and_recovers_after_probe(monkeypatch, rasa):
+    app, client = _make_app(
+        monkeypatch, rasa, RASA_RETRIES="0", RASA_BREAKER_FAILURES="2", RASA_BREAKER_RESET_S="60"
+    )
+    rasa.status["*"] = 500
+
+    assert _send(client).status_code == 502  # parse + webhook fallan: el circuito se abre
+    calls = dict(rasa.hits)
+
+    started = time.monotonic()
+    resp = _send(client)
+    assert resp.status_code == 200
+    assert resp.get_json() == list(RASA_OFFLINE_PAYLOAD)
+    assert time.monotonic() - started < 0.5
+    assert rasa.hits == calls  # fallo rapido: no se llamo a Rasa
+    assert client.get("/metrics").get_json()["rasa"]["breaker"]["state"] == "open"
+
+    rasa.status.clear()
+    assert app.chat_service.rasa_ready.probe_once()["ready"] is True
+    resp = _send(client, "de vuelta")
+    assert resp.status_code == 200
+    assert resp.get_json()[0]["text"] == "eco de vuelta"
+    assert app.chat_service.rasa.breaker.snapshot() == {"state": "closed", "failures": 0}
+
+
+def test_half_open_trial_is_left_for_the_webhook(monkeypatch, rasa):
+    app, client = _make_app(
+        monkeypatch, rasa, RASA_RETRIES="0", RASA_BREAKER_FAILURES="1", RASA_BREAKER_RESET_S="60",
+        RASA_CONCURRENT_PARSE="1",
+    )
+    rasa.status["*"] = 500
+    assert _send(client).status_code == 502
+    assert app.chat_service.rasa.breaker.snapshot()["state"] == "open"
+
+    service = app.chat_service
+    call_rasa = service._call_rasa_or_offline
+
+    def _late_webhook(*args, **kwargs):
+        time.sleep(0.1)  # el parse concurrente llega primero al breaker
+        return call_rasa(*args, **kwargs)
+
+    monkeypatch.setattr(service, "_call_rasa_or_offline", _late_webhook)
+    rasa.status.clear()
+    assert service.rasa_ready.probe_once()["ready"] is True
+    parse_hits = rasa.hits.get("/model/parse", 0)
+    resp = _send(client, "de vuelta")
+    assert resp.get_json()[0]["text"] == "eco de vuelta"
+    assert rasa.hits.get("/model/parse", 0) == parse_hits  # el parse no tomo la prueba
+    assert app.chat_service.rasa.breaker.snapshot() == {"state": "closed", "failures": 0}
+
+
+def test_ready_returns_cached_probe_state(monkeypatch, rasa):
+    app, client = _make_app(monkeypatch, rasa, RASA_READY_INTERVAL_S="60")
+    try:
+        assert client.get("/ready").status_code == 200
+        assert client.get("/ready").status_code == 200
+        assert rasa.hits["/status"] == 1
+
+        rasa.status["/status"] = 503
+        assert client.get("/ready").status_code == 200  # estado cacheado hasta el proximo probe
+        app.chat_service.rasa_ready.probe_once()
+        resp = client.get("/ready")
+        assert resp.status_code == 503
+        assert resp.get_json() == {"ok": False, "reason": "rasa_unavailable"}
+    finally:
+        app.chat_service.rasa_ready.stop()
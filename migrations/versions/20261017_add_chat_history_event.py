@@ -0,0 +1,134 @@
+"""Add append-only chat_history_event table and backfill it from chat_user_context.history.
+
+Revision ID: 20261017_add_chat_history_event
+Revises: 20260506_fix_ri
+Create Date: 2026-10-17 00:00:00.000000
+"""
+
+import json
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "20261017_add_chat_history_event"
+down_revision = "20260506_fix_ri"
+branch_labels = None
+depends_on = None
+
+HISTORY_WINDOW = 20
+
+chat_user_context = sa.table(
+    "chat_user_context",
+    sa.column("id", sa.Integer),
+    sa.column("sender_id", sa.String),
+    sa.column("chat_id", sa.String),
+    sa.column("history", sa.JSON),
+    sa.column("history_seq", sa.Integer),
+)
+
+chat_history_event = sa.table(
+    "chat_history_event",
+    sa.column("sender_id", sa.String),
+    sa.column("chat_id", sa.String),
+    sa.column("seq", sa.Integer),
+    sa.column("type", sa.String),
+    sa.column("payload", sa.JSON),
+)
+
+
+def _has_column(inspector, table: str, column: str) -> bool:
+    return column in {col["name"] for col in inspector.get_columns(table)}
+
+
+def _load_json(value):
+    if isinstance(value, str):
+        try:
+            return json.loads(value)
+        except ValueError:
+            return None
+    return value
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    insp = sa.inspect(conn)
+
+    if not insp.has_table("chat_history_event"):
+        op.create_table(
+            "chat_history_event",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("sender_id", sa.String(length=80), nullable=False),
+            sa.Column("chat_id", sa.String(length=80), nullable=True),
+            sa.Column("seq", sa.Integer(), nullable=False),
+            sa.Column("type", sa.String(length=32), nullable=True),
+            sa.Column("payload", sa.JSON(), nullable=False),
+            sa.Column("created_at", sa.DateTime(), nullable=False, server_default=sa.func.now()),
+            sa.PrimaryKeyConstraint("id"),
+            sa.UniqueConstraint("sender_id", "seq", name="uq_chat_history_event_sender_seq"),
+        )
+
+    if not insp.has_table("chat_user_context"):
+        return
+
+    if not _has_column(insp, "chat_user_context", "history_seq"):
+        op.add_column(
+            "chat_user_context",
+            sa.Column("history_seq", sa.Integer(), nullable=False, server_default=sa.text("0")),
+        )
+
+    # Backfill: cada entrada del JSON pasa a una fila; el JSON queda vacio.
+    rows = conn.execute(
+        sa.select(chat_user_context.c.id, chat_user_context.c.sender_id, chat_user_context.c.chat_id,
+                  chat_user_context.c.history)
+        .where(chat_user_context.c.history_seq == 0)
+    ).fetchall()
+    for ctx_id, sender_id, chat_id, history in rows:
+        loaded = _load_json(history)
+        entries = [entry for entry in loaded if isinstance(entry, dict)] if isinstance(loaded, list) else []
+        if not entries:
+            continue
+        conn.execute(
+            chat_history_event.insert(),
+            [
+                {
+                    "sender_id": sender_id,
+                    "chat_id": chat_id,
+                    "seq": seq,
+                    "type": (str(entry.get("type") or "")[:32] or None),
+                    "payload": entry,
+                }
+                for seq, entry in enumerate(entries, start=1)
+            ],
+        )
+        conn.execute(
+            chat_user_context.update()
+            .where(chat_user_context.c.id == ctx_id)
+            .values(history_seq=len(entries), history=[])
+        )
+
+
+def downgrade() -> None:
+    conn = op.get_bind()
+    insp = sa.inspect(conn)
+
+    if insp.has_table("chat_user_context") and insp.has_table("chat_history_event"):
+        rows = conn.execute(sa.select(chat_user_context.c.id, chat_user_context.c.sender_id)).fetchall()
+        for ctx_id, sender_id in rows:
+            payloads = conn.execute(
+                sa.select(chat_history_event.c.payload)
+                .where(chat_history_event.c.sender_id == sender_id)
+                .order_by(chat_history_event.c.seq.desc())
+                .limit(HISTORY_WINDOW)
+            ).fetchall()
+            if payloads:
+                conn.execute(
+                    chat_user_context.update()
+                    .where(chat_user_context.c.id == ctx_id)
+                    .values(history=[_load_json(row[0]) for row in reversed(payloads)])
+                )
+
+    if insp.has_table("chat_user_context") and _has_column(insp, "chat_user_context", "history_seq"):
+        op.drop_column("chat_user_context", "history_seq")
+    if insp.has_table("chat_history_event"):
+        op.drop_table("chat_history_event")
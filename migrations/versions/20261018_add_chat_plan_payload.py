@@ -0,0 +1,177 @@
+"""Add content-addressed chat_plan_payload table and replace inline plans with references.
+
+Revision ID: 20261018_add_chat_plan_payload
+Revises: 20261017_add_chat_history_event
+Create Date: 2026-10-18 00:00:00.000000
+"""
+
+import json
+
+from alembic import op
+import sqlalchemy as sa
+
+from backend.planner.refs import canonical_plan_json, is_plan_payload, is_plan_ref, make_plan_ref, plan_digest
+
+
+revision = "20261018_add_chat_plan_payload"
+down_revision = "20261017_add_chat_history_event"
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 500
+
+chat_plan_payload = sa.table(
+    "chat_plan_payload",
+    sa.column("digest", sa.String),
+    sa.column("kind", sa.String),
+    sa.column("payload", sa.JSON),
+    sa.column("size_bytes", sa.Integer),
+)
+
+chat_user_context = sa.table(
+    "chat_user_context",
+    sa.column("id", sa.Integer),
+    sa.column("last_routine", sa.JSON),
+    sa.column("last_diet", sa.JSON),
+)
+
+chat_history_event = sa.table(
+    "chat_history_event",
+    sa.column("id", sa.Integer),
+    sa.column("type", sa.String),
+    sa.column("payload", sa.JSON),
+)
+
+# Entradas de historial cuyo `data` puede ser un plan completo.
+_PLAN_ENTRY_TYPES = ("routine", "diet", "bot_custom")
+
+
+def _load_json(value):
+    if isinstance(value, str):
+        try:
+            return json.loads(value)
+        except ValueError:
+            return None
+    return value
+
+
+class _Interner:
+    """Inserta cada digest una sola vez durante la migracion."""
+
+    def __init__(self, conn, known):
+        self.conn = conn
+        self.known = set(known)
+
+    def ref(self, payload):
+        digest = plan_digest(payload)
+        if digest not in self.known:
+            self.conn.execute(
+                chat_plan_payload.insert(),
+                {
+                    "digest": digest,
+                    "kind": str(payload.get("type") or "")[:32] or None,
+                    "payload": payload,
+                    "size_bytes": len(canonical_plan_json(payload).encode("utf-8")),
+                },
+            )
+            self.known.add(digest)
+        return make_plan_ref(payload, digest)
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    insp = sa.inspect(conn)
+
+    if not insp.has_table("chat_plan_payload"):
+        op.create_table(
+            "chat_plan_payload",
+            sa.Column("digest", sa.String(length=64), nullable=False),
+            sa.Column("kind", sa.String(length=32), nullable=True),
+            sa.Column("payload", sa.JSON(), nullable=False),
+            sa.Column("size_bytes", sa.Integer(), nullable=False, server_default=sa.text("0")),
+            sa.Column("created_at", sa.DateTime(), nullable=False, server_default=sa.func.now()),
+            sa.PrimaryKeyConstraint("digest"),
+        )
+
+    interner = _Interner(conn, [row[0] for row in conn.execute(sa.select(chat_plan_payload.c.digest))])
+
+    if insp.has_table("chat_user_context"):
+        rows = conn.execute(
+            sa.select(chat_user_context.c.id, chat_user_context.c.last_routine, chat_user_context.c.last_diet)
+        ).fetchall()
+        for ctx_id, last_routine, last_diet in rows:
+            values = {}
+            for column, raw in (("last_routine", last_routine), ("last_diet", last_diet)):
+                loaded = _load_json(raw)
+                if is_plan_payload(loaded):
+                    values[column] = interner.ref(loaded)
+            if values:
+                conn.execute(chat_user_context.update().where(chat_user_context.c.id == ctx_id).values(**values))
+
+    if insp.has_table("chat_history_event"):
+        last_id = 0
+        while True:
+            rows = conn.execute(
+                sa.select(chat_history_event.c.id, chat_history_event.c.payload)
+                .where(chat_history_event.c.id > last_id)
+                .where(chat_history_event.c.type.in_(_PLAN_ENTRY_TYPES))
+                .order_by(chat_history_event.c.id)
+                .limit(BATCH_SIZE)
+            ).fetchall()
+            if not rows:
+                break
+            for event_id, raw in rows:
+                entry = _load_json(raw)
+                if isinstance(entry, dict) and is_plan_payload(entry.get("data")):
+                    entry = dict(entry, data=interner.ref(entry["data"]))
+                    conn.execute(
+                        chat_history_event.update().where(chat_history_event.c.id == event_id).values(payload=entry)
+                    )
+            last_id = rows[-1][0]
+
+
+def downgrade() -> None:
+    conn = op.get_bind()
+    insp = sa.inspect(conn)
+    if not insp.has_table("chat_plan_payload"):
+        return
+
+    def _resolve(value):
+        loaded = _load_json(value)
+        if not is_plan_ref(loaded):
+            return None
+        row = conn.execute(
+            sa.select(chat_plan_payload.c.payload).where(chat_plan_payload.c.digest == loaded["plan_ref"])
+        ).first()
+        return _load_json(row[0]) if row else None
+
+    if insp.has_table("chat_user_context"):
+        rows = conn.execute(
+            sa.select(chat_user_context.c.id, chat_user_context.c.last_routine, chat_user_context.c.last_diet)
+        ).fetchall()
+        for ctx_id, last_routine, last_diet in rows:
+            values = {}
+            for column, raw in (("last_routine", last_routine), ("last_diet", last_diet)):
+                payload = _resolve(raw)
+                if payload is not None:
+                    values[column] = payload
+            if values:
+                conn.execute(chat_user_context.update().where(chat_user_context.c.id == ctx_id).values(**values))
+
+    if insp.has_table("chat_history_event"):
+        rows = conn.execute(
+            sa.select(chat_history_event.c.id, chat_history_event.c.payload)
+            .where(chat_history_event.c.type.in_(_PLAN_ENTRY_TYPES))
+        ).fetchall()
+        for event_id, raw in rows:
+            entry = _load_json(raw)
+            if isinstance(entry, dict):
+                payload = _resolve(entry.get("data"))
+                if payload is not None:
+                    conn.execute(
+                        chat_history_event.update()
+                        .where(chat_history_event.c.id == event_id)
+                        .values(payload=dict(entry, data=payload))
+                    )
+
+    op.drop_table("chat_plan_payload")
@@ -0,0 +1,131 @@
+"""Benchmark: llamadas de una accion al backend, secuencia anterior vs. /chat/bootstrap.
+
+Uso:
+    python scripts/bench_action_bootstrap.py [--actions 200] [--rtt-ms 5]
+
+Levanta el backend real (create_app + SQLite temporal) en un servidor HTTP/1.1
+local, crea un usuario con perfil cifrado y un contexto de chat, y mide por accion:
+
+- antes: GET /health, GET /chat/context (dos veces, como ActionGenerarRutina sin
+  sesion) y GET /profile/me, cada uno con `requests.get` y una conexion TCP nueva;
+- despues: un GET /chat/bootstrap/<sender> sobre una `requests.Session` compartida
+  (keep-alive), como `backend_http()` en actions/actions.py.
+
+`--rtt-ms` agrega esa latencia a cada respuesta para simular la red entre el
+action server y el backend.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+SENDER = "bench-bootstrap"
+API_KEY = "bench-key"
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * (len(ordered) - 1)))))
+    return ordered[idx]
+
+
+def _start_backend(rtt_s):
+    from cryptography.fernet import Fernet
+    from werkzeug.serving import WSGIRequestHandler, make_server
+
+    db_path = os.path.join(tempfile.mkdtemp(prefix="bench-bootstrap-"), "bench.db")
+    os.environ.update(
+        SQLALCHEMY_DATABASE_URI=f"sqlite:///{db_path}",
+        SECRET_KEY=os.environ.get("SECRET_KEY") or "bench",
+        CHAT_CONTEXT_API_KEY=API_KEY,
+        PROFILE_ENCRYPTION_KEY=Fernet.generate_key().decode(),
+        RATE_LIMIT_DEFAULT="1000000/minute",
+    )
+    from backend.app import create_app
+    from backend.chat.models import ChatUserContext
+    from backend.extensions import db
+    from backend.login.models import User
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        user = User(email="bench@test.com", username="bench", full_name="Bench")
+        db.session.add(user)
+        db.session.flush()
+        user.ensure_profile().update_from_payload({"weight_kg": 70, "height_cm": 175, "primary_goal": "fuerza"})
+        ctx = ChatUserContext.get_or_create(SENDER, user.id)
+        ctx.consent_given = True
+        ctx.user_id = user.id
+        db.session.commit()
+        user_id = user.id
+
+    def delayed(environ, start_response):
+        time.sleep(rtt_s)
+        return app.wsgi_app(environ, start_response)
+
+    class _Handler(WSGIRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_request(self, *args, **kwargs):
+            pass
+
+    server = make_server("127.0.0.1", 0, delayed, threaded=True, request_handler=_Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}", user_id
+
+
+def _legacy_action(base, user_id):
+    import requests
+
+    headers = {"X-Context-Key": API_KEY}
+    assert requests.get(f"{base}/health", timeout=5).status_code == 200
+    for _ in range(2):
+        ctx = requests.get(f"{base}/chat/context/{SENDER}", headers=headers, timeout=5).json()["context"]
+    profile = requests.get(f"{base}/profile/me", params={"user_id": user_id}, headers=headers, timeout=5).json()
+    return ctx, profile["profile"]
+
+
+def _bootstrap_action(session, base):
+    data = session.get(f"{base}/chat/bootstrap/{SENDER}", headers={"X-Context-Key": API_KEY}, timeout=5).json()
+    return data["context"], data["profile"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latencia de las llamadas de una accion al backend.")
+    parser.add_argument("--actions", type=int, default=200)
+    parser.add_argument("--rtt-ms", type=float, default=5.0)
+    args = parser.parse_args()
+
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    server, base, user_id = _start_backend(args.rtt_ms / 1000.0)
+    session = requests.Session()
+    session.mount("http://", HTTPAdapter(pool_maxsize=4, max_retries=0))
+    try:
+        legacy_ctx, legacy_profile = _legacy_action(base, user_id)
+        boot_ctx, boot_profile = _bootstrap_action(session, base)
+        assert legacy_ctx == boot_ctx and legacy_profile == boot_profile, "bootstrap no coincide con la secuencia"
+
+        print(f"{args.actions} acciones, rtt simulado {args.rtt_ms:.1f} ms")
+        print(f"{'modo':<26}{'p50 ms':>9}{'p95 ms':>9}{'llamadas':>10}")
+        for label, calls, run in (
+            ("health+context x2+profile", 4, lambda: _legacy_action(base, user_id)),
+            ("bootstrap (pool)", 1, lambda: _bootstrap_action(session, base)),
+        ):
+            timings = []
+            for _ in range(args.actions):
+                started = time.perf_counter()
+                run()
+                timings.append((time.perf_counter() - started) * 1000.0)
+            print(f"{label:<26}{_percentile(timings, 50):>9.2f}{_percentile(timings, 95):>9.2f}{calls:>10}")
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""Benchmark: p95 de /chat/send durante un pico, con y sin control de admision.
+
+Uso:
+    python scripts/bench_chat_admission.py [--clients 48] [--capacity 8] [--base-ms 40] [--seconds 6]
+
+Simula el backend de chat como un recurso compartido (Rasa/LLM + CPU) con
+`capacity` turnos a plena velocidad: con mas turnos simultaneos, cada uno tarda
+`base_ms * inflight / capacity` (reparto de procesador). `clients` hilos envian
+turnos sin pausa durante `seconds`, primero sin limitador y despues detras de
+`AdaptiveConcurrencyLimiter`. Se reportan p50/p95 de los turnos atendidos,
+throughput y turnos descartados (503).
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from backend.chat.admission import AdaptiveConcurrencyLimiter  # noqa: E402
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * (len(ordered) - 1)))))
+    return ordered[idx]
+
+
+class _SharedBackend:
+    def __init__(self, capacity, base_ms):
+        self.capacity = capacity
+        self.base_s = base_ms / 1000.0
+        self.inflight = 0
+        self.lock = threading.Lock()
+
+    def call(self):
+        # Trabajo en pasos de 5 ms; cada paso avanza menos cuanto mas cargado esta.
+        remaining = self.base_s
+        with self.lock:
+            self.inflight += 1
+        try:
+            while remaining > 0:
+                with self.lock:
+                    share = min(1.0, self.capacity / max(1, self.inflight))
+                time.sleep(0.005)
+                remaining -= 0.005 * share
+        finally:
+            with self.lock:
+                self.inflight -= 1
+
+
+def _run(backend, limiter, clients, seconds):
+    latencies, shed = [], [0]
+    lock = threading.Lock()
+    stop_at = time.perf_counter() + seconds
+
+    def _client():
+        while time.perf_counter() < stop_at:
+            started = time.perf_counter()
+            ticket = limiter.acquire() if limiter else None
+            if limiter and ticket is None:
+                with lock:
+                    shed[0] += 1
+                time.sleep(0.02)  # el cliente reintenta tras un breve backoff
+                continue
+            try:
+                backend.call()
+            finally:
+                elapsed_ms = (time.perf_counter() - started) * 1000.0
+                if limiter:
+                    limiter.release(ticket, elapsed_ms)
+            with lock:
+                latencies.append(elapsed_ms)
+
+    threads = [threading.Thread(target=_client) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, shed[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="p95 de turnos de chat con y sin admision adaptativa.")
+    parser.add_argument("--clients", type=int, default=48)
+    parser.add_argument("--capacity", type=int, default=8)
+    parser.add_argument("--base-ms", type=float, default=40.0)
+    parser.add_argument("--seconds", type=float, default=6.0)
+    args = parser.parse_args()
+
+    print(f"{args.clients} clientes, capacidad {args.capacity}, turno base {args.base_ms:.0f} ms, {args.seconds:.0f} s")
+    print(f"{'modo':<14}{'p50 ms':>9}{'p95 ms':>9}{'turnos/s':>10}{'503':>7}{'limite':>8}")
+    for label in ("sin limite", "adaptativo"):
+        limiter = None
+        if label == "adaptativo":
+            limiter = AdaptiveConcurrencyLimiter(initial_limit=16, min_limit=2, max_limit=64, queue_max=16,
+                                                 queue_timeout_s=0.05, long_window=100)
+        latencies, shed = _run(_SharedBackend(args.capacity, args.base_ms), limiter, args.clients, args.seconds)
+        print(
+            f"{label:<14}{_percentile(latencies, 50):>9.1f}{_percentile(latencies, 95):>9.1f}"
+            f"{len(latencies) / args.seconds:>10.1f}{shed:>7}{(int(limiter.limit) if limiter else '-'):>8}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""Benchmark: /chat/send con parse NLU secuencial vs. concurrente con el webhook.
+
+Uso:
+    python scripts/bench_chat_pipeline.py [--requests 200] [--parse-ms 40] [--webhook-ms 80]
+
+Levanta un Rasa falso local (http.server en un hilo) que responde `/model/parse` y
+`/webhooks/rest/webhook` con la latencia indicada, crea la app con SQLite en memoria y
+mide p50/p95 de `/chat/send` con `RASA_CONCURRENT_PARSE` desactivado y activado.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+
+def _stub_handler(parse_s: float, webhook_s: float):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def log_message(self, *args):  # silencio
+            pass
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            self.rfile.read(length)
+            if self.path.endswith("/model/parse"):
+                time.sleep(parse_s)
+                body = {"intent": {"name": "saludar", "confidence": 0.97}, "entities": []}
+            else:
+                time.sleep(webhook_s)
+                body = [{"text": "Hola! Soy Fitter."}]
+            raw = json.dumps(body).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(raw)))
+            self.end_headers()
+            self.wfile.write(raw)
+
+    return Handler
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * (len(ordered) - 1)))))
+    return ordered[idx]
+
+
+def _run(app, n):
+    client = app.test_client()
+    headers = {"X-Context-Key": "bench-key"}
+    client.post("/chat/context/bench", headers=headers, json={"consent_given": True})
+    timings = []
+    for i in range(n):
+        start = time.perf_counter()
+        resp = client.post("/chat/send", headers=headers, json={"sender": "bench", "message": f"hola {i}"})
+        timings.append((time.perf_counter() - start) * 1000)
+        if resp.status_code != 200:
+            raise SystemExit(f"/chat/send devolvio {resp.status_code}: {resp.get_data(as_text=True)}")
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del pipeline parse + webhook de /chat/send.")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--parse-ms", type=float, default=40.0)
+    parser.add_argument("--webhook-ms", type=float, default=80.0)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _stub_handler(args.parse_ms / 1000, args.webhook_ms / 1000))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    os.environ.setdefault("SECRET_KEY", "bench-secret")
+    os.environ["SQLALCHEMY_DATABASE_URI"] = "sqlite:///:memory:"
+    os.environ["RASA_BASE_URL"] = f"http://127.0.0.1:{server.server_port}"
+    os.environ["CHAT_CONTEXT_API_KEY"] = "bench-key"
+    os.environ["LLM_PROVIDER"] = "disabled"
+
+    from backend.app import create_app  # noqa: E402
+    from backend.extensions import db  # noqa: E402
+
+    app = create_app()
+    app.config.update(TESTING=True, RATELIMIT_ENABLED=False)
+    with app.app_context():
+        db.create_all()
+
+    print(f"Rasa falso: parse {args.parse_ms:.0f} ms, webhook {args.webhook_ms:.0f} ms; {args.requests} mensajes")
+    print(f"{'modo':<14}{'p50 ms':>10}{'p95 ms':>10}{'media ms':>10}")
+    for label, concurrent in (("secuencial", False), ("concurrente", True)):
+        app.config["RASA_CONCURRENT_PARSE"] = concurrent
+        timings = _run(app, args.requests)
+        print(
+            f"{label:<14}{_percentile(timings, 50):>10.1f}{_percentile(timings, 95):>10.1f}"
+            f"{statistics.mean(timings):>10.1f}"
+        )
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
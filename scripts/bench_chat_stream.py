@@ -0,0 +1,102 @@
+"""Benchmark: time-to-first-token de /chat/stream frente a la latencia completa de /chat/send.
+
+Uso:
+    python scripts/bench_chat_stream.py [--requests 30] [--token-ms 15]
+
+Levanta el LLM falso de los tests (`backend/tests/fixtures/fake_llm.py`) con un retardo
+por chunk, crea la app con SQLite en memoria y mide, para el mismo mensaje, cuánto tarda
+/chat/send en devolver la respuesta y cuánto tarda /chat/stream en emitir su primer evento.
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from backend.tests.fixtures.fake_llm import FakeLLMServer  # noqa: E402
+
+
+class _RasaStub:
+    def post(self, url, json=None, timeout=None):
+        class _Resp:
+            status_code = 200
+
+            def raise_for_status(self):
+                return None
+
+            def json(self):
+                return {"intent": {"name": "saludar", "confidence": 0.9}, "entities": []}
+
+        return _Resp()
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * (len(ordered) - 1)))))
+    return ordered[idx]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de TTFT en /chat/stream.")
+    parser.add_argument("--requests", type=int, default=30)
+    parser.add_argument("--token-ms", type=float, default=15.0)
+    parser.add_argument("--message", default="quiero una rutina de pecho")
+    args = parser.parse_args()
+
+    server = FakeLLMServer(token_delay_s=args.token_ms / 1000).start()
+    os.environ.setdefault("SECRET_KEY", "bench-secret")
+    os.environ["SQLALCHEMY_DATABASE_URI"] = "sqlite:///:memory:"
+    os.environ["CHAT_CONTEXT_API_KEY"] = "bench-key"
+    os.environ["LLM_PROVIDER"] = "openai"
+    os.environ["LLM_API_KEY"] = "bench"
+    os.environ["LLM_BASE_URL"] = server.base_url
+
+    from backend.app import create_app  # noqa: E402
+    from backend.extensions import db  # noqa: E402
+
+    app = create_app()
+    app.config.update(TESTING=True, RATELIMIT_ENABLED=False)
+    app.chat_service.http = _RasaStub()
+    with app.app_context():
+        db.create_all()
+
+    client = app.test_client()
+    headers = {"X-Context-Key": "bench-key"}
+
+    def _fresh_sender(i):
+        # un sender por mensaje: el historial no crece entre iteraciones
+        sender = f"bench-{i}"
+        client.post(f"/chat/context/{sender}", headers=headers, json={"consent_given": True})
+        return {"sender": sender, "message": args.message}
+
+    send_ms, ttft_ms, stream_ms = [], [], []
+    for i in range(args.requests):
+        body = _fresh_sender(f"send-{i}")
+        start = time.perf_counter()
+        client.post("/chat/send", headers=headers, json=body)
+        send_ms.append((time.perf_counter() - start) * 1000)
+
+        body = _fresh_sender(f"stream-{i}")
+        start = time.perf_counter()
+        resp = client.post("/chat/stream", headers=headers, json=body, buffered=False)
+        chunks = iter(resp.response)
+        next(chunks)
+        ttft_ms.append((time.perf_counter() - start) * 1000)
+        for _chunk in chunks:
+            pass
+        resp.close()
+        stream_ms.append((time.perf_counter() - start) * 1000)
+    server.stop()
+
+    print(f"LLM falso: {args.token_ms:.0f} ms por chunk; {args.requests} mensajes ({args.message!r})")
+    print(f"{'medida':<22}{'p50 ms':>10}{'p95 ms':>10}{'media ms':>10}")
+    for label, values in (("/chat/send total", send_ms), ("/chat/stream TTFT", ttft_ms),
+                          ("/chat/stream total", stream_ms)):
+        print(f"{label:<22}{_percentile(values, 50):>10.1f}{_percentile(values, 95):>10.1f}"
+              f"{statistics.mean(values):>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""Benchmark: sentencias SQL y bytes escritos por turno de /chat/send.
+
+Uso:
+    python scripts/bench_chat_turn_sql.py [--turns 10] [--exercises 6]
+
+Usa un Rasa falso en proceso que responde texto + una tarjeta `routine_detail` con
+`context_payload` (el turno mas pesado: historial, last_routine y alergias), cuenta
+con un listener `before_cursor_execute` las sentencias por tipo y el tamano de los
+parametros enviados, y compara `CHAT_UNIT_OF_WORK` desactivado y activado.
+
+Referencia (10 turnos, rutina de 6 ejercicios, SQLite, promedio por turno):
+
+    arbol                                  modo           SELECT INSERT UPDATE total  bytes
+    historial por fila, sin batch          ambos             2      6      2    10    2646
+    INSERT multi-fila + unit of work       autoflush         2      1      2     5    2658
+                                           unit of work      2      1      1     4    2595
+    + planes por digest y seq asignado     autoflush         3      2      2     7    2524
+      en la BD al hacer flush              unit of work      3      2      1     6    2461
+
+La mayor parte del ahorro viene del INSERT multi-fila del historial (6 -> 1), que
+aplica con y sin unit of work; el unit of work por si solo ahorra un UPDATE por turno.
+"""
+import argparse
+import collections
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+
+class _Resp:
+    status_code = 200
+
+    def __init__(self, payload):
+        self._payload = payload
+
+    def raise_for_status(self):
+        return None
+
+    def json(self):
+        return self._payload
+
+
+class _RasaStub:
+    def __init__(self, exercises):
+        self.routine = {
+            "type": "routine_detail",
+            "routine_id": "bench",
+            "header": "Rutina - Pecho",
+            "exercises": [{"nombre": f"ejercicio {i}", "series": 3, "reps": "8-12"} for i in range(exercises)],
+            "explanation": "Volumen moderado para hipertrofia.",
+            "context_payload": {"allergies": "mani"},
+        }
+
+    def post(self, url, json=None, timeout=None):
+        if url.endswith("/model/parse"):
+            return _Resp({"intent": {"name": "pedir_rutina", "confidence": 0.9}, "entities": []})
+        return _Resp([{"text": "Aqui va tu rutina."}, {"custom": self.routine}])
+
+
+def _run(app, db, sender, turns):
+    from sqlalchemy import event
+
+    client = app.test_client()
+    headers = {"X-Context-Key": "bench-key"}
+    client.post(f"/chat/context/{sender}", headers=headers, json={"consent_given": True})
+    stats = []
+    current = collections.Counter()
+
+    def _count(conn, cursor, statement, parameters, context, executemany):
+        current[statement.split(None, 1)[0].upper()] += 1
+        current["bytes"] += len(json.dumps(parameters, default=str))
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, "before_cursor_execute", _count)
+    try:
+        for i in range(turns):
+            current.clear()
+            resp = client.post("/chat/send", headers=headers, json={"sender": sender, "message": f"rutina {i}"})
+            if resp.status_code != 200:
+                raise SystemExit(f"/chat/send devolvio {resp.status_code}: {resp.get_data(as_text=True)}")
+            stats.append(dict(current))
+    finally:
+        event.remove(engine, "before_cursor_execute", _count)
+    return stats[1:] or stats  # el primer turno incluye la creacion de filas
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sentencias SQL y bytes por turno de chat.")
+    parser.add_argument("--turns", type=int, default=10)
+    parser.add_argument("--exercises", type=int, default=6)
+    args = parser.parse_args()
+
+    os.environ.setdefault("SECRET_KEY", "bench-secret")
+    os.environ["SQLALCHEMY_DATABASE_URI"] = "sqlite:///:memory:"
+    os.environ["CHAT_CONTEXT_API_KEY"] = "bench-key"
+    os.environ["LLM_PROVIDER"] = "disabled"
+
+    from backend.app import create_app  # noqa: E402
+    from backend.extensions import db  # noqa: E402
+
+    app = create_app()
+    app.config.update(TESTING=True, RATELIMIT_ENABLED=False, RASA_CONCURRENT_PARSE=False)
+    app.chat_service.http = _RasaStub(args.exercises)
+    with app.app_context():
+        db.create_all()
+
+    print(f"{args.turns} turnos con rutina de {args.exercises} ejercicios (promedio por turno)")
+    print(f"{'modo':<18}{'SELECT':>8}{'INSERT':>8}{'UPDATE':>8}{'total':>8}{'bytes':>10}")
+    for label, enabled in (("autoflush", False), ("unit of work", True)):
+        app.config["CHAT_UNIT_OF_WORK"] = enabled
+        stats = _run(app, db, f"bench-{int(enabled)}", args.turns)
+
+        def avg(key):
+            return sum(s.get(key, 0) for s in stats) / len(stats)
+
+        total = sum(avg(k) for k in ("SELECT", "INSERT", "UPDATE", "DELETE"))
+        print(
+            f"{label:<18}{avg('SELECT'):>8.1f}{avg('INSERT'):>8.1f}{avg('UPDATE'):>8.1f}"
+            f"{total:>8.1f}{avg('bytes'):>10.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
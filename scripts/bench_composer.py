@@ -0,0 +1,57 @@
+"""Benchmark: compose_diet con engine="scan" (recorrido original) vs. engine="vectorized".
+
+Uso:
+    python scripts/bench_composer.py [--path backend/data/food_catalog.json] [--repeat 50]
+
+Verifica que ambos motores entreguen las mismas comidas antes de medir.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from backend.food.composer import compose_diet  # noqa: E402
+
+DEFAULT_PATH = os.path.join("backend", "data", "food_catalog.json")
+
+
+def _strip(diet):
+    diet = dict(diet)
+    diet.pop("diet_id", None)
+    return diet
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del composer vectorizado.")
+    parser.add_argument("--path", default=DEFAULT_PATH)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    cases = [
+        ("2000 kcal, 4 comidas, equilibrada", dict(target_kcal=2000, n_meals=4, objetivo=None)),
+        ("2800 kcal, 4 comidas, hipertrofia", dict(target_kcal=2800, n_meals=4, objetivo="hipertrofia", weight_kg=80)),
+        ("1700 kcal, 4 comidas, bajar_grasa, sin gluten", dict(target_kcal=1700, n_meals=4, objetivo="bajar_grasa", exclude_allergens=["en:gluten"])),
+    ]
+
+    start = time.perf_counter()
+    compose_diet(2000, n_meals=4, catalog_path=args.path)
+    print(f"Primera llamada (carga catalogo + indice): {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    print(f"{'caso':<48}{'scan ms':>10}{'vector ms':>12}{'speedup':>10}")
+    for label, kwargs in cases:
+        kwargs = dict(kwargs, catalog_path=args.path)
+        if _strip(compose_diet(engine="scan", **kwargs)) != _strip(compose_diet(engine="vectorized", **kwargs)):
+            raise SystemExit(f"Resultados distintos para {label}")
+        timings = {}
+        for engine in ("scan", "vectorized"):
+            t0 = time.perf_counter()
+            for _ in range(args.repeat):
+                compose_diet(engine=engine, **kwargs)
+            timings[engine] = (time.perf_counter() - t0) / args.repeat * 1000
+        print(f"{label:<48}{timings['scan']:>10.2f}{timings['vectorized']:>12.3f}{timings['scan'] / max(timings['vectorized'], 1e-9):>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
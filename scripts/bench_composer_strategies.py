@@ -0,0 +1,64 @@
+"""Benchmark: compose_diet strategy="greedy" vs. strategy="milp".
+
+Uso:
+    python scripts/bench_composer_strategies.py [--path backend/data/food_catalog.json] [--budget 1.0]
+
+Recorre una grilla de kcal objetivo x objetivos y reporta tiempo de resolución y
+error relativo de kcal y macros (promedio proteínas/carbohidratos/grasas) de cada estrategia.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from backend.food.composer import compose_diet, diet_error  # noqa: E402
+
+DEFAULT_PATH = os.path.join("backend", "data", "food_catalog.json")
+KCAL_GRID = (1500, 1800, 2200, 2600, 3000)
+OBJECTIVES = (None, "hipertrofia", "bajar_grasa")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara greedy vs MILP en el composer.")
+    parser.add_argument("--path", default=DEFAULT_PATH)
+    parser.add_argument("--budget", type=float, default=1.0, help="Presupuesto de tiempo del solver (s).")
+    parser.add_argument("--weight", type=float, default=75.0)
+    parser.add_argument("--meals", type=int, default=4)
+    args = parser.parse_args()
+
+    compose_diet(2000, n_meals=args.meals, catalog_path=args.path)  # warm-up: carga catálogo e índice
+
+    header = f"{'objetivo':<12}{'kcal':>6} | {'greedy ms':>9}{'kcal err':>9}{'macro err':>10} | {'milp ms':>8}{'kcal err':>9}{'macro err':>10}{'usado':>8}"
+    print(header)
+    print("-" * len(header))
+    totals = {"greedy": [0.0, 0.0], "milp": [0.0, 0.0]}
+    for objetivo in OBJECTIVES:
+        for kcal in KCAL_GRID:
+            kwargs = dict(n_meals=args.meals, catalog_path=args.path, objetivo=objetivo, weight_kg=args.weight)
+            row = {}
+            for strategy in ("greedy", "milp"):
+                t0 = time.perf_counter()
+                diet = compose_diet(kcal, strategy=strategy, time_budget_s=args.budget, **kwargs)
+                elapsed = (time.perf_counter() - t0) * 1000
+                err = diet_error(diet["meals"], kcal, args.weight)
+                row[strategy] = (elapsed, err, diet["summary"].get("strategy", strategy))
+                totals[strategy][0] += err["kcal"]
+                totals[strategy][1] += err["macro_mean"]
+            g, m = row["greedy"], row["milp"]
+            print(
+                f"{str(objetivo or 'equilibrada'):<12}{kcal:>6} | "
+                f"{g[0]:>9.1f}{g[1]['kcal']:>9.1%}{g[1]['macro_mean']:>10.1%} | "
+                f"{m[0]:>8.1f}{m[1]['kcal']:>9.1%}{m[1]['macro_mean']:>10.1%}{m[2]:>8}"
+            )
+    n = len(OBJECTIVES) * len(KCAL_GRID)
+    print("-" * len(header))
+    print(
+        f"{'promedio':<18} | {'':>9}{totals['greedy'][0] / n:>9.1%}{totals['greedy'][1] / n:>10.1%} | "
+        f"{'':>8}{totals['milp'][0] / n:>9.1%}{totals['milp'][1] / n:>10.1%}"
+    )
+
+
+if __name__ == "__main__":
+    main()
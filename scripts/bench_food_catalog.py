@@ -0,0 +1,107 @@
+"""Benchmark: búsquedas del FoodCatalog indexado vs. el recorrido lineal original.
+
+Uso:
+    python scripts/bench_food_catalog.py [--path backend/data/food_catalog.json] [--repeat 200]
+
+Las funciones `legacy_*` reproducen los métodos previos (recorren todos los items y
+pasan a minúsculas alérgenos/categorías en cada llamada); se verifica que ambos
+caminos devuelvan exactamente los mismos items antes de medir.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from backend.food.catalog import FoodCatalog  # noqa: E402
+
+DEFAULT_PATH = os.path.join("backend", "data", "food_catalog.json")
+
+
+def legacy_filter_allergens(items, allergens):
+    if not allergens:
+        return items
+    normalized = [a.lower() for a in allergens]
+    out = []
+    for it in items:
+        item_all = [a.lower() for a in it.get("allergens", [])]
+        if any(a in item_all for a in normalized):
+            continue
+        out.append(it)
+    return out
+
+
+def legacy_by_category(items, category_tag):
+    out = []
+    for it in items:
+        cats = it.get("categories", []) or []
+        if any(category_tag.lower() in c.lower() for c in cats):
+            out.append(it)
+    return out
+
+
+def legacy_find_by_kcal_approx(items, target_kcal, tolerance_pct=30.0, per_serving=False):
+    tol = tolerance_pct / 100.0
+    out = []
+    for it in items:
+        ek = it.get("energy_kcal_100g")
+        if ek is None:
+            continue
+        kcal_value = ek
+        if per_serving:
+            serving = it.get("serving_size_g")
+            if not serving:
+                continue
+            kcal_value = ek * (serving / 100.0)
+        if target_kcal * (1 - tol) <= kcal_value <= target_kcal * (1 + tol):
+            out.append(it)
+    return out
+
+
+def _timeit(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1e6  # us por llamada
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del FoodCatalog indexado.")
+    parser.add_argument("--path", default=DEFAULT_PATH)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    cat = FoodCatalog(args.path)
+    load_ms = (time.perf_counter() - start) * 1000
+    items = cat.all()
+    print(f"Catalogo: {len(items)} items ({args.path}); carga + indices: {load_ms:.1f} ms")
+
+    allergens = ["en:gluten", "en:milk", "en:nuts"]
+    cases = [
+        ("filter_allergens(gluten,milk,nuts)",
+         lambda: legacy_filter_allergens(items, allergens),
+         lambda: cat.filter_allergens(allergens)),
+        ("by_category('dairies')",
+         lambda: legacy_by_category(items, "dairies"),
+         lambda: cat.by_category("dairies")),
+        ("find_by_kcal_approx(130, 10%)",
+         lambda: legacy_find_by_kcal_approx(items, 130, 10),
+         lambda: cat.find_by_kcal_approx(130, 10)),
+        ("find_by_kcal_approx(250, 30%, serving)",
+         lambda: legacy_find_by_kcal_approx(items, 250, 30, per_serving=True),
+         lambda: cat.find_by_kcal_approx(250, 30, per_serving=True)),
+    ]
+
+    print(f"{'consulta':<42}{'lineal us':>12}{'indexado us':>14}{'speedup':>10}")
+    for label, legacy, indexed in cases:
+        if legacy() != indexed():
+            raise SystemExit(f"Resultados distintos para {label}")
+        t_legacy = _timeit(legacy, args.repeat)
+        t_indexed = _timeit(indexed, args.repeat)
+        print(f"{label:<42}{t_legacy:>12.1f}{t_indexed:>14.1f}{t_legacy / max(t_indexed, 1e-9):>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
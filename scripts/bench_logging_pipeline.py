@@ -0,0 +1,135 @@
+"""Benchmark: costo de logging y metricas por request, sincrono vs `LogPipeline`.
+
+Uso:
+    python scripts/bench_logging_pipeline.py [--requests 20000] [--threads 4] [--events 6] [--work-ms 1.0]
+        [--dir /tmp]
+
+Cada "request" emite lo que emite un `/chat/send` tipico: una linea en el logger
+de la app y `--events` eventos de `MetricsCollector` (mitad contadores, mitad
+latencias) y entre request y request espera `--work-ms` (I/O a Rasa/DB, suelta
+el GIL). Se mide solo el tiempo que pasa el hilo del request emitiendo:
+
+- sync: `RotatingFileHandler`/`FileHandler` con flush por registro (antes);
+- pipeline: cola acotada + hilo escritor con flush por lote (ahora).
+
+Reporta media y p99 por request y, para el pipeline, lotes escritos y descartes.
+Con `--work-ms 0` los hilos emiten sin pausa y el escritor no da abasto: sirve
+para ver el descarte por cola llena en vez de requests frenados.
+"""
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+from logging.handlers import RotatingFileHandler
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from backend.log_pipeline import BatchedFileHandler, BatchedRotatingFileHandler, LogPipeline  # noqa: E402
+from backend.metrics import MetricsCollector, _JsonMessageFormatter  # noqa: E402
+
+
+def _loggers(mode, directory):
+    app_handler_cls = BatchedRotatingFileHandler if mode == "pipeline" else RotatingFileHandler
+    app_handler = app_handler_cls(
+        os.path.join(directory, f"backend-{mode}.log"), maxBytes=5 * 1024 * 1024, backupCount=5, encoding="utf-8"
+    )
+    app_handler.setFormatter(logging.Formatter("[%(asctime)s] %(levelname)s in %(module)s: %(message)s"))
+    metrics_handler = (BatchedFileHandler if mode == "pipeline" else logging.FileHandler)(
+        os.path.join(directory, f"metrics-{mode}.log"), encoding="utf-8"
+    )
+    metrics_handler.setFormatter(_JsonMessageFormatter("%(message)s"))
+
+    pipelines = []
+    loggers = []
+    for name, handler in (("app", app_handler), ("metrics", metrics_handler)):
+        logger = logging.getLogger(f"bench.{mode}.{name}")
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+        if mode == "pipeline":
+            pipeline = LogPipeline(f"bench-{name}", [handler]).start()
+            pipelines.append(pipeline)
+            logger.handlers = [pipeline.handler]
+        else:
+            logger.handlers = [handler]
+        loggers.append(logger)
+    return loggers[0], loggers[1], pipelines, [app_handler, metrics_handler]
+
+
+def _run(mode, args):
+    app_logger, metrics_logger, pipelines, handlers = _loggers(mode, args.dir)
+    collector = MetricsCollector()
+    collector.set_logger(metrics_logger, pipeline=pipelines[1] if pipelines else None)
+    per_thread = args.requests // args.threads
+    samples = []
+    lock = threading.Lock()
+
+    def _worker(worker):
+        local = []
+        for i in range(per_thread):
+            started = time.perf_counter()
+            app_logger.info("chat_send sender=%s status=%s", f"u{worker}", "ok")
+            for n in range(args.events):
+                if n % 2:
+                    collector.observe_latency("chat_send_latency_ms", 40.0 + i % 100, tags={"status": "ok"})
+                else:
+                    collector.inc_counter("chat_send_total", tags={"status": "ok", "code": 200})
+            local.append(time.perf_counter() - started)
+            if args.work_ms:
+                time.sleep(args.work_ms / 1000.0)
+        with lock:
+            samples.extend(local)
+
+    threads = [threading.Thread(target=_worker, args=(w,)) for w in range(args.threads)]
+    wall = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - wall
+    drain = time.perf_counter()
+    stats = {}
+    for pipeline in pipelines:
+        pipeline.stop(timeout=60)
+        stats[pipeline.name] = pipeline.stats()
+    drain = time.perf_counter() - drain
+    for handler in handlers:
+        handler.close()
+
+    samples.sort()
+    mean_us = sum(samples) / len(samples) * 1e6
+    p99_us = samples[int(len(samples) * 0.99) - 1] * 1e6
+    print(f"{mode:>8}: media {mean_us:8.1f} us/req  p99 {p99_us:8.1f} us/req  total {wall:6.2f} s", end="")
+    if stats:
+        batches = sum(s["batches"] for s in stats.values())
+        written = sum(s["written"] for s in stats.values())
+        dropped = sum(s["dropped"] for s in stats.values())
+        print(f"  (escritos {written}, lotes {batches}, descartados {dropped}, vaciado {drain:.2f} s)")
+    else:
+        print()
+    return mean_us
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--events", type=int, default=6, help="eventos de metricas por request")
+    parser.add_argument("--work-ms", type=float, default=1.0, help="espera simulada por request (I/O)")
+    parser.add_argument("--dir", default=None, help="directorio de los logs (por defecto uno temporal)")
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        args.dir = args.dir or tmp
+        print(
+            f"{args.requests} requests, {args.threads} hilos, {args.events} eventos de metricas por request, "
+            f"{args.work_ms} ms de I/O por request"
+        )
+        sync_us = _run("sync", args)
+        async_us = _run("pipeline", args)
+    print(f"ahorro por request: {sync_us - async_us:.1f} us ({sync_us / max(async_us, 1e-9):.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
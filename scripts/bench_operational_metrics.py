@@ -0,0 +1,105 @@
+"""Benchmark: costo de `OperationalMetrics.record` y `.snapshot` a 10k req/s.
+
+Uso:
+    python scripts/bench_operational_metrics.py [--rps 10000] [--seconds 60] [--snapshots 20]
+
+Simula `--seconds` de trafico a `--rps` con un reloj falso (latencias lognormales,
+mezcla de rutas y `interaction_result`) y mide:
+
+- record: costo medio por evento y fraccion de un core que implica a `--rps`;
+- snapshot: costo de un GET /metrics con la ventana llena.
+
+Compara con la implementacion anterior (deque de dicts + `sorted` completo en cada
+snapshot) con la ventana por defecto (500 eventos) y con una ventana que cubra
+el mismo minuto de trafico que la ventana "1m" de los sketches.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from collections import deque
+from math import ceil
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from backend.app import OperationalMetrics  # noqa: E402
+
+
+class LegacyOperationalMetrics:
+    """Copia de la version anterior de backend/app.py (referencia)."""
+
+    def __init__(self, window_size):
+        self._events = deque(maxlen=max(1, int(window_size or 500)))
+
+    def record(self, *, status_code, latency_ms, interaction_result, route=None):
+        self._events.append(
+            {
+                "status_code": int(status_code),
+                "latency_ms": max(0.0, float(latency_ms)),
+                "interaction_result": interaction_result or "",
+            }
+        )
+
+    def snapshot(self):
+        events = list(self._events)
+        total = len(events)
+        count_2xx = sum(1 for event in events if 200 <= event["status_code"] < 300)
+        fallback = sum(1 for event in events if event["interaction_result"] == "fallback")
+        p95 = 0.0
+        if events:
+            latencies = sorted(event["latency_ms"] for event in events)
+            p95 = latencies[max(0, ceil(0.95 * len(latencies)) - 1)]
+        return {"window_size": total, "count_2xx": count_2xx, "fallback_rate": fallback / max(1, total), "p95": p95}
+
+
+def _traffic(n, seed=11):
+    rng = random.Random(seed)
+    routes = ("/chat/send", "/chat/send", "/chat/send", "/chat/stream")
+    results = ("success", "success", "success", "fallback", "handoff", None)
+    statuses = (200,) * 18 + (400, 503)
+    return [
+        (rng.choice(statuses), rng.lognormvariate(5.0, 0.8), rng.choice(results), rng.choice(routes))
+        for _ in range(n)
+    ]
+
+
+def _run(label, metrics, events, clock, step, snapshots):
+    started = time.perf_counter()
+    for status, latency, result, route in events:
+        clock[0] += step
+        metrics.record(status_code=status, latency_ms=latency, interaction_result=result, route=route)
+    record_s = time.perf_counter() - started
+    per_event_us = record_s / len(events) * 1e6
+
+    snap_ms = []
+    for _ in range(snapshots):
+        t0 = time.perf_counter()
+        metrics.snapshot()
+        snap_ms.append((time.perf_counter() - t0) * 1000.0)
+    snap_ms.sort()
+    print(f"{label:<34}{per_event_us:>12.2f}{per_event_us / step / 1e6 * 100:>11.1f}%{snap_ms[len(snap_ms) // 2]:>14.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Costo de record/snapshot de OperationalMetrics.")
+    parser.add_argument("--rps", type=int, default=10_000)
+    parser.add_argument("--seconds", type=int, default=60)
+    parser.add_argument("--snapshots", type=int, default=20)
+    args = parser.parse_args()
+
+    events = _traffic(args.rps * args.seconds)
+    step = 1.0 / args.rps
+    print(f"{len(events)} eventos ({args.seconds} s a {args.rps} req/s)")
+    print(f"{'implementacion':<34}{'record us':>12}{'core @rps':>12}{'snapshot ms':>14}")
+    for label, factory in (
+        ("anterior, ventana 500", lambda clock: LegacyOperationalMetrics(500)),
+        (f"anterior, ventana {args.rps * 60}", lambda clock: LegacyOperationalMetrics(args.rps * 60)),
+        ("sketch (500 + 1m/5m/1h)", lambda clock: OperationalMetrics(500, clock=lambda: clock[0])),
+    ):
+        clock = [0.0]
+        _run(label, factory(clock), events, clock, step, args.snapshots)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""Benchmark: `pick_exercises` sobre el índice precompilado vs. la reconstrucción por llamada.
+
+Uso:
+    python scripts/bench_pick_exercises.py [--repeat 5000] [--weeks 4]
+
+Las funciones `legacy_*` reproducen la versión previa (arman el pool desde `CATALOGO`
+en cada llamada y barajan listas nuevas). Antes de medir se verifica que los pools
+por prioridad coincidan para todos los grupos/equipos.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from backend.planner.common import EQUIPOS_MIXTO_PREFERENCIA, equip_key_norm  # noqa: E402
+from backend.planner.workouts import (  # noqa: E402
+    CATALOGO,
+    _build_bank_por_prioridad,
+    generate_workout_plan,
+    generate_workout_plan_batch,
+    pick_exercises,
+)
+
+
+def legacy_build_bank(grupo, equip):
+    g = (grupo or "").strip().lower()
+    e = equip_key_norm(equip)
+    pool, seen = [], set()
+
+    def _add(items):
+        for n, u, _src in items:
+            if n not in seen:
+                seen.add(n)
+                pool.append((n, u))
+
+    if e == "mixto":
+        if g in CATALOGO:
+            disponibles = list(CATALOGO[g].keys())
+            orden = [eq for eq in EQUIPOS_MIXTO_PREFERENCIA if eq in disponibles]
+            orden += [eq for eq in disponibles if eq not in orden]
+            for eq in orden:
+                _add(CATALOGO[g][eq])
+        if "fullbody" in CATALOGO:
+            for eq in EQUIPOS_MIXTO_PREFERENCIA:
+                if eq in CATALOGO["fullbody"]:
+                    _add(CATALOGO["fullbody"][eq])
+    else:
+        if g in CATALOGO and e in CATALOGO[g]:
+            _add(CATALOGO[g][e])
+        if g in CATALOGO:
+            for e2, lista in CATALOGO[g].items():
+                if e2 != e:
+                    _add(lista)
+        if "fullbody" in CATALOGO and "máquinas" in CATALOGO["fullbody"]:
+            _add(CATALOGO["fullbody"]["máquinas"])
+        elif "fullbody" in CATALOGO and "mancuernas" in CATALOGO["fullbody"]:
+            _add(CATALOGO["fullbody"]["mancuernas"])
+    return pool
+
+
+def legacy_pick_exercises(grupo, equip, n, exclude=None):
+    exclude_set = {x.lower().strip() for x in (exclude or [])}
+    pool = [(name, url) for name, url in legacy_build_bank(grupo, equip) if name.lower() not in exclude_set]
+    if not pool:
+        return []
+    random.shuffle(pool)
+    return pool[:max(0, n)]
+
+
+def _timeit(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1e6  # us por llamada
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de pick_exercises con índice precompilado.")
+    parser.add_argument("--repeat", type=int, default=5000)
+    parser.add_argument("--weeks", type=int, default=4)
+    args = parser.parse_args()
+
+    for grupo in list(CATALOGO) + ["desconocido"]:
+        for equip in ["barra", "mancuernas", "máquinas", "peso corporal", "mixto", "trx"]:
+            if legacy_build_bank(grupo, equip) != _build_bank_por_prioridad(grupo, equip):
+                raise SystemExit(f"Pools distintos para {grupo}/{equip}")
+
+    exclude = ["Press banca con barra", "Sentadilla trasera", "Remo con barra"]
+    cases = [
+        ("pecho/barra n=6", lambda: legacy_pick_exercises("pecho", "barra", 6),
+         lambda: pick_exercises("pecho", "barra", 6)),
+        ("piernas/mancuernas n=8 + exclude", lambda: legacy_pick_exercises("piernas", "mancuernas", 8, exclude),
+         lambda: pick_exercises("piernas", "mancuernas", 8, exclude)),
+        ("desconocido/barra n=5", lambda: legacy_pick_exercises("desconocido", "barra", 5),
+         lambda: pick_exercises("desconocido", "barra", 5)),
+    ]
+    print(f"{'consulta':<36}{'legacy us':>12}{'indexado us':>14}{'speedup':>10}")
+    for label, legacy, indexed in cases:
+        t_legacy = _timeit(legacy, args.repeat)
+        t_indexed = _timeit(indexed, args.repeat)
+        print(f"{label:<36}{t_legacy:>12.2f}{t_indexed:>14.2f}{t_legacy / max(t_indexed, 1e-9):>9.1f}x")
+
+    split = ["pecho", "espalda", "piernas", "hombros"]
+    sessions = [{"musculo": m} for _ in range(args.weeks) for m in split]
+    common = dict(objetivo="hipertrofia", nivel="intermedio", equipamiento="mancuernas", ejercicios_num=6, tiempo_min=45)
+    repeat = max(1, args.repeat // 100)
+    t_loop = _timeit(lambda: [generate_workout_plan(**common, **s) for s in sessions], repeat)
+    t_batch = _timeit(lambda: generate_workout_plan_batch(sessions, **common), repeat)
+    print(f"{len(sessions)} rutinas: bucle {t_loop / 1000:.2f} ms | batch con rotación {t_batch / 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -41,6 +41,7 @@ def main() -> int:
         print(
             f"[retencion] days={result['retention_days']} dry_run={result['dry_run']} "
             f"chat_contexts_deleted={result['chat_contexts_deleted']} "
+            f"chat_plans_deleted={result['chat_plans_deleted']} "
             f"profiles_anonymized={result['profiles_anonymized']}"
         )
     return 0
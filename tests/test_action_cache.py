@@ -0,0 +1,128 @@
+"""
+Tests del cache de lecturas del action server (actions/cache.py).
+"""
+import threading
+import time
+
+from actions.cache import TTLCache
+
+
+class _Loader:
+    def __init__(self, value="v", delay_s=0.0):
+        self.value = value
+        self.delay_s = delay_s
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        time.sleep(self.delay_s)
+        return self.value
+
+
+def test_hits_within_ttl_and_reload_after_expiry():
+    cache = TTLCache("t", ttl_s=0.05)
+    loader = _Loader([{"id": 1}])
+
+    assert cache.get_or_load(("classes", ""), loader) == [{"id": 1}]
+    assert cache.get_or_load(("classes", ""), loader) == [{"id": 1}]
+    assert loader.calls == 1
+
+    time.sleep(0.06)
+    cache.get_or_load(("classes", ""), loader)
+    assert loader.calls == 2
+    assert cache.stats()["hit"] == 1 and cache.stats()["miss"] == 2
+
+
+def test_lru_bound_evicts_least_recently_used():
+    cache = TTLCache("t", maxsize=2, ttl_s=60)
+    for key in ("a", "b"):
+        cache.get_or_load(key, lambda key=key: key)
+    cache.get_or_load("a", lambda: "nuevo")  # "a" pasa a ser el mas reciente
+    cache.get_or_load("c", lambda: "c")
+
+    assert cache.get_or_load("a", lambda: "otro") == "a"
+    assert cache.get_or_load("b", lambda: "recargado") == "recargado"
+    assert cache.stats()["evicted"] >= 1
+
+
+def test_concurrent_identical_fetches_share_one_request():
+    cache = TTLCache("t", ttl_s=60)
+    loader = _Loader("clases", delay_s=0.1)
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(cache.get_or_load(("classes", ""), loader)))
+        for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert loader.calls == 1
+    assert results == ["clases"] * 8
+    assert cache.stats()["shared"] == 7
+
+
+def test_failures_are_not_cached_and_errors_reach_waiters():
+    cache = TTLCache("t", ttl_s=60)
+    assert cache.get_or_load("k", lambda: None) is None
+    assert cache.get_or_load("k", lambda: "ok") == "ok"
+
+    def _boom():
+        time.sleep(0.05)
+        raise RuntimeError("backend caido")
+
+    errors = []
+
+    def _call():
+        try:
+            cache.get_or_load("x", _boom)
+        except RuntimeError as exc:
+            errors.append(str(exc))
+
+    threads = [threading.Thread(target=_call) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == ["backend caido"] * 3
+
+
+def test_invalidate_by_prefix_and_inflight_load_is_not_stored():
+    cache = TTLCache("t", ttl_s=60)
+    cache.get_or_load(("sessions", 1, "2025-01-10"), lambda: ["10:00"])
+    cache.get_or_load(("sessions", 2, "2025-01-10"), lambda: ["11:00"])
+    cache.get_or_load(("classes", ""), lambda: ["yoga"])
+
+    assert cache.invalidate(("sessions",)) == 2
+    assert cache.get_or_load(("classes", ""), lambda: ["otra"]) == ["yoga"]
+
+    started = threading.Event()
+
+    def _slow():
+        started.set()
+        time.sleep(0.05)
+        return ["viejo"]
+
+    thread = threading.Thread(target=lambda: cache.get_or_load(("sessions", 1), _slow))
+    thread.start()
+    started.wait()
+    cache.invalidate(("sessions",))  # la reserva se creo mientras se leia
+    thread.join()
+    assert cache.get_or_load(("sessions", 1), lambda: ["nuevo"]) == ["nuevo"]
+
+
+def test_copy_values_protects_cached_entry():
+    cache = TTLCache("t", ttl_s=60, copy_values=True)
+    ctx = cache.get_or_load(("boot", "ana"), lambda: {"user_id": 1, "tags": []})
+    ctx["tags"].append("mutado")
+    assert cache.get_or_load(("boot", "ana"), lambda: None) == {"user_id": 1, "tags": []}
+
+
+def test_hit_rate_is_logged(caplog):
+    cache = TTLCache("clases", ttl_s=60, log_every=2)
+    with caplog.at_level("INFO", logger="actions.cache"):
+        for _ in range(4):
+            cache.get_or_load("k", lambda: "v")
+    records = [r for r in caplog.records if r.getMessage() == "action_cache"]
+    assert [r.hit_rate for r in records] == [0.5, 0.75]
@@ -0,0 +1,112 @@
+"""
+Tests del monitor de salud del backend del action server (actions/health.py).
+"""
+import threading
+import time
+
+from actions.health import BackendHealthMonitor
+
+
+class _Probe:
+    def __init__(self, ok=True, delay_s=0.0):
+        self.ok = ok
+        self.delay_s = delay_s
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        time.sleep(self.delay_s)
+        return self.ok
+
+
+def test_healthy_status_is_cached_within_ttl():
+    probe = _Probe()
+    monitor = BackendHealthMonitor(probe, ttl_s=60, interval_s=0)
+
+    assert monitor.status()[2] == "probe"
+    for _ in range(50):
+        ok, elapsed_ms, source = monitor.status()
+        assert ok and elapsed_ms == 0.0 and source == "cache"
+    assert probe.calls == 1
+
+
+def test_circuit_opens_and_offline_answers_instantly():
+    probe = _Probe(ok=False, delay_s=0.05)
+    monitor = BackendHealthMonitor(probe, ttl_s=0, interval_s=0, failure_threshold=3, reset_timeout_s=60)
+
+    for _ in range(3):
+        assert monitor.status()[0] is False
+    assert monitor.snapshot()["state"] == "open"
+    assert monitor.available() is False
+
+    started = time.perf_counter()
+    for _ in range(20):
+        assert monitor.status() == (False, 0.0, "circuit")
+    assert time.perf_counter() - started < 0.05
+    assert probe.calls == 3
+
+
+def test_half_open_probe_closes_or_reopens_the_circuit():
+    probe = _Probe(ok=False)
+    monitor = BackendHealthMonitor(probe, ttl_s=0, interval_s=0, failure_threshold=1, reset_timeout_s=0.05)
+    monitor.status()
+    assert monitor.snapshot()["state"] == "open"
+
+    time.sleep(0.06)
+    assert monitor.probe_once() is False  # half-open fallido: vuelve a abrir
+    assert monitor.snapshot()["state"] == "open"
+
+    probe.ok = True
+    time.sleep(0.06)
+    assert monitor.probe_once() is True
+    assert monitor.snapshot()["state"] == "closed"
+    assert monitor.status()[0] is True
+
+
+def test_passive_failures_open_circuit_and_background_probe_recovers():
+    probe = _Probe(ok=True)
+    monitor = BackendHealthMonitor(probe, ttl_s=1, interval_s=0.02, failure_threshold=2, reset_timeout_s=0.05)
+    try:
+        assert monitor.status()[0] is True
+        monitor.record_failure()
+        assert monitor.status()[0] is True  # un fallo suelto no marca offline
+        monitor.record_failure()
+        assert monitor.available() is False
+
+        deadline = time.monotonic() + 2
+        while not monitor.available() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert monitor.snapshot()["state"] == "closed"
+    finally:
+        monitor.stop()
+
+
+def test_concurrent_callers_do_not_queue_behind_a_slow_probe():
+    probe = _Probe(ok=True, delay_s=0.2)
+    monitor = BackendHealthMonitor(probe, ttl_s=60, interval_s=0)
+    results = []
+
+    first = threading.Thread(target=lambda: results.append(monitor.status()))
+    first.start()
+    time.sleep(0.02)
+    started = time.perf_counter()
+    results.append(monitor.status())
+    assert time.perf_counter() - started < 0.1
+    first.join()
+    assert probe.calls == 1
+
+
+def test_half_open_probe_takes_the_single_breaker_trial():
+    probe = _Probe(ok=False)
+    monitor = BackendHealthMonitor(probe, ttl_s=0, interval_s=0, failure_threshold=1, reset_timeout_s=0.05)
+    monitor.status()
+    time.sleep(0.06)
+
+    assert monitor.breaker.allow(trial=True) is True  # otra llamada toma la prueba
+    assert monitor.snapshot()["state"] == "half_open"
+    assert monitor.probe_once() is False
+    assert probe.calls == 1
+
+    probe.ok = True
+    monitor.record_success()
+    assert monitor.snapshot()["state"] == "closed"
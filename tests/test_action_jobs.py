@@ -0,0 +1,171 @@
+"""
+Tests de la cola durable de efectos secundarios del action server (actions/jobs.py).
+"""
+import threading
+import time
+
+import pytest
+
+from actions.jobs import DurableJobQueue, JobExecutor, PermanentJobError
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "jobs.sqlite3")
+
+
+def _executor(path, **kwargs):
+    kwargs.setdefault("backoff_s", 0.0)
+    return JobExecutor(DurableJobQueue(path), **kwargs)
+
+
+def test_context_updates_coalesce_per_sender(db_path):
+    executor = _executor(db_path)
+    calls = []
+    executor.register("context_update", lambda payload: calls.append(payload))
+
+    for idx in range(5):
+        executor.queue.enqueue("context_update", {"peso": 70 + idx, f"k{idx}": idx}, coalesce_key="ana")
+    executor.queue.enqueue("context_update", {"peso": 90}, coalesce_key="beto")
+    assert executor.queue.stats()["depth"] == 2
+
+    assert executor.run_pending() == 2
+    assert calls[0] == {"peso": 74, "k0": 0, "k1": 1, "k2": 2, "k3": 3, "k4": 4}
+    assert calls[1] == {"peso": 90}
+
+
+def test_nested_context_payloads_merge_on_enqueue_and_retry(db_path):
+    queue = DurableJobQueue(db_path)
+    queue.enqueue("context_update", {"sender_id": "ana", "payload": {"injuries": "rodilla"}}, coalesce_key="ana")
+    queue.enqueue("context_update", {"sender_id": "ana", "payload": {"allergies": "mani"}}, coalesce_key="ana")
+    (job,) = queue.lease()
+    assert job.payload == {"sender_id": "ana", "payload": {"injuries": "rodilla", "allergies": "mani"}}
+
+    # Llega otro update mientras el primero esta arrendado y luego este falla:
+    # el reintento se fusiona en el nuevo sin perder campos de ninguno.
+    queue.enqueue("context_update", {"sender_id": "ana", "payload": {"allergies": "nuez"}}, coalesce_key="ana")
+    queue.retry(job, "503", delay_s=0.0)
+    (merged,) = queue.lease()
+    assert merged.payload == {"sender_id": "ana", "payload": {"injuries": "rodilla", "allergies": "nuez"}}
+    assert queue.stats()["depth"] == 1
+
+
+def test_batch_kind_receives_one_call_per_batch(db_path):
+    executor = _executor(db_path, batch_size=3)
+    batches = []
+
+    def _persist(items):
+        batches.append([item["n"] for item in items])
+        return [None] * len(items)
+
+    executor.register("persist_plan", _persist, batch=True)
+    for n in range(7):
+        executor.queue.enqueue("persist_plan", {"n": n})
+
+    assert executor.run_pending() == 7
+    assert batches == [[0, 1, 2], [3, 4, 5], [6]]
+    assert executor.queue.stats()["depth"] == 0
+
+
+def test_failures_retry_with_backoff_then_bury(db_path):
+    executor = _executor(db_path, max_attempts=3)
+    attempts = []
+
+    def _flaky(payload):
+        attempts.append(payload)
+        raise RuntimeError("backend caido")
+
+    executor.register("email", _flaky)
+    executor.register("bad", lambda payload: (_ for _ in ()).throw(PermanentJobError("400")))
+    executor.queue.enqueue("email", {"user_id": 1})
+    executor.queue.enqueue("bad", {"user_id": 2})
+
+    for _ in range(3):
+        executor.run_pending()
+    assert len(attempts) == 3
+    assert executor.queue.stats() == {"depth": 0, "lag_s": 0.0, "dead": 2}
+
+
+def test_partial_batch_failure_only_retries_failed_items(db_path):
+    executor = _executor(db_path)
+    seen = []
+
+    def _persist(items):
+        seen.extend(item["n"] for item in items)
+        return [None if item["n"] != 1 or seen.count(1) > 1 else RuntimeError("503") for item in items]
+
+    executor.register("persist_plan", _persist, batch=True)
+    for n in range(3):
+        executor.queue.enqueue("persist_plan", {"n": n})
+
+    executor.run_pending()
+    executor.run_pending()
+    assert seen == [0, 1, 2, 1]
+    assert executor.queue.stats()["depth"] == 0
+
+
+def test_missing_batch_results_are_retried_not_completed(db_path):
+    executor = _executor(db_path)
+    seen = []
+
+    def _persist(items):
+        seen.extend(item["n"] for item in items)
+        return [None] if len(seen) <= 3 else [None] * len(items)
+
+    executor.register("persist_plan", _persist, batch=True)
+    for n in range(3):
+        executor.queue.enqueue("persist_plan", {"n": n})
+
+    executor.run_pending()
+    assert seen == [0, 1, 2, 1, 2]
+    assert executor.queue.stats()["depth"] == 0
+
+
+def test_pending_jobs_survive_restart(db_path):
+    first = DurableJobQueue(db_path)
+    first.enqueue("context_update", {"peso": 80}, coalesce_key="ana")
+    leased = first.lease(lease_s=0.05)  # el proceso "muere" con el trabajo arrendado
+    assert len(leased) == 1
+    first.close()
+
+    executor = _executor(db_path)
+    calls = []
+    executor.register("context_update", calls.append)
+    time.sleep(0.1)
+    assert executor.run_pending() == 1
+    assert calls == [{"peso": 80}]
+
+
+def test_same_sender_never_runs_concurrently_or_out_of_order(db_path):
+    executor = _executor(db_path, workers=4, poll_s=0.01)
+    order = []
+    inflight = set()
+    overlap = []
+    lock = threading.Lock()
+
+    def _deliver(payload):
+        with lock:
+            if payload["sender"] in inflight:
+                overlap.append(payload["sender"])
+            inflight.add(payload["sender"])
+        time.sleep(0.02)
+        with lock:
+            inflight.discard(payload["sender"])
+            order.append((payload["sender"], payload["seq"]))
+
+    executor.register("context_update", _deliver)
+    try:
+        for seq in range(20):
+            executor.submit("context_update", {"sender": "ana", "seq": seq}, coalesce_key="ana")
+            executor.submit("context_update", {"sender": "beto", "seq": seq}, coalesce_key="beto")
+            time.sleep(0.005)
+        deadline = time.monotonic() + 5
+        while executor.queue.stats()["depth"] and time.monotonic() < deadline:
+            time.sleep(0.02)
+    finally:
+        executor.stop()
+
+    assert not overlap
+    for sender in ("ana", "beto"):
+        seqs = [seq for who, seq in order if who == sender]
+        assert seqs == sorted(seqs) and seqs[-1] == 19
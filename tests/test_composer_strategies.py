@@ -0,0 +1,55 @@
+import os
+
+import pytest
+
+from backend.food import composer
+from backend.food.composer import compose_diet, diet_error
+
+CATALOG = os.path.join("backend", "data", "food_catalog.json")
+
+
+def _item_tags(item):
+    fallback_key = next((k for k, fb in composer.FALLBACK_ITEMS.items() if fb["id"] == item["id"]), None)
+    tags = composer._tags_for_text(str(item.get("name") or "").lower())
+    if fallback_key in composer.TAG_KEYWORDS:
+        tags.add(fallback_key)
+    if fallback_key is None:
+        catalog_item = next(it for it in composer.get_catalog(CATALOG).all() if it.get("id") == item["id"])
+        tags = composer._tags_for_text(composer._normalized_text(catalog_item, {}))
+    return tags
+
+
+def test_unknown_strategy_rejected():
+    with pytest.raises(ValueError):
+        compose_diet(2000, strategy="annealing")
+
+
+@pytest.mark.parametrize("objetivo,target_kcal", [(None, 2200), ("hipertrofia", 3000), ("bajar_grasa", 1700)])
+def test_milp_not_worse_than_greedy(objetivo, target_kcal):
+    pytest.importorskip("scipy")
+    kwargs = dict(n_meals=4, catalog_path=CATALOG, objetivo=objetivo, weight_kg=75)
+    greedy = compose_diet(target_kcal, **kwargs)
+    solved = compose_diet(target_kcal, strategy="milp", time_budget_s=2.0, **kwargs)
+    assert solved["summary"]["strategy"] in {"milp", "greedy"}
+
+    err_greedy = diet_error(greedy["meals"], target_kcal, 75)
+    err_solved = diet_error(solved["meals"], target_kcal, 75)
+    assert err_solved["kcal"] + err_solved["macro_mean"] <= err_greedy["kcal"] + err_greedy["macro_mean"] + 1e-9
+
+
+def test_milp_respects_meal_constraints():
+    pytest.importorskip("scipy")
+    diet = compose_diet(2400, n_meals=4, catalog_path=CATALOG, weight_kg=80, strategy="milp", time_budget_s=2.0)
+    if diet["summary"]["strategy"] != "milp":
+        pytest.skip("el solver no mejoró al greedy en este entorno")
+    for template, meal in zip(composer.MEAL_TEMPLATES, diet["meals"]):
+        assert 1 <= len(meal["items"]) <= 5
+        counts = {}
+        for item in meal["items"]:
+            assert 30 <= item["qty_g"] <= 450
+            for tag in _item_tags(item):
+                counts[tag] = counts.get(tag, 0) + 1
+        for tag in template["required_tags"]:
+            assert counts.get(tag, 0) >= 1, (meal["name"], tag)
+        for tag, limit in template["meal_tag_limits"].items():
+            assert counts.get(tag, 0) <= limit, (meal["name"], tag)
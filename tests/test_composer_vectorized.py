@@ -0,0 +1,51 @@
+import os
+
+import pytest
+
+from backend.food.composer import compose_diet
+
+CATALOGS = [
+    os.path.join("backend", "data", "food_catalog.json"),
+    os.path.join("backend", "data", "food_catalog_curated.json"),
+]
+
+
+def _strip_ids(diet):
+    diet = dict(diet)
+    diet.pop("diet_id", None)
+    return diet
+
+
+@pytest.mark.parametrize("catalog_path", CATALOGS)
+@pytest.mark.parametrize("objetivo", [None, "hipertrofia", "bajar_grasa", "equilibrada"])
+@pytest.mark.parametrize("target_kcal,n_meals", [(1500, 3), (2200, 4), (3000, 5), (1800, 2)])
+def test_vectorized_matches_scan(catalog_path, objetivo, target_kcal, n_meals):
+    kwargs = dict(n_meals=n_meals, catalog_path=catalog_path, objetivo=objetivo, weight_kg=72)
+    scan = compose_diet(target_kcal, engine="scan", **kwargs)
+    fast = compose_diet(target_kcal, engine="vectorized", **kwargs)
+    assert _strip_ids(fast) == _strip_ids(scan)
+
+
+@pytest.mark.parametrize("exclude", [["en:gluten"], ["en:milk", "en:soybeans", "en:eggs"], ["nueces"]])
+def test_vectorized_matches_scan_with_allergens(exclude):
+    kwargs = dict(n_meals=4, catalog_path=CATALOGS[0], exclude_allergens=exclude, objetivo="hipertrofia")
+    assert _strip_ids(compose_diet(2500, engine="vectorized", **kwargs)) == _strip_ids(compose_diet(2500, engine="scan", **kwargs))
+
+
+def test_unknown_engine_rejected():
+    with pytest.raises(ValueError):
+        compose_diet(2000, engine="gpu")
+
+
+@pytest.mark.parametrize("group", ["gain", "loss", "balanced"])
+@pytest.mark.parametrize("n_meals", [2, 4, 6])
+def test_greedy_meals_identical_before_fallbacks(group, n_meals):
+    # Compara las comidas antes de fallbacks/rebalanceo, que podrían ocultar diferencias.
+    from backend.food.catalog import get_catalog
+    from backend.food.composer import _greedy_meals_scan, _greedy_meals_vectorized, _objective_sort_key
+
+    catalog = get_catalog(CATALOGS[0])
+    items = [it for it in catalog.all() if it.get("energy_kcal_100g")]
+    items.sort(key=_objective_sort_key(group), reverse=True)
+    meal_target = 2400 / n_meals
+    assert _greedy_meals_vectorized(catalog, None, n_meals, meal_target, group) == _greedy_meals_scan(items, n_meals, meal_target, group)
@@ -24,3 +24,65 @@ def test_find_by_kcal_approx():
     # look for a ~130 kcal item per 100g -> should find arroz (130)
     results = c.find_by_kcal_approx(130, tolerance_pct=10, per_serving=False)
     assert any(r['id'] == '0002' for r in results)
+
+
+def _full_catalog():
+    return FoodCatalog(path=os.path.join(os.path.dirname(__file__), "..", "backend", "data", "food_catalog.json"))
+
+
+def test_indexes_match_linear_scan():
+    c = _full_catalog()
+    items = c.all()
+    allergens = ["en:gluten", "EN:Milk"]
+    expected = [
+        it for it in items
+        if not any(a.lower() in [x.lower() for x in it.get("allergens", [])] for a in allergens)
+    ]
+    assert c.filter_allergens(allergens) == expected
+
+    expected_cat = [it for it in items if any("dair" in cat.lower() for cat in it.get("categories", []) or [])]
+    assert c.by_category("Dair") == expected_cat
+
+    expected_kcal = [it for it in items if it.get("energy_kcal_100g") is not None and 117 <= it["energy_kcal_100g"] <= 143]
+    assert c.find_by_kcal_approx(130, tolerance_pct=10) == expected_kcal
+
+
+def test_nutrient_columns_aligned():
+    c = _full_catalog()
+    kcal = c.column("kcal")
+    assert len(kcal) == len(c)
+    for pos in (0, len(c) // 2, len(c) - 1):
+        assert kcal[pos] == c.all()[pos]["energy_kcal_100g"]
+    with pytest.raises(KeyError):
+        c.column("sodium")
+
+
+def test_get_catalog_reloads_when_file_changes(tmp_path):
+    path = tmp_path / "catalog.json"
+    path.write_text('[{"id": "a", "energy_kcal_100g": 100}]', encoding="utf-8")
+    first = get_catalog(path=str(path))
+    assert get_catalog(path=str(path)) is first
+
+    path.write_text('[{"id": "a", "energy_kcal_100g": 100}, {"id": "b", "energy_kcal_100g": 50}]', encoding="utf-8")
+    os.utime(path, ns=(first.signature[0] + 10**9, first.signature[0] + 10**9))
+    reloaded = get_catalog(path=str(path))
+    assert reloaded is not first
+    assert [it["id"] for it in reloaded.all()] == ["a", "b"]
+
+
+def test_query_memos_are_bounded_and_nan_matches_nothing(monkeypatch):
+    from backend.food import catalog as catalog_mod
+
+    monkeypatch.setattr(catalog_mod, "_MEMO_MAX_ENTRIES", 4)
+    c = _full_catalog()
+    for i in range(10):
+        c.category_positions(f"tag-{i}")
+        c.excluded_positions([f"en:alergeno-{i}"])
+    assert len(c._category_cache) == 4
+    assert len(c._excluded_cache) == 4
+    assert "tag-9" in c._category_cache and "tag-0" not in c._category_cache
+
+    nan, inf = float("nan"), float("inf")
+    assert c.kcal_range_positions(nan, nan) == []
+    assert c.kcal_range_positions(0, inf) == []
+    assert c.find_by_kcal_approx(nan) == []
@@ -0,0 +1,130 @@
+import pytest
+
+from backend.metrics import metrics
+from backend.planner import cache as plan_cache
+from backend.planner.cache import PlanCache, PlanCacheConfig, cached_diet_plan, cached_workout_plan
+
+WORKOUT = dict(objetivo="fuerza", nivel="intermedio", musculo="pecho", ejercicios_num=5, tiempo_min=40)
+
+
+def _counter(name, **tags):
+    wanted = {k: str(v) for k, v in tags.items()}
+    return sum(
+        c["value"] for c in metrics.snapshot()["counters"]
+        if c["name"] == name and all(c["tags"].get(k) == v for k, v in wanted.items())
+    )
+
+
+def test_config_from_env():
+    cfg = PlanCacheConfig.from_env({"PLAN_CACHE_BACKEND": "SQLite", "PLAN_CACHE_TTL_S": "30", "PLAN_CACHE_VARIANTS": "0"})
+    assert cfg.backend == "sqlite"
+    assert cfg.ttl_s == 30.0
+    assert cfg.variants == 1
+    assert PlanCacheConfig.from_env({"PLAN_CACHE_BACKEND": "redis"}).backend == "memory"
+
+
+def test_equivalent_requests_share_entry():
+    cache = PlanCache()
+    first = cached_diet_plan(objetivo="Equilibrada", nivel="intermedio", alergias="Maní y leche",
+                             dislikes=None, condiciones="Ninguna", cache=cache)
+    hits = _counter("plan_cache.hit", kind="diet")
+    second = cached_diet_plan(objetivo="equilibrada ", nivel=" Intermedio", alergias="leche, maní, leche",
+                              dislikes="", condiciones=None, cache=cache)
+    assert second == first
+    assert len(cache) == 1
+    assert _counter("plan_cache.hit", kind="diet") == hits + 1
+
+
+def test_equipment_synonyms_share_entry():
+    cache = PlanCache(PlanCacheConfig(variants=1))
+    cached_workout_plan(equipamiento="mancuerna", cache=cache, **WORKOUT)
+    cached_workout_plan(equipamiento="Kettlebell", cache=cache, **WORKOUT)
+    assert len(cache) == 1
+
+
+def test_generator_receives_normalized_arguments():
+    cache = PlanCache(PlanCacheConfig(variants=1))
+    plan = cached_workout_plan(equipamiento="peso corporal", condiciones="Hipertensión", cache=cache, **WORKOUT)
+    assert "Equipo: peso corporal" in plan["text"]
+    assert "peso_corporal" not in plan["text"]
+
+    first = cached_workout_plan(equipamiento="Kettlebell", alergias="nueces, maní", cache=cache, **WORKOUT)
+    second = cached_workout_plan(equipamiento="mancuernas", alergias="maní y nueces", cache=cache, **WORKOUT)
+    assert second["text"] == first["text"]
+    assert "Equipo: mancuernas" in first["text"]
+    assert "Alergias registradas: maní, nueces" in first["text"]
+
+
+def test_hits_are_independent_copies():
+    cache = PlanCache(PlanCacheConfig(variants=1))
+    first = cached_workout_plan(equipamiento="barra", cache=cache, **WORKOUT)
+    first["routine_summary"]["exercises"].clear()
+    second = cached_workout_plan(equipamiento="barra", cache=cache, **WORKOUT)
+    assert second["routine_summary"]["exercises"]
+
+
+def test_variants_are_cached_separately():
+    cache = PlanCache(PlanCacheConfig(variants=3))
+    plans = {v: cached_workout_plan(equipamiento="mixto", variant=v, cache=cache, **WORKOUT) for v in range(3)}
+    assert len(cache) == 3
+    for v, plan in plans.items():
+        again = cached_workout_plan(equipamiento="mixto", variant=v, cache=cache, **WORKOUT)
+        assert again["routine_summary"]["exercises"] == plan["routine_summary"]["exercises"]
+    # variantes fuera de rango se acotan; sin variante se elige una existente
+    cached_workout_plan(equipamiento="mixto", variant=4, cache=cache, **WORKOUT)
+    cached_workout_plan(equipamiento="mixto", cache=cache, **WORKOUT)
+    assert len(cache) == 3
+
+
+def test_ttl_and_lru_eviction(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(plan_cache.time, "monotonic", lambda: now[0])
+    cache = PlanCache(PlanCacheConfig(ttl_s=10, max_entries=2))
+    calls = []
+
+    def compute(tag):
+        calls.append(tag)
+        return {"tag": tag}
+
+    for tag in ("a", "b"):
+        cache.get_or_compute("test", {"k": tag}, lambda tag=tag: compute(tag))
+    cache.get_or_compute("test", {"k": "a"}, lambda: compute("a"))  # "a" pasa a ser el más reciente
+    cache.get_or_compute("test", {"k": "c"}, lambda: compute("c"))  # expulsa "b"
+    cache.get_or_compute("test", {"k": "b"}, lambda: compute("b"))
+    assert calls == ["a", "b", "c", "b"]
+
+    now[0] += 11
+    cache.get_or_compute("test", {"k": "b"}, lambda: compute("b"))
+    assert calls[-1] == "b" and len(calls) == 5
+
+
+def test_disabled_cache_always_computes():
+    cache = PlanCache(PlanCacheConfig(backend="off"))
+    calls = []
+    for _ in range(2):
+        cache.get_or_compute("test", {}, lambda: calls.append(1) or {"ok": True})
+    assert len(calls) == 2
+    assert len(cache) == 0
+
+
+def test_diet_with_callbacks_is_not_cached():
+    cache = PlanCache()
+    cached_diet_plan(objetivo="equilibrada", nivel="intermedio", alergias=None, dislikes=None, condiciones=None,
+                     enable_catalog=True, catalog_loader=lambda: [], cache=cache)
+    assert len(cache) == 0
+
+
+@pytest.mark.parametrize("backend,path", [("sqlite", "plans.sqlite3"), ("file", "plans")])
+def test_shared_backend_across_instances(tmp_path, backend, path):
+    config = PlanCacheConfig(backend=backend, path=str(tmp_path / path), variants=1)
+    writer = PlanCache(config)
+    plan = cached_workout_plan(equipamiento="barra", cache=writer, **WORKOUT)
+
+    reader = PlanCache(config)  # otro proceso: memoria vacía, mismo almacenamiento
+    hits = _counter("plan_cache.hit", kind="workout", layer="shared")
+    again = cached_workout_plan(equipamiento="barra", cache=reader, **WORKOUT)
+    assert again["routine_summary"]["exercises"] == plan["routine_summary"]["exercises"]
+    assert _counter("plan_cache.hit", kind="workout", layer="shared") == hits + 1
+
+    reader.clear()
+    assert PlanCache(config).get(plan_cache.plan_cache_key("workout", {}), kind="workout") is None
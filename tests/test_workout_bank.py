@@ -0,0 +1,89 @@
+import random
+
+import pytest
+
+from backend.planner import workouts
+from backend.planner.workouts import (
+    CATALOGO,
+    _build_bank_por_prioridad,
+    available_exercise_count,
+    generate_workout_plan_batch,
+    pick_exercises,
+)
+
+
+def test_index_covers_catalog():
+    for grupo, equipos in CATALOGO.items():
+        for equip, items in equipos.items():
+            assert workouts._EXERCISE_INDEX[grupo][equip] == tuple((n, u) for n, u, _ in items)
+
+
+@pytest.mark.parametrize("equip", ["barra", "mancuerna", "peso corporal", "mixto", "trx"])
+def test_unknown_group_uses_fullbody_fallback(equip):
+    pool = _build_bank_por_prioridad("musculo_inexistente", equip)
+    fullbody = {n for eqs in workouts._EXERCISE_INDEX["fullbody"].values() for n, _ in eqs}
+    assert pool and {n for n, _ in pool} <= fullbody
+
+
+def test_bank_prioritizes_requested_equipment():
+    pool = _build_bank_por_prioridad("pecho", "Mancuerna")
+    first = workouts._EXERCISE_INDEX["pecho"]["mancuernas"]
+    assert tuple(pool[:len(first)]) == first
+    assert len({n for n, _ in pool}) == len(pool)
+
+
+def test_pick_is_uniform_sample_of_pool():
+    random.seed(7)
+    pool = set(_build_bank_por_prioridad("espalda", "barra"))
+    for _ in range(50):
+        picked = pick_exercises("espalda", "barra", 6)
+        assert len(picked) == 6
+        assert len(set(picked)) == 6
+        assert set(picked) <= pool
+
+
+def test_pick_respects_exclude_case_insensitive():
+    excluded = [n for n, _ in workouts._EXERCISE_INDEX["piernas"]["barra"]]
+    for _ in range(20):
+        picked = pick_exercises("piernas", "barra", 8, exclude=[n.upper() for n in excluded])
+        assert not {n for n, _ in picked} & set(excluded)
+    for _ in range(20):
+        picked = pick_exercises("piernas", "mixto", 5, exclude=excluded[:2])
+        assert len(picked) == 5
+        assert not {n for n, _ in picked} & set(excluded[:2])
+
+
+def test_available_exercise_count():
+    total = available_exercise_count("pecho", "barra")
+    assert total == len(_build_bank_por_prioridad("pecho", "barra"))
+    assert available_exercise_count("pecho", "barra", ["press banca con barra"]) == total - 1
+
+
+def test_batch_rotates_exercises_per_group():
+    sessions = [{"musculo": m} for _ in range(4) for m in ("pecho", "espalda", "piernas")]
+    plans = generate_workout_plan_batch(
+        sessions, objetivo="hipertrofia", nivel="intermedio", equipamiento="mancuernas",
+        ejercicios_num=6, tiempo_min=45,
+    )
+    assert len(plans) == 12
+    assert len({p["routine_summary"]["routine_id"] for p in plans}) == 12
+    for grupo in ("pecho", "espalda", "piernas"):
+        weeks = [p for p in plans if p["routine_summary"]["summary"]["musculo"] == grupo]
+        names = [[e["nombre"] for e in p["routine_summary"]["exercises"]] for p in weeks]
+        assert all(len(n) == 6 for n in names)
+        # semanas consecutivas no repiten ejercicios mientras el pool alcance
+        pool = available_exercise_count(grupo, "mancuernas")
+        if pool >= 12:
+            assert not set(names[0]) & set(names[1])
+
+
+def test_batch_session_overrides_defaults():
+    plans = generate_workout_plan_batch(
+        [{"musculo": "core", "ejercicios_num": 3}, {}],
+        objetivo="fuerza", nivel="principiante", musculo="brazos", equipamiento="barra",
+        ejercicios_num=4, tiempo_min=30, rotate_exercises=False,
+    )
+    assert plans[0]["routine_summary"]["summary"]["musculo"] == "core"
+    assert len(plans[0]["routine_summary"]["exercises"]) == 3
+    assert plans[1]["routine_summary"]["summary"]["musculo"] == "brazos"
+    assert len(plans[1]["routine_summary"]["exercises"]) == 4